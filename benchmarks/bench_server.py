@@ -0,0 +1,246 @@
+#!/usr/bin/env python3
+"""
+Server Benchmark - Load-tests the KCM converter end to end against local fake services
+Starts the fake Notion / Anthropic / WordPress / n8n APIs, serves kcm_converter_server
+on a local port, then drives /convert, /process-images and /upload-all at several
+concurrency levels and reports p50/p95/p99 latency and throughput.
+
+Usage:
+    python benchmarks/bench_server.py
+    python benchmarks/bench_server.py --concurrency 1,4,16 --requests 20 --claude-latency 300
+    python benchmarks/bench_server.py --error-rate 0.05 --no-stream --json results.json
+"""
+
+import os
+import sys
+import json
+import time
+import argparse
+import logging
+import tempfile
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Dict, List
+
+import requests
+
+from fake_services import FakeServices, FakeConfig, ServiceProfile, NOTION, ANTHROPIC, WORDPRESS, N8N, IMAGES
+
+logger = logging.getLogger(__name__)
+
+ENDPOINTS = ('convert', 'process-images', 'upload-all')
+
+
+def percentile(sorted_values: List[float], pct: float) -> float:
+    """Nearest-rank percentile of an already sorted list"""
+    if not sorted_values:
+        return 0.0
+    rank = max(1, int(round(pct / 100 * len(sorted_values) + 0.5)))
+    return sorted_values[min(rank, len(sorted_values)) - 1]
+
+
+def build_article(fakes: FakeServices, images: int) -> str:
+    """Synthetic KCM article with a few internal links and images served by the fakes"""
+    parts = ['<h1>Is Now a Good Time to Downsize?</h1>']
+    for i in range(12):
+        parts.append(
+            f"<p>Many homeowners are sitting on record equity. Paragraph {i} covers prices, rates and inventory. "
+            f"<a href=\"https://www.simplifyingthemarket.com/en/2025/0{1 + i % 9}/10/article-{i}/\">Related</a></p>"
+        )
+        if i < images:
+            parts.append(f"<p><img src=\"{fakes.image_url(i)}\" alt=\"chart {i}\"></p>")
+    return '\n'.join(parts)
+
+
+def build_request(endpoint: str, fakes: FakeServices, article: str, images: int, index: int) -> Dict:
+    image_list = [
+        {'original_url': fakes.image_url(i), 'suggested_filename': f"south-jersey-chart-{index}-{i}.png",
+         'alt_text': f"South Jersey chart {i}"}
+        for i in range(images)
+    ]
+    if endpoint == 'convert':
+        return {'html': article}
+    if endpoint == 'process-images':
+        return {'images': image_list}
+    # Unique KCM URL per request so the publish guard never short-circuits a measurement
+    return {
+        'converted_html': article + f"\n<!-- {index} -->",
+        'seo_metadata': {
+            'article_title': 'Is Now a Good Time to Downsize in South Jersey?',
+            'seo_title': 'Downsizing in South Jersey',
+            'categories': ['For Sellers'],
+            'tags': ['Downsizing'],
+            'focus_keyphrase': 'downsize in South Jersey',
+            'meta_description': 'Downsizing in South Jersey.'
+        },
+        'images': image_list,
+        'kcm_url': f"https://www.simplifyingthemarket.com/en/2025/01/01/bench-{index}/"
+    }
+
+
+def run_level(base_url: str, endpoint: str, concurrency: int, total: int, fakes: FakeServices,
+              article: str, images: int, offset: int) -> Dict:
+    """Send `total` requests to one endpoint with `concurrency` clients"""
+    latencies = []
+    failures = 0
+    lock = threading.Lock()
+    session = requests.Session()
+    adapter = requests.adapters.HTTPAdapter(pool_connections=concurrency, pool_maxsize=concurrency)
+    session.mount('http://', adapter)
+
+    def one(index: int):
+        nonlocal failures
+        payload = build_request(endpoint, fakes, article, images, offset + index)
+        started = time.perf_counter()
+        try:
+            response = session.post(f"{base_url}/{endpoint}", json=payload, timeout=600)
+            ok = response.status_code < 400
+        except requests.RequestException:
+            ok = False
+        elapsed = time.perf_counter() - started
+        with lock:
+            latencies.append(elapsed)
+            if not ok:
+                failures += 1
+
+    wall_started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        list(pool.map(one, range(total)))
+    wall = time.perf_counter() - wall_started
+
+    latencies.sort()
+    return {
+        'endpoint': endpoint,
+        'concurrency': concurrency,
+        'requests': total,
+        'errors': failures,
+        'p50_ms': round(percentile(latencies, 50) * 1000, 1),
+        'p95_ms': round(percentile(latencies, 95) * 1000, 1),
+        'p99_ms': round(percentile(latencies, 99) * 1000, 1),
+        'max_ms': round(latencies[-1] * 1000, 1) if latencies else 0.0,
+        'throughput_rps': round(total / wall, 2) if wall else 0.0,
+        'wall_s': round(wall, 2)
+    }
+
+
+def configure_environment(fakes: FakeServices, args) -> str:
+    """Point the converter at the fakes and give it throwaway state files (before it is imported)"""
+    state_dir = tempfile.mkdtemp(prefix='kcm-bench-')
+    os.environ.update(fakes.env())
+    os.environ.update({
+        'WEBHOOK_OUTBOX_PATH': os.path.join(state_dir, 'webhook_outbox.db'),
+        'PUBLISH_GUARD_PATH': os.path.join(state_dir, 'publish_guard.db'),
+        'TRACKING_QUEUE_PATH': os.path.join(state_dir, 'tracking_queue.db'),
+        'CONTEXT_DIGEST_DIR': os.path.join(state_dir, 'digests'),
+        'CONTEXT_INDEX_PATH': os.path.join(state_dir, 'context_index.bin'),
+        'SHARED_CACHE_URL': f"sqlite:///{os.path.join(state_dir, 'shared_cache.db')}",
+        'REWRITE_STREAMING': 'false' if args.no_stream else 'true'
+    })
+    if not args.real_limits:
+        # Measure the pipeline, not the production rate limits
+        os.environ.update({
+            'CLAUDE_MAX_CONCURRENT': '64',
+            'CLAUDE_RATE_PER_MINUTE': '100000',
+            'NOTION_MAX_CONCURRENT': '64',
+            'NOTION_RATE_PER_SECOND': '10000'
+        })
+    if not args.shared_cache:
+        # Every request sends the same article and images - measure the calls, not cache hits
+        os.environ.update({'CLAUDE_CACHE_TTL': '0', 'IMAGE_CACHE_TTL': '0'})
+    return state_dir
+
+
+def print_results(results: List[Dict], fakes: FakeServices):
+    print()
+    print("=" * 96)
+    print(f"{'Endpoint':<16}{'Conc':>6}{'Reqs':>6}{'Errors':>8}{'p50 ms':>10}{'p95 ms':>10}"
+          f"{'p99 ms':>10}{'max ms':>10}{'req/s':>9}{'wall s':>9}")
+    print("-" * 96)
+    for r in results:
+        print(f"{r['endpoint']:<16}{r['concurrency']:>6}{r['requests']:>6}{r['errors']:>8}{r['p50_ms']:>10}"
+              f"{r['p95_ms']:>10}{r['p99_ms']:>10}{r['max_ms']:>10}{r['throughput_rps']:>9}{r['wall_s']:>9}")
+    print("=" * 96)
+    print(f"Fake service calls: {fakes.counts}")
+    if fakes.errors:
+        print(f"Injected errors:    {fakes.errors}")
+
+
+def main():
+    """Main entry point"""
+    parser = argparse.ArgumentParser(description='Benchmark the KCM converter against local fake services')
+    parser.add_argument('--endpoints', default=','.join(ENDPOINTS), help='Comma-separated endpoints to drive')
+    parser.add_argument('--concurrency', default='1,4,8', help='Comma-separated concurrency levels')
+    parser.add_argument('--requests', type=int, default=10, help='Requests per endpoint and concurrency level')
+    parser.add_argument('--images', type=int, default=3, help='Images per article')
+    parser.add_argument('--notion-latency', type=float, default=120, help='Mean Notion latency (ms)')
+    parser.add_argument('--claude-latency', type=float, default=800, help='Mean Anthropic time to first byte (ms)')
+    parser.add_argument('--wordpress-latency', type=float, default=300, help='Mean WordPress media latency (ms)')
+    parser.add_argument('--webhook-latency', type=float, default=400, help='Mean n8n webhook latency (ms)')
+    parser.add_argument('--image-latency', type=float, default=80, help='Mean KCM image download latency (ms)')
+    parser.add_argument('--jitter', type=float, default=0.25, help='Latency jitter as a fraction of the mean')
+    parser.add_argument('--error-rate', type=float, default=0.0, help='Injected error rate for every fake service')
+    parser.add_argument('--no-stream', action='store_true', help='Use non-streaming rewrites')
+    parser.add_argument('--real-limits', action='store_true', help='Keep the configured Claude/Notion rate limits')
+    parser.add_argument('--shared-cache', action='store_true',
+                        help='Keep the Claude response and image caches on (repeat requests become cache hits)')
+    parser.add_argument('--json', help='Also write the results to this JSON file')
+    parser.add_argument('--verbose', action='store_true', help='Show the converter server logs')
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.WARNING, format='%(asctime)s - %(levelname)s - %(message)s')
+
+    latencies = {
+        NOTION: args.notion_latency, ANTHROPIC: args.claude_latency, WORDPRESS: args.wordpress_latency,
+        N8N: args.webhook_latency, IMAGES: args.image_latency
+    }
+    config = FakeConfig(profiles={
+        service: ServiceProfile(latency, latency * args.jitter, args.error_rate)
+        for service, latency in latencies.items()
+    })
+    fakes = FakeServices(config).start()
+    state_dir = configure_environment(fakes, args)
+
+    # Import only now so the server picks up the fake endpoints
+    sys.path.insert(0, str(Path(__file__).parent.parent / 'kcm-converter'))
+    import kcm_converter_server
+    from werkzeug.serving import make_server
+
+    # The server configures INFO logging on import - keep the benchmark output readable
+    logging.getLogger().setLevel(logging.INFO if args.verbose else logging.CRITICAL)
+    logging.getLogger('werkzeug').setLevel(logging.INFO if args.verbose else logging.ERROR)
+    kcm_converter_server.start_background_workers()
+    # Warm up before the first request, as serve.py does (CACHE_WARMING=false to measure cold starts)
+    kcm_converter_server.warm_caches()
+    kcm_converter_server.start_cache_refresh()
+    server = make_server('127.0.0.1', 0, kcm_converter_server.app, threaded=True)
+    threading.Thread(target=server.serve_forever, name='bench-server', daemon=True).start()
+    base_url = f"http://127.0.0.1:{server.server_port}"
+
+    article = build_article(fakes, args.images)
+    levels = [int(level) for level in args.concurrency.split(',') if level.strip()]
+    endpoints = [e.strip() for e in args.endpoints.split(',') if e.strip()]
+
+    results = []
+    offset = 0
+    for endpoint in endpoints:
+        for concurrency in levels:
+            print(f"Running {endpoint} x{args.requests} at concurrency {concurrency}...", flush=True)
+            results.append(run_level(base_url, endpoint, concurrency, args.requests, fakes, article, args.images, offset))
+            offset += args.requests
+
+    print_results(results, fakes)
+
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as f:
+            json.dump({'args': vars(args), 'results': results, 'fake_calls': fakes.counts,
+                       'injected_errors': fakes.errors}, f, indent=2)
+        print(f"Results written to {args.json}")
+
+    server.shutdown()
+    fakes.stop()
+    print(f"State files: {state_dir}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,162 @@
+#!/usr/bin/env python3
+"""
+Startup Benchmark - Import-time budget for the CLI and the converter server
+Runs `blog_rewriter.py --help` and a worker boot (importing kcm_converter_server) under
+`python -X importtime`, measures the import time beyond a bare interpreter and fails when it
+exceeds the budget or when an SDK that should load lazily (anthropic, notion_client, httpx,
+requests) is imported at startup.
+
+Usage:
+    python benchmarks/bench_startup.py
+    python benchmarks/bench_startup.py --cli-budget-ms 150 --worker-budget-ms 400 --runs 5
+"""
+
+import os
+import sys
+import json
+import argparse
+import tempfile
+import subprocess
+from pathlib import Path
+from typing import Dict, List, Set
+
+ROOT = Path(__file__).parent.parent
+CONVERTER_DIR = ROOT / 'kcm-converter'
+
+# Imported on first use only - loading any of these at startup is a regression
+LAZY_MODULES = {'anthropic', 'notion_client', 'httpx', 'httpx2', 'requests'}
+
+SCENARIOS = {
+    'cli-help': {
+        'args': [str(CONVERTER_DIR / 'blog_rewriter.py'), '--help'],
+        'lazy': LAZY_MODULES | {'dotenv'},
+        'budget_flag': 'cli_budget_ms'
+    },
+    'worker-boot': {
+        'args': ['-c', f"import sys; sys.path.insert(0, {str(CONVERTER_DIR)!r}); import kcm_converter_server"],
+        'lazy': LAZY_MODULES,
+        'budget_flag': 'worker_budget_ms'
+    }
+}
+
+
+def parse_importtime(stderr: str) -> List[Dict]:
+    """
+    Parse `-X importtime` output
+
+    Returns:
+        One entry per import: name, depth (0 = imported by the script itself), self_us, cumulative_us
+    """
+    entries = []
+    for line in stderr.splitlines():
+        if not line.startswith('import time:') or 'imported package' in line:
+            continue
+        parts = line[len('import time:'):].split('|', 2)
+        try:
+            self_us, cumulative_us, raw_name = int(parts[0]), int(parts[1]), parts[2]
+        except (ValueError, IndexError):
+            continue
+        name = raw_name.lstrip()
+        depth = (len(raw_name) - len(name) - 1) // 2
+        entries.append({'name': name, 'depth': depth, 'self_us': self_us, 'cumulative_us': cumulative_us})
+    return entries
+
+
+def run_importtime(args: List[str], env: Dict[str, str], cwd: str) -> List[Dict]:
+    result = subprocess.run([sys.executable, '-X', 'importtime', *args], env=env, cwd=cwd,
+                            capture_output=True, text=True, timeout=120)
+    return parse_importtime(result.stderr)
+
+
+def startup_modules(env: Dict[str, str], cwd: str) -> Set[str]:
+    """Modules a bare interpreter imports (site, encodings, .pth hooks) - not charged to the scenarios"""
+    return {entry['name'] for entry in run_importtime(['-c', 'pass'], env, cwd)}
+
+
+def measure(scenario: Dict, baseline_modules: Set[str], env: Dict[str, str], cwd: str, runs: int) -> Dict:
+    """Best-of-N import time of one scenario, its slowest top-level imports and any eager SDK imports"""
+    best_us = None
+    best_entries = []
+    for _ in range(runs):
+        entries = run_importtime(scenario['args'], env, cwd)
+        top_level = [e for e in entries if e['depth'] == 0 and e['name'] not in baseline_modules]
+        total_us = sum(e['cumulative_us'] for e in top_level)
+        if best_us is None or total_us < best_us:
+            best_us, best_entries = total_us, entries
+
+    imported = {entry['name'].split('.')[0] for entry in best_entries}
+    slowest = sorted(
+        (e for e in best_entries if e['depth'] <= 1 and e['name'] not in baseline_modules),
+        key=lambda e: e['cumulative_us'], reverse=True
+    )[:10]
+    return {
+        'import_ms': round(best_us / 1000, 1),
+        'eager_sdks': sorted(imported & scenario['lazy']),
+        'slowest': [{'module': e['name'], 'ms': round(e['cumulative_us'] / 1000, 1)} for e in slowest]
+    }
+
+
+def main():
+    """Main entry point"""
+    parser = argparse.ArgumentParser(description='Check the import-time budget of the CLI and server')
+    parser.add_argument('--cli-budget-ms', type=float, default=150,
+                        help='Budget for blog_rewriter.py --help (import time beyond a bare interpreter)')
+    parser.add_argument('--worker-budget-ms', type=float, default=400,
+                        help='Budget for importing kcm_converter_server (worker boot)')
+    parser.add_argument('--runs', type=int, default=5, help='Runs per scenario (best is kept)')
+    parser.add_argument('--json', help='Also write the results to this JSON file')
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix='kcm-startup-')
+    env = dict(os.environ)
+    env.pop('CASSETTE_MODE', None)
+    # Keep the server's state files and the CLI log out of the repo
+    env.update({
+        'WEBHOOK_OUTBOX_PATH': os.path.join(workdir, 'webhook_outbox.db'),
+        'PUBLISH_GUARD_PATH': os.path.join(workdir, 'publish_guard.db'),
+        'TRACKING_QUEUE_PATH': os.path.join(workdir, 'tracking_queue.db'),
+        'CONTEXT_INDEX_PATH': os.path.join(workdir, 'context_index.bin'),
+        'SHARED_CACHE_URL': f"sqlite:///{os.path.join(workdir, 'shared_cache.db')}",
+        'PYTHONDONTWRITEBYTECODE': '1'
+    })
+    baseline_modules = startup_modules(env, workdir)
+
+    print("=" * 70)
+    print("STARTUP IMPORT-TIME BUDGET")
+    print("=" * 70)
+
+    results = {}
+    failures = []
+    for name, scenario in SCENARIOS.items():
+        budget = getattr(args, scenario['budget_flag'])
+        result = measure(scenario, baseline_modules, env, workdir, max(1, args.runs))
+        result['budget_ms'] = budget
+        results[name] = result
+
+        print(f"\n{name}: {result['import_ms']:.1f} ms (budget {budget:.0f} ms)")
+        for entry in result['slowest']:
+            print(f"    {entry['ms']:>8.1f} ms  {entry['module']}")
+
+        if result['import_ms'] > budget:
+            failures.append(f"{name}: {result['import_ms']:.1f} ms exceeds the {budget:.0f} ms budget")
+        if result['eager_sdks']:
+            failures.append(f"{name}: imports {', '.join(result['eager_sdks'])} at startup (should load on first use)")
+
+    print()
+    print("=" * 70)
+    if failures:
+        for failure in failures:
+            print(f"❌ {failure}")
+    else:
+        print("✅ Startup within budget")
+    print("=" * 70)
+
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as f:
+            json.dump({'results': results, 'failures': failures}, f, indent=2)
+
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == "__main__":
+    main()
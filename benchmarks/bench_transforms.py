@@ -0,0 +1,319 @@
+#!/usr/bin/env python3
+"""
+Transform Microbenchmarks - Time and peak memory of the regex-based HTML transforms
+Runs migrate_kcm_links, convert_image_urls, remove_em_dashes, replace_kcm_links,
+extract_kcm_links, extract_images and extract_article_slug over synthetic and real KCM
+articles at 1x / 10x / 100x size with 0-500 links and images, flags super-linear scaling
+and compares every result against a stored baseline (exit code 1 on any regression).
+
+Usage:
+    python benchmarks/bench_transforms.py                  # compare against the baseline
+    python benchmarks/bench_transforms.py --save-baseline  # record a new baseline
+    python benchmarks/bench_transforms.py --quick          # smaller grid for a fast check
+"""
+
+import os
+import re
+import sys
+import json
+import math
+import time
+import argparse
+import logging
+import tempfile
+import tracemalloc
+from pathlib import Path
+from typing import Callable, Dict, List, Tuple
+
+ROOT = Path(__file__).parent.parent
+DEFAULT_BASELINE = Path(__file__).parent / 'transform_baseline.json'
+
+# Real articles shipped with the repo (scaled by repetition)
+REAL_ARTICLES = [
+    ROOT / 'EXTRA' / 'sample_blog.html',
+    ROOT / 'EXTRA' / 'why-home-prices-arent-actually-flat.html',
+    ROOT / 'EXTRA' / 'rewritten_blog_20251008_072059.html'
+]
+
+SIZES = (1, 10, 100)
+ITEM_COUNTS = (0, 10, 100, 500)
+
+# Paragraphs in a 1x synthetic article (about the length of a KCM post)
+BASE_PARAGRAPHS = 20
+
+# Ignore regressions and scaling on timings below this (timer noise)
+MIN_SIGNIFICANT_SECONDS = 0.0005
+MIN_SIGNIFICANT_PEAK_KB = 64
+
+FOCUS_KEYPHRASE = 'downsizing in South Jersey'
+
+
+def load_transforms() -> Dict[str, Callable]:
+    """Import the transforms from the server and shared modules (with throwaway state files)"""
+    state_dir = tempfile.mkdtemp(prefix='kcm-microbench-')
+    for name, filename in (('WEBHOOK_OUTBOX_PATH', 'outbox.db'), ('PUBLISH_GUARD_PATH', 'guard.db'),
+                           ('TRACKING_QUEUE_PATH', 'tracking.db'), ('SHARED_CACHE_URL', 'shared_cache.db')):
+        os.environ.setdefault(name, os.path.join(state_dir, filename))
+
+    sys.path.insert(0, str(ROOT / 'kcm-converter'))
+    sys.path.insert(0, str(ROOT / 'shared'))
+    import kcm_converter_server as server
+    from link_replacer import replace_kcm_links, extract_kcm_links
+
+    return {
+        'migrate_kcm_links': lambda case: server.migrate_kcm_links(case['html']),
+        'convert_image_urls': lambda case: server.convert_image_urls(case['html'], case['image_mapping']),
+        'remove_em_dashes': lambda case: server.remove_em_dashes(case['html']),
+        'replace_kcm_links': lambda case: replace_kcm_links(case['html'], case['url_mapping']),
+        'extract_kcm_links': lambda case: extract_kcm_links(case['html']),
+        'extract_images': lambda case: server.extract_images(case['html'], case['html'], FOCUS_KEYPHRASE),
+        'extract_article_slug': lambda case: server.extract_article_slug(case['html'])
+    }
+
+
+def synthetic_article(size: int, items: int) -> Dict:
+    """
+    Synthetic KCM article with `items` links and `items` images spread over the text
+
+    Half the links are simplifyingthemarket.com article links (migrate_kcm_links),
+    half keepingcurrentmatters.com links (replace_kcm_links); every image gets a mapping.
+    """
+    paragraphs = BASE_PARAGRAPHS * size
+    link_every = paragraphs / items if items else None
+    parts = ['<h1>Why Downsizing in 2025 Could Be Your Best Move &mdash; Experts Weigh In</h1>']
+    image_mapping, url_mapping = {}, {}
+    link_index = image_index = 0
+
+    for p in range(paragraphs):
+        text = (f"<p>Homeowners who have built up equity are in a strong position — "
+                f"paragraph {p} explains how prices, rates and inventory affect the move&#8212;today.</p>")
+        parts.append(text)
+        # Place as many links and images as needed to reach `items` evenly
+        while link_every and link_index < items and link_index * link_every <= p:
+            if link_index % 2 == 0:
+                url = f"https://www.simplifyingthemarket.com/en/2025/0{1 + link_index % 9}/1{link_index % 10}/article-{link_index}/?a=211199-eed154519afbfe4c41f1265fedb5efcd"
+            else:
+                url = f"https://www.keepingcurrentmatters.com/2025/01/0{1 + link_index % 9}/article-{link_index}/"
+                url_mapping[url] = f"https://mikesellsnj.com/article-{link_index}/"
+            parts.append(f'<p>Read <a href="{url}" target="_blank" rel="noopener">more here</a>.</p>')
+            link_index += 1
+        while link_every and image_index < items and image_index * link_every <= p:
+            src = f"https://files.keepingcurrentmatters.com/content/assets/chart-{image_index}.png"
+            image_mapping[src] = f"https://mikesellsnj.com/wp-content/uploads/2025/01/chart-{image_index}.png"
+            parts.append(f'<a href="{src}"><img class="aligncenter" src="{src}" alt="Chart {image_index}" width="800"></a>')
+            image_index += 1
+
+    return {'html': '\n'.join(parts), 'image_mapping': image_mapping, 'url_mapping': url_mapping}
+
+
+def real_article(path: Path, size: int) -> Dict:
+    """A real article repeated `size` times, with mappings for its images and KCM links"""
+    html = '\n'.join([path.read_text(encoding='utf-8')] * size)
+    images = re.findall(r'<img\s+[^>]*?src="([^"]+)"', html, re.IGNORECASE)
+    links = re.findall(r'href=["\']([^"\']*keepingcurrentmatters\.com[^"\']*)["\']', html, re.IGNORECASE)
+    return {
+        'html': html,
+        'image_mapping': {src: f"https://mikesellsnj.com/wp-content/uploads/{i}.png" for i, src in enumerate(images)},
+        'url_mapping': {url: f"https://mikesellsnj.com/post-{i}/" for i, url in enumerate(links)}
+    }
+
+
+def build_corpus(sizes: Tuple[int, ...], item_counts: Tuple[int, ...]) -> Dict[str, Dict]:
+    corpus = {}
+    for size in sizes:
+        for items in item_counts:
+            corpus[f"synthetic/{size}x/{items}"] = synthetic_article(size, items)
+        for path in REAL_ARTICLES:
+            if path.exists():
+                corpus[f"real/{path.stem}/{size}x"] = real_article(path, size)
+    return corpus
+
+
+def time_call(fn: Callable, case: Dict, min_batch_seconds: float = 0.02, batches: int = 3) -> float:
+    """Best per-call time over several batches (each batch long enough to beat timer noise)"""
+    loops = 1
+    while True:
+        started = time.perf_counter()
+        for _ in range(loops):
+            fn(case)
+        elapsed = time.perf_counter() - started
+        if elapsed >= min_batch_seconds or loops >= 1000:
+            break
+        loops *= 4
+
+    best = elapsed / loops
+    for _ in range(batches - 1):
+        started = time.perf_counter()
+        for _ in range(loops):
+            fn(case)
+        best = min(best, (time.perf_counter() - started) / loops)
+    return best
+
+
+def peak_memory_kb(fn: Callable, case: Dict) -> float:
+    """Peak memory allocated during one call (KB)"""
+    tracemalloc.start()
+    tracemalloc.reset_peak()
+    baseline, _ = tracemalloc.get_traced_memory()
+    fn(case)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return (peak - baseline) / 1024
+
+
+def calibrate() -> float:
+    """Time of a fixed regex workload, used to normalize results across machines"""
+    text = ('<p>calibration <a href="https://example.com/x/">link</a> text</p>\n' * 20000)
+    best = float('inf')
+    for _ in range(15):
+        started = time.perf_counter()
+        re.sub(r'<a\s+([^>]*?)href="([^"]+)"([^>]*?)>', lambda m: m.group(0), text)
+        best = min(best, time.perf_counter() - started)
+    return best
+
+
+def scaling_exponent(small: Tuple[float, float], large: Tuple[float, float]) -> float:
+    """Exponent k in time ~ n^k between two (n, seconds) points"""
+    (n1, t1), (n2, t2) = small, large
+    if n1 <= 0 or n2 <= n1 or t1 <= 0 or t2 <= 0:
+        return 0.0
+    return math.log(t2 / t1) / math.log(n2 / n1)
+
+
+def find_superlinear(results: Dict[str, Dict], corpus: Dict[str, Dict], sizes, item_counts, limit: float) -> List[str]:
+    """
+    Flag functions whose time grows faster than n^limit with document size or with link/image count
+    """
+    problems = []
+    functions = sorted({key.split('|')[0] for key in results})
+    for name in functions:
+        def point(case_name):
+            return len(corpus[case_name]['html']), results[f"{name}|{case_name}"]['time_s']
+
+        # Document size, at a fixed number of links/images
+        for items in item_counts:
+            small, large = f"synthetic/{sizes[0]}x/{items}", f"synthetic/{sizes[-1]}x/{items}"
+            if f"{name}|{small}" in results and f"{name}|{large}" in results:
+                (n1, t1), (n2, t2) = point(small), point(large)
+                k = scaling_exponent((n1, t1), (n2, t2))
+                if t2 >= MIN_SIGNIFICANT_SECONDS and k > limit:
+                    problems.append(f"{name}: time ~ size^{k:.2f} with {items} links/images ({t1 * 1e3:.2f} -> {t2 * 1e3:.2f} ms)")
+
+        # Number of links/images, at the largest size
+        counts = [c for c in item_counts if c > 0]
+        if len(counts) >= 2:
+            small, large = f"synthetic/{sizes[-1]}x/{counts[0]}", f"synthetic/{sizes[-1]}x/{counts[-1]}"
+            if f"{name}|{small}" in results and f"{name}|{large}" in results:
+                t1, t2 = results[f"{name}|{small}"]['time_s'], results[f"{name}|{large}"]['time_s']
+                k = scaling_exponent((counts[0], t1), (counts[-1], t2))
+                if t2 >= MIN_SIGNIFICANT_SECONDS and k > limit:
+                    problems.append(f"{name}: time ~ items^{k:.2f} at {sizes[-1]}x ({t1 * 1e3:.2f} -> {t2 * 1e3:.2f} ms)")
+    return problems
+
+
+def compare_to_baseline(results: Dict[str, Dict], calibration: float, baseline: Dict, tolerance: float) -> List[str]:
+    """List results slower (normalized by calibration) or hungrier than the baseline by more than tolerance"""
+    regressions = []
+    # Only ever relax the budget for a slower machine: calibration itself jitters by ~25%,
+    # and scaling the baseline down on a quick calibration run produces false regressions
+    scale = max(1.0, calibration / baseline['calibration_s']) if baseline.get('calibration_s') else 1.0
+    for key, result in sorted(results.items()):
+        previous = baseline['results'].get(key)
+        if not previous:
+            continue
+        allowed_time = previous['time_s'] * scale * (1 + tolerance)
+        if result['time_s'] >= MIN_SIGNIFICANT_SECONDS and result['time_s'] > allowed_time:
+            regressions.append(
+                f"{key}: {result['time_s'] * 1e3:.2f} ms vs baseline {previous['time_s'] * scale * 1e3:.2f} ms (machine-adjusted)"
+            )
+        allowed_peak = previous['peak_kb'] * (1 + tolerance)
+        if result['peak_kb'] >= MIN_SIGNIFICANT_PEAK_KB and result['peak_kb'] > allowed_peak:
+            regressions.append(f"{key}: peak {result['peak_kb']:.0f} KB vs baseline {previous['peak_kb']:.0f} KB")
+    return regressions
+
+
+def main():
+    """Main entry point"""
+    parser = argparse.ArgumentParser(description='Microbenchmark the HTML transform functions')
+    parser.add_argument('--baseline', default=str(DEFAULT_BASELINE), help='Baseline JSON file')
+    parser.add_argument('--save-baseline', action='store_true', help='Write the results as the new baseline')
+    parser.add_argument('--tolerance', type=float, default=1.0, help='Allowed slowdown / memory growth (1.0 = 2x)')
+    parser.add_argument('--exponent-limit', type=float, default=1.3, help='Scaling exponent treated as super-linear')
+    parser.add_argument('--functions', help='Comma-separated subset of functions')
+    parser.add_argument('--quick', action='store_true', help='Sizes 1x/10x and up to 100 links/images only')
+    parser.add_argument('--json', help='Also write the results to this JSON file')
+    args = parser.parse_args()
+
+    transforms = load_transforms()
+    # Measure the transforms themselves, not log formatting and handlers
+    logging.disable(logging.CRITICAL)
+
+    if args.functions:
+        wanted = {name.strip() for name in args.functions.split(',')}
+        transforms = {name: fn for name, fn in transforms.items() if name in wanted}
+
+    sizes = SIZES[:2] if args.quick else SIZES
+    item_counts = ITEM_COUNTS[:3] if args.quick else ITEM_COUNTS
+    corpus = build_corpus(sizes, item_counts)
+    calibration = calibrate()
+
+    print("=" * 92)
+    print(f"TRANSFORM MICROBENCHMARKS ({len(transforms)} functions x {len(corpus)} documents, "
+          f"calibration {calibration * 1e3:.2f} ms)")
+    print("=" * 92)
+    print(f"{'Function':<22}{'Document':<46}{'KB':>8}{'ms':>9}{'peak KB':>9}")
+    print("-" * 92)
+
+    results = {}
+    for name, fn in transforms.items():
+        for case_name, case in corpus.items():
+            seconds = time_call(fn, case)
+            peak = peak_memory_kb(fn, case)
+            results[f"{name}|{case_name}"] = {'time_s': seconds, 'peak_kb': round(peak, 1), 'doc_kb': round(len(case['html']) / 1024, 1)}
+            print(f"{name:<22}{case_name:<46}{len(case['html']) / 1024:>8.1f}{seconds * 1e3:>9.3f}{peak:>9.1f}")
+
+    superlinear = find_superlinear(results, corpus, sizes, item_counts, args.exponent_limit)
+
+    regressions = []
+    baseline_path = Path(args.baseline)
+    if args.save_baseline:
+        with open(baseline_path, 'w', encoding='utf-8') as f:
+            json.dump({'calibration_s': calibration, 'results': results}, f, indent=2, sort_keys=True)
+        print(f"\nBaseline written to {baseline_path}")
+    elif baseline_path.exists():
+        with open(baseline_path, 'r', encoding='utf-8') as f:
+            baseline = json.load(f)
+        regressions = compare_to_baseline(results, calibration, baseline, args.tolerance)
+        if regressions:
+            # Confirm with a longer re-measurement so a noisy neighbour does not fail the run
+            flagged = {regression.split(':')[0] for regression in regressions}
+            print(f"\nRe-measuring {len(flagged)} flagged result(s)...")
+            calibration = min(calibration, calibrate())
+            for key in flagged:
+                name, case_name = key.split('|')
+                seconds = time_call(transforms[name], corpus[case_name], min_batch_seconds=0.05, batches=7)
+                results[key]['time_s'] = min(results[key]['time_s'], seconds)
+            regressions = compare_to_baseline(results, calibration, baseline, args.tolerance)
+    else:
+        print(f"\nNo baseline at {baseline_path} - run with --save-baseline to create one")
+
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as f:
+            json.dump({'calibration_s': calibration, 'results': results, 'superlinear': superlinear,
+                       'regressions': regressions}, f, indent=2)
+
+    print()
+    for problem in superlinear:
+        print(f"❌ SUPER-LINEAR: {problem}")
+    for regression in regressions:
+        print(f"❌ REGRESSION: {regression}")
+    if superlinear or regressions:
+        print("=" * 92)
+        sys.exit(1)
+
+    print("✅ No super-linear scaling or regressions")
+    print("=" * 92)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,429 @@
+"""
+Fake Services
+Local stand-ins for the Notion, Anthropic, WordPress (media, categories, tags) and n8n webhook APIs
+Every service has configurable latency (mean + jitter) and an injected error rate,
+so the converter can be load-tested offline without touching the real APIs.
+"""
+
+import re
+import json
+import time
+import hashlib
+import random
+import logging
+import threading
+from dataclasses import dataclass, field
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from typing import Dict, List, Optional
+from urllib.parse import urlparse, parse_qs
+
+logger = logging.getLogger(__name__)
+
+NOTION = 'notion'
+ANTHROPIC = 'anthropic'
+WORDPRESS = 'wordpress'
+N8N = 'n8n'
+IMAGES = 'images'
+
+# Error status returned per service when an error is injected
+ERROR_STATUS = {NOTION: 502, ANTHROPIC: 529, WORDPRESS: 500, N8N: 500, IMAGES: 503}
+
+CONTEXT_TOPICS = ['downsizing', 'first-time buyers', 'equity', 'market trends', 'mortgage rates',
+                  'senior homeowners', 'spring selling season', 'home prices', 'inventory', 'relocation']
+
+TOWNS = ['Mullica Hill', 'Cherry Hill', 'Haddonfield', 'Moorestown', 'Voorhees', 'Glassboro']
+
+# 1x1 transparent PNG
+PNG_BYTES = bytes.fromhex(
+    '89504e470d0a1a0a0000000d4948445200000001000000010806000000'
+    '1f15c4890000000d49444154789c6360000002000154a24f5d0000000049454e44ae426082'
+)
+
+
+@dataclass
+class ServiceProfile:
+    """Latency and error injection for one fake service"""
+    latency_ms: float = 0.0
+    jitter_ms: float = 0.0
+    error_rate: float = 0.0
+
+    def delay(self):
+        latency = self.latency_ms + random.uniform(-self.jitter_ms, self.jitter_ms)
+        if latency > 0:
+            time.sleep(latency / 1000)
+
+    def should_fail(self) -> bool:
+        return self.error_rate > 0 and random.random() < self.error_rate
+
+
+@dataclass
+class FakeConfig:
+    """Settings for all fake services"""
+    profiles: Dict[str, ServiceProfile] = field(default_factory=lambda: {
+        NOTION: ServiceProfile(120, 40),
+        ANTHROPIC: ServiceProfile(800, 200),
+        WORDPRESS: ServiceProfile(300, 100),
+        N8N: ServiceProfile(400, 100),
+        IMAGES: ServiceProfile(80, 30)
+    })
+    context_pages: int = 40
+    blocks_per_page: int = 30
+    rewrite_chars: int = 6000
+    stream_chunk_chars: int = 200
+    # Seconds between streamed chunks (models the token rate of a long rewrite)
+    stream_chunk_delay: float = 0.01
+
+
+def _context_page(index: int) -> Dict:
+    title = 'South Jersey Real Estate Context Guide' if index == 0 else \
+        f"{CONTEXT_TOPICS[index % len(CONTEXT_TOPICS)].title()} in {TOWNS[index % len(TOWNS)]}"
+    summary = f"Notes on {title}: " + ' '.join(CONTEXT_TOPICS) * 4
+    return {
+        'object': 'page',
+        'id': f"00000000-0000-0000-0000-{index:012d}",
+        'url': f"https://www.notion.so/page-{index}",
+        'last_edited_time': '2025-01-01T00:00:00.000Z',
+        'properties': {
+            'Title': {'id': 'title', 'type': 'title', 'title': [{'text': {'content': title}, 'plain_text': title}]},
+            'Keywords / Tags': {'id': 'kw%3At', 'type': 'multi_select', 'multi_select': [
+                {'name': CONTEXT_TOPICS[index % len(CONTEXT_TOPICS)]},
+                {'name': CONTEXT_TOPICS[(index * 3) % len(CONTEXT_TOPICS)]}
+            ]},
+            'Summary': {'id': 'sm%5Ey', 'type': 'rich_text', 'rich_text': [{'text': {'content': summary}, 'plain_text': summary}]}
+        }
+    }
+
+
+CONTEXT_DATABASE = {
+    'object': 'database',
+    'properties': {
+        'Title': {'id': 'title', 'name': 'Title', 'type': 'title', 'title': {}},
+        'Keywords / Tags': {'id': 'kw%3At', 'name': 'Keywords / Tags', 'type': 'multi_select',
+                            'multi_select': {'options': [{'name': topic} for topic in CONTEXT_TOPICS]}},
+        'Summary': {'id': 'sm%5Ey', 'name': 'Summary', 'type': 'rich_text', 'rich_text': {}}
+    }
+}
+
+
+def _property_text(prop: Dict) -> List[str]:
+    if prop.get('type') == 'multi_select':
+        return [option['name'] for option in prop['multi_select']]
+    return [''.join(part['plain_text'] for part in prop.get(prop.get('type'), []))]
+
+
+def _matches(page: Dict, condition: Dict) -> bool:
+    """Evaluate the subset of Notion's filter language the converter sends"""
+    if 'or' in condition:
+        return any(_matches(page, part) for part in condition['or'])
+    if 'and' in condition:
+        return all(_matches(page, part) for part in condition['and'])
+    prop = page['properties'].get(condition['property'], {})
+    if 'multi_select' in condition:
+        return condition['multi_select']['contains'] in _property_text(prop)
+    kind = 'title' if 'title' in condition else 'rich_text'
+    return condition[kind]['contains'].lower() in _property_text(prop)[0].lower()
+
+
+def _select_properties(page: Dict, property_ids: List[str]) -> Dict:
+    if not property_ids:
+        return page
+    properties = {name: prop for name, prop in page['properties'].items() if prop['id'] in property_ids}
+    return dict(page, properties=properties)
+
+
+def _paragraph(text: str, block_type: str = 'paragraph') -> Dict:
+    return {'object': 'block', 'type': block_type, block_type: {'rich_text': [{'text': {'content': text}}]}}
+
+
+def _rewrite_html(chars: int) -> str:
+    paragraphs = ['<h1>Is Now a Good Time to Downsize in South Jersey?</h1>']
+    i = 0
+    while sum(len(p) for p in paragraphs) < chars:
+        town = TOWNS[i % len(TOWNS)]
+        paragraphs.append(
+            f"<p>Homeowners in {town} have gained equity - the median price is up {3 + i % 5}% this year. "
+            f"<a href=\"https://www.simplifyingthemarket.com/en/2025/01/{1 + i % 28:02d}/article-{i}/\">Read more</a></p>"
+        )
+        i += 1
+    return '\n'.join(paragraphs)
+
+
+TAXONOMY_SNAPSHOT = Path(__file__).parent.parent / 'shared' / 'wordpress_taxonomy_snapshot.json'
+
+
+def _taxonomy_terms() -> Dict[str, List[Dict]]:
+    """The bundled taxonomy plus a few terms only the "live" site has (and one page's worth of town tags)"""
+    with open(TAXONOMY_SNAPSHOT, 'r', encoding='utf-8') as f:
+        terms = json.load(f)
+    tags = list(terms['tags']) + [{'id': 2000, 'name': 'New Construction', 'slug': 'new-construction'}]
+    tags += [{'id': 2100 + i, 'name': f"Fake Town {i}", 'slug': f"fake-town-{i}"} for i in range(100)]
+    return {
+        'categories': [dict(term, count=10) for term in terms['categories']],
+        'tags': [dict(term, count=1) for term in tags]
+    }
+
+
+SEO_RESPONSE = {
+    'article_title': 'Is Now a Good Time to Downsize in South Jersey?',
+    'categories': ['For Sellers', 'Housing Market Updates'],
+    'tags': ['Downsizing', 'Home Prices'],
+    'focus_keyphrase': 'downsize in South Jersey',
+    'seo_title': 'Downsizing in South Jersey | Market Guide',
+    'meta_description': 'Thinking about downsizing in South Jersey? See what your equity can do in today\'s market.'
+}
+
+
+class FakeServices:
+    """One threaded HTTP server that routes to every fake API by path"""
+
+    def __init__(self, config: Optional[FakeConfig] = None, host: str = '127.0.0.1', port: int = 0):
+        self.config = config or FakeConfig()
+        self.counts: Dict[str, int] = {}
+        self.errors: Dict[str, int] = {}
+        self._lock = threading.Lock()
+        self._media_id = 1000
+        self._pages = [_context_page(i) for i in range(self.config.context_pages)]
+        self._blocks = [
+            _paragraph(f"Market data for {TOWNS[i % len(TOWNS)]}", 'heading_2') if i % 10 == 0 else
+            _paragraph(f"In {TOWNS[i % len(TOWNS)]}, {CONTEXT_TOPICS[i % len(CONTEXT_TOPICS)]} matters: "
+                       f"the median sale price reached ${350 + i}K with {20 + i % 15} days on market.")
+            for i in range(self.config.blocks_per_page)
+        ]
+        self._rewrite = _rewrite_html(self.config.rewrite_chars)
+        self._taxonomy = _taxonomy_terms()
+        self.server = ThreadingHTTPServer((host, port), self._handler_class())
+        self.server.daemon_threads = True
+        self._thread = None
+
+    @property
+    def base_url(self) -> str:
+        host, port = self.server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self) -> 'FakeServices':
+        self._thread = threading.Thread(target=self.server.serve_forever, name='fake-services', daemon=True)
+        self._thread.start()
+        logger.info(f"Fake services listening on {self.base_url}")
+        return self
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+    def env(self) -> Dict[str, str]:
+        """Environment variables that point the converter at these fakes"""
+        return {
+            'NOTION_BASE_URL': self.base_url,
+            'NOTION_API_KEY': 'fake-notion-key',
+            'NOTION_DATABASE_ID': 'fake-database',
+            'NOTION_CONVERSION_DB_ID': 'fake-conversions',
+            'ANTHROPIC_BASE_URL': self.base_url,
+            'CLAUDE_API_KEY': 'fake-claude-key',
+            'WORDPRESS_SITE_URL': self.base_url,
+            'WORDPRESS_USERNAME': 'bench',
+            'WORDPRESS_APP_PASSWORD': 'fake-wordpress-password',
+            'N8N_WEBHOOK_URL': f"{self.base_url}/webhook/wordpress-publish"
+        }
+
+    def image_url(self, index: int) -> str:
+        return f"{self.base_url}/images/kcm-{index}.png"
+
+    def _count(self, service: str, failed: bool):
+        with self._lock:
+            self.counts[service] = self.counts.get(service, 0) + 1
+            if failed:
+                self.errors[service] = self.errors.get(service, 0) + 1
+
+    def _next_media_id(self) -> int:
+        with self._lock:
+            self._media_id += 1
+            return self._media_id
+
+    def _claude_text(self, prompt: str) -> str:
+        if 'Return a JSON array' in prompt:
+            return json.dumps(random.sample(CONTEXT_TOPICS, 5))
+        if 'generate SEO metadata' in prompt:
+            return json.dumps(SEO_RESPONSE)
+        return self._rewrite
+
+    def _handler_class(self):
+        services = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'
+
+            def log_message(self, *args):
+                pass
+
+            def _body(self) -> bytes:
+                length = int(self.headers.get('Content-Length') or 0)
+                return self.rfile.read(length) if length else b''
+
+            def _send(self, status: int, payload, content_type: str = 'application/json',
+                      headers: Optional[Dict[str, str]] = None):
+                data = payload if isinstance(payload, bytes) else json.dumps(payload).encode('utf-8')
+                self.send_response(status)
+                self.send_header('Content-Type', content_type)
+                self.send_header('Content-Length', str(len(data)))
+                for name, value in (headers or {}).items():
+                    self.send_header(name, value)
+                self.end_headers()
+                self.wfile.write(data)
+
+            def _route(self, method: str):
+                path = self.path.split('?')[0]
+                body = self._body()
+
+                if path.startswith('/v1/messages'):
+                    service = ANTHROPIC
+                elif path.startswith('/v1/'):
+                    service = NOTION
+                elif path.startswith('/wp-json/'):
+                    service = WORDPRESS
+                elif path.startswith('/webhook/'):
+                    service = N8N
+                elif path.startswith('/images/'):
+                    service = IMAGES
+                else:
+                    self._send(404, {'error': f"Unknown fake route {path}"})
+                    return
+
+                profile = services.config.profiles[service]
+                profile.delay()
+                failed = profile.should_fail()
+                services._count(service, failed)
+                if failed:
+                    self._send(ERROR_STATUS[service], {'type': 'error', 'error': {'type': 'injected', 'message': 'Injected failure'}})
+                    return
+
+                handler = getattr(self, f"_{service}")
+                handler(method, path, json.loads(body) if body and service != WORDPRESS else body)
+
+            def do_GET(self):
+                self._route('GET')
+
+            def do_POST(self):
+                self._route('POST')
+
+            def do_PATCH(self):
+                self._route('PATCH')
+
+            # --- Notion ---------------------------------------------------
+
+            def _notion(self, method: str, path: str, body):
+                if re.match(r'/v1/databases/[^/]+/query', path):
+                    pages = services._pages if 'conversions' not in path else []
+                    if body and body.get('filter'):
+                        pages = [page for page in pages if _matches(page, body['filter'])]
+                    property_ids = parse_qs(urlparse(self.path).query).get('filter_properties', [])
+                    pages = [_select_properties(page, property_ids) for page in pages]
+                    self._send(200, {'object': 'list', 'results': pages, 'has_more': False, 'next_cursor': None})
+                elif re.match(r'/v1/blocks/[^/]+/children', path):
+                    self._send(200, {'object': 'list', 'results': services._blocks, 'has_more': False, 'next_cursor': None})
+                elif path == '/v1/pages':
+                    self._send(200, {'object': 'page', 'id': f"tracked-{services._next_media_id()}"})
+                elif re.match(r'/v1/databases/[^/]+$', path):
+                    self._send(200, dict(CONTEXT_DATABASE, id=path.rsplit('/', 1)[-1]))
+                else:
+                    self._send(404, {'object': 'error', 'message': f"Unknown Notion route {path}"})
+
+            # --- Anthropic ------------------------------------------------
+
+            def _anthropic(self, method: str, path: str, body):
+                prompt = body['messages'][0]['content']
+                if isinstance(prompt, list):
+                    prompt = ' '.join(part.get('text', '') for part in prompt)
+                text = services._claude_text(prompt)
+                # A continuation request (assistant prefill) gets the rest of the article
+                if len(body['messages']) > 1:
+                    text = text[len(body['messages'][-1]['content']):]
+                usage = {'input_tokens': len(prompt) // 4, 'output_tokens': len(text) // 4}
+                message = {
+                    'id': f"msg_fake_{random.randrange(1 << 30)}",
+                    'type': 'message',
+                    'role': 'assistant',
+                    'model': body.get('model', 'fake'),
+                    'content': [{'type': 'text', 'text': text}],
+                    'stop_reason': 'end_turn',
+                    'stop_sequence': None,
+                    'usage': usage
+                }
+                if not body.get('stream'):
+                    self._send(200, message)
+                    return
+                self._stream(message, text)
+
+            def _stream(self, message: Dict, text: str):
+                self.send_response(200)
+                self.send_header('Content-Type', 'text/event-stream')
+                self.send_header('Cache-Control', 'no-cache')
+                self.send_header('Connection', 'close')
+                self.end_headers()
+                self.close_connection = True
+
+                def event(name: str, data: Dict):
+                    self.wfile.write(f"event: {name}\ndata: {json.dumps(data)}\n\n".encode('utf-8'))
+                    self.wfile.flush()
+
+                start = dict(message, content=[], stop_reason=None,
+                             usage={'input_tokens': message['usage']['input_tokens'], 'output_tokens': 1})
+                event('message_start', {'type': 'message_start', 'message': start})
+                event('content_block_start', {'type': 'content_block_start', 'index': 0,
+                                              'content_block': {'type': 'text', 'text': ''}})
+                chunk = services.config.stream_chunk_chars
+                for i in range(0, len(text), chunk):
+                    event('content_block_delta', {'type': 'content_block_delta', 'index': 0,
+                                                  'delta': {'type': 'text_delta', 'text': text[i:i + chunk]}})
+                    if services.config.stream_chunk_delay:
+                        time.sleep(services.config.stream_chunk_delay)
+                event('content_block_stop', {'type': 'content_block_stop', 'index': 0})
+                event('message_delta', {'type': 'message_delta',
+                                        'delta': {'stop_reason': 'end_turn', 'stop_sequence': None},
+                                        'usage': {'output_tokens': message['usage']['output_tokens']}})
+                event('message_stop', {'type': 'message_stop'})
+
+            # --- WordPress media ------------------------------------------
+
+            def _wordpress(self, method: str, path: str, body):
+                if path == '/wp-json/wp/v2/media':
+                    media_id = services._next_media_id()
+                    self._send(201, {'id': media_id, 'source_url': f"{services.base_url}/wp-content/uploads/{media_id}.png"})
+                elif re.match(r'/wp-json/wp/v2/media/\d+$', path):
+                    media_id = int(path.rsplit('/', 1)[-1])
+                    slug = json.loads(body or b'{}').get('slug', str(media_id))
+                    self._send(200, {'id': media_id, 'source_url': f"{services.base_url}/wp-content/uploads/{slug}.png"})
+                elif path in ('/wp-json/wp/v2/categories', '/wp-json/wp/v2/tags'):
+                    self._taxonomy(path.rsplit('/', 1)[-1])
+                else:
+                    self._send(200, [])
+
+            def _taxonomy(self, kind: str):
+                terms = services._taxonomy[kind]
+                etag = '"' + hashlib.sha256(json.dumps(terms).encode('utf-8')).hexdigest()[:16] + '"'
+                query = parse_qs(urlparse(self.path).query)
+                per_page = int(query.get('per_page', ['10'])[0])
+                page = int(query.get('page', ['1'])[0])
+                if page == 1 and self.headers.get('If-None-Match') == etag:
+                    self._send(304, b'', headers={'ETag': etag})
+                    return
+                total_pages = max(1, -(-len(terms) // per_page))
+                self._send(200, terms[(page - 1) * per_page:page * per_page], headers={
+                    'ETag': etag,
+                    'X-WP-Total': str(len(terms)),
+                    'X-WP-TotalPages': str(total_pages)
+                })
+
+            # --- n8n webhook ----------------------------------------------
+
+            def _n8n(self, method: str, path: str, body):
+                post_id = services._next_media_id()
+                slug = body.get('body', {}).get('slug', 'post')
+                self._send(200, [{'id': post_id, 'link': f"https://mikesellsnj.com/{slug}/"}])
+
+            # --- KCM images -----------------------------------------------
+
+            def _images(self, method: str, path: str, body):
+                self._send(200, PNG_BYTES, 'image/png')
+
+        return Handler
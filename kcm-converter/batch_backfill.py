@@ -0,0 +1,356 @@
+#!/usr/bin/env python3
+"""
+Batch Backfill - Converts many KCM blog posts through the Anthropic Message Batches API
+Rewrite and SEO requests are submitted as batches (half the price of interactive calls),
+then each result runs through the same local post-processing as /convert.
+Progress is saved to a state file so an interrupted backfill resumes where it left off.
+"""
+
+import os
+import sys
+import json
+import time
+import hashlib
+import argparse
+import logging
+import re
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+from typing import Dict, List, Optional
+
+from kcm_converter_server import (
+    claude_client,
+    extract_topics_from_blog,
+    search_notion_database,
+    build_rewrite_prompt,
+    clean_rewritten_html,
+    build_seo_prompt,
+    parse_seo_response,
+    extract_images,
+    notion_client,
+    FALLBACK_SEO_METADATA,
+)
+from notion_conversion_tracker import get_url_mappings
+from link_replacer import replace_kcm_links
+
+logger = logging.getLogger(__name__)
+
+MODEL = "claude-3-7-sonnet-20250219"
+
+# Article status flow: queued -> rewrite_submitted -> rewritten -> seo_submitted -> done (or failed)
+DEFAULT_STATE_FILE = 'backfill_state.json'
+DEFAULT_OUTPUT_DIR = 'backfill_output'
+DEFAULT_POLL_SECONDS = 60
+
+# Clock skew allowed between this machine and the API when matching an interrupted submission
+SUBMIT_CLOCK_SKEW = timedelta(minutes=5)
+
+
+class BackfillState:
+    """JSON-file backed progress for a backfill run (written atomically after every change)"""
+
+    def __init__(self, path: Path):
+        self.path = path
+        self.articles: Dict[str, Dict] = {}
+        # Batch being submitted: written before batches.create so a crash cannot lose its ID
+        self.submitting: Optional[Dict] = None
+        if path.exists():
+            with open(path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+            self.articles = data.get('articles', {})
+            self.submitting = data.get('submitting')
+            logger.info(f"Resuming backfill: {len(self.articles)} articles in {path}")
+
+    def save(self):
+        tmp_path = self.path.with_suffix('.tmp')
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump({'articles': self.articles, 'submitting': self.submitting,
+                       'updated_at': datetime.now().isoformat()}, f, indent=2)
+        os.replace(tmp_path, self.path)
+
+    def update(self, article_id: str, **fields):
+        self.articles[article_id].update(fields)
+        self.save()
+
+    def with_status(self, status: str) -> List[str]:
+        return [aid for aid, article in self.articles.items() if article['status'] == status]
+
+
+def make_article_id(path: Path) -> str:
+    """Build a Message Batches custom_id (max 64 chars of [a-zA-Z0-9_-]) for an input file"""
+    stem = re.sub(r'[^a-zA-Z0-9_-]', '-', path.stem)[:50]
+    digest = hashlib.sha1(str(path.resolve()).encode('utf-8')).hexdigest()[:8]
+    return f"{stem}-{digest}"
+
+
+def collect_inputs(inputs: List[str]) -> List[Path]:
+    """Expand files and directories into a sorted list of .html files"""
+    paths = []
+    for item in inputs:
+        path = Path(item)
+        if path.is_dir():
+            paths.extend(sorted(path.glob('*.html')))
+        elif path.exists():
+            paths.append(path)
+        else:
+            logger.warning(f"Input not found: {item}")
+    return paths
+
+
+def wait_for_batch(batch_id: str, poll_seconds: int):
+    """Poll a message batch until processing has ended"""
+    while True:
+        batch = claude_client.messages.batches.retrieve(batch_id)
+        counts = batch.request_counts
+        logger.info(
+            f"Batch {batch_id}: {batch.processing_status} "
+            f"({counts.succeeded} succeeded, {counts.errored} errored, {counts.processing} processing)"
+        )
+        if batch.processing_status == 'ended':
+            return
+        time.sleep(poll_seconds)
+
+
+def message_text(result) -> str:
+    """Text of a succeeded batch result (ValueError if the message has no text)"""
+    content = result.result.message.content
+    if not content or not getattr(content[0], 'text', None):
+        raise ValueError("Empty response")
+    return content[0].text
+
+
+def record_batch(state: BackfillState, batch_id: str):
+    """Move the articles of the batch being submitted to its status and clear the marker"""
+    submitting = state.submitting
+    for article_id in submitting['request_ids']:
+        if article_id in state.articles:
+            state.articles[article_id].update(status=submitting['status'], **{submitting['batch_field']: batch_id})
+    state.submitting = None
+    state.save()
+
+
+def batch_size(batch) -> int:
+    counts = batch.request_counts
+    return counts.processing + counts.succeeded + counts.errored + counts.canceled + counts.expired
+
+
+def find_submitted_batch(submitting: Dict) -> Optional[str]:
+    """
+    ID of the batch an interrupted run created, or None if the submission never reached the API
+
+    Batches do not carry their request IDs until they end, so the match is the oldest batch
+    created after the submission started with the same number of requests.
+    """
+    started_at = datetime.fromisoformat(submitting['started_at']) - SUBMIT_CLOCK_SKEW
+    matches = []
+    # Newest first
+    for batch in claude_client.messages.batches.list(limit=100):
+        if batch.created_at < started_at:
+            break
+        if batch_size(batch) == len(submitting['request_ids']):
+            matches.append(batch)
+    if len(matches) > 1:
+        logger.warning(f"{len(matches)} batches match the interrupted submission - using the oldest")
+    return min(matches, key=lambda batch: batch.created_at).id if matches else None
+
+
+def reconcile_submission(state: BackfillState):
+    """Adopt the batch of a submission interrupted before its ID was saved (instead of paying for it again)"""
+    if not state.submitting:
+        return
+    batch_id = find_submitted_batch(state.submitting)
+    if batch_id:
+        logger.info(f"Recovered interrupted submission: batch {batch_id} "
+                    f"({len(state.submitting['request_ids'])} requests)")
+        record_batch(state, batch_id)
+    else:
+        logger.info("Interrupted submission never reached the API - submitting again")
+        state.submitting = None
+        state.save()
+
+
+def submit_batch(state: BackfillState, requests_by_id: Dict[str, str], max_tokens: int, status: str, batch_field: str):
+    """Submit one prompt per article as a message batch and record the batch ID"""
+    if not requests_by_id:
+        return
+
+    state.submitting = {
+        'status': status,
+        'batch_field': batch_field,
+        'request_ids': sorted(requests_by_id),
+        'started_at': datetime.now(timezone.utc).isoformat()
+    }
+    state.save()
+
+    batch = claude_client.messages.batches.create(
+        requests=[
+            {
+                'custom_id': article_id,
+                'params': {
+                    'model': MODEL,
+                    'max_tokens': max_tokens,
+                    'messages': [{'role': 'user', 'content': prompt}]
+                }
+            }
+            for article_id, prompt in requests_by_id.items()
+        ]
+    )
+    logger.info(f"Submitted batch {batch.id} with {len(requests_by_id)} requests")
+    record_batch(state, batch.id)
+
+
+def submit_rewrites(state: BackfillState):
+    """Gather context for queued articles and submit their rewrite prompts"""
+    prompts = {}
+    for article_id in state.with_status('queued'):
+        article = state.articles[article_id]
+        original_html = Path(article['source']).read_text(encoding='utf-8')
+
+        topics = extract_topics_from_blog(original_html)
+        relevant_pages = search_notion_database(topics)
+        prompt, _ = build_rewrite_prompt(original_html, relevant_pages, topics) if relevant_pages else ('', None)
+
+        if not prompt:
+            state.update(article_id, status='failed', error='No relevant context found in Notion database')
+            continue
+
+        article.update(topics=topics, documents_used=[p['title'] for p in relevant_pages])
+        prompts[article_id] = prompt
+
+    submit_batch(state, prompts, 16000, 'rewrite_submitted', 'rewrite_batch_id')
+
+
+def collect_rewrites(state: BackfillState, output_dir: Path, poll_seconds: int):
+    """Wait for rewrite batches and post-process each rewrite as its result is read"""
+    url_mapping = None
+    batch_ids = {state.articles[aid]['rewrite_batch_id'] for aid in state.with_status('rewrite_submitted')}
+
+    for batch_id in sorted(batch_ids):
+        wait_for_batch(batch_id, poll_seconds)
+
+        for result in claude_client.messages.batches.results(batch_id):
+            article = state.articles.get(result.custom_id)
+            if not article or article['status'] != 'rewrite_submitted':
+                continue  # Already processed before a restart
+
+            if result.result.type != 'succeeded':
+                state.update(result.custom_id, status='failed', error=f"Rewrite {result.result.type}")
+                logger.error(f"Rewrite {result.result.type}: {result.custom_id}")
+                continue
+
+            try:
+                converted_html = clean_rewritten_html(message_text(result))
+            except ValueError as e:
+                state.update(result.custom_id, status='failed', error=f"Rewrite unusable: {e}")
+                logger.error(f"Rewrite unusable for {result.custom_id}: {e}")
+                continue
+
+            if url_mapping is None:
+                url_mapping = get_url_mappings(notion_client)
+            converted_html, link_stats = replace_kcm_links(converted_html, url_mapping)
+
+            output_file = output_dir / f"{result.custom_id}.html"
+            output_file.write_text(converted_html, encoding='utf-8')
+
+            state.update(result.custom_id, status='rewritten', output_html=str(output_file), link_replacement=link_stats)
+            logger.info(f"[OK] Rewritten: {result.custom_id} ({len(converted_html)} chars)")
+
+
+def submit_seo(state: BackfillState):
+    """Submit SEO metadata prompts for every rewritten article"""
+    prompts = {
+        article_id: build_seo_prompt(Path(state.articles[article_id]['output_html']).read_text(encoding='utf-8'))
+        for article_id in state.with_status('rewritten')
+    }
+    submit_batch(state, prompts, 1000, 'seo_submitted', 'seo_batch_id')
+
+
+def collect_seo(state: BackfillState, output_dir: Path, poll_seconds: int):
+    """Wait for SEO batches, then plan images and write each article's metadata file"""
+    batch_ids = {state.articles[aid]['seo_batch_id'] for aid in state.with_status('seo_submitted')}
+
+    for batch_id in sorted(batch_ids):
+        wait_for_batch(batch_id, poll_seconds)
+
+        for result in claude_client.messages.batches.results(batch_id):
+            article = state.articles.get(result.custom_id)
+            if not article or article['status'] != 'seo_submitted':
+                continue
+
+            seo_metadata = dict(FALLBACK_SEO_METADATA)
+            if result.result.type == 'succeeded':
+                try:
+                    seo_metadata = parse_seo_response(message_text(result))
+                except ValueError as e:
+                    logger.error(f"Unparseable SEO metadata for {result.custom_id} - using fallback: {e}")
+            else:
+                logger.error(f"SEO {result.result.type} for {result.custom_id} - using fallback")
+
+            original_html = Path(article['source']).read_text(encoding='utf-8')
+            converted_html = Path(article['output_html']).read_text(encoding='utf-8')
+            images = extract_images(original_html, converted_html, seo_metadata.get('focus_keyphrase', ''))
+
+            metadata_file = output_dir / f"{result.custom_id}_metadata.json"
+            with open(metadata_file, 'w', encoding='utf-8') as f:
+                json.dump({
+                    'source': article['source'],
+                    'topics': article.get('topics', []),
+                    'documents_used': article.get('documents_used', []),
+                    'seo': seo_metadata,
+                    'images': images,
+                    'link_replacement': article.get('link_replacement')
+                }, f, indent=2)
+
+            state.update(result.custom_id, status='done', metadata_file=str(metadata_file))
+            logger.info(f"[OK] Done: {result.custom_id}")
+
+
+def run_backfill(inputs: List[str], state_file: str, output_dir: str, poll_seconds: int):
+    """Run (or resume) a backfill over the given input files and directories"""
+    output_path = Path(output_dir)
+    output_path.mkdir(parents=True, exist_ok=True)
+    state = BackfillState(Path(state_file))
+    reconcile_submission(state)
+
+    for path in collect_inputs(inputs):
+        article_id = make_article_id(path)
+        if article_id not in state.articles:
+            state.articles[article_id] = {'source': str(path), 'status': 'queued'}
+    state.save()
+
+    submit_rewrites(state)
+    collect_rewrites(state, output_path, poll_seconds)
+    submit_seo(state)
+    collect_seo(state, output_path, poll_seconds)
+
+    done = state.with_status('done')
+    failed = state.with_status('failed')
+    print("\n" + "=" * 60)
+    print("BACKFILL COMPLETE")
+    print("=" * 60)
+    print(f"Converted: {len(done)}")
+    print(f"Failed:    {len(failed)}")
+    for article_id in failed:
+        print(f"  - {article_id}: {state.articles[article_id].get('error')}")
+    print(f"Output directory: {output_path}")
+    print(f"State file: {state_file}")
+
+
+def main():
+    """Main entry point"""
+    parser = argparse.ArgumentParser(description='Bulk-convert KCM blog posts via the Message Batches API')
+    parser.add_argument('inputs', nargs='+', help='HTML files or directories of HTML files')
+    parser.add_argument('--state', default=DEFAULT_STATE_FILE, help='Progress file (re-run with the same file to resume)')
+    parser.add_argument('--output', default=DEFAULT_OUTPUT_DIR, help='Directory for converted HTML and metadata')
+    parser.add_argument('--poll', type=int, default=DEFAULT_POLL_SECONDS, help='Seconds between batch status checks')
+    args = parser.parse_args()
+
+    try:
+        run_backfill(args.inputs, args.state, args.output, args.poll)
+    except KeyboardInterrupt:
+        print("\n\n[WARNING] Interrupted - re-run the same command to resume")
+        sys.exit(0)
+
+
+if __name__ == "__main__":
+    main()
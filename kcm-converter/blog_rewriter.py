@@ -13,14 +13,14 @@ from datetime import datetime
 from typing import Dict, List, Optional, Any
 from pathlib import Path
 
-# Third-party imports
-from dotenv import load_dotenv
-from notion_client import Client as NotionClient
-from anthropic import Anthropic
-
 # Add shared folder to path for imports
 sys.path.insert(0, str(Path(__file__).parent.parent / 'shared'))
 from wordpress_taxonomy import get_categories_prompt, get_tags_prompt
+from token_budget import fit_context_to_budget
+from context_digest import ContextDigestStore, digests_enabled
+from cassette import install_from_env
+from lazy_client import LazyClient
+from notion_query import ContextSchema, context_filter, query_pages
 
 # Configure logging
 logging.basicConfig(
@@ -39,10 +39,15 @@ class BlogRewriter:
 
     def __init__(self):
         """Initialize the blog rewriter with API credentials"""
+        from dotenv import load_dotenv
+
         # Load .env from shared folder
         env_path = Path(__file__).parent.parent / 'shared' / '.env'
         load_dotenv(dotenv_path=env_path)
 
+        # Record or replay Notion/Claude traffic (CASSETTE_MODE=record|replay)
+        install_from_env()
+
         # Load environment variables
         self.claude_api_key = os.getenv('CLAUDE_API_KEY')
         self.notion_api_key = os.getenv('NOTION_API_KEY')
@@ -51,9 +56,10 @@ class BlogRewriter:
         # Validate required credentials
         self._validate_credentials()
 
-        # Initialize API clients
-        self.notion_client = None
-        self.claude_client = None
+        # API clients (the SDKs are imported and the clients built on first use)
+        self.notion_client = LazyClient(self._create_notion_client, 'Notion')
+        self.claude_client = LazyClient(self._create_claude_client, 'Claude')
+        self.digest_store = None
 
         # Key document name to always retrieve
         self.master_doc_name = "South Jersey Real Estate Context Guide"
@@ -74,19 +80,32 @@ class BlogRewriter:
             logger.error("Please ensure your .env file is properly configured")
             sys.exit(1)
 
-    def authenticate(self):
-        """Authenticate with Notion and Claude APIs"""
+    def _create_notion_client(self):
+        from notion_client import Client as NotionClient
+        return NotionClient(auth=self.notion_api_key)
+
+    def _create_claude_client(self):
+        from anthropic import Anthropic
+        return Anthropic(api_key=self.claude_api_key)
+
+    def authenticate(self, verify: bool = False):
+        """
+        Prepare the Notion and Claude clients
+
+        Args:
+            verify: Check the Notion database right away (one API call); otherwise bad
+                    credentials show up on the first real request
+        """
         logger.info("Authenticating with APIs...")
 
         try:
-            # Notion
-            self.notion_client = NotionClient(auth=self.notion_api_key)
-            db_info = self.notion_client.databases.retrieve(self.notion_database_id)
-            logger.info(f"[OK] Connected to Notion database: {db_info.get('title', [{}])[0].get('plain_text', 'Unknown')}")
+            if verify:
+                db_info = self.notion_client.databases.retrieve(self.notion_database_id)
+                logger.info(f"[OK] Connected to Notion database: {db_info.get('title', [{}])[0].get('plain_text', 'Unknown')}")
 
-            # Claude
-            self.claude_client = Anthropic(api_key=self.claude_api_key)
-            logger.info(f"[OK] Connected to Claude API")
+            # Context digests shared with the converter server (optional)
+            if digests_enabled():
+                self.digest_store = ContextDigestStore(self.claude_client, "claude-3-7-sonnet-20250219")
 
             return True
         except Exception as e:
@@ -146,32 +165,30 @@ Example: ["downsizing", "equity", "senior homeowners", "California market", "spr
             # Fallback to basic keyword extraction
             return ["real estate", "South Jersey", "home buying", "selling"]
 
+    def _query_context_pages(self, topics: List[str]) -> List[Dict]:
+        """
+        Pages that can match the topics: a filtered query for the master doc and the pages whose
+        title or keywords contain a topic (Title and Keywords / Tags only), or every page if the
+        filter can't be pushed down to Notion
+        """
+        try:
+            schema = ContextSchema(self.notion_client.databases.retrieve(database_id=self.notion_database_id))
+            query_filter = context_filter(topics, schema, self.master_doc_name)
+            if query_filter:
+                return query_pages(self.notion_client, self.notion_database_id,
+                                   filter=query_filter, **schema.query_args())
+        except Exception as e:
+            logger.warning(f"Filtered Notion query failed - scanning every page: {e}")
+        return query_pages(self.notion_client, self.notion_database_id)
+
     def search_notion_database(self, topics: List[str]) -> List[Dict]:
         """Search Notion database for relevant content based on topics"""
         logger.info("Searching Notion database for relevant content...")
 
         try:
-            # Get all pages from database
-            all_pages = []
-            has_more = True
-            start_cursor = None
+            all_pages = self._query_context_pages(topics)
 
-            while has_more:
-                if start_cursor:
-                    response = self.notion_client.databases.query(
-                        database_id=self.notion_database_id,
-                        start_cursor=start_cursor
-                    )
-                else:
-                    response = self.notion_client.databases.query(
-                        database_id=self.notion_database_id
-                    )
-
-                all_pages.extend(response['results'])
-                has_more = response['has_more']
-                start_cursor = response.get('next_cursor')
-
-            logger.info(f"[OK] Found {len(all_pages)} total pages in database")
+            logger.info(f"[OK] Found {len(all_pages)} candidate pages in database")
 
             # Score and rank pages by relevance
             scored_pages = []
@@ -191,6 +208,7 @@ Example: ["downsizing", "equity", "senior homeowners", "California market", "spr
                         'id': page['id'],
                         'title': title,
                         'url': page['url'],
+                        'last_edited_time': page.get('last_edited_time'),
                         'is_master': True
                     }
                     logger.info(f"[OK] Found master document: {title}")
@@ -219,6 +237,7 @@ Example: ["downsizing", "equity", "senior homeowners", "California market", "spr
                         'id': page['id'],
                         'title': title,
                         'url': page['url'],
+                        'last_edited_time': page.get('last_edited_time'),
                         'score': score,
                         'is_master': False
                     })
@@ -313,14 +332,21 @@ Example: ["downsizing", "equity", "senior homeowners", "California market", "spr
             return ""
         return ''.join([text['text']['content'] for text in rich_text_array])
 
-    def rewrite_blog_post(self, original_html: str, context_pages: List[Dict]) -> str:
+    def rewrite_blog_post(self, original_html: str, context_pages: List[Dict], topics: Optional[List[str]] = None) -> str:
         """Use Claude to rewrite the blog post with local South Jersey context"""
         logger.info("Retrieving content from selected pages...")
 
-        # Retrieve full content from each page
+        # Retrieve content from each page (fresh digest when available, full page otherwise)
         context_docs = []
         for page in context_pages:
-            content = self.retrieve_page_content(page['id'])
+            content = None
+            if self.digest_store:
+                content = self.digest_store.get_digest(page['id'], page.get('last_edited_time'))
+                if content:
+                    logger.info(f"[OK] Using context digest for: {page['title']}")
+
+            if not content:
+                content = self.retrieve_page_content(page['id'])
             if content:
                 context_docs.append({
                     'title': page['title'],
@@ -333,6 +359,11 @@ Example: ["downsizing", "equity", "senior homeowners", "California market", "spr
             logger.error("No context retrieved from Notion pages")
             return ""
 
+        # Trim context documents to the token budget (most relevant paragraphs first)
+        context_docs, budget_report = fit_context_to_budget(context_docs, topics or [], original_html=original_html)
+        logger.info(f"[OK] Context trimmed by {budget_report['trimmed_tokens']} tokens "
+                    f"({budget_report['context_tokens_after']}/{budget_report['budget']} kept)")
+
         # Build context section
         context_text = ""
         for doc in context_docs:
@@ -559,7 +590,7 @@ Return ONLY valid JSON with these exact keys:
 
         if response in ['yes', 'y']:
             print("\nProceeding with rewrite...\n")
-            rewritten = self.rewrite_blog_post(blog_html, relevant_pages)
+            rewritten = self.rewrite_blog_post(blog_html, relevant_pages, topics)
 
             if rewritten:
                 # Generate SEO metadata
@@ -619,7 +650,7 @@ Return ONLY valid JSON with these exact keys:
             return
 
         # Rewrite
-        rewritten = self.rewrite_blog_post(blog_html, relevant_pages)
+        rewritten = self.rewrite_blog_post(blog_html, relevant_pages, topics)
 
         if rewritten:
             # Generate SEO metadata
@@ -666,18 +697,19 @@ def main():
     """)
 
     # Parse command line arguments
-    if len(sys.argv) < 2:
+    if len(sys.argv) < 2 or sys.argv[1] in ('-h', '--help'):
         print("Usage:")
-        print("  python blog_rewriter.py <input_file.html> [--auto]")
+        print("  python blog_rewriter.py <input_file.html> [--auto] [--verify]")
         print("")
         print("Options:")
         print("  --auto    Run in auto mode (no review step)")
+        print("  --verify  Check the Notion connection before starting")
         print("")
         print("Examples:")
         print("  python blog_rewriter.py blog.html")
         print("  python blog_rewriter.py blog.html --auto")
         print("")
-        sys.exit(1)
+        sys.exit(0 if len(sys.argv) >= 2 else 1)
 
     input_file = sys.argv[1]
     auto_mode = '--auto' in sys.argv
@@ -705,7 +737,7 @@ def main():
     try:
         rewriter = BlogRewriter()
 
-        if not rewriter.authenticate():
+        if not rewriter.authenticate(verify='--verify' in sys.argv):
             print("[ERROR] Authentication failed")
             sys.exit(1)
 
@@ -9,17 +9,18 @@ import re
 import json
 import logging
 from datetime import datetime
-from typing import Dict, List, Optional
+from typing import Callable, Dict, List, Optional, Tuple
 from urllib.parse import urlparse, parse_qs
 import base64
 import mimetypes
 import tempfile
+import hashlib
+import functools
+import asyncio
 
-from flask import Flask, request, jsonify
+from flask import Flask, Response, g, request, jsonify
 from flask_cors import CORS
 from dotenv import load_dotenv
-from notion_client import Client as NotionClient
-from anthropic import Anthropic
 from pathlib import Path
 import sys
 
@@ -28,9 +29,32 @@ sys.path.insert(0, str(Path(__file__).parent.parent / 'shared'))
 from wordpress_taxonomy import get_categories_prompt, get_tags_prompt
 from kcm_to_wordpress_mapping import parse_kcm_recommendations, merge_taxonomy
 from wordpress_taxonomy_ids import build_webhook_payload
-from notion_conversion_tracker import get_url_mappings, add_conversion_record
+from taxonomy_sync import get_taxonomy
+from notion_conversion_tracker import UrlMappingCache, add_conversion_record
 from link_replacer import replace_kcm_links, extract_kcm_links
-import requests
+from token_budget import fit_context_to_budget
+from context_digest import ContextDigestStore, digests_enabled
+from rate_limiter import LimitedClient, AsyncLimitedClient, create_claude_limiter, create_notion_limiter, get_retry_after
+from retry_policy import RetryPolicy, RATE_LIMITED
+from async_runner import AsyncRunner, DeadlineExceeded
+from lazy_client import LazyClient
+import single_flight
+from prompt_registry import PromptRegistry
+from cache_warmer import CacheWarmer, TimedValue
+from notion_query import (ContextSchema, context_filter, master_doc_filter, query_pages, query_pages_async,
+                          collect_results, collect_results_async)
+from context_index import ContextIndexStore
+from shared_cache import get_shared_cache, cache_key, FIFO, TTL
+from webhook_outbox import WebhookOutbox
+from publish_guard import PublishGuard, make_publish_key, NEW
+from tracking_queue import TrackingQueue
+import metrics
+from metrics import timed, record_error, record_cache, record_claude_usage
+import tracing
+from tracing import traced, span
+from cassette import install_from_env, active_cassette
+from request_profiler import RequestProfiler, parse_profile_mode, profiling_enabled, DEFAULT_TOP_N
+from server_lifecycle import Lifecycle
 
 # Configure logging
 logging.basicConfig(
@@ -43,31 +67,162 @@ logger = logging.getLogger(__name__)
 env_path = Path(__file__).parent.parent / 'shared' / '.env'
 load_dotenv(dotenv_path=env_path)
 
+# Record or replay all outbound API traffic (CASSETTE_MODE=record|replay, see shared/cassette.py)
+install_from_env()
+
 # Initialize Flask app
 app = Flask(__name__)
 CORS(app)  # Enable CORS for local development
 
-# Initialize API clients
-notion_client = NotionClient(auth=os.getenv('NOTION_API_KEY'))
-claude_client = Anthropic(api_key=os.getenv('CLAUDE_API_KEY'))
+# API client factories - the SDKs are imported and the clients built on first use, so
+# importing this module (worker boot, batch_backfill, benchmarks) stays fast
+# NOTION_BASE_URL / ANTHROPIC_BASE_URL point the clients at local stand-ins (see benchmarks/)
+NOTION_BASE_URL = os.getenv('NOTION_BASE_URL', 'https://api.notion.com')
+# Seconds an idle API connection is kept open (httpx closes them after 5s by default);
+# the cache warmer pings each API at half this interval so the connections stay open
+CONNECTION_KEEPALIVE = float(os.getenv('CONNECTION_KEEPALIVE', 90))
+
+
+def connection_limits():
+    import httpx
+    return httpx.Limits(max_connections=100, max_keepalive_connections=20, keepalive_expiry=CONNECTION_KEEPALIVE)
+
+
+def create_notion_client():
+    import httpx
+    from notion_client import Client as NotionClient
+    return NotionClient(client=httpx.Client(limits=connection_limits()),
+                        auth=os.getenv('NOTION_API_KEY'), base_url=NOTION_BASE_URL)
+
+
+def create_anthropic_client():
+    from anthropic import Anthropic, DefaultHttpxClient
+    # SDK retries are disabled - claude_retry classifies, logs and retries failures instead
+    return Anthropic(api_key=os.getenv('CLAUDE_API_KEY'), max_retries=0,
+                     http_client=DefaultHttpxClient(limits=connection_limits()))
+
+
+def create_async_notion_client():
+    import httpx
+    from notion_client import AsyncClient as AsyncNotionClient
+    return AsyncNotionClient(client=httpx.AsyncClient(limits=connection_limits()),
+                             auth=os.getenv('NOTION_API_KEY'), base_url=NOTION_BASE_URL)
+
+
+def create_async_anthropic_client():
+    from anthropic import AsyncAnthropic, DefaultAsyncHttpxClient
+    return AsyncAnthropic(api_key=os.getenv('CLAUDE_API_KEY'), max_retries=0,
+                          http_client=DefaultAsyncHttpxClient(limits=connection_limits()))
+
+
+def create_async_http_client():
+    import httpx
+    return httpx.AsyncClient(follow_redirects=True, limits=connection_limits())
+
+
+def create_http_session():
+    import requests
+    return requests.Session()
+
+
+# Initialize API clients (shared by all requests - calls queue behind per-API rate limiters)
+notion_limiter = create_notion_limiter()
+claude_limiter = create_claude_limiter()
+notion_client = LimitedClient(LazyClient(create_notion_client, 'Notion'), notion_limiter)
+anthropic_client = LazyClient(create_anthropic_client, 'Claude')
+claude_client = LimitedClient(anthropic_client, claude_limiter)
+claude_retry = RetryPolicy.from_env()
+
+
+def share_api_limits(processes: int):
+    """Split the Claude and Notion limits between the server's worker processes (before they fork)"""
+    for limiter in (notion_limiter, claude_limiter):
+        limiter.share(processes)
+    if processes > 1:
+        logger.info(f"API limits split over {processes} worker processes: "
+                    f"Claude {claude_limiter.max_concurrent} concurrent / {claude_limiter.bucket.max_rate * 60:.1f} per minute, "
+                    f"Notion {notion_limiter.max_concurrent} concurrent / {notion_limiter.bucket.max_rate:.2f} per second each")
+
+
+# WordPress uploads and image downloads on the request thread (one pooled session, not a connection per call)
+http_session = LazyClient(create_http_session, 'HTTP')
 database_id = os.getenv('NOTION_DATABASE_ID')
 
+# Identical lookups from concurrent conversions share one upstream call
+notion_flight = single_flight.group('notion')
+media_flight = single_flight.group('media')
+
+# Async twins for the conversion engine - same limiters, only ever used on the engine's event loop
+notion_async = AsyncLimitedClient(LazyClient(create_async_notion_client, 'async Notion'), notion_limiter)
+anthropic_async = LazyClient(create_async_anthropic_client, 'async Claude')
+claude_async = AsyncLimitedClient(anthropic_async, claude_limiter)
+http_async = LazyClient(create_async_http_client, 'async HTTP')
+
+# /convert and the image uploads run as coroutines on one event loop, so request threads only wait
+# (ASYNC_ENGINE=false runs them on the request thread as before)
+ASYNC_ENGINE = os.getenv('ASYNC_ENGINE', 'true').lower() in ('1', 'true', 'yes')
+# Seconds before a conversion is cancelled (per request: X-Deadline-Seconds header or deadline_seconds)
+CONVERT_DEADLINE = float(os.getenv('CONVERT_DEADLINE', 600))
+# Images downloaded/uploaded at once per request on the async engine
+IMAGE_UPLOAD_CONCURRENCY = int(os.getenv('IMAGE_UPLOAD_CONCURRENCY', 4))
+engine = AsyncRunner()
+
+# Caches shared by every server process and kept across restarts (SHARED_CACHE_URL: a SQLite
+# file by default, or redis://...), each namespace with its own TTL and eviction policy.
+# Claude responses are keyed by model, token limit and prompt; uploaded images by content hash.
+shared_cache = get_shared_cache()
+claude_cache = shared_cache.namespace('claude_response', ttl=float(os.getenv('CLAUDE_CACHE_TTL', 86400)),
+                                      maxsize=32, max_entries=1000, policy=FIFO)
+image_cache = shared_cache.namespace('image_media', ttl=float(os.getenv('IMAGE_CACHE_TTL', 30 * 86400)),
+                                     maxsize=256, max_entries=10000)
+
+# Context database listing: a memory-mapped snapshot shared by all server processes (rebuilt
+# by one of them before it expires, see warm_context_index), plus this process's copy of the
+# last full scan. Page text is cached until the page's last_edited_time changes.
+CONTEXT_LISTING_TTL = float(os.getenv('CONTEXT_LISTING_TTL', 300))
+context_index = ContextIndexStore()
+context_listing = TimedValue('context_listing', CONTEXT_LISTING_TTL)
+context_schema_cache = TimedValue('context_schema', CONTEXT_LISTING_TTL)
+page_text_cache = shared_cache.namespace('page_text', ttl=float(os.getenv('PAGE_TEXT_CACHE_TTL', 7 * 86400)),
+                                         maxsize=256, max_entries=2000)
+
+# Pre-summarized context digests (optional - enable with USE_CONTEXT_DIGESTS=true)
+digest_store = ContextDigestStore(claude_client, "claude-3-7-sonnet-20250219") if digests_enabled() else None
+
 # WordPress configuration
 WORDPRESS_SITE_URL = os.getenv('WORDPRESS_SITE_URL', 'https://mikesellsnj.com')
 WORDPRESS_USERNAME = os.getenv('WORDPRESS_USERNAME', 'admin')
 WORDPRESS_APP_PASSWORD = os.getenv('WORDPRESS_APP_PASSWORD', '')
 
+# Stream the rewrite so a dropped or truncated response can be resumed (REWRITE_STREAMING=false to disable)
+REWRITE_STREAMING = os.getenv('REWRITE_STREAMING', 'true').lower() in ('1', 'true', 'yes')
+# Continuation requests allowed when a streamed rewrite stops at max_tokens
+MAX_REWRITE_CONTINUATIONS = 2
+
+# Spans shorter than this are left out of the timeline returned with /convert and /upload-all
+TRACE_TIMELINE_MIN_MS = float(os.getenv('TRACE_TIMELINE_MIN_MS', 1.0))
+
 # Master document name
 MASTER_DOC_NAME = "South Jersey Real Estate Context Guide"
 
-# Store last webhook payload for retry functionality
-last_webhook_payload = None
-# Store uploaded image data for the current conversion
-uploaded_images = []
-# Store link replacement stats from last conversion
-last_link_stats = None
+# Generic SEO metadata used when Claude's response can't be generated or parsed
+FALLBACK_SEO_METADATA = {
+    "article_title": "South Jersey Real Estate Guide",
+    "categories": ["Housing Market Updates"],
+    "tags": ["Real Estate Market", "Home Prices", "Selling Tips", "Buying Tips"],  # Fixed to use exact tag names
+    "focus_keyphrase": "South Jersey real estate",
+    "seo_title": "South Jersey Real Estate Guide",
+    "meta_description": "%%title%% %%sep%% %%sitename%% %%sep%% %%primary_category%%"
+}
 
+# n8n webhook that creates the WordPress draft
+N8N_WEBHOOK_URL = os.getenv('N8N_WEBHOOK_URL', 'https://n8n.srv1007195.hstgr.cloud/webhook/wordpress-publish')
 
+# Per-conversion state (link stats, uploaded images, delivery ID) is returned to the client,
+# which sends it back with the next step - requests from different users never share it
+
+
+@traced()
 def migrate_kcm_links(html: str) -> str:
     """
     Migrate KCM links to MSNJ format
@@ -91,6 +246,7 @@ def migrate_kcm_links(html: str) -> str:
     return modified_html
 
 
+@traced()
 def convert_image_urls(html: str, uploaded_image_mapping: Dict[str, str] = None) -> str:
     """
     Convert image URLs to WordPress structure using uploaded image mapping
@@ -155,6 +311,7 @@ def convert_image_urls(html: str, uploaded_image_mapping: Dict[str, str] = None)
     return modified_html
 
 
+@traced()
 def remove_em_dashes(html: str) -> str:
     """Remove all em dashes (—) from the HTML"""
     # Remove em dash character
@@ -165,10 +322,11 @@ def remove_em_dashes(html: str) -> str:
     return html
 
 
-def extract_topics_from_blog(blog_html: str) -> List[str]:
-    """Extract key topics from blog post HTML using Claude"""
-    logger.info("Extracting topics from blog post...")
+FALLBACK_TOPICS = ["real estate", "South Jersey", "home buying", "selling"]
+
 
+def build_topics_prompt(blog_html: str) -> str:
+    """Topic extraction prompt for a blog post (tags stripped, truncated to 10k chars)"""
     # Remove HTML tags for analysis
     text_content = re.sub(r'<[^>]+>', ' ', blog_html)
     text_content = re.sub(r'\s+', ' ', text_content).strip()
@@ -178,7 +336,7 @@ def extract_topics_from_blog(blog_html: str) -> List[str]:
     if len(text_content) > max_chars:
         text_content = text_content[:max_chars]
 
-    prompt = f"""Analyze this real estate blog post and extract the key topics, themes, and concepts.
+    return f"""Analyze this real estate blog post and extract the key topics, themes, and concepts.
 Focus on:
 - Main real estate topics (e.g., "downsizing", "first-time buyers", "equity", "market trends")
 - Target audience or demographics
@@ -192,177 +350,514 @@ Return a JSON array of 5-15 key topics/keywords that would be useful for finding
 Return ONLY the JSON array, no additional text.
 Example: ["downsizing", "equity", "senior homeowners", "spring selling season"]"""
 
-    try:
-        message = claude_client.messages.create(
-            model="claude-3-7-sonnet-20250219",
-            max_tokens=1000,
-            messages=[{"role": "user", "content": prompt}]
-        )
 
-        response_text = message.content[0].text.strip()
+def parse_topics_response(response_text: str) -> List[str]:
+    """Parse Claude's topic list (strips code fences)"""
+    response_text = response_text.strip()
+
+    # Clean up response
+    if response_text.startswith('```'):
+        lines = response_text.split('\n')
+        response_text = '\n'.join(lines[1:-1])
+
+    return json.loads(response_text)
 
-        # Clean up response
-        if response_text.startswith('```'):
-            lines = response_text.split('\n')
-            response_text = '\n'.join(lines[1:-1])
 
-        topics = json.loads(response_text)
-        logger.info(f"Extracted {len(topics)} topics")
+def claude_response_key(label: str, prompt: str, max_tokens: int) -> str:
+    """Shared cache key of a Claude call (same model, token limit and prompt - same response)"""
+    return cache_key(label, "claude-3-7-sonnet-20250219", max_tokens, prompt)
 
-        return topics
+
+class ClaudeCall:
+    """
+    One cached Claude request: the prompt, cache key, response parsing and fallback
+    Both engines run it the same way - only the API call differs (call_claude / call_claude_async)
+    """
+
+    def __init__(self, label: str, stage: str, prompt: str, max_tokens: int,
+                 parse: Callable[[str], object], fallback: Callable[[Exception], object],
+                 describe: Callable[[object], str], stream: bool = False, refresh: bool = False):
+        """
+        Args:
+            label: Retry/cache label of the call
+            stage: Timing metric of the call
+            prompt: User message
+            max_tokens: Response token limit
+            parse: Turns the response text into the result (raises on a malformed response)
+            fallback: Result to use when the call or parsing fails (called with the error)
+            describe: Short description of a result for the logs
+            stream: Stream the response (stream_rewrite) instead of a single create call
+            refresh: Skip the cached result and ask Claude again (the new result replaces it)
+        """
+        self.label = label
+        self.stage = stage
+        self.prompt = prompt
+        self.max_tokens = max_tokens
+        self.parse = parse
+        self.fallback = fallback
+        self.describe = describe
+        self.stream = stream
+        self.refresh = refresh
+        self.key = claude_response_key(label, prompt, max_tokens)
+
+    def cached(self):
+        """The stored result of an identical call (by any process, within CLAUDE_CACHE_TTL), or None"""
+        if self.refresh:
+            return None
+        result = claude_cache.get(self.key)
+        if result is not None:
+            logger.info(f"Using cached {self.describe(result)}")
+        return result
+
+    def request(self) -> Dict:
+        """messages.create arguments (plus the retry label)"""
+        return {
+            'model': "claude-3-7-sonnet-20250219",
+            'max_tokens': self.max_tokens,
+            'messages': [{"role": "user", "content": self.prompt}],
+            'label': self.label
+        }
+
+    def finish(self, response_text: str):
+        """Parse the response and store the result (an empty result is not cached)"""
+        result = self.parse(response_text)
+        if result:
+            claude_cache.put(self.key, result)
+        logger.info(f"Claude returned {self.describe(result)}")
+        return result
+
+
+def call_claude(call: ClaudeCall):
+    """Run a ClaudeCall: the cached result, or the API call (the call's fallback if it fails)"""
+    result = call.cached()
+    if result is not None:
+        return result
+
+    try:
+        with timed(call.stage):
+            if call.stream:
+                response_text = stream_rewrite(call.prompt)
+            else:
+                message = claude_retry.run(claude_client.messages.create, **call.request())
+                record_claude_usage(message)
+                response_text = message.content[0].text
+            return call.finish(response_text)
     except Exception as e:
-        logger.error(f"Failed to extract topics: {e}")
-        return ["real estate", "South Jersey", "home buying", "selling"]
+        return call.fallback(e)
 
 
-def search_notion_database(topics: List[str]) -> List[Dict]:
-    """Search Notion database for relevant content based on topics"""
-    logger.info("Searching Notion database...")
+async def call_claude_async(call: ClaudeCall):
+    """call_claude() on the async engine"""
+    result = call.cached()
+    if result is not None:
+        return result
 
     try:
-        # Get all pages
-        all_pages = []
-        has_more = True
-        start_cursor = None
-
-        while has_more:
-            if start_cursor:
-                response = notion_client.databases.query(
-                    database_id=database_id,
-                    start_cursor=start_cursor
-                )
+        with timed(call.stage):
+            if call.stream:
+                response_text = await stream_rewrite_async(call.prompt)
             else:
-                response = notion_client.databases.query(database_id=database_id)
+                message = await claude_retry.run_async(claude_async.messages.create, **call.request())
+                record_claude_usage(message)
+                response_text = message.content[0].text
+            return call.finish(response_text)
+    except Exception as e:
+        return call.fallback(e)
 
-            all_pages.extend(response['results'])
-            has_more = response['has_more']
-            start_cursor = response.get('next_cursor')
 
-        logger.info(f"Found {len(all_pages)} total pages")
+def topics_fallback(error: Exception) -> List[str]:
+    """Generic topics when extraction fails"""
+    logger.error(f"Failed to extract topics: {error}")
+    return list(FALLBACK_TOPICS)
 
-        # Score and rank pages
-        scored_pages = []
-        master_doc = None
 
-        for page in all_pages:
-            title_prop = page['properties'].get('Title', {})
-            if title_prop.get('title'):
-                title = title_prop['title'][0]['text']['content']
-            else:
-                title = "Untitled"
-
-            # Always capture master doc
-            if MASTER_DOC_NAME.lower() in title.lower():
-                master_doc = {
-                    'id': page['id'],
-                    'title': title,
-                    'url': page['url'],
-                    'is_master': True
-                }
-                logger.info(f"Found master document: {title}")
-                continue
-
-            # Score based on keyword matches
-            score = 0
-            page_text = title.lower()
-
-            keywords_prop = page['properties'].get('Keywords / Tags', {})
-            if keywords_prop.get('multi_select'):
-                for tag in keywords_prop['multi_select']:
-                    page_text += " " + tag['name'].lower()
-            elif keywords_prop.get('rich_text') and keywords_prop['rich_text']:
-                page_text += " " + keywords_prop['rich_text'][0]['text']['content'].lower()
-
-            for topic in topics:
-                topic_lower = topic.lower()
-                if topic_lower in page_text:
-                    score += page_text.count(topic_lower)
-
-            if score > 0:
-                scored_pages.append({
-                    'id': page['id'],
-                    'title': title,
-                    'url': page['url'],
-                    'score': score,
-                    'is_master': False
-                })
-
-        # Sort by score
-        scored_pages.sort(key=lambda x: x['score'], reverse=True)
-
-        # Take top 5 relevant pages
-        relevant_pages = scored_pages[:5]
-
-        # Always include master doc first
-        if master_doc:
-            relevant_pages.insert(0, master_doc)
-
-        logger.info(f"Selected {len(relevant_pages)} relevant documents")
-
-        return relevant_pages
+def topics_call(blog_html: str, refresh: bool) -> ClaudeCall:
+    """Topic extraction request for a blog post"""
+    logger.info("Extracting topics from blog post...")
+    return ClaudeCall('extract_topics', 'topic_extraction', build_topics_prompt(blog_html), 1000,
+                      parse=parse_topics_response, fallback=topics_fallback,
+                      describe=lambda topics: f"{len(topics)} topics", refresh=refresh)
+
+
+def extract_topics_from_blog(blog_html: str, refresh: bool = False) -> List[str]:
+    """Extract key topics from blog post HTML using Claude (refresh: skip the cached topics)"""
+    return call_claude(topics_call(blog_html, refresh))
+
+
+async def extract_topics_from_blog_async(blog_html: str, refresh: bool = False) -> List[str]:
+    """extract_topics_from_blog() on the async engine"""
+    return await call_claude_async(topics_call(blog_html, refresh))
+
+
+def query_key(**query) -> str:
+    """Coalescing key for a databases.query (filters are dicts, so they can't key the call directly)"""
+    return json.dumps(query, sort_keys=True)
+
+
+@notion_flight.coalesce(key=query_key)
+def fetch_pages(**query) -> List[Dict]:
+    """Query the Notion context database (follows pagination; query: filter, filter_properties)"""
+    return query_pages(notion_client, database_id, **query)
+
+
+@notion_flight.coalesce(key=query_key)
+async def fetch_pages_async(**query) -> List[Dict]:
+    """fetch_pages() on the async engine"""
+    return await query_pages_async(notion_async, database_id, **query)
+
+
+def remember_context_schema(database: Dict) -> ContextSchema:
+    """Parse a databases.retrieve response and keep the schema for CONTEXT_LISTING_TTL"""
+    schema = ContextSchema(database)
+    context_schema_cache.put(schema)
+    return schema
 
+
+def context_schema(refresh: bool = False) -> Optional[ContextSchema]:
+    """Property IDs and keyword options of the context database (None if they can't be retrieved)"""
+    schema = None if refresh else context_schema_cache.get()
+    if schema is not None:
+        return schema
+    try:
+        return remember_context_schema(notion_client.databases.retrieve(database_id=database_id))
+    except Exception as e:
+        logger.warning(f"Could not retrieve the context database schema: {e}")
+        return None
+
+
+async def context_schema_async() -> Optional[ContextSchema]:
+    """context_schema() on the async engine"""
+    schema = context_schema_cache.get()
+    if schema is not None:
+        return schema
+    try:
+        return remember_context_schema(await notion_async.databases.retrieve(database_id=database_id))
+    except Exception as e:
+        logger.warning(f"Could not retrieve the context database schema: {e}")
+        return None
+
+
+def fetch_all_pages() -> List[Dict]:
+    """Every page in the context database (only the Title and Keywords / Tags properties)"""
+    schema = context_schema()
+    return fetch_pages(**(schema.query_args() if schema else {}))
+
+
+async def fetch_all_pages_async() -> List[Dict]:
+    """fetch_all_pages() on the async engine"""
+    schema = await context_schema_async()
+    return await fetch_pages_async(**(schema.query_args() if schema else {}))
+
+
+def query_all_pages() -> List[Dict]:
+    """Every page in the context database (the warm listing, or a new query once it expired)"""
+    pages = context_listing.get()
+    if pages is None:
+        pages = fetch_all_pages()
+        context_listing.put(pages)
+    return pages
+
+
+async def query_all_pages_async() -> List[Dict]:
+    """query_all_pages() on the async engine"""
+    pages = context_listing.get()
+    if pages is None:
+        pages = await fetch_all_pages_async()
+        context_listing.put(pages)
+    return pages
+
+
+def topic_query(topics: List[str], schema: Optional[ContextSchema]) -> Optional[Dict]:
+    """fetch_pages() arguments for a topic search, or None if the filter can't be pushed down to Notion"""
+    query_filter = context_filter(topics, schema, MASTER_DOC_NAME) if schema else None
+    if not query_filter:
+        return None
+    return {'filter': query_filter, **schema.query_args()}
+
+
+def query_context_pages(topics: List[str]) -> List[Dict]:
+    """
+    Candidate pages for a topic search: the warm listing when there is one, otherwise a
+    filtered query for the master document and the pages a topic matches (a full scan if
+    the filter can't be pushed down to Notion or the filtered query fails)
+    """
+    pages = context_listing.get()
+    if pages is not None:
+        return pages
+    query = topic_query(topics, context_schema())
+    if query:
+        try:
+            return fetch_pages(**query)
+        except Exception as e:
+            logger.warning(f"Filtered Notion query failed - scanning every page: {e}")
+    return query_all_pages()
+
+
+async def query_context_pages_async(topics: List[str]) -> List[Dict]:
+    """query_context_pages() on the async engine"""
+    pages = context_listing.get()
+    if pages is not None:
+        return pages
+    query = topic_query(topics, await context_schema_async())
+    if query:
+        try:
+            return await fetch_pages_async(**query)
+        except Exception as e:
+            logger.warning(f"Filtered Notion query failed - scanning every page: {e}")
+    return await query_all_pages_async()
+
+
+def fresh_context_index():
+    """The shared context index, if its snapshot is younger than CONTEXT_LISTING_TTL"""
+    index = context_index.current()
+    fresh = index is not None and index.age() < CONTEXT_LISTING_TTL
+    record_cache('context_index', fresh)
+    return index if fresh else None
+
+
+def find_master_page() -> Optional[Dict]:
+    """The master document's page (from the context index or the listing, otherwise through a title filter)"""
+    index = fresh_context_index()
+    if index is not None:
+        return index.master_page()
+    pages = context_listing.get()
+    if pages is None:
+        schema = context_schema()
+        pages = fetch_pages(filter=master_doc_filter(MASTER_DOC_NAME), **(schema.query_args() if schema else {}))
+    return next((page for page in pages if MASTER_DOC_NAME.lower() in get_page_title(page).lower()), None)
+
+
+def get_page_title(page: Dict) -> str:
+    """Extract the Title property of a Notion database page"""
+    title_prop = page['properties'].get('Title', {})
+    if title_prop.get('title'):
+        return title_prop['title'][0]['text']['content']
+    return "Untitled"
+
+
+def page_search_text(page: Dict, title: str) -> str:
+    """Lowercased title and keywords - the text topics are matched against"""
+    page_text = title.lower()
+
+    keywords_prop = page['properties'].get('Keywords / Tags', {})
+    if keywords_prop.get('multi_select'):
+        for tag in keywords_prop['multi_select']:
+            page_text += " " + tag['name'].lower()
+    elif keywords_prop.get('rich_text') and keywords_prop['rich_text']:
+        page_text += " " + keywords_prop['rich_text'][0]['text']['content'].lower()
+
+    return page_text
+
+
+def index_record(page: Dict) -> Dict:
+    """A listing page as a context index record"""
+    title = get_page_title(page)
+    return {
+        'id': page['id'],
+        'url': page['url'],
+        'title': title,
+        'last_edited_time': page.get('last_edited_time'),
+        'text': page_search_text(page, title),
+        'is_master': MASTER_DOC_NAME.lower() in title.lower()
+    }
+
+
+def list_context_pages() -> List[Dict]:
+    """List all context pages with the fields the digest builder needs"""
+    return [
+        {
+            'id': page['id'],
+            'title': get_page_title(page),
+            'last_edited_time': page.get('last_edited_time')
+        }
+        for page in query_all_pages()
+    ]
+
+
+def rank_context_pages(all_pages: List[Dict], topics: List[str]) -> List[Dict]:
+    """
+    Pick the context pages for a conversion: the master document first, then the
+    5 pages whose title and keywords mention the topics most
+    """
+    logger.info(f"Found {len(all_pages)} candidate pages")
+
+    # Score and rank pages
+    scored_pages = []
+    master_doc = None
+
+    for page in all_pages:
+        title = get_page_title(page)
+
+        # Always capture master doc
+        if MASTER_DOC_NAME.lower() in title.lower():
+            master_doc = {
+                'id': page['id'],
+                'title': title,
+                'url': page['url'],
+                'last_edited_time': page.get('last_edited_time'),
+                'is_master': True
+            }
+            logger.info(f"Found master document: {title}")
+            continue
+
+        # Score based on keyword matches
+        score = 0
+        page_text = page_search_text(page, title)
+
+        for topic in topics:
+            topic_lower = topic.lower()
+            if topic_lower in page_text:
+                score += page_text.count(topic_lower)
+
+        if score > 0:
+            scored_pages.append({
+                'id': page['id'],
+                'title': title,
+                'url': page['url'],
+                'last_edited_time': page.get('last_edited_time'),
+                'score': score,
+                'is_master': False
+            })
+
+    # Sort by score
+    scored_pages.sort(key=lambda x: x['score'], reverse=True)
+
+    # Take top 5 relevant pages
+    relevant_pages = scored_pages[:5]
+
+    # Always include master doc first
+    if master_doc:
+        relevant_pages.insert(0, master_doc)
+
+    logger.info(f"Selected {len(relevant_pages)} relevant documents")
+
+    return relevant_pages
+
+
+def search_context_index(topics: List[str]) -> Optional[List[Dict]]:
+    """Ranked pages from the shared context index, or None when it is missing or stale"""
+    logger.info("Searching Notion database...")
+    index = fresh_context_index()
+    return index.rank(topics) if index is not None else None
+
+
+def search_notion_database(topics: List[str]) -> List[Dict]:
+    """Search Notion database for relevant content based on topics"""
+    ranked = search_context_index(topics)
+    if ranked is not None:
+        return ranked
+
+    try:
+        with timed('notion_query'):
+            pages = query_context_pages(topics)
     except Exception as e:
         logger.error(f"Failed to search database: {e}")
         return []
+    return rank_context_pages(pages, topics)
+
 
+async def search_notion_database_async(topics: List[str]) -> List[Dict]:
+    """search_notion_database() on the async engine"""
+    ranked = search_context_index(topics)
+    if ranked is not None:
+        return ranked
 
+    try:
+        with timed('notion_query'):
+            pages = await query_context_pages_async(topics)
+    except Exception as e:
+        logger.error(f"Failed to search database: {e}")
+        return []
+    return rank_context_pages(pages, topics)
+
+
+def blocks_to_text(blocks: List[Dict]) -> str:
+    """Plain text of a page's paragraph, heading and list blocks"""
+    content_parts = []
+
+    for block in blocks:
+        block_type = block['type']
+
+        if block_type == 'paragraph':
+            text = extract_rich_text(block['paragraph']['rich_text'])
+            if text:
+                content_parts.append(text)
+        elif block_type == 'heading_1':
+            text = extract_rich_text(block['heading_1']['rich_text'])
+            if text:
+                content_parts.append(f"\n## {text}\n")
+        elif block_type == 'heading_2':
+            text = extract_rich_text(block['heading_2']['rich_text'])
+            if text:
+                content_parts.append(f"\n### {text}\n")
+        elif block_type == 'heading_3':
+            text = extract_rich_text(block['heading_3']['rich_text'])
+            if text:
+                content_parts.append(f"\n#### {text}\n")
+        elif block_type == 'bulleted_list_item':
+            text = extract_rich_text(block['bulleted_list_item']['rich_text'])
+            if text:
+                content_parts.append(f"• {text}")
+        elif block_type == 'numbered_list_item':
+            text = extract_rich_text(block['numbered_list_item']['rich_text'])
+            if text:
+                content_parts.append(f"- {text}")
+
+    return '\n'.join(content_parts)
+
+
+@notion_flight.coalesce()
 def retrieve_page_content(page_id: str) -> str:
     """Retrieve full content of a Notion page"""
     try:
-        blocks = []
-        has_more = True
-        start_cursor = None
-
-        while has_more:
-            if start_cursor:
-                response = notion_client.blocks.children.list(
-                    block_id=page_id,
-                    start_cursor=start_cursor
-                )
-            else:
-                response = notion_client.blocks.children.list(block_id=page_id)
-
-            blocks.extend(response['results'])
-            has_more = response['has_more']
-            start_cursor = response.get('next_cursor')
-
-        content_parts = []
-
-        for block in blocks:
-            block_type = block['type']
-
-            if block_type == 'paragraph':
-                text = extract_rich_text(block['paragraph']['rich_text'])
-                if text:
-                    content_parts.append(text)
-            elif block_type == 'heading_1':
-                text = extract_rich_text(block['heading_1']['rich_text'])
-                if text:
-                    content_parts.append(f"\n## {text}\n")
-            elif block_type == 'heading_2':
-                text = extract_rich_text(block['heading_2']['rich_text'])
-                if text:
-                    content_parts.append(f"\n### {text}\n")
-            elif block_type == 'heading_3':
-                text = extract_rich_text(block['heading_3']['rich_text'])
-                if text:
-                    content_parts.append(f"\n#### {text}\n")
-            elif block_type == 'bulleted_list_item':
-                text = extract_rich_text(block['bulleted_list_item']['rich_text'])
-                if text:
-                    content_parts.append(f"• {text}")
-            elif block_type == 'numbered_list_item':
-                text = extract_rich_text(block['numbered_list_item']['rich_text'])
-                if text:
-                    content_parts.append(f"- {text}")
-
-        return '\n'.join(content_parts)
+        with timed('page_fetch'):
+            blocks = collect_results(functools.partial(notion_client.blocks.children.list, block_id=page_id))
+
+        return blocks_to_text(blocks)
+
+    except Exception as e:
+        logger.error(f"Failed to retrieve page content: {e}")
+        return ""
+
+
+@notion_flight.coalesce()
+async def retrieve_page_content_async(page_id: str) -> str:
+    """retrieve_page_content() on the async engine"""
+    try:
+        with timed('page_fetch'):
+            blocks = await collect_results_async(
+                functools.partial(notion_async.blocks.children.list, block_id=page_id)
+            )
+
+        return blocks_to_text(blocks)
 
     except Exception as e:
         logger.error(f"Failed to retrieve page content: {e}")
         return ""
 
 
+def page_content(page: Dict) -> str:
+    """Full text of a context page, cached until the page's last_edited_time changes"""
+    version = page.get('last_edited_time')
+    content = page_text_cache.get(page['id'], version)
+    if content is None:
+        content = retrieve_page_content(page['id'])
+        if content and version:
+            page_text_cache.put(page['id'], content, version)
+    return content
+
+
+async def page_content_async(page: Dict) -> str:
+    """page_content() on the async engine"""
+    version = page.get('last_edited_time')
+    content = page_text_cache.get(page['id'], version)
+    if content is None:
+        content = await retrieve_page_content_async(page['id'])
+        if content and version:
+            page_text_cache.put(page['id'], content, version)
+    return content
+
+
 def extract_rich_text(rich_text_array: List) -> str:
     """Extract plain text from Notion rich text array"""
     if not rich_text_array:
@@ -370,6 +865,7 @@ def extract_rich_text(rich_text_array: List) -> str:
     return ''.join([text['text']['content'] for text in rich_text_array])
 
 
+@traced()
 def extract_article_slug(html: str) -> str:
     """Extract article slug from title, H1, H2, or H3"""
     title = None
@@ -420,13 +916,33 @@ def extract_article_slug(html: str) -> str:
     return final_slug
 
 
+@media_flight.coalesce()
 def download_image(url: str) -> Optional[bytes]:
     """Download image from URL and return bytes"""
     try:
-        response = requests.get(url, timeout=15)
+        with timed('image_download'):
+            response = http_session.get(url, timeout=15)
+        if response.status_code == 200:
+            return response.content
+        else:
+            record_error('image_download')
+            logger.error(f"Failed to download image {url}: {response.status_code}")
+            return None
+    except Exception as e:
+        logger.error(f"Error downloading image {url}: {e}")
+        return None
+
+
+@media_flight.coalesce()
+async def download_image_async(url: str) -> Optional[bytes]:
+    """download_image() on the async engine"""
+    try:
+        with timed('image_download'):
+            response = await http_async.get(url, timeout=15)
         if response.status_code == 200:
             return response.content
         else:
+            record_error('image_download')
             logger.error(f"Failed to download image {url}: {response.status_code}")
             return None
     except Exception as e:
@@ -434,6 +950,136 @@ def download_image(url: str) -> Optional[bytes]:
         return None
 
 
+def wordpress_auth_header() -> Dict[str, str]:
+    """Basic auth header for the WordPress REST API (application password)"""
+    auth_string = f"{WORDPRESS_USERNAME}:{WORDPRESS_APP_PASSWORD}"
+    auth_b64 = base64.b64encode(auth_string.encode('utf-8')).decode('utf-8')
+    return {'Authorization': f'Basic {auth_b64}'}
+
+
+def media_upload_headers(filename: str) -> Dict[str, str]:
+    """Headers for a raw media upload with an SEO-optimized filename"""
+    # Determine content type
+    content_type, _ = mimetypes.guess_type(filename)
+    if not content_type:
+        content_type = 'image/png'
+
+    return {
+        **wordpress_auth_header(),
+        'Content-Disposition': f'attachment; filename="{filename}"',
+        'Content-Type': content_type
+    }
+
+
+def media_rename_data(filename: str, alt_text: str) -> Dict[str, str]:
+    """
+    Slug, alt text and title for an uploaded media item
+    (WordPress often ignores Content-Disposition, so the upload is renamed afterwards)
+    """
+    # Extract the slug from our desired filename (without extension)
+    slug_name = os.path.splitext(filename)[0]
+    return {
+        'slug': slug_name,
+        'alt_text': alt_text,
+        'title': slug_name.replace('-', ' ').title()
+    }
+
+
+def uploaded_media(media_data: Dict, updated_media: Optional[Dict], filename: str, alt_text: str) -> Dict:
+    """Result of an upload (the renamed URL when the rename succeeded, the original one otherwise)"""
+    media_id = media_data['id']
+    if updated_media:
+        actual_url = updated_media['source_url']
+        logger.info(f"✅ Uploaded and renamed image: {filename} (ID: {media_id})")
+        logger.info(f"   WordPress URL: {actual_url}")
+    else:
+        # Use original URL if update failed
+        actual_url = media_data['source_url']
+        logger.warning(f"⚠️ Image uploaded but rename failed: {filename} (ID: {media_id})")
+        logger.warning(f"   Using URL: {actual_url}")
+
+    return {
+        'id': media_id,
+        'url': actual_url,
+        'filename': filename,
+        'alt_text': alt_text
+    }
+
+
+def image_media_key(image_data: bytes, alt_text: str) -> str:
+    """
+    Shared cache key of an image: the WordPress site, a hash of the image bytes and the alt text
+    (alt text lives on the media item, so the same image with other alt text is a new upload)
+    """
+    return cache_key(WORDPRESS_SITE_URL, hashlib.sha256(image_data).hexdigest(), alt_text)
+
+
+def reuse_uploaded_image(key: str) -> Optional[Dict]:
+    """The media item an identical image was uploaded as (by any process, within IMAGE_CACHE_TTL)"""
+    media = image_cache.get(key)
+    if not media:
+        return None
+    logger.info(f"♻️ Image already uploaded: {media['filename']} (ID: {media['id']})")
+    logger.info(f"   WordPress URL: {media['url']}")
+    return media
+
+
+def remember_uploaded_image(key: str, result: Dict) -> Dict:
+    """Record an upload so the same image is never uploaded twice"""
+    image_cache.put(key, {'id': result['id'], 'url': result['url'], 'filename': result['filename'],
+                          'alt_text': result['alt_text']})
+    return result
+
+
+class MediaUpload:
+    """
+    One image upload to the WordPress media library: configuration check, dedupe and result
+    handling. Both engines run it the same way - only the HTTP calls differ
+    (upload_image_to_wordpress / upload_image_to_wordpress_async)
+    """
+
+    def __init__(self, image_data: bytes, filename: str, alt_text: str):
+        self.url = f"{WORDPRESS_SITE_URL}/wp-json/wp/v2/media"
+        self.filename = filename
+        self.alt_text = alt_text
+        self.key = image_media_key(image_data, alt_text)
+
+    def settled(self) -> Tuple[bool, Optional[Dict]]:
+        """
+        (True, result) when no upload is needed - WordPress isn't configured (None), or an
+        identical image was uploaded before (its media item) - (False, None) otherwise
+        """
+        if not WORDPRESS_APP_PASSWORD:
+            logger.error("WordPress app password not configured")
+            return True, None
+        media = reuse_uploaded_image(self.key)
+        return (True, media) if media else (False, None)
+
+    def headers(self) -> Dict[str, str]:
+        return media_upload_headers(self.filename)
+
+    def created(self, response) -> Optional[Dict]:
+        """The new media item from the upload response (None if the upload failed)"""
+        if response.status_code == 201:
+            return response.json()
+        record_error('image_upload')
+        logger.error(f"WordPress upload failed: {response.status_code} - {response.text}")
+        return None
+
+    def rename_url(self, media_data: Dict) -> str:
+        return f"{self.url}/{media_data['id']}"
+
+    def rename_data(self) -> Dict[str, str]:
+        return media_rename_data(self.filename, self.alt_text)
+
+    def finish(self, media_data: Dict, rename_response) -> Dict:
+        """Result of the upload (remembered so the same image is never uploaded twice)"""
+        updated_media = rename_response.json() if rename_response.status_code == 200 else None
+        return remember_uploaded_image(
+            self.key, uploaded_media(media_data, updated_media, self.filename, self.alt_text)
+        )
+
+
 def upload_image_to_wordpress(image_data: bytes, filename: str, alt_text: str = "") -> Optional[Dict]:
     """
     Upload image to WordPress media library via REST API with proper SEO filename
@@ -446,86 +1092,124 @@ def upload_image_to_wordpress(image_data: bytes, filename: str, alt_text: str =
     Returns:
         Dict with id, url, and other WordPress media metadata, or None on failure
     """
-    if not WORDPRESS_APP_PASSWORD:
-        logger.error("WordPress app password not configured")
-        return None
+    upload = MediaUpload(image_data, filename, alt_text)
+    settled, result = upload.settled()
+    if settled:
+        return result
 
     try:
-        # Create auth header
-        auth_string = f"{WORDPRESS_USERNAME}:{WORDPRESS_APP_PASSWORD}"
-        auth_bytes = auth_string.encode('utf-8')
-        auth_b64 = base64.b64encode(auth_bytes).decode('utf-8')
-
-        # Determine content type
-        content_type, _ = mimetypes.guess_type(filename)
-        if not content_type:
-            content_type = 'image/png'
-
-        # Upload to WordPress with SEO-optimized filename
-        upload_url = f"{WORDPRESS_SITE_URL}/wp-json/wp/v2/media"
-
-        headers = {
-            'Authorization': f'Basic {auth_b64}',
-            'Content-Disposition': f'attachment; filename="{filename}"',
-            'Content-Type': content_type
-        }
+        # Upload with the SEO-optimized filename
+        with timed('image_upload'):
+            response = http_session.post(upload.url, headers=upload.headers(), data=image_data, timeout=30)
+        media_data = upload.created(response)
+        if not media_data:
+            return None
 
-        response = requests.post(
-            upload_url,
-            headers=headers,
-            data=image_data,
-            timeout=30
-        )
+        # Update the media post with correct slug, alt text, and title
+        with timed('image_rename'):
+            rename_response = http_session.post(
+                upload.rename_url(media_data), headers=wordpress_auth_header(), json=upload.rename_data(), timeout=10
+            )
+        return upload.finish(media_data, rename_response)
 
-        if response.status_code == 201:
-            media_data = response.json()
-            media_id = media_data['id']
-
-            # WordPress often ignores Content-Disposition, so we need to rename via post update
-            # Extract the slug from our desired filename (without extension)
-            slug_name = os.path.splitext(filename)[0]
-
-            # Update the media post with correct slug, alt text, and title
-            update_url = f"{WORDPRESS_SITE_URL}/wp-json/wp/v2/media/{media_id}"
-            update_data = {
-                'slug': slug_name,
-                'alt_text': alt_text,
-                'title': slug_name.replace('-', ' ').title()
-            }
+    except Exception as e:
+        logger.error(f"Error uploading image to WordPress: {e}")
+        return None
 
-            update_response = requests.post(
-                update_url,
-                headers={'Authorization': f'Basic {auth_b64}'},
-                json=update_data,
-                timeout=10
-            )
 
-            if update_response.status_code == 200:
-                updated_media = update_response.json()
-                actual_url = updated_media['source_url']
-                logger.info(f"✅ Uploaded and renamed image: {filename} (ID: {media_id})")
-                logger.info(f"   WordPress URL: {actual_url}")
-            else:
-                # Use original URL if update failed
-                actual_url = media_data['source_url']
-                logger.warning(f"⚠️ Image uploaded but rename failed: {filename} (ID: {media_id})")
-                logger.warning(f"   Using URL: {actual_url}")
-
-            return {
-                'id': media_id,
-                'url': actual_url,
-                'filename': filename,
-                'alt_text': alt_text
-            }
-        else:
-            logger.error(f"WordPress upload failed: {response.status_code} - {response.text}")
+async def upload_image_to_wordpress_async(image_data: bytes, filename: str, alt_text: str = "") -> Optional[Dict]:
+    """upload_image_to_wordpress() on the async engine"""
+    upload = MediaUpload(image_data, filename, alt_text)
+    settled, result = upload.settled()
+    if settled:
+        return result
+
+    try:
+        with timed('image_upload'):
+            response = await http_async.post(upload.url, headers=upload.headers(), content=image_data, timeout=30)
+        media_data = upload.created(response)
+        if not media_data:
             return None
 
+        with timed('image_rename'):
+            rename_response = await http_async.post(
+                upload.rename_url(media_data), headers=wordpress_auth_header(), json=upload.rename_data(), timeout=10
+            )
+        return upload.finish(media_data, rename_response)
+
     except Exception as e:
         logger.error(f"Error uploading image to WordPress: {e}")
         return None
 
 
+def processed_image(img: Dict, wp_result: Dict) -> Dict:
+    """Entry for an uploaded image in /process-images and /upload-all responses"""
+    return {
+        'original_url': img.get('original_url'),
+        'wordpress_id': wp_result['id'],
+        'wordpress_url': wp_result['url'],
+        'filename': wp_result['filename'],
+        'alt_text': wp_result['alt_text']
+    }
+
+
+def process_images_sync(images: List[Dict]) -> Tuple[List[Dict], List[Dict]]:
+    """
+    Download each image and upload it to WordPress, one at a time
+
+    Returns:
+        (processed images, failed images)
+    """
+    processed_images = []
+    failed_images = []
+
+    for img in images:
+        original_url = img.get('original_url')
+        logger.info(f"Processing image: {original_url}")
+
+        # Download image
+        image_data = download_image(original_url)
+        if not image_data:
+            failed_images.append({'original_url': original_url, 'error': 'Failed to download'})
+            continue
+
+        # Upload to WordPress
+        wp_result = upload_image_to_wordpress(image_data, img.get('suggested_filename'), img.get('alt_text', ''))
+        if not wp_result:
+            failed_images.append({'original_url': original_url, 'error': 'Failed to upload to WordPress'})
+            continue
+
+        processed_images.append(processed_image(img, wp_result))
+
+    return processed_images, failed_images
+
+
+async def process_images_async(images: List[Dict]) -> Tuple[List[Dict], List[Dict]]:
+    """process_images_sync() with up to IMAGE_UPLOAD_CONCURRENCY images in flight (results keep their order)"""
+    limit = asyncio.Semaphore(max(1, IMAGE_UPLOAD_CONCURRENCY))
+
+    async def process_one(img: Dict) -> Tuple[Optional[Dict], Optional[Dict]]:
+        original_url = img.get('original_url')
+        async with limit:
+            logger.info(f"Processing image: {original_url}")
+            image_data = await download_image_async(original_url)
+            if not image_data:
+                return None, {'original_url': original_url, 'error': 'Failed to download'}
+
+            wp_result = await upload_image_to_wordpress_async(
+                image_data, img.get('suggested_filename'), img.get('alt_text', '')
+            )
+            if not wp_result:
+                return None, {'original_url': original_url, 'error': 'Failed to upload to WordPress'}
+            return processed_image(img, wp_result), None
+
+    results = await asyncio.gather(*(process_one(img) for img in images))
+    processed_images = [done for done, _ in results if done]
+    failed_images = [failed for _, failed in results if failed]
+    return processed_images, failed_images
+
+
+@traced()
 def extract_images(original_html: str, converted_html: str, focus_keyphrase: str = "") -> List[Dict]:
     """
     Extract all images and generate SEO/GEO optimized filenames and alt text
@@ -661,10 +1345,9 @@ def extract_images(original_html: str, converted_html: str, focus_keyphrase: str
     return images
 
 
-def generate_seo_metadata(original_html: str, converted_html: str) -> Dict:
-    """Generate SEO metadata for the converted blog post"""
-    logger.info("Generating SEO metadata...")
-
+@traced()
+def build_seo_prompt(converted_html: str) -> str:
+    """Build the SEO metadata prompt for a converted blog post"""
     # Remove HTML tags for analysis
     text_content = re.sub(r'<[^>]+>', ' ', converted_html)
     text_content = re.sub(r'\s+', ' ', text_content).strip()
@@ -733,83 +1416,49 @@ Return ONLY valid JSON with these exact keys:
   "meta_description": "..."
 }}"""
 
-    try:
-        message = claude_client.messages.create(
-            model="claude-3-7-sonnet-20250219",
-            max_tokens=1000,
-            messages=[{"role": "user", "content": prompt}]
-        )
+    return prompt
 
-        response_text = message.content[0].text.strip()
 
-        # Clean up response
-        if response_text.startswith('```'):
-            lines = response_text.split('\n')
-            response_text = '\n'.join(lines[1:-1])
+def parse_seo_response(response_text: str) -> Dict:
+    """Parse Claude's SEO metadata JSON response (strips code fences)"""
+    response_text = response_text.strip()
 
-        metadata = json.loads(response_text)
-        logger.info("SEO metadata generated successfully")
+    # Clean up response
+    if response_text.startswith('```'):
+        lines = response_text.split('\n')
+        response_text = '\n'.join(lines[1:-1])
 
-        return metadata
+    return json.loads(response_text)
 
-    except Exception as e:
-        logger.error(f"❌ FAILED TO GENERATE SEO METADATA - USING FALLBACK GENERIC TAGS ❌")
-        logger.error(f"Error type: {type(e).__name__}")
-        logger.error(f"Error message: {str(e)}")
-        logger.error(f"This is why you're seeing generic categories and tags!")
-        import traceback
-        logger.error(f"Full traceback:\n{traceback.format_exc()}")
-        return {
-            "article_title": "South Jersey Real Estate Guide",
-            "categories": ["Housing Market Updates"],
-            "tags": ["Real Estate Market", "Home Prices", "Selling Tips", "Buying Tips"],  # Fixed to use exact tag names
-            "focus_keyphrase": "South Jersey real estate",
-            "seo_title": "South Jersey Real Estate Guide",
-            "meta_description": "%%title%% %%sep%% %%sitename%% %%sep%% %%primary_category%%"
-        }
 
+def seo_fallback(error: Exception) -> Dict:
+    """Generic SEO metadata when generation fails (logged loudly - it shows up as generic tags)"""
+    logger.error(f"❌ FAILED TO GENERATE SEO METADATA - USING FALLBACK GENERIC TAGS ❌")
+    logger.error(f"This is why you're seeing generic categories and tags!")
+    logger.error(f"{type(error).__name__}: {error}", exc_info=error)
+    return dict(FALLBACK_SEO_METADATA)
 
-def rewrite_blog_post(original_html: str, context_pages: List[Dict]) -> str:
-    """Use Claude to rewrite the blog post with local South Jersey context"""
-    logger.info("Retrieving content from selected pages...")
 
-    # Retrieve full content from each page
-    context_docs = []
-    for page in context_pages:
-        content = retrieve_page_content(page['id'])
-        if content:
-            context_docs.append({
-                'title': page['title'],
-                'content': content,
-                'is_master': page.get('is_master', False)
-            })
-            logger.info(f"Retrieved content from: {page['title']}")
+def seo_call(converted_html: str, refresh: bool) -> ClaudeCall:
+    """SEO metadata request for a converted post"""
+    logger.info("Generating SEO metadata...")
+    return ClaudeCall('seo_metadata', 'seo', build_seo_prompt(converted_html), 1000,
+                      parse=parse_seo_response, fallback=seo_fallback,
+                      describe=lambda metadata: "SEO metadata", refresh=refresh)
 
-    if not context_docs:
-        logger.error("No context retrieved")
-        return ""
 
-    # Build context section
-    context_text = ""
-    for doc in context_docs:
-        marker = " [MASTER REFERENCE]" if doc['is_master'] else ""
-        context_text += f"\n\n{'='*60}\n"
-        context_text += f"Document: {doc['title']}{marker}\n"
-        context_text += f"{'='*60}\n"
-        context_text += doc['content']
+def generate_seo_metadata(original_html: str, converted_html: str, refresh: bool = False) -> Dict:
+    """Generate SEO metadata for the converted blog post (refresh: skip the cached metadata)"""
+    return call_claude(seo_call(converted_html, refresh))
 
-    logger.info("Sending to Claude for rewriting...")
 
-    # Load refined prompt template (ACTIVE version)
-    prompt_path = Path(__file__).parent / 'kcm_prompt_ACTIVE.md'
+async def generate_seo_metadata_async(original_html: str, converted_html: str, refresh: bool = False) -> Dict:
+    """generate_seo_metadata() on the async engine"""
+    return await call_claude_async(seo_call(converted_html, refresh))
 
-    try:
-        with open(prompt_path, 'r', encoding='utf-8') as f:
-            refined_prompt_template = f.read()
-        logger.info("Loaded refined prompt template: ACTIVE")
-    except FileNotFoundError:
-        logger.warning(f"Refined prompt template v4 not found at {prompt_path}, using fallback prompt")
-        refined_prompt_template = """# KCM to South Jersey Blog Conversion
+
+# Used when kcm_prompt_ACTIVE.md is missing
+FALLBACK_PROMPT_TEMPLATE = """# KCM to South Jersey Blog Conversion
 
 ## MISSION
 Convert national real estate content into South Jersey gold. Make readers stop scrolling. Drive action.
@@ -824,21 +1473,49 @@ Convert national real estate content into South Jersey gold. Make readers stop s
 
 OUTPUT: Return ONLY the rewritten HTML. No preamble, no code fences."""
 
-    prompt = f"""{refined_prompt_template}
 
----
+def cached_digest(page: Dict) -> Optional[str]:
+    """Context digest for a page when digests are enabled and one is current (queues a build otherwise)"""
+    if not digest_store:
+        return None
+    content = digest_store.get_digest(page['id'], page.get('last_edited_time'))
+    record_cache('context_digest', bool(content))
+    if content:
+        logger.info(f"Using context digest for: {page['title']}")
+    else:
+        digest_store.request_build(page)
+    return content
 
-## CONTENT TO CONVERT
 
-### ORIGINAL BLOG POST (HTML):
-{original_html}
+# Rewrite prompt templates (kcm_prompt_ACTIVE.md, kcm_prompt_v17.md ...), re-read only when a file changes
+prompt_registry = PromptRegistry(Path(__file__).parent, fallback=FALLBACK_PROMPT_TEMPLATE)
 
-### SOUTH JERSEY CONTEXT DOCUMENTS:
-{context_text}
 
----
+def load_prompt_template() -> str:
+    """Refined prompt template (PROMPT_VERSION, default ACTIVE), or the built-in fallback"""
+    return prompt_registry.get().text
 
-## CONVERSION INSTRUCTIONS
+
+# Fixed parts of the rewrite prompt around the template, the original post and the context
+REWRITE_PROMPT_ORIGINAL = """
+
+---
+
+## CONTENT TO CONVERT
+
+### ORIGINAL BLOG POST (HTML):
+"""
+
+REWRITE_PROMPT_CONTEXT = """
+
+### SOUTH JERSEY CONTEXT DOCUMENTS:
+"""
+
+REWRITE_PROMPT_INSTRUCTIONS = """
+
+---
+
+## CONVERSION INSTRUCTIONS
 
 Apply ALL guidelines from the refined prompt above to convert this national content into localized South Jersey content.
 
@@ -854,174 +1531,922 @@ Apply ALL guidelines from the refined prompt above to convert this national cont
 
 OUTPUT: Return ONLY the rewritten HTML. No preamble, no explanation, no code fences, just the complete localized blog post in HTML format ready for WordPress."""
 
-    try:
-        message = claude_client.messages.create(
-            model="claude-3-7-sonnet-20250219",
-            max_tokens=16000,
-            messages=[{"role": "user", "content": prompt}]
-        )
 
-        rewritten_html = message.content[0].text.strip()
-
-        # Remove markdown code fences if present
-        if rewritten_html.startswith('```html'):
-            lines = rewritten_html.split('\n')
-            rewritten_html = '\n'.join(lines[1:-1])
-        elif rewritten_html.startswith('```'):
-            lines = rewritten_html.split('\n')
-            rewritten_html = '\n'.join(lines[1:-1])
-
-        # Aggressively clean up any markdown sections Claude might have added
-        # Remove any markdown headers at the beginning (# or ##)
-        while rewritten_html.strip().startswith('#'):
-            lines = rewritten_html.strip().split('\n')
-            # Find first line that doesn't start with # (the actual HTML content)
-            for i, line in enumerate(lines):
-                if not line.strip().startswith('#'):
-                    rewritten_html = '\n'.join(lines[i:])
-                    break
-            # Prevent infinite loop if all lines start with #
-            if i == len(lines) - 1:
+@functools.lru_cache(maxsize=8)
+def rewrite_prompt_head(template_text: str) -> str:
+    """Template plus the fixed lead-in to the original post (built once per template version)"""
+    return template_text + REWRITE_PROMPT_ORIGINAL
+
+
+def assemble_rewrite_prompt(original_html: str, context_docs: List[Dict],
+                            topics: Optional[List[str]] = None) -> Tuple[str, Dict]:
+    """
+    Fit the context documents to the token budget and build the full rewrite prompt
+
+    Returns:
+        (prompt, context budget report - includes the template name, version and hash)
+    """
+    template = prompt_registry.get()
+
+    # Trim context documents to the token budget (most relevant paragraphs first)
+    context_docs, context_budget = fit_context_to_budget(
+        context_docs,
+        topics or [],
+        template=template.text,
+        original_html=original_html
+    )
+    context_budget['prompt'] = template.info()
+
+    # Build context section
+    context_text = ""
+    for doc in context_docs:
+        marker = " [MASTER REFERENCE]" if doc['is_master'] else ""
+        context_text += f"\n\n{'='*60}\n"
+        context_text += f"Document: {doc['title']}{marker}\n"
+        context_text += f"{'='*60}\n"
+        context_text += doc['content']
+
+    prompt = ''.join((
+        rewrite_prompt_head(template.text),
+        original_html,
+        REWRITE_PROMPT_CONTEXT,
+        context_text,
+        REWRITE_PROMPT_INSTRUCTIONS
+    ))
+
+    return prompt, context_budget
+
+
+@traced()
+def build_rewrite_prompt(original_html: str, context_pages: List[Dict],
+                         topics: Optional[List[str]] = None) -> Tuple[str, Optional[Dict]]:
+    """
+    Retrieve context for the selected pages and build the full rewrite prompt
+
+    Returns:
+        (prompt, context budget report), or ("", None) if no context could be retrieved
+    """
+    logger.info("Retrieving content from selected pages...")
+
+    # Retrieve content from each page (cached digest when available, full page otherwise)
+    context_docs = []
+    for page in context_pages:
+        content = cached_digest(page)
+
+        if not content:
+            content = page_content(page)
+            if content:
+                logger.info(f"Retrieved content from: {page['title']}")
+
+        if content:
+            context_docs.append({
+                'title': page['title'],
+                'content': content,
+                'is_master': page.get('is_master', False)
+            })
+
+    if not context_docs:
+        logger.error("No context retrieved")
+        return "", None
+
+    return assemble_rewrite_prompt(original_html, context_docs, topics)
+
+
+@traced()
+async def build_rewrite_prompt_async(original_html: str, context_pages: List[Dict],
+                                     topics: Optional[List[str]] = None) -> Tuple[str, Optional[Dict]]:
+    """
+    build_rewrite_prompt() on the async engine: the pages are retrieved concurrently
+
+    Returns:
+        (prompt, context budget report), or ("", None) if no context could be retrieved
+    """
+    logger.info("Retrieving content from selected pages...")
+
+    async def context_doc(page: Dict) -> Optional[Dict]:
+        content = cached_digest(page)
+        if not content:
+            content = await page_content_async(page)
+            if content:
+                logger.info(f"Retrieved content from: {page['title']}")
+        if not content:
+            return None
+        return {'title': page['title'], 'content': content, 'is_master': page.get('is_master', False)}
+
+    context_docs = [doc for doc in await asyncio.gather(*(context_doc(page) for page in context_pages)) if doc]
+
+    if not context_docs:
+        logger.error("No context retrieved")
+        return "", None
+
+    return assemble_rewrite_prompt(original_html, context_docs, topics)
+
+
+@traced()
+def clean_rewritten_html(rewritten_html: str) -> str:
+    """
+    Post-process Claude's rewrite: strip code fences and markdown sections,
+    remove em dashes and migrate KCM links to MSNJ format
+    """
+    rewritten_html = rewritten_html.strip()
+
+    # Remove markdown code fences if present
+    if rewritten_html.startswith('```html'):
+        lines = rewritten_html.split('\n')
+        rewritten_html = '\n'.join(lines[1:-1])
+    elif rewritten_html.startswith('```'):
+        lines = rewritten_html.split('\n')
+        rewritten_html = '\n'.join(lines[1:-1])
+
+    # Aggressively clean up any markdown sections Claude might have added
+    # Remove any markdown headers at the beginning (# or ##)
+    while rewritten_html.strip().startswith('#'):
+        lines = rewritten_html.strip().split('\n')
+        # Find first line that doesn't start with # (the actual HTML content)
+        for i, line in enumerate(lines):
+            if not line.strip().startswith('#'):
+                rewritten_html = '\n'.join(lines[i:])
                 break
+        # Prevent infinite loop if all lines start with #
+        if i == len(lines) - 1:
+            break
+
+    # Remove any markdown sections at the END
+    # Look for patterns like "## OUTPUT", "### 1.", "### 2.", "## SEO", etc.
+    # These typically appear after the HTML content ends
+    end_section_patterns = [
+        r'\n#+\s*(OUTPUT|SEO|IMAGE|KEYPHRASE|DELIVERABLE).*',
+        r'\n###\s*\d+\..*',  # Numbered sections like "### 1. Rewritten HTML"
+        r'\n##\s*\d+\..*'   # Numbered sections like "## 1. HTML"
+    ]
+
+    for pattern in end_section_patterns:
+        match = re.search(pattern, rewritten_html, re.IGNORECASE | re.DOTALL)
+        if match:
+            rewritten_html = rewritten_html[:match.start()]
+            logger.info(f"Removed markdown section from converted HTML (pattern: {pattern[:30]}...)")
+            break  # Only need to find the first match since we're removing everything after it
+
+    # Remove any remaining em dashes
+    rewritten_html = remove_em_dashes(rewritten_html)
+
+    # Migrate KCM links to MSNJ format
+    rewritten_html = migrate_kcm_links(rewritten_html)
+
+    # Note: Image URL conversion will happen after images are uploaded to WordPress
+    # This ensures we use the actual WordPress URLs with SEO-optimized filenames
+
+    return rewritten_html
+
+
+def throttle_claude_on_rate_limit(error: Exception, error_class: str):
+    """Retry hook: slow the Claude limiter down when a retried call was rate limited"""
+    if error_class == RATE_LIMITED:
+        claude_limiter.bucket.throttle(get_retry_after(error) or claude_retry.base_delay)
+
+
+def rewrite_messages(prompt: str, state: Dict) -> List[Dict]:
+    """Messages for a (resumed) streamed rewrite: the partial output so far goes in as an assistant prefill"""
+    messages = [{"role": "user", "content": prompt}]
+    if state['text']:
+        # The API rejects assistant prefills that end in whitespace
+        state['text'] = state['text'].rstrip()
+        messages.append({"role": "assistant", "content": state['text']})
+        logger.info(f"Resuming rewrite from {len(state['text'])} chars of partial output")
+    return messages
+
+
+def wants_continuation(stop_reason: str, state: Dict) -> bool:
+    """True (and counted) when a rewrite stopped at max_tokens and may be continued"""
+    if stop_reason != 'max_tokens' or state['continuations'] >= MAX_REWRITE_CONTINUATIONS:
+        return False
+    state['continuations'] += 1
+    logger.warning(
+        f"Rewrite stopped at max_tokens - requesting continuation "
+        f"{state['continuations']}/{MAX_REWRITE_CONTINUATIONS}"
+    )
+    return True
+
+
+def stream_rewrite(prompt: str) -> str:
+    """
+    Stream the rewrite from Claude, keeping the partial output across failures
 
-        # Remove any markdown sections at the END
-        # Look for patterns like "## OUTPUT", "### 1.", "### 2.", "## SEO", etc.
-        # These typically appear after the HTML content ends
-        end_section_patterns = [
-            r'\n#+\s*(OUTPUT|SEO|IMAGE|KEYPHRASE|DELIVERABLE).*',
-            r'\n###\s*\d+\..*',  # Numbered sections like "### 1. Rewritten HTML"
-            r'\n##\s*\d+\..*'   # Numbered sections like "## 1. HTML"
-        ]
+    A retry after a dropped stream, or a response that stopped at max_tokens,
+    sends a continuation request (the partial output as an assistant prefill)
+    instead of regenerating the whole article.
+    """
+    state = {'text': '', 'continuations': 0}
 
-        for pattern in end_section_patterns:
-            match = re.search(pattern, rewritten_html, re.IGNORECASE | re.DOTALL)
-            if match:
-                rewritten_html = rewritten_html[:match.start()]
-                logger.info(f"Removed markdown section from converted HTML (pattern: {pattern[:30]}...)")
-                break  # Only need to find the first match since we're removing everything after it
+    def stream_once() -> str:
+        while True:
+            messages = rewrite_messages(prompt, state)
 
-        # Remove any remaining em dashes
-        rewritten_html = remove_em_dashes(rewritten_html)
+            with span('claude.messages.stream'), claude_limiter.slot():
+                with anthropic_client.messages.stream(
+                    model="claude-3-7-sonnet-20250219",
+                    max_tokens=16000,
+                    messages=messages
+                ) as stream:
+                    for text in stream.text_stream:
+                        state['text'] += text
+                    final_message = stream.get_final_message()
+                    record_claude_usage(final_message)
+                    stop_reason = final_message.stop_reason
 
-        # Migrate KCM links to MSNJ format
-        rewritten_html = migrate_kcm_links(rewritten_html)
+            if not wants_continuation(stop_reason, state):
+                return state['text']
 
-        # Note: Image URL conversion will happen after images are uploaded to WordPress
-        # This ensures we use the actual WordPress URLs with SEO-optimized filenames
+    return claude_retry.run(stream_once, label='rewrite', on_retry=throttle_claude_on_rate_limit)
 
-        logger.info(f"Blog post rewritten successfully ({len(rewritten_html)} chars)")
 
-        return rewritten_html
+async def stream_rewrite_async(prompt: str) -> str:
+    """stream_rewrite() on the async engine"""
+    state = {'text': '', 'continuations': 0}
 
-    except Exception as e:
-        logger.error(f"Failed to rewrite blog post: {e}")
-        return ""
+    async def stream_once() -> str:
+        while True:
+            messages = rewrite_messages(prompt, state)
 
+            with span('claude.messages.stream'):
+                async with claude_limiter.async_slot():
+                    async with anthropic_async.messages.stream(
+                        model="claude-3-7-sonnet-20250219",
+                        max_tokens=16000,
+                        messages=messages
+                    ) as stream:
+                        async for text in stream.text_stream:
+                            state['text'] += text
+                        final_message = await stream.get_final_message()
+                        record_claude_usage(final_message)
+                        stop_reason = final_message.stop_reason
 
-@app.route('/convert', methods=['POST'])
-def convert():
-    """Main endpoint for blog conversion"""
-    global last_link_stats
+            if not wants_continuation(stop_reason, state):
+                return state['text']
+
+    return await claude_retry.run_async(stream_once, label='rewrite', on_retry=throttle_claude_on_rate_limit)
+
+
+def rewrite_fallback(error: Exception) -> str:
+    """No rewrite when the call fails (the conversion reports the error)"""
+    logger.error(f"Failed to rewrite blog post: {error}")
+    return ""
+
+
+def rewrite_call(prompt: str, refresh: bool) -> ClaudeCall:
+    """Rewrite request for a built rewrite prompt"""
+    logger.info("Sending to Claude for rewriting...")
+    return ClaudeCall('rewrite', 'rewrite', prompt, 16000,
+                      parse=clean_rewritten_html, fallback=rewrite_fallback,
+                      describe=lambda html: f"rewrite ({len(html)} chars)", stream=REWRITE_STREAMING,
+                      refresh=refresh)
+
+
+def rewrite_blog_post(original_html: str, context_pages: List[Dict], topics: Optional[List[str]] = None,
+                      refresh: bool = False) -> Tuple[str, Optional[Dict]]:
+    """
+    Use Claude to rewrite the blog post with local South Jersey context (refresh: skip the cached rewrite)
+
+    Returns:
+        (rewritten HTML or "" on failure, context budget report)
+    """
+    prompt, context_budget = build_rewrite_prompt(original_html, context_pages, topics)
+    if not prompt:
+        return "", context_budget
+    return call_claude(rewrite_call(prompt, refresh)), context_budget
+
+
+async def rewrite_blog_post_async(original_html: str, context_pages: List[Dict], topics: Optional[List[str]] = None,
+                                  refresh: bool = False) -> Tuple[str, Optional[Dict]]:
+    """
+    rewrite_blog_post() on the async engine
+
+    Returns:
+        (rewritten HTML or "" on failure, context budget report)
+    """
+    prompt, context_budget = await build_rewrite_prompt_async(original_html, context_pages, topics)
+    if not prompt:
+        return "", context_budget
+    return await call_claude_async(rewrite_call(prompt, refresh)), context_budget
+
+
+def build_tracking_context(data: Dict, title: str, categories: List[str], tags: List[str], seo_metadata: Dict) -> Dict:
+    """Collect everything Notion tracking needs once the webhook has been delivered"""
+    # Link stats of the conversion (its link_replacement, sent back by the client)
+    # Total internal links = replaced + not_found
+    link_stats = data.get('link_stats')
+    internal_links_count = 0
+    if link_stats:
+        internal_links_count = link_stats.get('replaced', 0) + len(link_stats.get('not_found', []))
+        logger.info(f"Internal links count: {internal_links_count} ({link_stats.get('replaced', 0)} replaced, {len(link_stats.get('not_found', []))} not found)")
+    else:
+        logger.warning("No link stats available - internal links count will be 0")
+
+    # Ensure categories and tags are lists of strings (not IDs)
+    # They should already be lists of category/tag names from seo_metadata
+    return {
+        'kcm_url': data.get('kcm_url', ''),  # Original KCM URL from frontend
+        'article_title': title,
+        'categories': categories if isinstance(categories, list) else [],
+        'tags': tags if isinstance(tags, list) else [],
+        'focus_keyphrase': seo_metadata.get('focus_keyphrase', ''),
+        'seo_title': seo_metadata.get('seo_title', ''),
+        'meta_description': seo_metadata.get('meta_description', ''),
+        'internal_links_count': internal_links_count,
+        'publish_key': make_publish_key(data.get('kcm_url', ''), data.get('converted_html', ''))
+    }
+
+
+def track_conversion(context: Dict, webhook_response: Dict):
+    """Queue a Notion conversion record for a delivered post (optional feature)"""
+    kcm_url = context.get('kcm_url', '')
+
+    # WordPress REST API returns 'id' and 'link', not 'post_id' and 'post_url'
+    wordpress_post_id = webhook_response.get('id', 0)
+    wordpress_url = webhook_response.get('link', '')
+
+    logger.info(f"Notion tracking data - KCM URL: {kcm_url}, WP Post ID: {wordpress_post_id}, WP URL: {wordpress_url}")
+
+    if not (kcm_url and wordpress_post_id and wordpress_url):
+        logger.warning("⚠️  Missing KCM URL or WordPress details - skipping Notion tracking")
+        return
+
+    # Extract slugs from URLs
+    # KCM slug: just the article slug (last segment of path)
+    # Example: https://simplifyingthemarket.com/en/2025/09/24/how-to-buy-a-home/ → "how-to-buy-a-home"
+    kcm_path = urlparse(kcm_url).path.rstrip('/')
+    kcm_slug = kcm_path.split('/')[-1] if kcm_path else ''
+
+    # WordPress slug: same extraction method
+    wordpress_path = urlparse(wordpress_url).path.rstrip('/')
+    wordpress_slug = wordpress_path.split('/')[-1] if wordpress_path else ''
+
+    publish_key = context.get('publish_key')
+    if publish_key and publish_guard.is_tracked(publish_key):
+        logger.info("Conversion already tracked in Notion for this publish - skipping duplicate record")
+        return
+
+    logger.info(f"Notion tracking - KCM slug: '{kcm_slug}', WP slug: '{wordpress_slug}'")
+    logger.info(f"Notion tracking - Categories: {context['categories']}, Tags: {context['tags']}")
+
+    # Queue for the Notion writer and make the new link resolvable right away
+    record = {
+        'kcm_url': kcm_url,
+        'kcm_slug': kcm_slug,
+        'wordpress_url': wordpress_url,
+        'wordpress_slug': wordpress_slug,
+        'wordpress_post_id': wordpress_post_id,
+        'article_title': context['article_title'],
+        'focus_keyphrase': context['focus_keyphrase'],
+        'categories': context['categories'],
+        'tags': context['tags'],
+        'seo_title': context['seo_title'],
+        'meta_description': context['meta_description'],
+        'internal_links_count': context['internal_links_count'],
+        'status': 'Published'
+    }
+    tracking_queue.enqueue(record, dedupe_key=publish_key or f"{kcm_url}|{wordpress_post_id}")
+    url_mappings.add(kcm_url, wordpress_url)
+
+
+def write_conversion_record(record: Dict) -> str:
+    """Tracking queue writer: add one conversion record to Notion (raises so the queue retries)"""
+    notion_page_id = add_conversion_record(notion_client=notion_client, raise_errors=True, **record)
+    if not notion_page_id and os.getenv('NOTION_CONVERSION_DB_ID'):
+        raise RuntimeError("Notion returned no page ID for the conversion record")
+    return notion_page_id
+
+
+def on_conversion_tracked(dedupe_key: str, notion_page_id: str):
+    """Tracking queue hook: remember the Notion page so the publish is never tracked twice"""
+    if notion_page_id:
+        logger.info(f"✅ Conversion tracked in Notion (Page ID: {notion_page_id})")
+        publish_guard.mark_tracked(dedupe_key, notion_page_id)
+
+
+def on_webhook_delivered(record: Dict, webhook_response: Dict):
+    """Outbox hook: log what WordPress returned and track the conversion in Notion"""
+    logger.info(f"WordPress Response - Post ID: {webhook_response.get('id', 'NOT SET')}")
+    logger.info(f"WordPress Response - Post URL: {webhook_response.get('link', 'NOT SET')}")
+    logger.info(f"WordPress Response - Featured Media: {webhook_response.get('featured_media', 'NOT SET')}")
+
+    # v2.0: Check TOP-LEVEL Yoast fields (register_rest_field creates top-level fields)
+    logger.info(f"WordPress Response - Yoast Fields (v2.0 - TOP-LEVEL):")
+    for field in ['_yoast_wpseo_focuskw', '_yoast_wpseo_title', '_yoast_wpseo_metadesc']:
+        value = webhook_response.get(field, '')
+        if value:
+            logger.info(f"  ✅ {field}: '{value[:80]}...'")
+        else:
+            logger.error(f"  ❌ {field}: EMPTY or NOT SET")
 
     try:
-        data = request.json
-        original_html = data.get('html', '')
-        kcm_tags_text = data.get('kcm_tags', '')
+        track_conversion(record['context'], webhook_response)
+    except Exception as tracking_error:
+        # Don't fail the delivery if queueing the tracking record fails
+        logger.error(f"Failed to queue conversion record for Notion (non-critical): {tracking_error}")
 
-        if not original_html:
-            return jsonify({'error': 'No HTML provided'}), 400
 
-        logger.info(f"Received conversion request ({len(original_html)} chars)")
+# Durable webhook queue - posts survive a server restart
+outbox = WebhookOutbox(N8N_WEBHOOK_URL, on_delivered=on_webhook_delivered)
 
-        # Parse KCM recommended tags if provided
-        kcm_taxonomy = {"categories": [], "tags": []}
-        if kcm_tags_text and kcm_tags_text.strip():
-            logger.info(f"Parsing KCM recommended tags: {kcm_tags_text[:100]}...")
-            kcm_taxonomy = parse_kcm_recommendations(kcm_tags_text)
-            logger.info(f"KCM taxonomy parsed: {kcm_taxonomy['categories']} categories, {len(kcm_taxonomy['tags'])} tags")
 
-        # Extract topics
-        topics = extract_topics_from_blog(original_html)
+# Idempotent publishing - a repeated publish of the same post returns the first result
+publish_guard = PublishGuard()
 
-        # Search database
-        relevant_pages = search_notion_database(topics)
+# Write-behind Notion tracking - publishes never wait on Notion, and records survive restarts
+tracking_queue = TrackingQueue(write_conversion_record, on_written=on_conversion_tracked)
 
-        if not relevant_pages:
-            return jsonify({'error': 'No relevant context found in Notion database'}), 500
+# KCM -> WordPress URL mapping for link replacement (includes conversions still queued for Notion),
+# reloaded by one process and shared with the others through the shared cache
+URL_MAPPING_TTL = int(os.getenv('URL_MAPPING_TTL', 300))
+url_mappings = UrlMappingCache(
+    notion_client, ttl=URL_MAPPING_TTL, pending=tracking_queue.pending_mappings,
+    shared=shared_cache.namespace('url_mappings', ttl=URL_MAPPING_TTL, maxsize=0, policy=TTL)
+)
 
-        # Rewrite blog post
-        converted_html = rewrite_blog_post(original_html, relevant_pages)
+# Readiness and graceful draining for the production server (see serve.py)
+lifecycle = Lifecycle()
+
+# Fill the caches and open the API connections before a process reports ready, then keep them
+# fresh in the background (CACHE_WARMING=false loads everything on first use instead)
+CACHE_WARMING = os.getenv('CACHE_WARMING', 'true').lower() in ('1', 'true', 'yes')
+cache_warmer = CacheWarmer()
+
+
+def warm_prompt_template() -> str:
+    """Rewrite prompt template and the category/tag prompt tables"""
+    prompt_registry.preload()
+    get_categories_prompt()
+    get_tags_prompt()
+    template = prompt_registry.get()
+    return f"{template.name} {template.version}"
+
+
+def warm_context_index() -> str:
+    """
+    Rebuild the shared context index from the Notion listing once its snapshot is 60% of
+    CONTEXT_LISTING_TTL old - only one process rebuilds, the others map the new snapshot
+    """
+    index = context_index.current()
+    if index is not None and index.age() < CONTEXT_LISTING_TTL * 0.6:
+        return f"{len(index)} pages ({index.age():.0f}s old)"
+    with context_index.rebuild_lock() as rebuild:
+        if not rebuild:
+            return "rebuilding in another process"
+        context_schema(refresh=True)
+        records = [index_record(page) for page in fetch_all_pages()]
+        index = context_index.publish(records)
+    return f"{len(index)} pages rebuilt ({index.size} bytes)"
+
+
+def warm_master_doc() -> str:
+    """Text of the master document (re-read from Notion only when it was edited)"""
+    page = find_master_page()
+    if not page:
+        raise LookupError(f"'{MASTER_DOC_NAME}' is not in the context database")
+    content = page_content(page)
+    if not content:
+        raise RuntimeError(f"Could not retrieve '{MASTER_DOC_NAME}'")
+    return f"{len(content)} characters"
+
+
+def warm_url_mappings() -> str:
+    """
+    Reload the KCM -> WordPress URL mapping before its TTL runs out (or take another
+    process's reload if it is less than half a TTL old)
+    """
+    return f"{len(url_mappings.refresh(max_age=url_mappings.ttl * 0.5))} mappings"
+
+
+def connection_reached(error: BaseException) -> bool:
+    """True if a call failed with an HTTP error response (the connection itself was opened)"""
+    return isinstance(getattr(error, 'status_code', getattr(error, 'status', None)), int)
+
+
+def open_connections() -> Dict[str, Optional[BaseException]]:
+    """Cheap call to each API on the request-thread clients (Notion, Claude, WordPress)"""
+    calls = {
+        'notion': lambda: notion_client.users.me(),
+        'claude': lambda: anthropic_client.models.list(limit=1, timeout=10),
+        'wordpress': lambda: http_session.head(f"{WORDPRESS_SITE_URL}/wp-json/", timeout=10)
+    }
+    outcomes = {}
+    for name, call in calls.items():
+        try:
+            call()
+            outcomes[name] = None
+        except Exception as e:
+            outcomes[name] = e
+    return outcomes
+
+
+async def open_connections_async() -> Dict[str, Optional[BaseException]]:
+    """open_connections() on the async engine's clients, concurrently"""
+    names = ('notion', 'claude', 'wordpress')
+    results = await asyncio.gather(
+        notion_async.users.me(),
+        anthropic_async.models.list(limit=1, timeout=10),
+        http_async.head(f"{WORDPRESS_SITE_URL}/wp-json/", timeout=10),
+        return_exceptions=True
+    )
+    return {name: result if isinstance(result, BaseException) else None for name, result in zip(names, results)}
+
+
+def warm_connections() -> str:
+    """Open (or keep open) the TLS connections to Notion, Claude, WordPress and n8n"""
+    if ASYNC_ENGINE:
+        outcomes = engine.run(open_connections_async, timeout=30)
+    else:
+        outcomes = open_connections()
+    reached = [name for name, error in outcomes.items() if error is None or connection_reached(error)]
+    for name, error in outcomes.items():
+        if name not in reached:
+            logger.debug(f"Could not open a connection to {name}: {error}")
+    if not reached:
+        raise ConnectionError("No API could be reached")
+    # Only the process running the outbox sender talks to n8n
+    if outbox.warm_connection():
+        reached.append('n8n')
+    return ', '.join(reached)
+
+
+cache_warmer.add('prompt_template', warm_prompt_template)
+cache_warmer.add('connections', warm_connections, interval=CONNECTION_KEEPALIVE / 2)
+# Checked every TTL/5 and rebuilt at 60% of the TTL, so a snapshot never outlives the TTL
+cache_warmer.add('context_index', warm_context_index, interval=CONTEXT_LISTING_TTL * 0.2)
+cache_warmer.add('master_doc', warm_master_doc, interval=CONTEXT_LISTING_TTL * 0.8)
+cache_warmer.add('url_mappings', warm_url_mappings, interval=url_mappings.ttl * 0.8)
+
+# Probes and status endpoints stay available while draining and are not counted as in flight
+LIFECYCLE_EXEMPT_ENDPOINTS = {'health', 'ready', 'metrics_endpoint', 'delivery_status'}
+
+
+@app.before_request
+def track_in_flight():
+    """Count work requests so a shutdown can wait for them; turn new ones away while draining"""
+    if request.endpoint in LIFECYCLE_EXEMPT_ENDPOINTS or request.method == 'OPTIONS':
+        return None
+    if not lifecycle.begin():
+        return jsonify({'success': False, 'error': 'Server is shutting down - please retry shortly'}), 503
+    g.in_flight = True
+    return None
+
+
+@app.teardown_request
+def finish_in_flight(error=None):
+    if g.pop('in_flight', False):
+        lifecycle.end()
+
+
+def guarded_publish(data: Dict, converted_html: str, publish) -> Dict:
+    """
+    Run a publish once per (KCM URL, converted HTML) pair
+
+    Duplicates (double clicks, retries after a timeout) get the first publish's result
+    with its current delivery status instead of new images, drafts and Notion rows.
+    A publish whose webhook delivery failed permanently may be published again.
+    """
+    def still_valid(result: Dict) -> bool:
+        record = outbox.get(result.get('delivery_id', ''))
+        return bool(record) and record['status'] != 'failed'
+
+    result, outcome = publish_guard.run(data.get('kcm_url', ''), converted_html, publish, is_valid=still_valid)
+    record_cache('publish', outcome != NEW)
+    if outcome != NEW:
+        record = outbox.get(result['delivery_id'])
+        result = delivery_response(record, {**result, 'duplicate': True})
+    return {**result, 'publish_outcome': outcome}
+
+
+def queue_webhook(wrapped_payload: Dict, tracking_context: Dict) -> Dict:
+    """Durably queue a webhook payload keyed by its content hash (identical payloads queue once)"""
+    idempotency_key = hashlib.sha256(json.dumps(wrapped_payload, sort_keys=True).encode('utf-8')).hexdigest()
+    post_key = tracking_context.get('kcm_url') or wrapped_payload['body'].get('slug', '')
+
+    return outbox.enqueue(wrapped_payload, idempotency_key, post_key=post_key, context=tracking_context)
+
+
+def delivery_response(record: Dict, extra: Dict) -> Dict:
+    """JSON summary of an outbox record (without the post content)"""
+    webhook_response = record.get('response') or {}
+    return {
+        **extra,
+        'queued': record['status'] != 'delivered',
+        'delivery_id': record['idempotency_key'],
+        'delivery_status': record['status'],
+        'status_url': f"/delivery-status?key={record['idempotency_key']}",
+        'attempts': record['attempts'],
+        'last_error': record.get('last_error'),
+        'webhook_response': webhook_response,
+        'post_id': webhook_response.get('id'),
+        'post_url': webhook_response.get('link')
+    }
+
+
+def with_timeline(view):
+    """
+    Trace a request and add its span timeline to successful JSON responses
+    (the full trace is also exported when TRACE_EXPORT_PATH is set)
+    """
+    @functools.wraps(view)
+    def wrapper(*args, **kwargs):
+        with tracing.start_trace(f"{request.method} {request.path}") as trace:
+            result = view(*args, **kwargs)
+
+        response, status = result if isinstance(result, tuple) else (result, None)
+        if response.is_json and (status or response.status_code) < 400:
+            data = response.get_json()
+            if isinstance(data, dict):
+                data['trace_id'] = trace.trace_id
+                data['timeline'] = trace.timeline(min_ms=TRACE_TIMELINE_MIN_MS)
+                response.set_data(json.dumps(data))
+        return result
+    return wrapper
+
+
+def with_profile(view):
+    """
+    Profile a request when asked to with an X-Profile header or ?profile= query parameter
+    (top, prof or speedscope; any other true value means top) - only with REQUEST_PROFILING=true,
+    otherwise the switch is ignored. The report is added to JSON
+    responses as 'profile'; .prof/speedscope file paths are also sent in X-Profile-File.
+    Optional: X-Profile-Top / ?profile_top= (number of functions), ?profile_sort=tottime
+    """
+    @functools.wraps(view)
+    def wrapper(*args, **kwargs):
+        mode = parse_profile_mode(request.headers.get('X-Profile') or request.args.get('profile'))
+        if not mode or not profiling_enabled():
+            return view(*args, **kwargs)
+
+        try:
+            top_n = int(request.headers.get('X-Profile-Top') or request.args.get('profile_top') or DEFAULT_TOP_N)
+        except ValueError:
+            top_n = DEFAULT_TOP_N
+        sort = request.args.get('profile_sort', 'cumulative')
+        g.profiling = True
+        with RequestProfiler(mode, name=f"{request.method} {request.path}", top_n=top_n, sort=sort) as profiler:
+            result = view(*args, **kwargs)
+        report = profiler.report()
+
+        response, status = result if isinstance(result, tuple) else (result, None)
+        if report.get('file'):
+            response.headers['X-Profile-File'] = report['file']
+        if response.is_json:
+            data = response.get_json()
+            if isinstance(data, dict):
+                data['profile'] = report
+                response.set_data(json.dumps(data))
+        return result
+    return wrapper
+
+
+class ConversionError(Exception):
+    """A conversion step failed (the message is returned to the client)"""
+
+
+def use_engine() -> bool:
+    """
+    Run this request's conversion on the async engine
+    (profiled requests stay on the request thread so the profiler sees the work)
+    """
+    return ASYNC_ENGINE and not g.get('profiling', False)
 
-        if not converted_html:
-            return jsonify({'error': 'Conversion failed'}), 500
 
-        # Replace KCM internal links with WordPress links (if database is configured)
-        logger.info("Checking for KCM internal links to replace...")
-        url_mapping = get_url_mappings(notion_client)
+def wants_fresh_response(data: Optional[Dict]) -> bool:
+    """
+    Skip cached Claude responses for this request: Cache-Control: no-cache header or refresh
+    field (sent by the converter's Re-convert button for a new take on a converted article)
+    """
+    if 'no-cache' in request.headers.get('Cache-Control', '').lower():
+        return True
+    return bool((data or {}).get('refresh'))
+
+
+def request_deadline(data: Optional[Dict]) -> float:
+    """Deadline for this request: X-Deadline-Seconds header, deadline_seconds field or CONVERT_DEADLINE"""
+    value = request.headers.get('X-Deadline-Seconds') or (data or {}).get('deadline_seconds')
+    try:
+        return max(1.0, float(value)) if value else CONVERT_DEADLINE
+    except (TypeError, ValueError):
+        return CONVERT_DEADLINE
+
+
+def parse_kcm_tags(kcm_tags_text: str) -> Dict:
+    """KCM recommended categories/tags from the pasted tag text (empty when none were given)"""
+    kcm_taxonomy = {"categories": [], "tags": []}
+    if kcm_tags_text and kcm_tags_text.strip():
+        logger.info(f"Parsing KCM recommended tags: {kcm_tags_text[:100]}...")
+        kcm_taxonomy = parse_kcm_recommendations(kcm_tags_text)
+        logger.info(f"KCM taxonomy parsed: {kcm_taxonomy['categories']} categories, {len(kcm_taxonomy['tags'])} tags")
+    return kcm_taxonomy
+
+
+def replace_links(converted_html: str, url_mapping: Dict[str, str]) -> Tuple[str, Dict]:
+    """Replace KCM internal links with WordPress links (if database is configured)"""
+    logger.info("Checking for KCM internal links to replace...")
+    with timed('link_replacement'):
         converted_html, link_stats = replace_kcm_links(converted_html, url_mapping)
 
-        # Store link stats globally for use in send-to-wordpress endpoint
-        last_link_stats = link_stats
-
-        if link_stats['replaced'] > 0:
-            logger.info(f"✅ Replaced {link_stats['replaced']} KCM links with WordPress URLs")
-        if link_stats['not_found']:
-            logger.warning(f"⚠️  {len(link_stats['not_found'])} KCM links not yet converted:")
-            for url in link_stats['not_found']:
-                logger.warning(f"   - {url}")
-
-        # Generate SEO metadata (AI-generated)
-        ai_seo_metadata = generate_seo_metadata(original_html, converted_html)
-
-        # Merge KCM recommendations with AI suggestions
-        # FIXED: Pass the actual category/tag lists, not the whole dictionaries
-        seo_metadata = merge_taxonomy(
-            kcm_taxonomy.get('categories', []),
-            kcm_taxonomy.get('tags', []),
-            ai_seo_metadata.get('categories', []),
-            ai_seo_metadata.get('tags', [])
+    if link_stats['replaced'] > 0:
+        logger.info(f"✅ Replaced {link_stats['replaced']} KCM links with WordPress URLs")
+    if link_stats['not_found']:
+        logger.warning(f"⚠️  {len(link_stats['not_found'])} KCM links not yet converted:")
+        for url in link_stats['not_found']:
+            logger.warning(f"   - {url}")
+    return converted_html, link_stats
+
+
+def finish_conversion(original_html: str, converted_html: str, kcm_taxonomy: Dict, ai_seo_metadata: Dict,
+                      topics: List[str], relevant_pages: List[Dict], link_stats: Dict,
+                      context_budget: Optional[Dict]) -> Dict:
+    """Merge the taxonomy, extract images and build the /convert response"""
+    # Merge KCM recommendations with AI suggestions
+    # FIXED: Pass the actual category/tag lists, not the whole dictionaries
+    seo_metadata = merge_taxonomy(
+        kcm_taxonomy.get('categories', []),
+        kcm_taxonomy.get('tags', []),
+        ai_seo_metadata.get('categories', []),
+        ai_seo_metadata.get('tags', [])
+    )
+
+    unmapped = seo_metadata['unmapped']
+    if unmapped['categories'] or unmapped['tags']:
+        logger.warning(f"Suggested terms not found in WordPress: categories {unmapped['categories']}, tags {unmapped['tags']}")
+
+    # Preserve other AI-generated fields
+    seo_metadata['article_title'] = ai_seo_metadata.get('article_title', '')
+    seo_metadata['focus_keyphrase'] = ai_seo_metadata.get('focus_keyphrase', '')
+    seo_metadata['seo_title'] = ai_seo_metadata.get('seo_title', '')
+    seo_metadata['meta_description'] = ai_seo_metadata.get('meta_description', '')
+
+    # Extract images with focus keyphrase for SEO-optimized alt text
+    focus_keyphrase = seo_metadata.get('focus_keyphrase', '')
+    images = extract_images(original_html, converted_html, focus_keyphrase)
+
+    # Calculate expansion ratio
+    expansion = round(len(converted_html) / len(original_html), 2)
+
+    return {
+        'converted_html': converted_html,
+        'original_length': len(original_html),
+        'converted_length': len(converted_html),
+        'expansion': expansion,
+        'topics': topics,
+        'documents_used': [p['title'] for p in relevant_pages],
+        'seo': seo_metadata,
+        'images': images,
+        'link_replacement': link_stats,
+        'context_budget': context_budget
+    }
+
+
+def convert_article(original_html: str, kcm_taxonomy: Dict, refresh: bool = False) -> Dict:
+    """Run a conversion on the calling thread (ASYNC_ENGINE=false, profiled requests)"""
+    # Extract topics
+    topics = extract_topics_from_blog(original_html, refresh)
+
+    # Search database
+    relevant_pages = search_notion_database(topics)
+
+    if not relevant_pages:
+        raise ConversionError('No relevant context found in Notion database')
+
+    # Rewrite blog post
+    converted_html, context_budget = rewrite_blog_post(original_html, relevant_pages, topics, refresh)
+
+    if not converted_html:
+        raise ConversionError('Conversion failed')
+
+    converted_html, link_stats = replace_links(converted_html, url_mappings.get())
+
+    # Generate SEO metadata (AI-generated)
+    ai_seo_metadata = generate_seo_metadata(original_html, converted_html, refresh)
+
+    return finish_conversion(original_html, converted_html, kcm_taxonomy, ai_seo_metadata,
+                             topics, relevant_pages, link_stats, context_budget)
+
+
+async def convert_article_async(original_html: str, kcm_taxonomy: Dict, refresh: bool = False) -> Dict:
+    """
+    Run a conversion on the async engine
+
+    Independent steps overlap: the context database schema and URL mappings are fetched
+    while the topics are extracted, and the context pages are retrieved concurrently.
+    """
+    # URL mappings come from a cache that may query Notion with the sync client
+    url_mapping_task = asyncio.ensure_future(asyncio.to_thread(url_mappings.get))
+    try:
+        topics, _ = await asyncio.gather(
+            extract_topics_from_blog_async(original_html, refresh),
+            context_schema_async()
         )
+        relevant_pages = await search_notion_database_async(topics)
+        if not relevant_pages:
+            raise ConversionError('No relevant context found in Notion database')
 
-        # Preserve other AI-generated fields
-        seo_metadata['article_title'] = ai_seo_metadata.get('article_title', '')
-        seo_metadata['focus_keyphrase'] = ai_seo_metadata.get('focus_keyphrase', '')
-        seo_metadata['seo_title'] = ai_seo_metadata.get('seo_title', '')
-        seo_metadata['meta_description'] = ai_seo_metadata.get('meta_description', '')
+        converted_html, context_budget = await rewrite_blog_post_async(original_html, relevant_pages, topics, refresh)
+        if not converted_html:
+            raise ConversionError('Conversion failed')
 
-        # Extract images with focus keyphrase for SEO-optimized alt text
-        focus_keyphrase = seo_metadata.get('focus_keyphrase', '')
-        images = extract_images(original_html, converted_html, focus_keyphrase)
+        converted_html, link_stats = replace_links(converted_html, await url_mapping_task)
+    finally:
+        url_mapping_task.cancel()
 
-        # Calculate expansion ratio
-        expansion = round(len(converted_html) / len(original_html), 2)
+    ai_seo_metadata = await generate_seo_metadata_async(original_html, converted_html, refresh)
 
-        return jsonify({
-            'converted_html': converted_html,
-            'original_length': len(original_html),
-            'converted_length': len(converted_html),
-            'expansion': expansion,
-            'topics': topics,
-            'documents_used': [p['title'] for p in relevant_pages],
-            'seo': seo_metadata,
-            'images': images,
-            'link_replacement': link_stats
-        })
+    return finish_conversion(original_html, converted_html, kcm_taxonomy, ai_seo_metadata,
+                             topics, relevant_pages, link_stats, context_budget)
+
+
+@app.route('/convert', methods=['POST'])
+@with_profile
+@with_timeline
+def convert():
+    """
+    Main endpoint for blog conversion
+    The client sends the result's link_replacement back as link_stats with /send-to-wordpress or /upload-all
+    """
+    try:
+        data = request.json
+        original_html = data.get('html', '')
+        kcm_tags_text = data.get('kcm_tags', '')
+
+        if not original_html:
+            return jsonify({'error': 'No HTML provided'}), 400
+
+        logger.info(f"Received conversion request ({len(original_html)} chars)")
+
+        # Parse KCM recommended tags if provided
+        kcm_taxonomy = parse_kcm_tags(kcm_tags_text)
+
+        refresh = wants_fresh_response(data)
+        if refresh:
+            logger.info("Re-convert requested - skipping cached Claude responses")
 
+        if use_engine():
+            result = engine.run(convert_article_async, original_html, kcm_taxonomy, refresh,
+                                timeout=request_deadline(data))
+        else:
+            result = convert_article(original_html, kcm_taxonomy, refresh)
+
+        return jsonify(result)
+
+    except DeadlineExceeded as e:
+        logger.error(f"Conversion cancelled: {e}")
+        return jsonify({'error': str(e)}), 504
     except Exception as e:
         logger.error(f"Conversion error: {e}")
         return jsonify({'error': str(e)}), 500
 
 
+def upload_images(images: List[Dict], data: Optional[Dict]) -> Tuple[List[Dict], List[Dict]]:
+    """Download the images and upload them to WordPress (concurrently on the async engine)"""
+    if use_engine():
+        return engine.run(process_images_async, images, timeout=request_deadline(data))
+    return process_images_sync(images)
+
+
+def apply_uploaded_images(converted_html: str, processed_images: List[Dict]) -> str:
+    """Point image URLs at their WordPress copies and drop the first image (it becomes the featured image)"""
+    # Update image URLs in HTML
+    image_url_mapping = {img['original_url']: img['wordpress_url'] for img in processed_images}
+    logger.info(f"  Updating {len(image_url_mapping)} image URLs in HTML")
+    converted_html = convert_image_urls(converted_html, image_url_mapping)
+
+    # Remove first image from post content (it's the featured image)
+    first_img_pattern = r'<img\s+[^>]*?src=["\'][^"\']+["\'][^>]*?>'
+    match = re.search(first_img_pattern, converted_html, re.IGNORECASE)
+    if match:
+        # Also remove surrounding <br> tags if present (only around the featured image itself)
+        img_with_breaks = re.sub(
+            r'<br\s*/?>\s*' + re.escape(match.group(0)) + r'\s*<br\s*/?>',
+            '',
+            converted_html,
+            count=1,
+            flags=re.IGNORECASE
+        )
+        if img_with_breaks != converted_html:
+            converted_html = img_with_breaks
+            logger.info("  Removed first image (featured) and surrounding <br> tags from content")
+        else:
+            converted_html = converted_html.replace(match.group(0), '', 1)
+            logger.info("  Removed first image (featured) from content")
+    return converted_html
+
+
 @app.route('/send-to-wordpress', methods=['POST'])
+@with_profile
 def send_to_wordpress():
-    """Send converted blog post to WordPress via n8n webhook"""
-    global last_webhook_payload, uploaded_images, last_link_stats
-
+    """
+    Send converted blog post to WordPress via n8n webhook
+    uploaded_images: the images /process-images returned for this post (their WordPress URLs replace the originals)
+    """
     try:
         data = request.json
         converted_html = data.get('converted_html', '')
         seo_metadata = data.get('seo_metadata', {})
         featured_image_id = data.get('featured_image_id', None)
+        uploaded_images = data.get('uploaded_images') or []
 
         if not converted_html:
             return jsonify({'error': 'No HTML provided'}), 400
@@ -1041,229 +2466,87 @@ def send_to_wordpress():
                 'uploaded_count': 0
             }), 400
 
-        # Use featured image from uploaded images if not provided and images were uploaded
-        if not featured_image_id and uploaded_images:
-            featured_image_id = uploaded_images[0]['wordpress_id']
-            logger.info(f"Using first uploaded image as featured image: ID {featured_image_id}")
-
-        # Update image URLs in HTML if images were uploaded
-        if uploaded_images:
-            # Create mapping of original URLs to WordPress URLs
-            image_url_mapping = {img['original_url']: img['wordpress_url'] for img in uploaded_images}
-            logger.info(f"Updating {len(image_url_mapping)} image URLs in HTML with WordPress URLs")
-            converted_html = convert_image_urls(converted_html, image_url_mapping)
-
-            # Remove first image from post content (it's the featured image)
-            # Match first <img> tag (including any attributes before/after src)
-            first_img_pattern = r'<img\s+[^>]*?src=["\'][^"\']+["\'][^>]*?>'
-            match = re.search(first_img_pattern, converted_html, re.IGNORECASE)
-            if match:
-                # Also remove surrounding <br> tags if present
-                img_with_breaks = re.sub(
-                    r'<br\s*/?>\s*' + re.escape(match.group(0)) + r'\s*<br\s*/?>',
-                    '',
-                    converted_html,
-                    count=1,
-                    flags=re.IGNORECASE
-                )
-                if img_with_breaks != converted_html:
-                    converted_html = img_with_breaks
-                    logger.info("Removed first image (with surrounding breaks) from post content - it's the featured image")
-                else:
-                    # No breaks found, just remove the image
-                    converted_html = converted_html.replace(match.group(0), '', 1)
-                    logger.info("Removed first image from post content - it's the featured image")
-
-        # Extract fields from seo_metadata for webhook payload
-        title = seo_metadata.get('article_title', 'Untitled')
-        categories = seo_metadata.get('categories', [])
-        tags = seo_metadata.get('tags', [])
-
-        # Build Yoast SEO meta (including focus keyphrase)
-        yoast_meta = {
-            'yoast_wpseo_focuskw': seo_metadata.get('focus_keyphrase', ''),
-            'yoast_wpseo_title': seo_metadata.get('seo_title', ''),
-            'yoast_wpseo_metadesc': seo_metadata.get('meta_description', '')
-        }
-
-        logger.info(f"Yoast SEO metadata: Focus Keyphrase = '{yoast_meta['yoast_wpseo_focuskw']}'")
-        logger.info(f"Yoast SEO metadata: SEO Title = '{yoast_meta['yoast_wpseo_title']}'")
-        logger.info(f"Yoast SEO metadata: Meta Description = '{yoast_meta['yoast_wpseo_metadesc'][:80]}...'")
-
-        # Log what we're about to send
-        logger.info(f"Categories to send: {categories}")
-        logger.info(f"Tags to send: {tags}")
-        logger.info(f"Featured Media ID: {featured_image_id}")
-
-        # Build n8n webhook payload with properly structured parameters
-        payload = build_webhook_payload(
-            title=title,
-            content=converted_html,
-            excerpt='',  # Empty excerpt for now
-            categories=categories,
-            tags=tags,
-            featured_media_id=featured_image_id,
-            yoast_meta=yoast_meta
-        )
-
-        # CRITICAL: n8n workflow expects payload wrapped in 'body' key
-        # n8n accesses data as: $('Webhook').item.json.body.body.tags
-        # So we send: {'body': payload} which becomes body.body.tags in n8n
-        wrapped_payload = {'body': payload}
-
-        # Log the actual payload structure (without the huge content field)
-        payload_debug = {k: v for k, v in payload.items() if k != 'content'}
-        payload_debug['content'] = f"<{len(payload.get('content', ''))} chars>"
-        logger.info(f"Webhook payload (inner): {json.dumps(payload_debug, indent=2)}")
-        logger.info(f"Title: {payload.get('title', 'NOT SET')}")
-        logger.info(f"Slug: {payload.get('slug', 'NOT SET')}")
-        logger.info(f"Categories (IDs): {payload.get('categories', [])}")
-        logger.info(f"Tags (IDs): {payload.get('tags', [])}")
-
-        # CRITICAL v2.1: Yoast fields sent in n8n-compatible format
-        logger.info(f"🔍 YOAST FIELDS (v2.1 - N8N FORMAT):")
-        logger.info(f"  - yoast_focus_keyword: {payload.get('yoast_focus_keyword', 'NOT SET')}")
-        logger.info(f"  - yoast_seo_title: {payload.get('yoast_seo_title', 'NOT SET')}")
-        logger.info(f"  - yoast_meta_description: {payload.get('yoast_meta_description', 'NOT SET')[:80]}...")
-
-        # CRITICAL: Log what we're actually sending to N8N
-        logger.info(f"🔍 PAYLOAD INSPECTION:")
-        logger.info(f"  - featured_media in payload: {('featured_media' in payload)}")
-        logger.info(f"  - featured_media value: {payload.get('featured_media', 'NOT SET')}")
-
-        # Store payload for potential retry
-        last_webhook_payload = wrapped_payload
-
-        logger.info(f"Sending to n8n webhook: {len(converted_html)} chars")
-
-        # Send to n8n webhook (production)
-        webhook_url = "https://n8n.srv1007195.hstgr.cloud/webhook/wordpress-publish"
-
-        response = requests.post(
-            webhook_url,
-            json=wrapped_payload,  # Send wrapped payload
-            headers={'Content-Type': 'application/json'},
-            timeout=30
-        )
+        def publish() -> Dict:
+            nonlocal converted_html, featured_image_id
 
-        if response.status_code == 200:
-            logger.info("✅ Successfully sent to WordPress")
+            # Use featured image from uploaded images if not provided and images were uploaded
+            if not featured_image_id and uploaded_images:
+                featured_image_id = uploaded_images[0]['wordpress_id']
+                logger.info(f"Using first uploaded image as featured image: ID {featured_image_id}")
 
-            # Get webhook response (needed regardless of Notion tracking)
-            # n8n may return an array or object - handle both
-            webhook_response_raw = response.json() if response.text else {}
+            # Update image URLs in HTML if images were uploaded
+            if uploaded_images:
+                converted_html = apply_uploaded_images(converted_html, uploaded_images)
 
-            # Log the RAW response from N8N/WordPress for debugging
-            logger.info(f"N8N/WordPress RAW response type: {type(webhook_response_raw).__name__}")
-            logger.info(f"N8N/WordPress RAW response: {json.dumps(webhook_response_raw, indent=2)[:500]}...")
+            # Extract fields from seo_metadata for webhook payload
+            title = seo_metadata.get('article_title', 'Untitled')
+            categories = seo_metadata.get('categories', [])
+            tags = seo_metadata.get('tags', [])
 
-            if isinstance(webhook_response_raw, list) and len(webhook_response_raw) > 0:
-                webhook_response = webhook_response_raw[0]  # Extract first item from array
-            elif isinstance(webhook_response_raw, dict):
-                webhook_response = webhook_response_raw
-            else:
-                webhook_response = {}
-
-            # Log what WordPress actually returned for critical fields
-            logger.info(f"WordPress Response - Post ID: {webhook_response.get('id', 'NOT SET')}")
-            logger.info(f"WordPress Response - Post URL: {webhook_response.get('link', 'NOT SET')}")
-            logger.info(f"WordPress Response - Featured Media: {webhook_response.get('featured_media', 'NOT SET')}")
-
-            # v2.0: Check TOP-LEVEL Yoast fields (register_rest_field creates top-level fields)
-            logger.info(f"WordPress Response - Yoast Fields (v2.0 - TOP-LEVEL):")
-            for field in ['_yoast_wpseo_focuskw', '_yoast_wpseo_title', '_yoast_wpseo_metadesc']:
-                value = webhook_response.get(field, '')
-                if value:
-                    logger.info(f"  ✅ {field}: '{value[:80]}...'")
-                else:
-                    logger.error(f"  ❌ {field}: EMPTY or NOT SET")
-
-            # Try to add conversion record to Notion (optional feature)
-            try:
-                kcm_url = data.get('kcm_url', '')  # Original KCM URL from frontend
-
-                # WordPress REST API returns 'id' and 'link', not 'post_id' and 'post_url'
-                wordpress_post_id = webhook_response.get('id', 0)
-                wordpress_url = webhook_response.get('link', '')
-
-                logger.info(f"Notion tracking data - KCM URL: {kcm_url}, WP Post ID: {wordpress_post_id}, WP URL: {wordpress_url}")
-
-                if kcm_url and wordpress_post_id and wordpress_url:
-                    # Extract slugs from URLs
-                    # KCM slug: just the article slug (last segment of path)
-                    # Example: https://simplifyingthemarket.com/en/2025/09/24/how-to-buy-a-home/ → "how-to-buy-a-home"
-                    kcm_path = urlparse(kcm_url).path.rstrip('/') if kcm_url else ''
-                    kcm_slug = kcm_path.split('/')[-1] if kcm_path else ''
-
-                    # WordPress slug: same extraction method
-                    wordpress_path = urlparse(wordpress_url).path.rstrip('/') if wordpress_url else ''
-                    wordpress_slug = wordpress_path.split('/')[-1] if wordpress_path else ''
-
-                    logger.info(f"Notion tracking - KCM slug: '{kcm_slug}', WP slug: '{wordpress_slug}'")
-
-                    # Use stored link stats from conversion (links have already been replaced)
-                    # Total internal links = replaced + not_found
-                    internal_links_count = 0
-                    if last_link_stats:
-                        internal_links_count = last_link_stats.get('replaced', 0) + len(last_link_stats.get('not_found', []))
-                        logger.info(f"Internal links count: {internal_links_count} ({last_link_stats.get('replaced', 0)} replaced, {len(last_link_stats.get('not_found', []))} not found)")
-                    else:
-                        logger.warning("No link stats available - internal links count will be 0")
-
-                    # Ensure categories and tags are lists of strings (not IDs)
-                    # They should already be lists of category/tag names from seo_metadata
-                    category_list = categories if isinstance(categories, list) else []
-                    tag_list = tags if isinstance(tags, list) else []
-
-                    logger.info(f"Notion tracking - Categories: {category_list}, Tags: {tag_list}")
-
-                    # Add to Notion conversion tracking database
-                    notion_page_id = add_conversion_record(
-                        notion_client=notion_client,
-                        kcm_url=kcm_url,
-                        kcm_slug=kcm_slug,
-                        wordpress_url=wordpress_url,
-                        wordpress_slug=wordpress_slug,
-                        wordpress_post_id=wordpress_post_id,
-                        article_title=title,
-                        focus_keyphrase=seo_metadata.get('focus_keyphrase', ''),
-                        categories=category_list,
-                        tags=tag_list,
-                        seo_title=seo_metadata.get('seo_title', ''),
-                        meta_description=seo_metadata.get('meta_description', ''),
-                        internal_links_count=internal_links_count,
-                        status='Published'
-                    )
-
-                    if notion_page_id:
-                        logger.info(f"✅ Conversion tracked in Notion (Page ID: {notion_page_id})")
-                else:
-                    logger.warning("⚠️  Missing KCM URL or WordPress details - skipping Notion tracking")
+            # Build Yoast SEO meta (including focus keyphrase)
+            yoast_meta = {
+                'yoast_wpseo_focuskw': seo_metadata.get('focus_keyphrase', ''),
+                'yoast_wpseo_title': seo_metadata.get('seo_title', ''),
+                'yoast_wpseo_metadesc': seo_metadata.get('meta_description', '')
+            }
 
-            except Exception as notion_error:
-                # Don't fail the whole request if Notion tracking fails
-                logger.error(f"Failed to add conversion record to Notion (non-critical): {notion_error}")
+            logger.info(f"Yoast SEO metadata: Focus Keyphrase = '{yoast_meta['yoast_wpseo_focuskw']}'")
+            logger.info(f"Yoast SEO metadata: SEO Title = '{yoast_meta['yoast_wpseo_title']}'")
+            logger.info(f"Yoast SEO metadata: Meta Description = '{yoast_meta['yoast_wpseo_metadesc'][:80]}...'")
+
+            # Log what we're about to send
+            logger.info(f"Categories to send: {categories}")
+            logger.info(f"Tags to send: {tags}")
+            logger.info(f"Featured Media ID: {featured_image_id}")
+
+            # Build n8n webhook payload with properly structured parameters
+            payload = build_webhook_payload(
+                title=title,
+                content=converted_html,
+                excerpt='',  # Empty excerpt for now
+                categories=categories,
+                tags=tags,
+                featured_media_id=featured_image_id,
+                yoast_meta=yoast_meta
+            )
 
-            return jsonify({
+            # CRITICAL: n8n workflow expects payload wrapped in 'body' key
+            # n8n accesses data as: $('Webhook').item.json.body.body.tags
+            # So we send: {'body': payload} which becomes body.body.tags in n8n
+            wrapped_payload = {'body': payload}
+
+            # Log the actual payload structure (without the huge content field)
+            payload_debug = {k: v for k, v in payload.items() if k != 'content'}
+            payload_debug['content'] = f"<{len(payload.get('content', ''))} chars>"
+            logger.info(f"Webhook payload (inner): {json.dumps(payload_debug, indent=2)}")
+            logger.info(f"Title: {payload.get('title', 'NOT SET')}")
+            logger.info(f"Slug: {payload.get('slug', 'NOT SET')}")
+            logger.info(f"Categories (IDs): {payload.get('categories', [])}")
+            logger.info(f"Tags (IDs): {payload.get('tags', [])}")
+
+            # CRITICAL v2.1: Yoast fields sent in n8n-compatible format
+            logger.info(f"🔍 YOAST FIELDS (v2.1 - N8N FORMAT):")
+            logger.info(f"  - yoast_focus_keyword: {payload.get('yoast_focus_keyword', 'NOT SET')}")
+            logger.info(f"  - yoast_seo_title: {payload.get('yoast_seo_title', 'NOT SET')}")
+            logger.info(f"  - yoast_meta_description: {payload.get('yoast_meta_description', 'NOT SET')[:80]}...")
+
+            # CRITICAL: Log what we're actually sending to N8N
+            logger.info(f"🔍 PAYLOAD INSPECTION:")
+            logger.info(f"  - featured_media in payload: {('featured_media' in payload)}")
+            logger.info(f"  - featured_media value: {payload.get('featured_media', 'NOT SET')}")
+
+            # Queue for delivery - the outbox sender posts it to n8n and tracks it in Notion
+            tracking_context = build_tracking_context(data, title, categories, tags, seo_metadata)
+            record = queue_webhook(wrapped_payload, tracking_context)
+
+            logger.info(f"Queued for n8n webhook: {len(converted_html)} chars")
+
+            return delivery_response(record, {
                 'success': True,
-                'message': 'Blog post sent to WordPress (draft created)',
-                'webhook_response': webhook_response
+                'message': 'Blog post queued for WordPress (draft will be created shortly)'
             })
-        else:
-            logger.error(f"Webhook failed: {response.status_code} - {response.text}")
-            return jsonify({
-                'success': False,
-                'error': f'Webhook returned status {response.status_code}',
-                'details': response.text
-            }), response.status_code
 
-    except requests.exceptions.Timeout:
-        logger.error("Webhook timeout")
-        return jsonify({'error': 'Webhook request timed out'}), 504
-
-    except requests.exceptions.RequestException as e:
-        logger.error(f"Webhook request error: {e}")
-        return jsonify({'error': f'Failed to connect to webhook: {str(e)}'}), 500
+        return jsonify(guarded_publish(data, converted_html, publish)), 202
 
     except Exception as e:
         logger.error(f"Error sending to WordPress: {e}")
@@ -1271,10 +2554,12 @@ def send_to_wordpress():
 
 
 @app.route('/process-images', methods=['POST'])
+@with_profile
 def process_images():
-    """Download images from KCM and upload to WordPress"""
-    global uploaded_images
-
+    """
+    Download images from KCM and upload to WordPress
+    The client sends the returned images back as uploaded_images with /send-to-wordpress
+    """
     try:
         data = request.json
         images = data.get('images', [])
@@ -1289,44 +2574,7 @@ def process_images():
 
         logger.info(f"Processing {len(images)} images...")
 
-        processed_images = []
-        failed_images = []
-
-        for img in images:
-            original_url = img.get('original_url')
-            suggested_filename = img.get('suggested_filename')
-            alt_text = img.get('alt_text', '')
-
-            logger.info(f"Processing image: {original_url}")
-
-            # Download image
-            image_data = download_image(original_url)
-            if not image_data:
-                failed_images.append({
-                    'original_url': original_url,
-                    'error': 'Failed to download'
-                })
-                continue
-
-            # Upload to WordPress
-            wp_result = upload_image_to_wordpress(image_data, suggested_filename, alt_text)
-            if not wp_result:
-                failed_images.append({
-                    'original_url': original_url,
-                    'error': 'Failed to upload to WordPress'
-                })
-                continue
-
-            processed_images.append({
-                'original_url': original_url,
-                'wordpress_id': wp_result['id'],
-                'wordpress_url': wp_result['url'],
-                'filename': wp_result['filename'],
-                'alt_text': wp_result['alt_text']
-            })
-
-        # Store for webhook use
-        uploaded_images = processed_images
+        processed_images, failed_images = upload_images(images, data)
 
         logger.info(f"✅ Processed {len(processed_images)} images successfully, {len(failed_images)} failed")
 
@@ -1339,6 +2587,9 @@ def process_images():
             'featured_image_id': processed_images[0]['wordpress_id'] if processed_images else None
         })
 
+    except DeadlineExceeded as e:
+        logger.error(f"Image processing cancelled: {e}")
+        return jsonify({'error': str(e)}), 504
     except Exception as e:
         logger.error(f"Error processing images: {e}")
         return jsonify({'error': str(e)}), 500
@@ -1346,61 +2597,69 @@ def process_images():
 
 @app.route('/retry-webhook', methods=['POST'])
 def retry_webhook():
-    """Retry sending the last webhook payload to WordPress"""
-    global last_webhook_payload
-
+    """
+    Retry a queued webhook delivery to WordPress
+    delivery_id: the delivery to retry (from the send response); kcm_url: the post's latest delivery otherwise
+    """
     try:
-        if not last_webhook_payload:
+        data = request.get_json(silent=True) or {}
+        record = None
+        if data.get('delivery_id'):
+            record = outbox.get(data['delivery_id'])
+        elif data.get('kcm_url'):
+            deliveries = outbox.find_by_post(data['kcm_url'])
+            record = deliveries[0] if deliveries else None
+        if not record:
             return jsonify({
                 'success': False,
                 'error': 'No webhook payload available. Please run "Convert to South Jersey" first.'
             }), 400
 
-        logger.info("Retrying webhook with stored payload...")
-
-        # Send to n8n webhook (production)
-        webhook_url = "https://n8n.srv1007195.hstgr.cloud/webhook/wordpress-publish"
-
-        response = requests.post(
-            webhook_url,
-            json=last_webhook_payload,
-            headers={'Content-Type': 'application/json'},
-            timeout=30
-        )
-
-        if response.status_code == 200:
-            logger.info("✅ Successfully retried webhook to WordPress")
-            return jsonify({
+        if record['status'] == 'delivered':
+            logger.info("Last webhook was already delivered - not sending a duplicate")
+            return jsonify(delivery_response(record, {
                 'success': True,
-                'message': 'Blog post sent to WordPress (draft created)',
-                'webhook_response': response.json() if response.text else {}
-            })
-        else:
-            logger.error(f"Webhook retry failed: {response.status_code} - {response.text}")
-            return jsonify({
-                'success': False,
-                'error': f'Webhook returned status {response.status_code}',
-                'details': response.text
-            }), response.status_code
+                'message': 'Blog post already sent to WordPress (draft created)'
+            }))
 
-    except requests.exceptions.Timeout:
-        logger.error("Webhook retry timeout")
-        return jsonify({'error': 'Webhook request timed out'}), 504
+        logger.info("Retrying webhook delivery from the outbox...")
+        record = outbox.retry(record['idempotency_key'])
 
-    except requests.exceptions.RequestException as e:
-        logger.error(f"Webhook retry request error: {e}")
-        return jsonify({'error': f'Failed to connect to webhook: {str(e)}'}), 500
+        return jsonify(delivery_response(record, {
+            'success': True,
+            'message': 'Blog post re-queued for WordPress (draft will be created shortly)'
+        })), 202
 
     except Exception as e:
         logger.error(f"Error retrying webhook: {e}")
         return jsonify({'error': str(e)}), 500
 
 
+@app.route('/delivery-status', methods=['GET'])
+def delivery_status():
+    """Webhook delivery status by idempotency key (?key=) or by post (?kcm_url=)"""
+    key = request.args.get('key', '')
+    kcm_url = request.args.get('kcm_url', '')
+
+    if key:
+        record = outbox.get(key)
+        records = [record] if record else []
+    elif kcm_url:
+        records = outbox.find_by_post(kcm_url)
+    else:
+        return jsonify({'error': 'Provide key or kcm_url'}), 400
+
+    if not records:
+        return jsonify({'error': 'No deliveries found'}), 404
+
+    return jsonify({'deliveries': [delivery_response(r, {}) for r in records]})
+
+
 @app.route('/upload-all', methods=['POST'])
+@with_profile
+@with_timeline
 def upload_all():
     """ONE-CLICK: Upload images AND send blog post to WordPress in a single operation"""
-    global uploaded_images, last_webhook_payload, last_link_stats
-
     try:
         data = request.json
         images = data.get('images', [])
@@ -1417,234 +2676,84 @@ def upload_all():
         logger.info("ONE-CLICK UPLOAD: Starting combined image + WordPress upload")
         logger.info("=" * 70)
 
-        # STEP 1: Upload images to WordPress (if any)
-        featured_image_id = None
-        if images:
-            logger.info(f"STEP 1/2: Processing {len(images)} images...")
+        if images and (not WORDPRESS_APP_PASSWORD or WORDPRESS_APP_PASSWORD == 'your_wordpress_app_password_here'):
+            return jsonify({
+                'error': 'WordPress credentials not configured. Please set WORDPRESS_APP_PASSWORD in .env file.'
+            }), 400
 
-            if not WORDPRESS_APP_PASSWORD or WORDPRESS_APP_PASSWORD == 'your_wordpress_app_password_here':
-                return jsonify({
-                    'error': 'WordPress credentials not configured. Please set WORDPRESS_APP_PASSWORD in .env file.'
-                }), 400
+        def publish() -> Dict:
+            nonlocal converted_html
 
+            # STEP 1: Upload images to WordPress (if any)
+            featured_image_id = None
             processed_images = []
-            failed_images = []
-
-            for img in images:
-                original_url = img.get('original_url')
-                suggested_filename = img.get('suggested_filename')
-                alt_text = img.get('alt_text', '')
-
-                logger.info(f"  Processing image: {original_url}")
-
-                # Download image
-                image_data = download_image(original_url)
-                if not image_data:
-                    failed_images.append({
-                        'original_url': original_url,
-                        'error': 'Failed to download'
-                    })
-                    continue
-
-                # Upload to WordPress
-                wp_result = upload_image_to_wordpress(image_data, suggested_filename, alt_text)
-                if not wp_result:
-                    failed_images.append({
-                        'original_url': original_url,
-                        'error': 'Failed to upload to WordPress'
-                    })
-                    continue
-
-                processed_images.append({
-                    'original_url': original_url,
-                    'wordpress_id': wp_result['id'],
-                    'wordpress_url': wp_result['url'],
-                    'filename': wp_result['filename'],
-                    'alt_text': wp_result['alt_text']
-                })
-
-            # Store for webhook use
-            uploaded_images = processed_images
-
-            if processed_images:
-                featured_image_id = processed_images[0]['wordpress_id']
-                logger.info(f"✅ Uploaded {len(processed_images)} images, using first as featured image: ID {featured_image_id}")
-
-                # Update image URLs in HTML
-                image_url_mapping = {img['original_url']: img['wordpress_url'] for img in processed_images}
-                logger.info(f"  Updating {len(image_url_mapping)} image URLs in HTML")
-                converted_html = convert_image_urls(converted_html, image_url_mapping)
-
-                # Remove first image from post content (it's the featured image)
-                first_img_pattern = r'<img\s+[^>]*?src=["\'][^"\']+["\'][^>]*?>'
-                match = re.search(first_img_pattern, converted_html, re.IGNORECASE)
-                if match:
-                    img_with_breaks = re.sub(
-                        r'<br\s*/?>\s*' + re.escape(match.group(0)) + r'\s*<br\s*/?>',
-                        '',
-                        converted_html,
-                        flags=re.IGNORECASE
-                    )
-                    if img_with_breaks != converted_html:
-                        converted_html = img_with_breaks
-                        logger.info("  Removed first image (featured) and surrounding <br> tags from content")
-                    else:
-                        converted_html = converted_html.replace(match.group(0), '', 1)
-                        logger.info("  Removed first image (featured) from content")
-
-            if failed_images:
-                logger.warning(f"⚠️  {len(failed_images)} images failed to upload")
-        else:
-            logger.info("STEP 1/2: No images to process, skipping image upload")
+            if images:
+                logger.info(f"STEP 1/2: Processing {len(images)} images...")
 
-        # STEP 2: Send to WordPress via n8n
-        logger.info("STEP 2/2: Sending post to WordPress...")
+                processed_images, failed_images = upload_images(images, data)
 
-        # Get title from SEO metadata
-        title = seo_metadata.get('seo_title', seo_metadata.get('title', 'Untitled'))
+                if processed_images:
+                    featured_image_id = processed_images[0]['wordpress_id']
+                    logger.info(f"✅ Uploaded {len(processed_images)} images, using first as featured image: ID {featured_image_id}")
+                    converted_html = apply_uploaded_images(converted_html, processed_images)
 
-        # Get categories and tags
-        categories = seo_metadata.get('categories', [])
-        tags = seo_metadata.get('tags', [])
+                if failed_images:
+                    logger.warning(f"⚠️  {len(failed_images)} images failed to upload")
+            else:
+                logger.info("STEP 1/2: No images to process, skipping image upload")
 
-        # Build Yoast SEO meta
-        yoast_meta = {
-            'yoast_wpseo_focuskw': seo_metadata.get('focus_keyphrase', ''),
-            'yoast_wpseo_title': seo_metadata.get('seo_title', ''),
-            'yoast_wpseo_metadesc': seo_metadata.get('meta_description', '')
-        }
+            # STEP 2: Send to WordPress via n8n
+            logger.info("STEP 2/2: Sending post to WordPress...")
 
-        # Build n8n webhook payload (imported at top of file)
-        payload = build_webhook_payload(
-            title=title,
-            content=converted_html,
-            excerpt='',
-            categories=categories,
-            tags=tags,
-            featured_media_id=featured_image_id,
-            yoast_meta=yoast_meta
-        )
+            # Get title from SEO metadata
+            title = seo_metadata.get('seo_title', seo_metadata.get('title', 'Untitled'))
 
-        # Wrap payload for n8n
-        wrapped_payload = {'body': payload}
-        last_webhook_payload = wrapped_payload
+            # Get categories and tags
+            categories = seo_metadata.get('categories', [])
+            tags = seo_metadata.get('tags', [])
 
-        # Send to n8n webhook
-        webhook_url = "https://n8n.srv1007195.hstgr.cloud/webhook/wordpress-publish"
+            # Build Yoast SEO meta
+            yoast_meta = {
+                'yoast_wpseo_focuskw': seo_metadata.get('focus_keyphrase', ''),
+                'yoast_wpseo_title': seo_metadata.get('seo_title', ''),
+                'yoast_wpseo_metadesc': seo_metadata.get('meta_description', '')
+            }
 
-        response = requests.post(
-            webhook_url,
-            json=wrapped_payload,
-            headers={'Content-Type': 'application/json'},
-            timeout=30
-        )
+            # Build n8n webhook payload (imported at top of file)
+            payload = build_webhook_payload(
+                title=title,
+                content=converted_html,
+                excerpt='',
+                categories=categories,
+                tags=tags,
+                featured_media_id=featured_image_id,
+                yoast_meta=yoast_meta
+            )
 
-        if response.status_code == 200:
-            webhook_response_raw = response.json() if response.text else {}
+            # Wrap payload for n8n
+            wrapped_payload = {'body': payload}
 
-            if isinstance(webhook_response_raw, list) and len(webhook_response_raw) > 0:
-                webhook_response = webhook_response_raw[0]
-            elif isinstance(webhook_response_raw, dict):
-                webhook_response = webhook_response_raw
-            else:
-                webhook_response = {}
+            # Queue for delivery - the outbox sender posts it to n8n and tracks it in Notion
+            tracking_context = build_tracking_context(data, title, categories, tags, seo_metadata)
+            record = queue_webhook(wrapped_payload, tracking_context)
 
             logger.info("=" * 70)
-            logger.info("✅ ONE-CLICK UPLOAD COMPLETE!")
-            logger.info(f"   WordPress Post ID: {webhook_response.get('id', 'NOT SET')}")
-            logger.info(f"   Post URL: {webhook_response.get('link', 'NOT SET')}")
-            logger.info(f"   Featured Image: {webhook_response.get('featured_media', 'NOT SET')}")
+            logger.info("✅ ONE-CLICK UPLOAD QUEUED!")
+            logger.info(f"   Images uploaded: {len(processed_images)}")
+            logger.info(f"   Featured Image: {featured_image_id}")
             logger.info("=" * 70)
 
-            # Try to add conversion record to Notion (optional feature)
-            try:
-                kcm_url = data.get('kcm_url', '')  # Original KCM URL from frontend
-
-                # WordPress REST API returns 'id' and 'link', not 'post_id' and 'post_url'
-                wordpress_post_id = webhook_response.get('id', 0)
-                wordpress_url = webhook_response.get('link', '')
-
-                logger.info(f"Notion tracking data - KCM URL: {kcm_url}, WP Post ID: {wordpress_post_id}, WP URL: {wordpress_url}")
-
-                if kcm_url and wordpress_post_id and wordpress_url:
-                    # Extract slugs from URLs
-                    # KCM slug: just the article slug (last segment of path)
-                    # Example: https://simplifyingthemarket.com/en/2025/09/24/how-to-buy-a-home/ → "how-to-buy-a-home"
-                    kcm_path = urlparse(kcm_url).path.rstrip('/') if kcm_url else ''
-                    kcm_slug = kcm_path.split('/')[-1] if kcm_path else ''
-
-                    # WordPress slug: same extraction method
-                    wordpress_path = urlparse(wordpress_url).path.rstrip('/') if wordpress_url else ''
-                    wordpress_slug = wordpress_path.split('/')[-1] if wordpress_path else ''
-
-                    logger.info(f"Notion tracking - KCM slug: '{kcm_slug}', WP slug: '{wordpress_slug}'")
-
-                    # Use stored link stats from conversion (links have already been replaced)
-                    # Total internal links = replaced + not_found
-                    internal_links_count = 0
-                    if last_link_stats:
-                        internal_links_count = last_link_stats.get('replaced', 0) + len(last_link_stats.get('not_found', []))
-                        logger.info(f"Internal links count: {internal_links_count} ({last_link_stats.get('replaced', 0)} replaced, {len(last_link_stats.get('not_found', []))} not found)")
-                    else:
-                        logger.warning("No link stats available - internal links count will be 0")
-
-                    # Ensure categories and tags are lists of strings (not IDs)
-                    # They should already be lists of category/tag names from seo_metadata
-                    category_list = categories if isinstance(categories, list) else []
-                    tag_list = tags if isinstance(tags, list) else []
-
-                    logger.info(f"Notion tracking - Categories: {category_list}, Tags: {tag_list}")
-
-                    # Add to Notion conversion tracking database
-                    notion_page_id = add_conversion_record(
-                        notion_client=notion_client,
-                        kcm_url=kcm_url,
-                        kcm_slug=kcm_slug,
-                        wordpress_url=wordpress_url,
-                        wordpress_slug=wordpress_slug,
-                        wordpress_post_id=wordpress_post_id,
-                        article_title=title,
-                        focus_keyphrase=seo_metadata.get('focus_keyphrase', ''),
-                        categories=category_list,
-                        tags=tag_list,
-                        seo_title=seo_metadata.get('seo_title', ''),
-                        meta_description=seo_metadata.get('meta_description', ''),
-                        internal_links_count=internal_links_count,
-                        status='Published'
-                    )
-
-                    if notion_page_id:
-                        logger.info(f"✅ Conversion tracked in Notion (Page ID: {notion_page_id})")
-                else:
-                    logger.warning("⚠️  Missing KCM URL or WordPress details - skipping Notion tracking")
-
-            except Exception as notion_error:
-                # Don't fail the whole request if Notion tracking fails
-                logger.error(f"Failed to add conversion record to Notion (non-critical): {notion_error}")
-
-            return jsonify({
+            return delivery_response(record, {
                 'success': True,
-                'wordpress_response': webhook_response,
-                'images_processed': len(uploaded_images) if uploaded_images else 0,
-                'post_id': webhook_response.get('id'),
-                'post_url': webhook_response.get('link'),
-                'featured_image_id': webhook_response.get('featured_media')
+                'images_processed': len(processed_images),
+                'featured_image_id': featured_image_id
             })
-        else:
-            logger.error(f"WordPress webhook returned status {response.status_code}")
-            return jsonify({
-                'error': f'WordPress webhook returned status {response.status_code}',
-                'details': response.text
-            }), response.status_code
 
-    except requests.exceptions.Timeout:
-        logger.error("One-click upload timeout")
-        return jsonify({'error': 'WordPress request timed out'}), 504
-
-    except requests.exceptions.RequestException as e:
-        logger.error(f"One-click upload request error: {e}")
-        return jsonify({'error': f'Failed to connect to WordPress: {str(e)}'}), 500
+        return jsonify(guarded_publish(data, converted_html, publish)), 202
 
+    except DeadlineExceeded as e:
+        logger.error(f"One-click upload cancelled: {e}")
+        return jsonify({'error': str(e)}), 504
     except Exception as e:
         logger.error(f"Error in one-click upload: {e}")
         return jsonify({'error': str(e)}), 500
@@ -1653,18 +2762,164 @@ def upload_all():
 @app.route('/health', methods=['GET'])
 def health():
     """Health check endpoint"""
+    cassette = active_cassette()
     return jsonify({
         'status': 'ok',
+        'cassette': cassette.stats() if cassette else None,
         'notion_connected': bool(notion_client),
         'claude_connected': bool(claude_client),
         'wordpress_configured': bool(WORDPRESS_APP_PASSWORD and WORDPRESS_APP_PASSWORD != 'your_wordpress_app_password_here'),
         'wordpress_site': WORDPRESS_SITE_URL,
-        'wordpress_username': WORDPRESS_USERNAME
+        'wordpress_username': WORDPRESS_USERNAME,
+        'webhook_outbox': outbox.stats(),
+        'publish_guard': publish_guard.stats(),
+        'tracking_queue': tracking_queue.stats(),
+        'lifecycle': lifecycle.status(),
+        'async_engine': engine.stats() if ASYNC_ENGINE else None,
+        'prompt_templates': prompt_registry.stats(),
+        'taxonomy': get_taxonomy().stats(),
+        'single_flight': single_flight.stats(),
+        'context_index': context_index.stats(),
+        'shared_cache': shared_cache.stats(),
+        'cache_warmer': cache_warmer.stats() if CACHE_WARMING else None,
+        'rate_limits': {
+            'claude': claude_limiter.stats(),
+            'notion': notion_limiter.stats()
+        }
     })
 
 
+def collect_queue_metrics() -> Dict:
+    """Scrape-time gauge values: outbox and tracking queue sizes by status"""
+    values = {('webhook_outbox', status): count for status, count in outbox.stats().items()}
+    values.update({('notion_tracking', status): count for status, count in tracking_queue.stats().items()})
+    return values
+
+
+def collect_limiter_metrics() -> Dict:
+    """Scrape-time gauge values: in-flight calls and queue depth per API limiter"""
+    values = {}
+    for limiter in (claude_limiter, notion_limiter):
+        stats = limiter.stats()
+        values[(limiter.name, 'in_flight')] = stats['in_flight']
+        values[(limiter.name, 'queue_depth')] = stats['queue_depth']
+        values[(limiter.name, 'rate_per_second')] = stats['rate_per_second']
+    return values
+
+
+metrics.REGISTRY.gauge_callback('kcm_queue_items', 'Items in the durable queues by status', ('queue', 'status'), collect_queue_metrics)
+metrics.REGISTRY.gauge_callback('kcm_api_limiter', 'API limiter state', ('api', 'field'), collect_limiter_metrics)
+
+
+@app.route('/ready', methods=['GET'])
+def ready():
+    """Readiness probe: 200 once the startup checks passed, 503 while starting up or draining"""
+    status = lifecycle.status()
+    return jsonify(status), 200 if status['ready'] else 503
+
+
+@app.route('/metrics', methods=['GET'])
+def metrics_endpoint():
+    """Prometheus metrics: stage latencies, Claude tokens, cache hit ratios, errors and queue sizes"""
+    return Response(metrics.render(), mimetype='text/plain; version=0.0.4')
+
+
+def start_background_workers():
+    """Start background threads (webhook sender, Notion tracking writer, taxonomy sync, digest builder) once the server process is running"""
+    # Crash recovery belongs to the process that runs the queues - importing this module
+    # (batch_backfill, other gunicorn workers) must not touch another process's in-flight rows
+    outbox.recover()
+    tracking_queue.recover()
+    outbox.start_sender()
+    tracking_queue.start_worker()
+    get_taxonomy().start_background_refresh()
+    if digest_store:
+        digest_store.start_background_builder(list_context_pages, retrieve_page_content)
+
+
+def warm_caches() -> str:
+    """
+    Run every warm-up task once (the last startup check, so a process is warm before it reports ready)
+    Failed tasks don't block readiness - those caches load on first use
+    """
+    if not CACHE_WARMING:
+        return "disabled"
+    failed = cache_warmer.warm()
+    warmed = len(cache_warmer.tasks) - len(failed)
+    return f"{warmed}/{len(cache_warmer.tasks)} warmed" + (f" ({', '.join(failed)} failed)" if failed else "")
+
+
+def start_cache_refresh():
+    """Keep this process's caches and connections fresh (every server process runs its own refresher)"""
+    if CACHE_WARMING:
+        cache_warmer.start()
+
+
+def preload():
+    """
+    Load everything that can be shared by forked workers before the fork
+    (prompt tables, lazily imported SDK modules - no network connections)
+    """
+    # Cached or bundled taxonomy (the live sync starts with the background workers)
+    get_categories_prompt()
+    get_tags_prompt()
+    prompt_registry.preload()
+    # Build the lazy clients so the SDKs are imported once here, not in every worker
+    # (the Anthropic SDK also imports its resource modules on first attribute access)
+    notion_client.databases
+    anthropic_client.messages
+    if ASYNC_ENGINE:
+        notion_async.databases
+        anthropic_async.messages
+        http_async.resolve()
+    logger.info("Preloaded taxonomy and rewrite prompts and API client modules")
+
+
+def readiness_checks() -> Dict:
+    """Startup checks a server process must pass before it reports ready"""
+    def notion():
+        if not database_id:
+            raise RuntimeError("NOTION_DATABASE_ID is not set")
+        context_schema_cache.put(ContextSchema(notion_client.databases.retrieve(database_id=database_id)))
+
+    def claude():
+        if not os.getenv('CLAUDE_API_KEY'):
+            raise RuntimeError("CLAUDE_API_KEY is not set")
+
+    def prompt_template():
+        prompt_path = prompt_registry.path_for(prompt_registry.default)
+        if not prompt_path.exists():
+            raise FileNotFoundError(f"{prompt_path} is missing")
+        template = prompt_registry.get()
+        return f"{template.name} {template.version} sha256 {template.sha256}"
+
+    def state_files():
+        outbox.stats()
+        publish_guard.stats()
+        tracking_queue.stats()
+
+    return {
+        'notion': notion,
+        'claude': claude,
+        'prompt_template': prompt_template,
+        'state_files': state_files,
+        'warm_caches': warm_caches
+    }
+
+
 if __name__ == '__main__':
-    logger.info("Starting KCM Blog Converter Server...")
-    logger.info("Server will run on http://localhost:5000")
-    logger.info("Open clipboard.html in your browser to use the converter")
-    app.run(host='0.0.0.0', port=5000, debug=True)
+    if '--dev' in sys.argv or os.getenv('KCM_DEV_SERVER', '').lower() == 'true':
+        # Flask development server with the reloader and debugger
+        logger.info("Starting KCM Blog Converter Server (development mode)...")
+        # The debug reloader imports this module twice - only start workers in the serving process
+        if os.environ.get('WERKZEUG_RUN_MAIN') == 'true':
+            warm_caches()
+            start_background_workers()
+            start_cache_refresh()
+        logger.info("Server will run on http://localhost:5000")
+        logger.info("Open clipboard.html in your browser to use the converter")
+        app.run(host='0.0.0.0', port=5000, debug=True)
+    else:
+        # Production server: waitress on Windows, gunicorn elsewhere (see serve.py)
+        import serve
+        serve.main(sys.modules[__name__], [arg for arg in sys.argv[1:] if arg != '--dev'])
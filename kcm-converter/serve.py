@@ -0,0 +1,225 @@
+#!/usr/bin/env python3
+"""
+KCM Converter - Production Server
+Serves the converter with a production WSGI server instead of the Flask development server:
+gunicorn (threaded workers, app preloaded before fork) on Linux/macOS, waitress on Windows.
+Each process runs its readiness checks (the last one warms its caches and API connections)
+before taking requests, keeps those caches fresh in the background and drains in-flight
+conversions on shutdown.
+
+Usage:
+    python serve.py
+    python serve.py --threads 16 --port 5000
+    python kcm_converter_server.py           # same entry point (--dev for the Flask debug server)
+
+Settings (flags override): SERVER_HOST, SERVER_PORT, SERVER_WORKERS, SERVER_THREADS,
+SERVER_TIMEOUT, SERVER_DRAIN_TIMEOUT, SERVER_BACKEND (auto, gunicorn, waitress, werkzeug)
+"""
+
+import os
+import time
+import signal
+import logging
+import argparse
+import threading
+import _thread
+from pathlib import Path
+from typing import List, Optional
+
+logger = logging.getLogger(__name__)
+
+# Held for the life of the process that runs the background queues (see start_background_workers_once)
+_background_lock_handle = None
+
+
+def parse_args(argv: Optional[List[str]] = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description='Run the KCM converter with a production WSGI server')
+    parser.add_argument('--host', default=os.getenv('SERVER_HOST', '0.0.0.0'))
+    parser.add_argument('--port', type=int, default=int(os.getenv('SERVER_PORT', 5000)))
+    parser.add_argument('--workers', type=int, default=int(os.getenv('SERVER_WORKERS', 1)),
+                        help='Worker processes (gunicorn only). Per-conversion state travels with the client, '
+                             'so any worker can serve any step')
+    parser.add_argument('--threads', type=int, default=int(os.getenv('SERVER_THREADS', 8)),
+                        help='Request threads per process')
+    parser.add_argument('--timeout', type=int, default=int(os.getenv('SERVER_TIMEOUT', 600)),
+                        help='Seconds before a stuck gunicorn worker is restarted')
+    parser.add_argument('--drain-timeout', type=int, default=int(os.getenv('SERVER_DRAIN_TIMEOUT', 300)),
+                        help='Seconds to wait for in-flight conversions on shutdown')
+    parser.add_argument('--backend', choices=('auto', 'gunicorn', 'waitress', 'werkzeug'),
+                        default=os.getenv('SERVER_BACKEND', 'auto'))
+    parser.add_argument('--access-log', action='store_true', help='Log every request')
+    return parser.parse_args(argv)
+
+
+def choose_backend(requested: str) -> str:
+    """gunicorn on POSIX, waitress on Windows; werkzeug (threaded, no debugger) if neither is installed"""
+    if requested != 'auto':
+        return requested
+    candidates = ['waitress'] if os.name == 'nt' else ['gunicorn', 'waitress']
+    for backend in candidates:
+        try:
+            __import__(backend)
+            return backend
+        except ImportError:
+            continue
+    logger.warning("No production server installed (pip install -r shared/requirements.txt) - "
+                   "falling back to the threaded Werkzeug server")
+    return 'werkzeug'
+
+
+def run_startup_checks(server):
+    """Readiness checks for this process; failed checks are retried in the background"""
+    checks = server.readiness_checks()
+    if not server.lifecycle.run_checks(checks):
+        logger.error("Startup checks failed - /ready returns 503 until they pass")
+        server.lifecycle.start_rechecking(checks)
+
+
+def start_background_workers_once(server, lock_path: Path):
+    """
+    Start the background queues in exactly one worker process
+
+    The webhook outbox and tracking queue claim rows without cross-process locking, so the
+    workers take turns on a file lock; if the owner exits, another worker picks them up.
+    """
+    import fcntl
+
+    def run():
+        global _background_lock_handle
+        lock_path.parent.mkdir(parents=True, exist_ok=True)
+        handle = open(lock_path, 'a')
+        while True:
+            try:
+                fcntl.flock(handle, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                break
+            except OSError:
+                time.sleep(30)
+        _background_lock_handle = handle
+        logger.info(f"Worker {os.getpid()} runs the background queues")
+        server.start_background_workers()
+
+    threading.Thread(target=run, name='background-election', daemon=True).start()
+
+
+def drain_on_signal(server, signum: int):
+    """Mark the process as draining (503 for new work, /ready fails) before the server's own handler runs"""
+    previous = signal.getsignal(signum)
+
+    def handler(sig, frame):
+        server.lifecycle.start_draining()
+        if callable(previous):
+            previous(sig, frame)
+
+    signal.signal(signum, handler)
+
+
+def serve_gunicorn(server, args):
+    from gunicorn.app.base import BaseApplication
+
+    lock_path = Path(__file__).parent.parent / 'shared' / '.cache' / 'background_workers.lock'
+
+    class ConverterApplication(BaseApplication):
+        def __init__(self, options):
+            self.options = options
+            super().__init__()
+
+        def load_config(self):
+            for key, value in self.options.items():
+                self.cfg.set(key, value)
+
+        def load(self):
+            return server.app
+
+    def post_worker_init(worker):
+        # After fork, before this worker accepts requests
+        drain_on_signal(server, signal.SIGTERM)
+        run_startup_checks(server)
+        server.start_cache_refresh()
+        start_background_workers_once(server, lock_path)
+
+    options = {
+        'bind': f"{args.host}:{args.port}",
+        'workers': args.workers,
+        'threads': args.threads,
+        'worker_class': 'gthread',
+        'timeout': args.timeout,
+        # SIGTERM: stop accepting, let in-flight conversions finish for up to this long
+        'graceful_timeout': args.drain_timeout,
+        'preload_app': True,
+        'post_worker_init': post_worker_init,
+        'accesslog': '-' if args.access_log else None
+    }
+    ConverterApplication(options).run()
+
+
+def serve_waitress(server, args):
+    from waitress import create_server
+
+    if args.workers > 1:
+        logger.warning("waitress runs a single process - use --threads to scale")
+
+    run_startup_checks(server)
+    server.start_background_workers()
+    server.start_cache_refresh()
+    wsgi_server = create_server(server.app, host=args.host, port=args.port, threads=args.threads)
+
+    def finish():
+        server.lifecycle.drain(args.drain_timeout)
+        time.sleep(1)  # let the last responses flush
+        _thread.interrupt_main()
+
+    def shutdown(signum, frame):
+        if server.lifecycle.draining:
+            raise KeyboardInterrupt  # second Ctrl+C stops immediately
+        logger.info("Shutting down - finishing in-flight conversions (Ctrl+C again to stop now)")
+        server.lifecycle.start_draining()
+        threading.Thread(target=finish, name='drain', daemon=True).start()
+
+    for name in ('SIGINT', 'SIGTERM', 'SIGBREAK'):
+        if hasattr(signal, name):
+            signal.signal(getattr(signal, name), shutdown)
+
+    logger.info(f"Serving on http://{args.host}:{args.port} with waitress ({args.threads} threads)")
+    wsgi_server.run()
+
+
+def serve_werkzeug(server, args):
+    from werkzeug.serving import run_simple
+
+    run_startup_checks(server)
+    server.start_background_workers()
+    server.start_cache_refresh()
+    run_simple(args.host, args.port, server.app, threaded=True)
+
+
+def main(server=None, argv: Optional[List[str]] = None):
+    """
+    Start the production server
+
+    Args:
+        server: The kcm_converter_server module (imported here if not given)
+        argv: Command-line arguments (defaults to sys.argv)
+    """
+    args = parse_args(argv)
+    if server is None:
+        import kcm_converter_server as server
+
+    backend = choose_backend(args.backend)
+    # Every gunicorn worker holds its own Claude/Notion limiters - give each an equal share of the limits
+    server.share_api_limits(args.workers if backend == 'gunicorn' else 1)
+    logger.info(f"Starting KCM Blog Converter Server ({backend})...")
+    logger.info(f"Server will run on http://localhost:{args.port}")
+    logger.info("Open clipboard.html in your browser to use the converter")
+    server.preload()
+
+    if backend == 'gunicorn':
+        serve_gunicorn(server, args)
+    elif backend == 'waitress':
+        serve_waitress(server, args)
+    else:
+        serve_werkzeug(server, args)
+    logger.info("Server stopped")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,139 @@
+"""
+Async Runner
+Runs coroutines on one shared background event loop for sync callers (Flask request threads)
+Many conversions can be in flight on the loop at once since they mostly wait on APIs. A deadline
+cancels the coroutine and every await inside it, and the caller's context variables (request
+trace, current span) are carried into the coroutine.
+"""
+
+import time
+import asyncio
+import logging
+import threading
+import contextvars
+import concurrent.futures
+from contextvars import ContextVar
+from typing import Any, Callable, Optional
+
+logger = logging.getLogger(__name__)
+
+_deadline: ContextVar[Optional[float]] = ContextVar('deadline', default=None)
+
+
+class DeadlineExceeded(TimeoutError):
+    """The coroutine did not finish before its deadline and was cancelled"""
+
+
+def time_remaining() -> Optional[float]:
+    """Seconds left before the current coroutine's deadline (None when it has none)"""
+    deadline = _deadline.get()
+    if deadline is None:
+        return None
+    return max(0.0, deadline - time.monotonic())
+
+
+class AsyncRunner:
+    """Background event loop thread plus a blocking run() adapter"""
+
+    def __init__(self, name: str = 'async-engine'):
+        self.name = name
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._thread: Optional[threading.Thread] = None
+        self._lock = threading.Lock()
+        self.running = 0
+        self.completed = 0
+        self.cancelled = 0
+
+    def loop(self) -> asyncio.AbstractEventLoop:
+        """The event loop (started on first use)"""
+        with self._lock:
+            if self._loop is None:
+                loop = asyncio.new_event_loop()
+                ready = threading.Event()
+
+                def run():
+                    asyncio.set_event_loop(loop)
+                    loop.call_soon(ready.set)
+                    loop.run_forever()
+
+                self._thread = threading.Thread(target=run, name=self.name, daemon=True)
+                self._thread.start()
+                ready.wait()
+                self._loop = loop
+                logger.info(f"Started {self.name} event loop")
+            return self._loop
+
+    def run(self, coro_fn: Callable, *args, timeout: Optional[float] = None, **kwargs) -> Any:
+        """
+        Run coro_fn(*args, **kwargs) on the loop and wait for its result
+
+        Args:
+            coro_fn: Coroutine function
+            timeout: Deadline in seconds; the coroutine is cancelled when it passes
+
+        Returns:
+            The coroutine's result
+
+        Raises:
+            DeadlineExceeded: The deadline passed (the coroutine has been cancelled)
+            Any exception raised by the coroutine
+        """
+        loop = self.loop()
+        if threading.current_thread() is self._thread:
+            raise RuntimeError("AsyncRunner.run() called from its own event loop - await the coroutine instead")
+
+        context = contextvars.copy_context()
+        if timeout is not None:
+            context.run(_deadline.set, time.monotonic() + timeout)
+        future: concurrent.futures.Future = concurrent.futures.Future()
+        holder = {}
+
+        def finish(task: asyncio.Task):
+            with self._lock:
+                self.running -= 1
+                if task.cancelled():
+                    self.cancelled += 1
+                else:
+                    self.completed += 1
+            if future.done():
+                return
+            if task.cancelled():
+                future.set_exception(DeadlineExceeded(f"{getattr(coro_fn, '__name__', 'coroutine')} was cancelled"))
+            elif task.exception() is not None:
+                future.set_exception(task.exception())
+            else:
+                future.set_result(task.result())
+
+        def start():
+            if holder.get('abandoned'):
+                return
+            try:
+                # Tasks copy the current context, so create it inside the caller's context
+                task = context.run(loop.create_task, coro_fn(*args, **kwargs))
+            except Exception as e:
+                future.set_exception(e)
+                return
+            holder['task'] = task
+            with self._lock:
+                self.running += 1
+            task.add_done_callback(finish)
+
+        def abandon():
+            # The caller gave up: cancel the task, or never start it if start() has not run yet
+            holder['abandoned'] = True
+            task = holder.get('task')
+            if task is not None:
+                task.cancel()
+
+        loop.call_soon_threadsafe(start)
+        try:
+            return future.result(timeout=timeout)
+        except concurrent.futures.TimeoutError:
+            loop.call_soon_threadsafe(abandon)
+            raise DeadlineExceeded(
+                f"{getattr(coro_fn, '__name__', 'coroutine')} did not finish within {timeout:.0f}s"
+            ) from None
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {'running': self.running, 'completed': self.completed, 'cancelled': self.cancelled}
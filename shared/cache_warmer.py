@@ -0,0 +1,192 @@
+"""
+Cache Warmer
+Fills the converter's caches and opens its API connections before a server process reports
+ready, then refreshes each one on its own interval so requests never land on a cold cache
+Each task is a plain function; a failed task is logged and retried at its next interval
+(requests then load on demand as before).
+"""
+
+import time
+import logging
+import threading
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Hashable, List, Optional
+
+from metrics import record_cache, timed
+
+logger = logging.getLogger(__name__)
+
+
+class TimedValue:
+    """One cached value that expires after a TTL (the warmer replaces it before then)"""
+
+    def __init__(self, name: str, ttl: float):
+        self.name = name
+        self.ttl = ttl
+        self._value = None
+        self._loaded_at: Optional[float] = None
+        self._lock = threading.Lock()
+
+    def get(self) -> Optional[Any]:
+        """The value, or None if it was never loaded or has expired"""
+        with self._lock:
+            fresh = self._loaded_at is not None and time.monotonic() - self._loaded_at < self.ttl
+            value = self._value if fresh else None
+        record_cache(self.name, fresh)
+        return value
+
+    def put(self, value: Any):
+        with self._lock:
+            self._value = value
+            self._loaded_at = time.monotonic()
+
+    def age(self) -> Optional[float]:
+        with self._lock:
+            return None if self._loaded_at is None else time.monotonic() - self._loaded_at
+
+
+class VersionedCache:
+    """LRU of values that stay valid until their source's version (e.g. last_edited_time) changes"""
+
+    def __init__(self, name: str, maxsize: int = 256):
+        self.name = name
+        self.maxsize = maxsize
+        self._entries: 'OrderedDict[Hashable, tuple]' = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: Hashable, version: Hashable) -> Optional[Any]:
+        with self._lock:
+            entry = self._entries.get(key)
+            hit = entry is not None and entry[0] == version
+            if hit:
+                self._entries.move_to_end(key)
+        record_cache(self.name, hit)
+        return entry[1] if hit else None
+
+    def put(self, key: Hashable, version: Hashable, value: Any):
+        with self._lock:
+            self._entries[key] = (version, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self._entries)
+
+
+class WarmTask:
+    """A warm-up step and its refresh interval"""
+
+    def __init__(self, name: str, fn: Callable[[], Optional[str]], interval: Optional[float]):
+        self.name = name
+        self.fn = fn
+        self.interval = interval
+        self.runs = 0
+        self.failures = 0
+        self.last_run: Optional[float] = None
+        self.last_ms: Optional[float] = None
+        self.last_detail: Optional[str] = None
+        self.last_error: Optional[str] = None
+
+    def due_in(self, now: float) -> Optional[float]:
+        if not self.interval:
+            return None
+        if self.last_run is None:
+            return 0.0
+        return max(0.0, self.last_run + self.interval - now)
+
+    def status(self) -> Dict:
+        return {
+            'interval': self.interval,
+            'runs': self.runs,
+            'failures': self.failures,
+            'last_ms': self.last_ms,
+            'age': round(time.monotonic() - self.last_run, 1) if self.last_run is not None else None,
+            'detail': self.last_detail,
+            'error': self.last_error
+        }
+
+
+class CacheWarmer:
+    """Ordered warm-up tasks plus a scheduler thread that re-runs them on their intervals"""
+
+    def __init__(self):
+        self.tasks: Dict[str, WarmTask] = {}
+        self._lock = threading.Lock()
+        self._thread: Optional[threading.Thread] = None
+        self._stop = threading.Event()
+
+    def add(self, name: str, fn: Callable[[], Optional[str]], interval: Optional[float] = None):
+        """
+        Register a task (tasks warm up in the order they were added)
+
+        Args:
+            name: Task name for logs, metrics and /health
+            fn: Fills a cache or opens connections; may return a short detail string
+            interval: Seconds between refreshes (None or 0: warm-up only)
+        """
+        self.tasks[name] = WarmTask(name, fn, interval)
+
+    def run(self, name: str) -> bool:
+        """Run one task now (stage metric warm_<name>); returns False if it failed"""
+        task = self.tasks[name]
+        with self._lock:
+            started = time.perf_counter()
+            try:
+                with timed(f"warm_{name}"):
+                    task.last_detail = task.fn()
+                task.last_error = None
+                return True
+            except Exception as e:
+                task.failures += 1
+                task.last_error = f"{type(e).__name__}: {e}"
+                logger.warning(f"Cache warm-up '{name}' failed: {e}")
+                return False
+            finally:
+                task.runs += 1
+                task.last_run = time.monotonic()
+                task.last_ms = round((time.perf_counter() - started) * 1000, 1)
+
+    def warm(self) -> List[str]:
+        """
+        Run every task once, in order (server start, before readiness)
+
+        Returns:
+            Names of the tasks that failed
+        """
+        started = time.perf_counter()
+        failed = [name for name in self.tasks if not self.run(name)]
+        elapsed = time.perf_counter() - started
+        if failed:
+            logger.warning(f"Caches warmed in {elapsed:.1f}s - {', '.join(failed)} will load on demand")
+        else:
+            logger.info(f"Caches warmed in {elapsed:.1f}s ({', '.join(self.tasks)})")
+        return failed
+
+    def start(self):
+        """Start the scheduler thread (once per process)"""
+        if self._thread and self._thread.is_alive():
+            return
+        self._stop.clear()
+
+        def loop():
+            while not self._stop.is_set():
+                now = time.monotonic()
+                waits = [(task.due_in(now), task.name) for task in self.tasks.values() if task.interval]
+                if not waits:
+                    return
+                wait, name = min(waits)
+                if wait > 0:
+                    self._stop.wait(wait)
+                    continue
+                self.run(name)
+
+        self._thread = threading.Thread(target=loop, name='cache-warmer', daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+
+    def stats(self) -> Dict:
+        return {name: task.status() for name, task in self.tasks.items()}
@@ -0,0 +1,422 @@
+"""
+Cassette
+Records outbound HTTP traffic (Notion, Claude, WordPress, n8n, image downloads) to a compressed
+cassette file and replays it offline with the original or scaled latency
+Hooks the httpx/httpx2 transports (notion-client, anthropic) and the requests adapter (WordPress,
+n8n), so no client code changes. Enable with CASSETTE_MODE=record|replay and CASSETTE_PATH.
+"""
+
+import os
+import io
+import gzip
+import json
+import time
+import base64
+import hashlib
+import logging
+import threading
+from collections import defaultdict, deque
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+from urllib.parse import urlsplit, urlunsplit, parse_qsl, urlencode
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_CASSETTE_PATH = Path(__file__).parent / '.cache' / 'cassettes' / 'session.jsonl.gz'
+
+RECORD = 'record'
+REPLAY = 'replay'
+
+REDACTED = '<REDACTED>'
+
+# Headers whose values are never written to a cassette
+SECRET_HEADERS = {'authorization', 'x-api-key', 'cookie', 'set-cookie', 'proxy-authorization'}
+
+# Environment variables whose values are scrubbed from URLs and bodies
+SECRET_ENV_VARS = ('CLAUDE_API_KEY', 'ANTHROPIC_API_KEY', 'NOTION_API_KEY', 'WORDPRESS_APP_PASSWORD',
+                   'WORDPRESS_PASSWORD', 'WP_APP_PASSWORD', 'N8N_API_KEY')
+
+# Query parameters that carry credentials
+SECRET_PARAMS = {'api_key', 'apikey', 'key', 'token', 'access_token', 'password'}
+
+# Response headers that no longer apply once the body is stored decoded
+DROPPED_RESPONSE_HEADERS = {'content-encoding', 'transfer-encoding', 'content-length', 'connection'}
+
+# Request bodies larger than this are matched by hash only (image uploads)
+MAX_STORED_REQUEST_BODY = 64 * 1024
+
+
+class CassetteMiss(Exception):
+    """A replayed request has no recorded interaction"""
+
+
+def _secret_values() -> List[str]:
+    values = [os.getenv(name) for name in SECRET_ENV_VARS]
+    # Longest first so a secret containing another is scrubbed whole
+    return sorted({v for v in values if v and len(v) >= 8}, key=len, reverse=True)
+
+
+def redact_text(text: str, secrets: List[str]) -> str:
+    for secret in secrets:
+        text = text.replace(secret, REDACTED)
+    return text
+
+
+def redact_url(url: str, secrets: List[str]) -> str:
+    parts = urlsplit(url)
+    netloc = parts.netloc
+    if '@' in netloc:
+        netloc = f"{REDACTED}@{netloc.split('@', 1)[1]}"
+    query = urlencode([(k, REDACTED if k.lower() in SECRET_PARAMS else v)
+                       for k, v in parse_qsl(parts.query, keep_blank_values=True)])
+    return redact_text(urlunsplit((parts.scheme, netloc, parts.path, query, parts.fragment)), secrets)
+
+
+def redact_headers(headers, secrets: List[str]) -> Dict[str, str]:
+    return {
+        name: REDACTED if name.lower() in SECRET_HEADERS else redact_text(str(value), secrets)
+        for name, value in headers.items()
+    }
+
+
+def _encode_body(body: bytes, secrets: List[str]) -> Dict:
+    """Body as redacted text when it is UTF-8, otherwise base64"""
+    try:
+        return {'text': redact_text(body.decode('utf-8'), secrets)}
+    except UnicodeDecodeError:
+        return {'base64': base64.b64encode(body).decode('ascii')}
+
+
+def _decode_body(stored: Dict) -> bytes:
+    if 'base64' in stored:
+        return base64.b64decode(stored['base64'])
+    return stored.get('text', '').encode('utf-8')
+
+
+def _body_hash(body: bytes, secrets: List[str]) -> str:
+    # Hash the redacted form so recording and replaying machines with different keys agree
+    try:
+        body = redact_text(body.decode('utf-8'), secrets).encode('utf-8')
+    except UnicodeDecodeError:
+        pass
+    return hashlib.sha256(body).hexdigest()[:32]
+
+
+class Cassette:
+    """
+    Recorded interactions and the replay state for one cassette file
+
+    Recording appends one gzip member per interaction (a crash keeps everything recorded so far).
+    Replay matches on method + URL + request body hash, falling back to method + URL in recorded
+    order (multipart boundaries and timestamps change between runs); repeated requests get the
+    recorded responses in sequence, then the last one again.
+    """
+
+    def __init__(self, path: str, mode: str, latency_scale: float = 1.0):
+        if mode not in (RECORD, REPLAY):
+            raise ValueError(f"Unknown cassette mode: {mode}")
+        self.path = path
+        self.mode = mode
+        self.latency_scale = latency_scale
+        self.secrets = _secret_values()
+        self.recorded = 0
+        self.replayed = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._exact: Dict[Tuple, deque] = defaultdict(deque)
+        self._loose: Dict[Tuple, deque] = defaultdict(deque)
+        self._last: Dict[Tuple, Dict] = {}
+        self._used = set()
+
+        if mode == REPLAY:
+            self._load()
+
+    def _load(self):
+        interactions = read_cassette(self.path)
+        for index, interaction in enumerate(interactions):
+            req = interaction['request']
+            self._exact[(req['method'], req['url'], req['body_sha256'])].append(index)
+            self._loose[(req['method'], req['url'])].append(index)
+        self.interactions = interactions
+        logger.info(f"Replaying {len(interactions)} recorded interactions from {self.path}")
+
+    def record(self, method: str, url: str, headers, body: bytes, status: int, reason: str,
+               response_headers, response_body: bytes, elapsed: float):
+        """Append one redacted interaction to the cassette file"""
+        request_entry = {
+            'method': method.upper(),
+            'url': redact_url(url, self.secrets),
+            'headers': redact_headers(headers, self.secrets),
+            'body_sha256': _body_hash(body, self.secrets)
+        }
+        if body and len(body) <= MAX_STORED_REQUEST_BODY:
+            request_entry['body'] = _encode_body(body, self.secrets)
+
+        interaction = {
+            'request': request_entry,
+            'response': {
+                'status': status,
+                'reason': reason,
+                'headers': {k: v for k, v in redact_headers(response_headers, self.secrets).items()
+                            if k.lower() not in DROPPED_RESPONSE_HEADERS},
+                'body': _encode_body(response_body, self.secrets)
+            },
+            'elapsed': round(elapsed, 4),
+            'recorded_at': time.time()
+        }
+        line = (json.dumps(interaction) + '\n').encode('utf-8')
+        with self._lock:
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            with gzip.open(self.path, 'ab') as f:
+                f.write(line)
+            self.recorded += 1
+
+    def _take(self, queue: deque) -> Optional[int]:
+        while queue and queue[0] in self._used:
+            queue.popleft()
+        if not queue:
+            return None
+        index = queue.popleft()
+        self._used.add(index)
+        return index
+
+    def _lookup(self, method: str, url: str, body: bytes) -> Tuple[Dict, float]:
+        method = method.upper()
+        url = redact_url(url, self.secrets)
+        key = (method, url, _body_hash(body, self.secrets))
+        with self._lock:
+            index = self._take(self._exact[key])
+            if index is None:
+                index = self._take(self._loose[(method, url)])
+            if index is not None:
+                self._last[(method, url)] = self.interactions[index]
+                interaction = self.interactions[index]
+            else:
+                interaction = self._last.get((method, url))
+            if interaction is None:
+                self.misses += 1
+                raise CassetteMiss(f"No recorded response for {method} {url}")
+            self.replayed += 1
+        return interaction['response'], interaction.get('elapsed', 0) * self.latency_scale
+
+    def match(self, method: str, url: str, body: bytes) -> Dict:
+        """
+        Next recorded interaction for a request (sleeps for the recorded latency x scale)
+
+        Raises:
+            CassetteMiss: Nothing with this method and URL was recorded
+        """
+        response, delay = self._lookup(method, url, body)
+        if delay > 0:
+            time.sleep(delay)
+        return response
+
+    async def match_async(self, method: str, url: str, body: bytes) -> Dict:
+        """match() without blocking the event loop"""
+        import asyncio
+
+        response, delay = self._lookup(method, url, body)
+        if delay > 0:
+            await asyncio.sleep(delay)
+        return response
+
+    def stats(self) -> Dict:
+        with self._lock:
+            return {'mode': self.mode, 'path': self.path, 'recorded': self.recorded,
+                    'replayed': self.replayed, 'misses': self.misses}
+
+
+def read_cassette(path: str) -> List[Dict]:
+    """All interactions in a cassette file"""
+    with gzip.open(path, 'rt', encoding='utf-8') as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+_active: Optional[Cassette] = None
+# httpx/requests are imported on first install so importing this module stays cheap
+_httpx_modules: List = []
+_original_httpx_handles: Dict = {}
+_original_httpx_async_handles: Dict = {}
+_original_requests_send = None
+
+
+def _load_transports():
+    """Import the HTTP libraries and remember their original send functions (once)"""
+    global _original_requests_send
+    if _original_requests_send is not None:
+        return
+    import httpx
+    import requests.adapters
+    _httpx_modules.append(httpx)
+    # Newer anthropic SDKs send through httpx2 (same API as httpx)
+    try:
+        import httpx2
+        _httpx_modules.append(httpx2)
+    except ImportError:
+        pass
+    for module in _httpx_modules:
+        _original_httpx_handles[module] = module.HTTPTransport.handle_request
+        _original_httpx_async_handles[module] = module.AsyncHTTPTransport.handle_async_request
+    _original_requests_send = requests.adapters.HTTPAdapter.send
+
+
+def _make_httpx_handler(module):
+    original = _original_httpx_handles[module]
+
+    def handle_request(self, request):
+        cassette = _active
+        if cassette is None:
+            return original(self, request)
+
+        body = request.read()
+        if cassette.mode == REPLAY:
+            recorded = cassette.match(request.method, str(request.url), body)
+            return module.Response(recorded['status'], headers=recorded['headers'],
+                                   content=_decode_body(recorded['body']), request=request)
+
+        started = time.perf_counter()
+        response = original(self, request)
+        # Streams (Claude SSE) are read whole so the full body is captured
+        content = response.read()
+        response.close()
+        cassette.record(request.method, str(request.url), request.headers, body, response.status_code,
+                        response.reason_phrase, response.headers, content, time.perf_counter() - started)
+        headers = [(k, v) for k, v in response.headers.items() if k.lower() not in DROPPED_RESPONSE_HEADERS]
+        return module.Response(response.status_code, headers=headers, content=content, request=request,
+                               extensions=response.extensions)
+
+    return handle_request
+
+
+def _make_httpx_async_handler(module):
+    original = _original_httpx_async_handles[module]
+
+    async def handle_async_request(self, request):
+        cassette = _active
+        if cassette is None:
+            return await original(self, request)
+
+        body = await request.aread()
+        if cassette.mode == REPLAY:
+            recorded = await cassette.match_async(request.method, str(request.url), body)
+            return module.Response(recorded['status'], headers=recorded['headers'],
+                                   content=_decode_body(recorded['body']), request=request)
+
+        started = time.perf_counter()
+        response = await original(self, request)
+        content = await response.aread()
+        await response.aclose()
+        cassette.record(request.method, str(request.url), request.headers, body, response.status_code,
+                        response.reason_phrase, response.headers, content, time.perf_counter() - started)
+        headers = [(k, v) for k, v in response.headers.items() if k.lower() not in DROPPED_RESPONSE_HEADERS]
+        return module.Response(response.status_code, headers=headers, content=content, request=request,
+                               extensions=response.extensions)
+
+    return handle_async_request
+
+
+def _requests_response(request, status: int, reason: str, headers: Dict, content: bytes):
+    import requests
+    from requests.structures import CaseInsensitiveDict
+    from requests.utils import get_encoding_from_headers
+
+    response = requests.Response()
+    response.status_code = status
+    response.reason = reason
+    response.headers = CaseInsensitiveDict(headers)
+    response._content = content
+    response._content_consumed = True
+    response.raw = io.BytesIO(content)
+    response.url = request.url
+    response.request = request
+    response.encoding = get_encoding_from_headers(response.headers)
+    return response
+
+
+def _requests_send(self, request, **kwargs):
+    cassette = _active
+    if cassette is None:
+        return _original_requests_send(self, request, **kwargs)
+
+    body = request.body or b''
+    if hasattr(body, 'read'):
+        body = body.read()
+        request.body = body
+    if isinstance(body, str):
+        body = body.encode('utf-8')
+
+    if cassette.mode == REPLAY:
+        recorded = cassette.match(request.method, request.url, body)
+        return _requests_response(request, recorded['status'], recorded['reason'], recorded['headers'],
+                                  _decode_body(recorded['body']))
+
+    started = time.perf_counter()
+    response = _original_requests_send(self, request, **kwargs)
+    content = response.content
+    cassette.record(request.method, request.url, request.headers, body, response.status_code,
+                    response.reason or '', response.headers, content, time.perf_counter() - started)
+    headers = {k: v for k, v in response.headers.items() if k.lower() not in DROPPED_RESPONSE_HEADERS}
+    return _requests_response(request, response.status_code, response.reason, headers, content)
+
+
+def install(path: str, mode: str, latency_scale: float = 1.0) -> Cassette:
+    """
+    Start recording or replaying all outbound HTTP traffic of this process
+
+    Args:
+        path: Cassette file (gzip JSON lines, e.g. convert.jsonl.gz)
+        mode: 'record' or 'replay'
+        latency_scale: Replay delay as a multiple of the recorded latency (0 = no delay)
+
+    Returns:
+        The active Cassette
+    """
+    global _active
+    import requests.adapters
+
+    cassette = Cassette(path, mode, latency_scale)
+    _load_transports()
+    for module in _httpx_modules:
+        module.HTTPTransport.handle_request = _make_httpx_handler(module)
+        module.AsyncHTTPTransport.handle_async_request = _make_httpx_async_handler(module)
+    requests.adapters.HTTPAdapter.send = _requests_send
+    _active = cassette
+    logger.info(f"Cassette {mode} mode: {path}" + (f" (latency x{latency_scale})" if mode == REPLAY else ''))
+    return cassette
+
+
+def uninstall():
+    """Stop recording/replaying and restore the real transports"""
+    global _active
+    _active = None
+    if _original_requests_send is None:
+        return  # never installed
+    import requests.adapters
+
+    for module in _httpx_modules:
+        module.HTTPTransport.handle_request = _original_httpx_handles[module]
+        module.AsyncHTTPTransport.handle_async_request = _original_httpx_async_handles[module]
+    requests.adapters.HTTPAdapter.send = _original_requests_send
+
+
+def active_cassette() -> Optional[Cassette]:
+    return _active
+
+
+def install_from_env() -> Optional[Cassette]:
+    """
+    Install a cassette when CASSETTE_MODE is set (record or replay)
+
+    Uses CASSETTE_PATH (default shared/.cache/cassettes/session.jsonl.gz) and
+    CASSETTE_LATENCY_SCALE (default 1.0)
+    """
+    mode = os.getenv('CASSETTE_MODE', '').strip().lower()
+    if not mode:
+        return None
+    if _active is not None:
+        return _active
+    path = os.getenv('CASSETTE_PATH', str(DEFAULT_CASSETTE_PATH))
+    latency_scale = float(os.getenv('CASSETTE_LATENCY_SCALE', '1.0'))
+    return install(path, mode, latency_scale)
@@ -0,0 +1,217 @@
+"""
+Context Digest Store
+Builds compact, fact-dense digests of Notion context pages and caches them on disk
+Digests are keyed by the page's last_edited_time and rebuilt only when the page changes
+"""
+
+import os
+import json
+import queue
+import logging
+import threading
+from datetime import datetime
+from pathlib import Path
+from typing import Callable, Dict, List, Optional
+
+from metrics import timed, record_claude_usage
+
+logger = logging.getLogger(__name__)
+
+# Default cache location (next to the shared modules)
+DEFAULT_DIGEST_DIR = Path(__file__).parent / '.cache' / 'context_digests'
+
+# How often the background builder re-checks the whole database (seconds)
+DEFAULT_REFRESH_INTERVAL = 1800
+
+DIGEST_PROMPT = """You are preparing reference notes for a South Jersey real estate writer.
+Condense the Notion page below into a compact, fact-dense digest.
+
+Keep ONLY local facts that could be quoted in a blog post:
+- Statistics and market numbers (with their dates and sources if given)
+- Town, township and county names with what is specific about each
+- Price ranges, taxes, fees and program amounts
+- Local programs, rules and timelines (e.g. NJ attorney review)
+
+Rules:
+- Copy every number exactly as written - never round or estimate
+- Use short "- " bullet points grouped under "## " headings
+- Drop marketing language, opinions, instructions and anything not local
+- Stay under 400 words
+
+PAGE TITLE: {title}
+
+PAGE CONTENT:
+{content}
+
+Return ONLY the digest."""
+
+
+def digests_enabled() -> bool:
+    """
+    Returns True when rewrites should use digests instead of raw pages (USE_CONTEXT_DIGESTS env var)
+    """
+    return os.getenv('USE_CONTEXT_DIGESTS', '').lower() in ('1', 'true', 'yes')
+
+
+class ContextDigestStore:
+    """Disk-backed cache of per-page context digests with a background builder"""
+
+    def __init__(self, claude_client, model: str, cache_dir: Optional[Path] = None):
+        """
+        Args:
+            claude_client: Anthropic client used to summarize pages
+            model: Claude model name for digest generation
+            cache_dir: Directory holding one JSON file per page digest
+        """
+        self.claude_client = claude_client
+        self.model = model
+        self.cache_dir = Path(cache_dir or os.getenv('CONTEXT_DIGEST_DIR', DEFAULT_DIGEST_DIR))
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+
+        self._lock = threading.Lock()
+        self._pending = set()
+        self._queue = queue.Queue()
+        self._worker = None
+
+    def _digest_path(self, page_id: str) -> Path:
+        return self.cache_dir / f"{page_id.replace('-', '')}.json"
+
+    def _load(self, page_id: str) -> Optional[Dict]:
+        path = self._digest_path(page_id)
+        if not path.exists():
+            return None
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except (OSError, ValueError) as e:
+            logger.warning(f"Unreadable digest cache for {page_id}: {e}")
+            return None
+
+    def _save(self, record: Dict):
+        path = self._digest_path(record['page_id'])
+        tmp_path = path.with_suffix('.tmp')
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(record, f, indent=2)
+        os.replace(tmp_path, path)
+
+    def get_digest(self, page_id: str, last_edited_time: Optional[str]) -> Optional[str]:
+        """
+        Return the cached digest for a page if it matches the page's last_edited_time
+
+        Args:
+            page_id: Notion page ID
+            last_edited_time: Page's current last_edited_time (from the database query)
+
+        Returns:
+            Digest text, or None if missing or stale
+        """
+        record = self._load(page_id)
+        if not record or not last_edited_time:
+            return None
+        if record.get('last_edited_time') != last_edited_time:
+            return None
+        return record.get('digest') or None
+
+    def build_digest(self, page_id: str, title: str, content: str, last_edited_time: Optional[str]) -> Optional[str]:
+        """
+        Summarize a page with Claude and store the digest
+
+        Args:
+            page_id: Notion page ID
+            title: Page title
+            content: Full page text (from retrieve_page_content)
+            last_edited_time: Page's last_edited_time the digest corresponds to
+
+        Returns:
+            Digest text, or None on failure
+        """
+        if not content:
+            return None
+
+        try:
+            with timed('digest_build'):
+                message = self.claude_client.messages.create(
+                    model=self.model,
+                    max_tokens=1500,
+                    messages=[{"role": "user", "content": DIGEST_PROMPT.format(title=title, content=content)}]
+                )
+            record_claude_usage(message)
+            digest = message.content[0].text.strip()
+        except Exception as e:
+            logger.error(f"Failed to build digest for {title}: {e}")
+            return None
+
+        self._save({
+            'page_id': page_id,
+            'title': title,
+            'last_edited_time': last_edited_time,
+            'digest': digest,
+            'source_chars': len(content),
+            'digest_chars': len(digest),
+            'built_at': datetime.now().isoformat()
+        })
+        logger.info(f"Built digest for {title}: {len(content)} -> {len(digest)} chars")
+        return digest
+
+    def request_build(self, page: Dict):
+        """
+        Queue a page for background digest building (duplicates are ignored)
+
+        Args:
+            page: Dict with 'id', 'title' and 'last_edited_time' keys
+        """
+        with self._lock:
+            if page['id'] in self._pending:
+                return
+            self._pending.add(page['id'])
+        self._queue.put(page)
+
+    def start_background_builder(
+        self,
+        list_pages: Callable[[], List[Dict]],
+        retrieve_content: Callable[[str], str],
+        refresh_interval: int = DEFAULT_REFRESH_INTERVAL
+    ):
+        """
+        Start a daemon thread that keeps every page's digest up to date
+
+        Args:
+            list_pages: Returns all context pages as dicts with 'id', 'title', 'last_edited_time'
+            retrieve_content: Returns the full text of a page by ID
+            refresh_interval: Seconds between full database re-checks
+        """
+        if self._worker and self._worker.is_alive():
+            return
+
+        def enqueue_stale_pages():
+            try:
+                pages = list_pages()
+            except Exception as e:
+                logger.error(f"Digest builder could not list pages: {e}")
+                return
+            stale = [p for p in pages if self.get_digest(p['id'], p.get('last_edited_time')) is None]
+            if stale:
+                logger.info(f"Digest builder: {len(stale)} of {len(pages)} pages need a new digest")
+            for page in stale:
+                self.request_build(page)
+
+        def run():
+            enqueue_stale_pages()
+            while True:
+                try:
+                    page = self._queue.get(timeout=refresh_interval)
+                except queue.Empty:
+                    enqueue_stale_pages()
+                    continue
+
+                try:
+                    if self.get_digest(page['id'], page.get('last_edited_time')) is None:
+                        content = retrieve_content(page['id'])
+                        self.build_digest(page['id'], page['title'], content, page.get('last_edited_time'))
+                finally:
+                    with self._lock:
+                        self._pending.discard(page['id'])
+
+        self._worker = threading.Thread(target=run, name='context-digest-builder', daemon=True)
+        self._worker.start()
+        logger.info("Context digest builder started")
@@ -0,0 +1,335 @@
+"""
+Context Index
+Compact, read-only on-disk index of the Notion context database, shared by every server process
+One process builds a snapshot from the context listing (titles, keywords, page metadata)
+and swaps it in atomically; the others memory-map the same file, so N workers share one
+physical copy through the page cache and a new worker can rank pages as soon as it starts.
+
+File layout (native byte order, all sections 4-byte aligned):
+    header    magic, version, byte order, build time, counts, master page and section offsets
+    strings   offsets (uint32, count + 1) and UTF-8 data - every string stored once (interned)
+    pages     fixed-size records: id, url, title, last_edited_time, search text (string
+              numbers) and flags, in listing order
+    grams     sorted (trigram hash, postings start, postings count) triples (uint32)
+    postings  page numbers per trigram (uint32)
+
+A topic's trigrams narrow the search to candidate pages; each candidate is then scored on
+its search text exactly like the server's rank_context_pages, so the ranking is identical.
+"""
+
+import os
+import sys
+import mmap
+import time
+import zlib
+import struct
+import bisect
+import logging
+import contextlib
+from array import array
+from pathlib import Path
+from typing import Dict, Iterator, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+# Default snapshot location (next to the shared modules)
+DEFAULT_INDEX_PATH = Path(__file__).parent / '.cache' / 'context_index.bin'
+
+MAGIC = b'KCMCTXIX'
+VERSION = 1
+BYTE_ORDER = b'L' if sys.byteorder == 'little' else b'B'
+
+# magic, version, byte order, built_at, strings, pages, grams, master page + 1 (0: none),
+# then the offsets of the string offsets/data, pages, grams and postings sections
+HEADER = struct.Struct('=8sIc3xdIIIIIIIII')
+# id, url, title, last_edited_time, search text (string numbers), flags
+PAGE = struct.Struct('=IIIIII')
+IS_MASTER = 1
+NGRAM = 3
+
+# Pages returned by rank() after the master document (same as the server's ranking)
+TOP_PAGES = 5
+
+
+def gram_hash(gram: str) -> int:
+    return zlib.crc32(gram.encode('utf-8'))
+
+
+def text_grams(text: str) -> set:
+    return {text[i:i + NGRAM] for i in range(len(text) - NGRAM + 1)}
+
+
+def _align(data: bytearray):
+    data.extend(b'\0' * (-len(data) % 4))
+
+
+def build_index(records: List[Dict], built_at: Optional[float] = None) -> bytes:
+    """
+    Serialize a context index snapshot
+
+    Args:
+        records: One dict per page in listing order - id, url, title, last_edited_time,
+                 text (the lowercased title and keywords the ranking searches) and is_master
+        built_at: Snapshot time (default: now)
+
+    Returns:
+        The file contents
+    """
+    strings: Dict[str, int] = {}
+
+    def intern(value: Optional[str]) -> int:
+        value = value or ''
+        if value not in strings:
+            strings[value] = len(strings)
+        return strings[value]
+
+    page_rows = []
+    postings: Dict[int, List[int]] = {}
+    master = 0
+    for number, record in enumerate(records):
+        if record.get('is_master'):
+            master = number + 1
+        page_rows.append((
+            intern(record['id']), intern(record.get('url')), intern(record['title']),
+            intern(record.get('last_edited_time')), intern(record['text']),
+            IS_MASTER if record.get('is_master') else 0
+        ))
+        for gram in text_grams(record['text']):
+            postings.setdefault(gram_hash(gram), []).append(number)
+
+    offsets = array('I', [0])
+    string_data = bytearray()
+    for value in strings:  # dicts keep insertion order = string numbers
+        string_data.extend(value.encode('utf-8'))
+        offsets.append(len(string_data))
+
+    grams = array('I')
+    posting_list = array('I')
+    for key in sorted(postings):
+        grams.extend((key, len(posting_list), len(postings[key])))
+        posting_list.extend(postings[key])
+
+    data = bytearray(HEADER.size)
+    string_offsets_at = len(data)
+    data.extend(offsets.tobytes())
+    string_data_at = len(data)
+    data.extend(string_data)
+    _align(data)
+    pages_at = len(data)
+    for row in page_rows:
+        data.extend(PAGE.pack(*row))
+    grams_at = len(data)
+    data.extend(grams.tobytes())
+    postings_at = len(data)
+    data.extend(posting_list.tobytes())
+
+    HEADER.pack_into(data, 0, MAGIC, VERSION, BYTE_ORDER, built_at if built_at is not None else time.time(),
+                     len(strings), len(page_rows), len(grams) // 3, master,
+                     string_offsets_at, string_data_at, pages_at, grams_at, postings_at)
+    return bytes(data)
+
+
+class _GramKeys:
+    """Sequence view of the sorted trigram hashes (for bisect)"""
+
+    def __init__(self, grams: memoryview):
+        self._grams = grams
+
+    def __len__(self) -> int:
+        return len(self._grams) // 3
+
+    def __getitem__(self, i: int) -> int:
+        return self._grams[i * 3]
+
+
+class ContextIndex:
+    """Read-only view of one snapshot (a memory map, or the file's bytes on Windows)"""
+
+    def __init__(self, buffer, path: Optional[Path] = None):
+        """
+        Raises:
+            ValueError: Not a context index snapshot, or one written by an incompatible version
+        """
+        if len(buffer) < HEADER.size:
+            raise ValueError("Context index file is truncated")
+        (magic, version, byte_order, self.built_at, string_count, self.page_count, gram_count, master,
+         string_offsets_at, string_data_at, pages_at, grams_at, postings_at) = HEADER.unpack_from(buffer, 0)
+        if magic != MAGIC or version != VERSION or byte_order != BYTE_ORDER:
+            raise ValueError(f"Not a version {VERSION} context index")
+
+        self.path = path
+        self.size = len(buffer)
+        self._master = master - 1
+        self._buffer = buffer
+        view = memoryview(buffer)
+        self._offsets = view[string_offsets_at:string_offsets_at + (string_count + 1) * 4].cast('I')
+        self._data = view[string_data_at:string_data_at + self._offsets[string_count]]
+        self._pages = view[pages_at:pages_at + self.page_count * PAGE.size]
+        self._grams = view[grams_at:grams_at + gram_count * 12].cast('I')
+        self._postings = view[postings_at:].cast('I')
+        self._gram_keys = _GramKeys(self._grams)
+
+    def __len__(self) -> int:
+        return self.page_count
+
+    def age(self) -> float:
+        return time.time() - self.built_at
+
+    def string(self, number: int) -> str:
+        return str(self._data[self._offsets[number]:self._offsets[number + 1]], 'utf-8')
+
+    def _row(self, number: int) -> Tuple[int, ...]:
+        return PAGE.unpack_from(self._pages, number * PAGE.size)
+
+    def page(self, number: int) -> Dict:
+        """Metadata of a page (the fields the server's context pages carry)"""
+        page_id, url, title, edited, _, flags = self._row(number)
+        return {
+            'id': self.string(page_id),
+            'title': self.string(title),
+            'url': self.string(url),
+            'last_edited_time': self.string(edited) or None,
+            'is_master': bool(flags & IS_MASTER)
+        }
+
+    def pages(self) -> Iterator[Dict]:
+        for number in range(self.page_count):
+            yield self.page(number)
+
+    def master_page(self) -> Optional[Dict]:
+        """The master document (the last flagged page, as in the ranking)"""
+        return self.page(self._master) if self._master >= 0 else None
+
+    def _postings_for(self, gram: str) -> array:
+        key = gram_hash(gram)
+        i = bisect.bisect_left(self._gram_keys, key)
+        if i == len(self._gram_keys) or self._grams[i * 3] != key:
+            return array('I')
+        start, count = self._grams[i * 3 + 1], self._grams[i * 3 + 2]
+        return self._postings[start:start + count]
+
+    def candidates(self, topic: str) -> List[int]:
+        """Pages whose search text may contain the topic (hash collisions only add candidates)"""
+        grams = text_grams(topic)
+        if not grams:
+            return list(range(self.page_count))
+        found = None
+        for postings in sorted((self._postings_for(gram) for gram in grams), key=len):
+            found = set(postings) if found is None else found.intersection(postings)
+            if not found:
+                return []
+        return sorted(found)
+
+    def rank(self, topics: List[str], limit: int = TOP_PAGES) -> List[Dict]:
+        """
+        Context pages for a conversion: the master document first, then the pages whose title
+        and keywords mention the topics most (same scores and order as rank_context_pages)
+        """
+        scores: Dict[int, int] = {}
+        texts: Dict[int, Optional[str]] = {}
+        for topic in topics:
+            topic_lower = topic.lower()
+            for number in self.candidates(topic_lower):
+                if number not in texts:
+                    row = self._row(number)
+                    # The master document is always included, never scored
+                    texts[number] = None if row[5] & IS_MASTER else self.string(row[4])
+                text = texts[number]
+                count = text.count(topic_lower) if text is not None else 0
+                if count:
+                    scores[number] = scores.get(number, 0) + count
+
+        ranked = sorted(scores, key=lambda number: (-scores[number], number))[:limit]
+        relevant_pages = [dict(self.page(number), score=scores[number]) for number in ranked]
+        master = self.master_page()
+        if master:
+            relevant_pages.insert(0, master)
+        logger.info(f"Selected {len(relevant_pages)} relevant documents from the context index")
+        return relevant_pages
+
+
+class ContextIndexStore:
+    """The snapshot file: atomic publishing, and re-mapping when another process published a new one"""
+
+    def __init__(self, path: Optional[Path] = None):
+        self.path = Path(path or os.getenv('CONTEXT_INDEX_PATH', DEFAULT_INDEX_PATH))
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._index: Optional[ContextIndex] = None
+        self._identity = None
+        self.maps = 0
+        self.builds = 0
+
+    def current(self) -> Optional[ContextIndex]:
+        """The latest published snapshot, or None if there is none (one stat() per call)"""
+        try:
+            stat = self.path.stat()
+        except FileNotFoundError:
+            self._index = self._identity = None
+            return None
+        identity = (stat.st_ino, stat.st_mtime_ns, stat.st_size)
+        if identity != self._identity:
+            # Snapshots are replaced, never rewritten, so views of the old one stay valid
+            self._identity = identity
+            self._index = self._open()
+        return self._index
+
+    def _open(self) -> Optional[ContextIndex]:
+        try:
+            with open(self.path, 'rb') as f:
+                if os.name == 'nt':
+                    # A mapped file can't be replaced on Windows (single process there anyway)
+                    buffer = f.read()
+                else:
+                    buffer = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            index = ContextIndex(buffer, self.path)
+        except (OSError, ValueError) as e:
+            logger.warning(f"Ignoring context index {self.path}: {e}")
+            return None
+        self.maps += 1
+        logger.info(f"Mapped context index ({index.page_count} pages, {index.size} bytes, {index.age():.0f}s old)")
+        return index
+
+    def publish(self, records: List[Dict]) -> ContextIndex:
+        """Write a new snapshot and swap it in atomically (readers see the old or the new one, never a mix)"""
+        data = build_index(records)
+        temp_path = self.path.with_name(f"{self.path.name}.{os.getpid()}.tmp")
+        with open(temp_path, 'wb') as f:
+            f.write(data)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(temp_path, self.path)
+        self.builds += 1
+        return self.current()
+
+    @contextlib.contextmanager
+    def rebuild_lock(self) -> Iterator[bool]:
+        """
+        Yields True if this process may rebuild the snapshot now, False if another one is
+        already rebuilding it (no cross-process lock on Windows, where there is one process)
+        """
+        try:
+            import fcntl
+        except ImportError:
+            yield True
+            return
+        with open(self.path.with_name(self.path.name + '.lock'), 'a') as handle:
+            try:
+                fcntl.flock(handle, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except OSError:
+                yield False
+                return
+            try:
+                yield True
+            finally:
+                fcntl.flock(handle, fcntl.LOCK_UN)
+
+    def stats(self) -> Dict:
+        index = self.current()
+        return {
+            'path': str(self.path),
+            'pages': index.page_count if index else None,
+            'bytes': index.size if index else None,
+            'age': round(index.age(), 1) if index else None,
+            'maps': self.maps,
+            'builds': self.builds
+        }
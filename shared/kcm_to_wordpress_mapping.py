@@ -183,6 +183,9 @@ def merge_taxonomy(categories1, tags1, categories2=None, tags2=None):
     """
     Merge two sets of categories and tags, removing duplicates
 
+    Names are mapped onto the WordPress terms first (see taxonomy_resolver), so
+    "Move-up Buyers" and "Move Up Buyers" merge into one tag
+
     Args:
         categories1: List of category names
         tags1: List of tag names
@@ -190,17 +193,29 @@ def merge_taxonomy(categories1, tags1, categories2=None, tags2=None):
         tags2: Optional second list of tags
 
     Returns:
-        dict with merged 'categories' and 'tags' lists
-    """
-    merged_categories = set(categories1 or [])
-    merged_tags = set(tags1 or [])
-
-    if categories2:
-        merged_categories.update(categories2)
-    if tags2:
-        merged_tags.update(tags2)
+        dict with merged 'categories' and 'tags' lists, and 'unmapped' - the names
+        (per list) that match no WordPress term; they are kept in the lists once each
+    """
+    from taxonomy_resolver import get_resolver, normalize
+
+    merged = {'categories': [], 'tags': []}
+    unmapped = {'categories': [], 'tags': []}
+    for kind, names in (('categories', (categories1 or []) + (categories2 or [])),
+                        ('tags', (tags1 or []) + (tags2 or []))):
+        resolver = get_resolver(kind)
+        seen = set()
+        for name in names:
+            term = resolver.resolve(name)
+            key = term or normalize(name)
+            if key in seen:
+                continue
+            seen.add(key)
+            merged[kind].append(term or name)
+            if term is None:
+                unmapped[kind].append(name)
 
     return {
-        'categories': list(merged_categories),
-        'tags': list(merged_tags)
+        'categories': merged['categories'],
+        'tags': merged['tags'],
+        'unmapped': unmapped
     }
@@ -0,0 +1,60 @@
+"""
+Lazy Client
+Defers building an API client (and importing its SDK) until the client is first used
+The Anthropic SDK alone takes about a second to import, so the server and CLI create
+their clients through factories instead of at import time.
+"""
+
+import logging
+import threading
+import time
+from typing import Any, Callable
+
+logger = logging.getLogger(__name__)
+
+
+class LazyClient:
+    """
+    Proxy that calls factory() on first attribute access and forwards to the result
+    (its own methods are named resolve/resolved so they do not shadow common client methods like get)
+
+    Usage:
+        def make_claude():
+            from anthropic import Anthropic
+            return Anthropic(api_key=...)
+
+        claude = LazyClient(make_claude, 'claude')
+        claude.messages.create(...)   # imports the SDK and builds the client here
+    """
+
+    def __init__(self, factory: Callable[[], Any], name: str = 'client'):
+        self._factory = factory
+        self._name = name
+        self._client = None
+        self._lock = threading.Lock()
+
+    @property
+    def resolved(self) -> bool:
+        return self._client is not None
+
+    def resolve(self) -> Any:
+        """The real client (built on first call)"""
+        if self._client is None:
+            with self._lock:
+                if self._client is None:
+                    started = time.perf_counter()
+                    self._client = self._factory()
+                    logger.info(f"Created {self._name} client ({(time.perf_counter() - started) * 1000:.0f} ms)")
+        return self._client
+
+    def __getattr__(self, name: str) -> Any:
+        if name in ('_factory', '_name', '_client', '_lock'):
+            raise AttributeError(name)  # not initialized yet (e.g. during copy)
+        return getattr(self.resolve(), name)
+
+    def __bool__(self) -> bool:
+        # Configured clients are truthy without being built (e.g. /health checks)
+        return True
+
+    def __repr__(self) -> str:
+        return f"<LazyClient {self._name} ({'built' if self.resolved else 'not built'})>"
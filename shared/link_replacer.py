@@ -8,9 +8,12 @@ import logging
 from typing import Dict, Tuple, List
 from urllib.parse import urlparse
 
+from tracing import traced
+
 logger = logging.getLogger(__name__)
 
 
+@traced()
 def extract_kcm_links(html: str) -> List[str]:
     """
     Extract all KCM internal links from HTML
@@ -40,6 +43,7 @@ def extract_kcm_links(html: str) -> List[str]:
     return unique_links
 
 
+@traced()
 def replace_kcm_links(html: str, url_mapping: Dict[str, str]) -> Tuple[str, Dict]:
     """
     Replace KCM internal links with WordPress links
@@ -66,7 +70,6 @@ def replace_kcm_links(html: str, url_mapping: Dict[str, str]) -> Tuple[str, Dict
         logger.info("No KCM internal links found in content")
         return html, {"replaced": 0, "not_found": [], "total_kcm_links": 0}
 
-    replaced_count = 0
     not_found = []
 
     # Normalize the mapping keys for matching
@@ -76,40 +79,38 @@ def replace_kcm_links(html: str, url_mapping: Dict[str, str]) -> Tuple[str, Dict
         normalized_key = f"{parsed.scheme}://{parsed.netloc}{parsed.path}".rstrip('/')
         normalized_mapping[normalized_key] = wp_url
 
-    # Replace each KCM link
-    updated_html = html
-
+    # Every href spelling to replace (with/without trailing slash, http/https), lowercased
+    # so one pass over the anchors handles all links instead of one pass per variation
+    replacements = {}
     for kcm_url in kcm_links:
         if kcm_url in normalized_mapping:
             wp_url = normalized_mapping[kcm_url]
-
-            # Replace all variations of this URL (with/without trailing slash, http/https)
-            # Pattern matches the URL in href attributes
-            variations = [
-                kcm_url,
-                kcm_url + '/',
-                kcm_url.replace('https://', 'http://'),
-                kcm_url.replace('http://', 'https://'),
-                kcm_url.replace('https://', 'http://') + '/',
-                kcm_url.replace('http://', 'https://') + '/'
-            ]
-
-            for variation in variations:
-                # Escape special regex characters in URL
-                escaped_url = re.escape(variation)
-                pattern = f'(<a[^>]+href=["\']){escaped_url}(["\'][^>]*>)'
-                replacement = f'\\1{wp_url}\\2'
-                new_html = re.sub(pattern, replacement, updated_html, flags=re.IGNORECASE)
-
-                if new_html != updated_html:
-                    logger.info(f"Replaced: {variation} -> {wp_url}")
-                    replaced_count += 1
-                    updated_html = new_html
-
+            for variation in (kcm_url.replace('http://', 'https://'), kcm_url.replace('https://', 'http://')):
+                replacements.setdefault(variation.lower(), wp_url)
+                replacements.setdefault(variation.lower() + '/', wp_url)
         else:
             not_found.append(kcm_url)
             logger.warning(f"⚠️  No WordPress URL found for: {kcm_url}")
 
+    replaced_variations = set()
+
+    def replace_href(match):
+        href = match.group(2)
+        wp_url = replacements.get(href.lower())
+        if wp_url is None:
+            return match.group(0)
+        if href.lower() not in replaced_variations:
+            replaced_variations.add(href.lower())
+            logger.info(f"Replaced: {href} -> {wp_url}")
+        return f"{match.group(1)}{wp_url}{match.group(3)}"
+
+    updated_html = html
+    if replacements:
+        # \s before href: the anchor's own href, not data-orig-href or another *-href attribute
+        pattern = r'(<a\b[^>]*?\shref=["\'])([^"\']*)(["\'][^>]*>)'
+        updated_html = re.sub(pattern, replace_href, html, flags=re.IGNORECASE)
+    replaced_count = len(replaced_variations)
+
     stats = {
         "replaced": replaced_count,
         "not_found": not_found,
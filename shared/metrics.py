@@ -0,0 +1,247 @@
+"""
+Metrics
+Minimal in-process counters and histograms rendered in the Prometheus text format
+Recording is a dict lookup and a few additions under a lock, cheap enough for every request
+"""
+
+import time
+import logging
+import threading
+from bisect import bisect_left
+from contextlib import contextmanager
+from typing import Callable, Dict, List, Optional, Tuple
+
+from tracing import span
+
+logger = logging.getLogger(__name__)
+
+# Latency buckets in seconds (a conversion stage runs from milliseconds to minutes)
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0)
+
+
+def _escape(value: str) -> str:
+    return str(value).replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"')
+
+
+def _format_labels(names: Tuple[str, ...], values: Tuple, extra: str = '') -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return '{' + ','.join(pairs) + '}' if pairs else ''
+
+
+def _format_value(value: float) -> str:
+    if value == float('inf'):
+        return '+Inf'
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Counter:
+    """Monotonic counter with optional labels"""
+
+    def __init__(self, name: str, help_text: str, labelnames: Tuple[str, ...] = ()):
+        self.name = name
+        self.help_text = help_text
+        self.labelnames = tuple(labelnames)
+        self._values: Dict[Tuple, float] = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount: float = 1, **labels):
+        key = tuple(labels.get(name, '') for name in self.labelnames)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def values(self) -> Dict[Tuple, float]:
+        with self._lock:
+            return dict(self._values)
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} counter"]
+        for key, value in sorted(self.values().items()):
+            lines.append(f"{self.name}{_format_labels(self.labelnames, key)} {_format_value(value)}")
+        return lines
+
+
+class Histogram:
+    """Fixed-bucket histogram with optional labels"""
+
+    def __init__(self, name: str, help_text: str, labelnames: Tuple[str, ...] = (),
+                 buckets: Tuple[float, ...] = DEFAULT_BUCKETS):
+        self.name = name
+        self.help_text = help_text
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(sorted(buckets))
+        self._series: Dict[Tuple, List] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, **labels):
+        key = tuple(labels.get(name, '') for name in self.labelnames)
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                # [per-bucket counts (+Inf last), sum, count]
+                series = self._series[key] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            series[0][index] += 1
+            series[1] += value
+            series[2] += 1
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            snapshot = {key: (list(s[0]), s[1], s[2]) for key, s in self._series.items()}
+        for key, (counts, total, count) in sorted(snapshot.items()):
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets + (float('inf'),), counts):
+                cumulative += bucket_count
+                le = 'le="' + _format_value(bound) + '"'
+                lines.append(f"{self.name}_bucket{_format_labels(self.labelnames, key, le)} {cumulative}")
+            labels = _format_labels(self.labelnames, key)
+            lines.append(f"{self.name}_sum{labels} {_format_value(total)}")
+            lines.append(f"{self.name}_count{labels} {count}")
+        return lines
+
+
+class Registry:
+    """Collection of metrics plus gauge callbacks evaluated at scrape time"""
+
+    def __init__(self):
+        self._metrics: List = []
+        self._gauges: List[Tuple[str, str, Tuple[str, ...], Callable[[], Dict[Tuple, float]]]] = []
+
+    def counter(self, name: str, help_text: str, labelnames: Tuple[str, ...] = ()) -> Counter:
+        metric = Counter(name, help_text, labelnames)
+        self._metrics.append(metric)
+        return metric
+
+    def histogram(self, name: str, help_text: str, labelnames: Tuple[str, ...] = (),
+                  buckets: Tuple[float, ...] = DEFAULT_BUCKETS) -> Histogram:
+        metric = Histogram(name, help_text, labelnames, buckets)
+        self._metrics.append(metric)
+        return metric
+
+    def gauge_callback(self, name: str, help_text: str, labelnames: Tuple[str, ...],
+                       collect: Callable[[], Dict[Tuple, float]]):
+        """Register a gauge whose values are read from collect() on every scrape"""
+        self._gauges.append((name, help_text, tuple(labelnames), collect))
+
+    def render(self) -> str:
+        lines = []
+        for metric in self._metrics:
+            lines.extend(metric.render())
+        for name, help_text, labelnames, collect in self._gauges:
+            try:
+                values = collect()
+            except Exception as e:
+                logger.warning(f"Metrics collector {name} failed: {e}")
+                continue
+            lines.append(f"# HELP {name} {help_text}")
+            lines.append(f"# TYPE {name} gauge")
+            for key, value in sorted(values.items()):
+                lines.append(f"{name}{_format_labels(labelnames, key)} {_format_value(value)}")
+        return '\n'.join(lines) + '\n'
+
+
+REGISTRY = Registry()
+
+STAGE_SECONDS = REGISTRY.histogram(
+    'kcm_stage_duration_seconds', 'Latency of each conversion and publishing stage', ('stage',)
+)
+STAGE_ERRORS = REGISTRY.counter(
+    'kcm_stage_errors_total', 'Failed calls per conversion and publishing stage', ('stage',)
+)
+CLAUDE_TOKENS = REGISTRY.counter(
+    'kcm_claude_tokens_total', 'Claude tokens by kind (input, output, cache_read, cache_creation)', ('kind',)
+)
+CACHE_REQUESTS = REGISTRY.counter(
+    'kcm_cache_requests_total', 'Cache lookups by cache and result (hit, miss)', ('cache', 'result')
+)
+SINGLE_FLIGHT_CALLS = REGISTRY.counter(
+    'kcm_single_flight_calls_total', 'Coalesced lookups by group and role (upstream, shared)', ('group', 'role')
+)
+
+
+def _cache_hit_ratios() -> Dict[Tuple, float]:
+    totals: Dict[str, List[float]] = {}
+    for (cache, result), count in CACHE_REQUESTS.values().items():
+        hits_and_total = totals.setdefault(cache, [0, 0])
+        hits_and_total[1] += count
+        if result == 'hit':
+            hits_and_total[0] += count
+    return {(cache,): round(hits / total, 4) for cache, (hits, total) in totals.items() if total}
+
+
+REGISTRY.gauge_callback('kcm_cache_hit_ratio', 'Share of cache lookups that were hits', ('cache',), _cache_hit_ratios)
+
+
+def _single_flight_fan_out() -> Dict[Tuple, float]:
+    totals: Dict[str, List[float]] = {}
+    for (group, role), count in SINGLE_FLIGHT_CALLS.values().items():
+        upstream_and_total = totals.setdefault(group, [0, 0])
+        upstream_and_total[1] += count
+        if role == 'upstream':
+            upstream_and_total[0] += count
+    return {(group,): round(total / upstream, 4) for group, (upstream, total) in totals.items() if upstream}
+
+
+REGISTRY.gauge_callback('kcm_single_flight_fan_out', 'Callers served per upstream call', ('group',), _single_flight_fan_out)
+
+
+@contextmanager
+def timed(stage: str):
+    """
+    Time a block as one observation of a stage (an exception also counts as a stage error)
+    Inside a traced request the block is also recorded as a span named after the stage
+    """
+    started = time.perf_counter()
+    try:
+        with span(stage):
+            yield
+    except BaseException:
+        STAGE_ERRORS.inc(stage=stage)
+        raise
+    finally:
+        STAGE_SECONDS.observe(time.perf_counter() - started, stage=stage)
+
+
+def record_error(stage: str):
+    """Count a stage failure that was handled without raising (e.g. a function returning None)"""
+    STAGE_ERRORS.inc(stage=stage)
+
+
+def record_cache(cache: str, hit: bool):
+    """Count one cache lookup"""
+    CACHE_REQUESTS.inc(cache=cache, result='hit' if hit else 'miss')
+
+
+def record_single_flight(group: str, shared: bool):
+    """Count one coalesced lookup (shared: it waited for a call already in flight)"""
+    SINGLE_FLIGHT_CALLS.inc(group=group, role='shared' if shared else 'upstream')
+
+
+def record_claude_usage(message) -> Optional[Dict[str, int]]:
+    """
+    Add the token usage of an Anthropic Message to the token counters
+
+    Returns:
+        Usage dict (input, output, cache_read, cache_creation) or None if the message has no usage
+    """
+    usage = getattr(message, 'usage', None)
+    if usage is None:
+        return None
+
+    counts = {
+        'input': getattr(usage, 'input_tokens', 0) or 0,
+        'output': getattr(usage, 'output_tokens', 0) or 0,
+        'cache_read': getattr(usage, 'cache_read_input_tokens', 0) or 0,
+        'cache_creation': getattr(usage, 'cache_creation_input_tokens', 0) or 0
+    }
+    for kind, count in counts.items():
+        if count:
+            CLAUDE_TOKENS.inc(count, kind=kind)
+    return counts
+
+
+def render() -> str:
+    """All metrics in the Prometheus text exposition format"""
+    return REGISTRY.render()
@@ -4,19 +4,26 @@ Tracks KCM to WordPress post conversions in a Notion database
 """
 
 import os
+import time
+import threading
 from datetime import datetime
-from typing import Dict, List, Optional
+from typing import Callable, Dict, List, Optional
 import logging
 
+from metrics import record_cache
+from shared_cache import CacheNamespace, cache_key
+import single_flight
+
 logger = logging.getLogger(__name__)
 
 
-def get_url_mappings(notion_client) -> Dict[str, str]:
+def get_url_mappings(notion_client, raise_errors: bool = False) -> Dict[str, str]:
     """
     Query Notion conversion database and return KCM URL -> WordPress URL mapping
 
     Args:
         notion_client: Authenticated Notion client
+        raise_errors: Re-raise Notion errors instead of returning an empty mapping
 
     Returns:
         Dictionary mapping KCM URLs to WordPress URLs
@@ -65,6 +72,8 @@ def get_url_mappings(notion_client) -> Dict[str, str]:
 
     except Exception as e:
         logger.error(f"Failed to load URL mappings from Notion: {e}")
+        if raise_errors:
+            raise
         return {}
 
 
@@ -82,7 +91,8 @@ def add_conversion_record(
     seo_title: str,
     meta_description: str,
     internal_links_count: int = 0,
-    status: str = "Published"
+    status: str = "Published",
+    raise_errors: bool = False
 ) -> Optional[str]:
     """
     Add a new conversion record to the Notion database
@@ -102,6 +112,7 @@ def add_conversion_record(
         meta_description: Meta description
         internal_links_count: Number of internal links found
         status: Conversion status (Published, Draft, Failed)
+        raise_errors: Re-raise Notion errors instead of returning None (for callers that retry)
 
     Returns:
         Notion page ID if successful, None otherwise
@@ -207,12 +218,116 @@ def add_conversion_record(
         return page_id
 
     except Exception as e:
+        if raise_errors:
+            raise
         logger.error(f"Failed to add conversion record to Notion: {e}")
         import traceback
         logger.error(traceback.format_exc())
         return None
 
 
+# Seconds before a failed reload is tried again (the previous mapping is kept meanwhile)
+RELOAD_RETRY_DELAY = 30
+
+
+class UrlMappingCache:
+    """
+    In-memory KCM URL -> WordPress URL mapping, reloaded from Notion after a TTL
+    New conversions are added immediately so links resolve before Notion is written
+    With a shared cache namespace, a reload by one process serves every other process too
+    """
+
+    def __init__(self, notion_client, ttl: float = 300, pending: Optional[Callable[[], Dict[str, str]]] = None,
+                 shared: Optional[CacheNamespace] = None):
+        """
+        Args:
+            notion_client: Authenticated Notion client
+            ttl: Seconds before the mapping is reloaded from Notion
+            pending: Returns mappings queued but not yet written to Notion (merged over each reload)
+            shared: Cache namespace holding the last reload of any process
+        """
+        self.notion_client = notion_client
+        self.ttl = ttl
+        self.pending = pending
+        self.shared = shared
+        self._shared_key = cache_key('url_mappings', os.getenv('NOTION_CONVERSION_DB_ID'))
+        self._mapping: Optional[Dict[str, str]] = None
+        self._loaded_at = 0.0
+        self._lock = threading.Lock()
+
+    def get(self) -> Dict[str, str]:
+        """Return the mapping, reloading it from Notion if it is older than the TTL"""
+        with self._lock:
+            if self._mapping is not None and time.monotonic() - self._loaded_at < self.ttl:
+                record_cache('url_mapping', True)
+                return dict(self._mapping)
+
+        record_cache('url_mapping', False)
+        try:
+            return self.refresh(max_age=self.ttl)
+        except Exception:
+            # refresh() kept the previous mapping and scheduled a retry
+            with self._lock:
+                return dict(self._mapping or {})
+
+    def refresh(self, max_age: Optional[float] = None) -> Dict[str, str]:
+        """
+        Reload the mapping from Notion now (the cache warmer calls this before the TTL runs out)
+
+        Args:
+            max_age: Use another process's reload instead if it is at most this many seconds old
+
+        Raises:
+            The Notion error if the reload failed - the previous mapping (or, before the first
+            load, the pending one) is kept and the reload is retried after RELOAD_RETRY_DELAY
+        """
+        shared = self.shared.get(self._shared_key) if self.shared and max_age else None
+        if shared and time.time() - shared['loaded_at'] <= max_age:
+            mapping = shared['mapping']
+            age = time.time() - shared['loaded_at']
+        else:
+            try:
+                # Concurrent misses share one reload
+                mapping = dict(single_flight.group('notion').do(
+                    ('url_mappings', id(self)), get_url_mappings, self.notion_client, raise_errors=True
+                ))
+            except Exception:
+                self._keep_after_failure()
+                raise
+            if self.pending:
+                mapping.update(self.pending())
+            # Only a successful load is published - a failed one raised above and stays in this process
+            if self.shared:
+                self.shared.put(self._shared_key, {'mapping': mapping, 'loaded_at': time.time()})
+            age = 0.0
+
+        with self._lock:
+            self._mapping = mapping
+            self._loaded_at = time.monotonic() - age
+            return dict(mapping)
+
+    def _keep_after_failure(self):
+        """Keep serving the last good mapping, but only until the retry delay has passed"""
+        with self._lock:
+            if self._mapping is None:
+                self._mapping = dict(self.pending()) if self.pending else {}
+            self._loaded_at = time.monotonic() - self.ttl + RELOAD_RETRY_DELAY
+            logger.warning(f"Keeping {len(self._mapping)} URL mappings - reloading again in {RELOAD_RETRY_DELAY}s")
+
+    def add(self, kcm_url: str, wordpress_url: str):
+        """Record a new conversion without waiting for the next reload"""
+        with self._lock:
+            if self._mapping is not None:
+                self._mapping[kcm_url] = wordpress_url
+        if self.shared:
+            # Lost updates between processes are merged back from `pending` on the next reload
+            shared = self.shared.get(self._shared_key)
+            if shared:
+                shared['mapping'][kcm_url] = wordpress_url
+                self.shared.put(self._shared_key, shared)
+        logger.info(f"Mapped: {kcm_url} -> {wordpress_url} (cached)")
+
+
 def create_conversion_database_schema():
     """
     Returns the schema for the Notion conversion tracking database
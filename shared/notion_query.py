@@ -0,0 +1,145 @@
+"""
+Notion Query
+Push-down filters for the context database query
+Instead of downloading every page with every property and filtering in Python, a topic
+search asks Notion for the master document plus the pages whose title or keywords contain
+a topic (one compound `or` filter), and only the Title and Keywords / Tags properties are
+returned (filter_properties). Callers fall back to a full scan when the filter can't be
+built or the filtered query fails.
+"""
+
+import logging
+import functools
+from typing import Awaitable, Callable, Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+TITLE_PROPERTY = 'Title'
+KEYWORDS_PROPERTY = 'Keywords / Tags'
+
+# Notion accepts at most 100 conditions in one compound filter
+MAX_FILTER_CONDITIONS = 100
+
+
+class ContextSchema:
+    """Property IDs and keyword options of the context database (from databases.retrieve)"""
+
+    def __init__(self, database: Dict):
+        properties = database.get('properties', {})
+        self.property_ids = [
+            properties[name]['id'] for name in (TITLE_PROPERTY, KEYWORDS_PROPERTY)
+            if properties.get(name, {}).get('id')
+        ]
+        self.has_title = properties.get(TITLE_PROPERTY, {}).get('type') == 'title'
+        keywords = properties.get(KEYWORDS_PROPERTY, {})
+        self.keywords_type = keywords.get('type')
+        self.keyword_options = [option['name'] for option in keywords.get('multi_select', {}).get('options', [])]
+
+    def query_args(self) -> Dict:
+        """databases.query arguments that return only the Title and Keywords / Tags properties"""
+        return {'filter_properties': self.property_ids} if self.property_ids else {}
+
+
+def master_doc_filter(master_doc_name: str) -> Dict:
+    """Filter for the master document (same case-insensitive substring match as the ranking)"""
+    return {'property': TITLE_PROPERTY, 'title': {'contains': master_doc_name}}
+
+
+def topic_conditions(topics: List[str], schema: ContextSchema) -> List[Dict]:
+    """
+    Filter conditions for the pages the ranking can score above zero
+
+    The ranking matches topics as case-insensitive substrings of the title and keywords.
+    Notion's title/rich_text `contains` does the same, but multi_select `contains` only
+    matches whole option names, so each topic becomes one condition per option containing it.
+    """
+    conditions = []
+    seen = set()
+    for topic in topics:
+        topic_lower = topic.lower().strip()
+        if not topic_lower or topic_lower in seen:
+            continue
+        seen.add(topic_lower)
+        conditions.append({'property': TITLE_PROPERTY, 'title': {'contains': topic_lower}})
+        if schema.keywords_type == 'multi_select':
+            conditions.extend(
+                {'property': KEYWORDS_PROPERTY, 'multi_select': {'contains': option}}
+                for option in schema.keyword_options if topic_lower in option.lower()
+            )
+        elif schema.keywords_type == 'rich_text':
+            conditions.append({'property': KEYWORDS_PROPERTY, 'rich_text': {'contains': topic_lower}})
+    return conditions
+
+
+def context_filter(topics: List[str], schema: ContextSchema, master_doc_name: str) -> Optional[Dict]:
+    """
+    Compound filter for a topic search: the master document or any page a topic matches
+
+    Returns:
+        The filter, or None if it can't be pushed down (no Title property, too many conditions)
+    """
+    if not schema.has_title:
+        return None
+    conditions = [master_doc_filter(master_doc_name)] + topic_conditions(topics, schema)
+    if len(conditions) > MAX_FILTER_CONDITIONS:
+        logger.info(f"{len(conditions)} filter conditions exceed Notion's limit - scanning every page")
+        return None
+    return {'or': conditions}
+
+
+def cursor_args(response: Optional[Dict]) -> Optional[Dict]:
+    """
+    Arguments for the next request of a paginated Notion list or query
+
+    Args:
+        response: The previous response, or None before the first request
+
+    Returns:
+        {} for the first request, {'start_cursor': ...} for the next one, None when done
+    """
+    if response is None:
+        return {}
+    if not response['has_more'] or not response.get('next_cursor'):
+        return None
+    return {'start_cursor': response['next_cursor']}
+
+
+def collect_results(fetch: Callable[..., Dict]) -> List[Dict]:
+    """Every result of a paginated Notion call (fetch takes the start_cursor argument)"""
+    results = []
+    args = cursor_args(None)
+    while args is not None:
+        response = fetch(**args)
+        results.extend(response['results'])
+        args = cursor_args(response)
+    return results
+
+
+async def collect_results_async(fetch: Callable[..., Awaitable[Dict]]) -> List[Dict]:
+    """collect_results() for an async Notion client"""
+    results = []
+    args = cursor_args(None)
+    while args is not None:
+        response = await fetch(**args)
+        results.extend(response['results'])
+        args = cursor_args(response)
+    return results
+
+
+def query_pages(notion_client, database_id: str, **query) -> List[Dict]:
+    """
+    Every page a databases.query returns (follows pagination)
+
+    Args:
+        notion_client: Notion client
+        database_id: Database to query
+        **query: filter, filter_properties, sorts
+    """
+    return collect_results(functools.partial(notion_client.databases.query, database_id=database_id, **query))
+
+
+async def query_pages_async(notion_client, database_id: str, **query) -> List[Dict]:
+    """query_pages() for an async Notion client"""
+    return await collect_results_async(
+        functools.partial(notion_client.databases.query, database_id=database_id, **query)
+    )
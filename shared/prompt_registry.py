@@ -0,0 +1,148 @@
+"""
+Prompt Registry
+Loads the versioned rewrite prompt templates (kcm_prompt_ACTIVE.md, kcm_prompt_v17.md ...) once
+and keeps them in memory
+A template is re-read only when its file's modification time or size changes, so editing a
+prompt takes effect on the next conversion without a restart. Each template carries its
+version and a content hash (usable as part of a response cache key).
+"""
+
+import os
+import re
+import hashlib
+import logging
+import threading
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+ACTIVE = 'ACTIVE'
+FALLBACK = 'fallback'
+DEFAULT_PATTERN = 'kcm_prompt_*.md'
+
+# "# KCM to South Jersey Blog Conversion Prompt - VERSION 24"
+_VERSION_HEADER = re.compile(r'VERSION\s+(\d+(?:\.\d+)?)', re.IGNORECASE)
+
+
+@dataclass(frozen=True)
+class PromptTemplate:
+    """One loaded template"""
+    name: str            # ACTIVE, v17 ... (from the file name), or 'fallback'
+    version: str         # version from the template header (e.g. v24), else the name
+    text: str
+    sha256: str          # first 16 hex chars of the content hash
+    path: Optional[str] = None
+    mtime: float = 0.0
+    size: int = 0
+
+    def info(self) -> Dict:
+        return {'name': self.name, 'version': self.version, 'sha256': self.sha256, 'chars': len(self.text)}
+
+
+def template_name(path: Path, pattern: str = DEFAULT_PATTERN) -> str:
+    """Registry name of a template file: kcm_prompt_v17.md -> v17"""
+    prefix, _, suffix = pattern.partition('*')
+    name = path.name
+    if name.startswith(prefix) and name.endswith(suffix):
+        return name[len(prefix):len(name) - len(suffix)]
+    return path.stem
+
+
+def make_template(name: str, text: str, path: Optional[str] = None, mtime: float = 0.0,
+                  size: int = 0) -> PromptTemplate:
+    match = _VERSION_HEADER.search(text[:500])
+    version = f"v{match.group(1)}" if match else name
+    sha256 = hashlib.sha256(text.encode('utf-8')).hexdigest()[:16]
+    return PromptTemplate(name=name, version=version, text=text, sha256=sha256, path=path, mtime=mtime, size=size)
+
+
+class PromptRegistry:
+    """Cached, mtime-checked access to the prompt templates in one directory"""
+
+    def __init__(self, directory: Path, pattern: str = DEFAULT_PATTERN, fallback: Optional[str] = None,
+                 default: Optional[str] = None):
+        """
+        Args:
+            directory: Folder with the template files
+            pattern: Glob for template files ('*' is the template name)
+            fallback: Text used when the requested template file is missing
+            default: Template returned by get() with no name (PROMPT_VERSION env var, else ACTIVE)
+        """
+        self.directory = Path(directory)
+        self.pattern = pattern
+        self.default = default or os.getenv('PROMPT_VERSION', ACTIVE)
+        self.fallback = make_template(FALLBACK, fallback) if fallback is not None else None
+        self._templates: Dict[str, PromptTemplate] = {}
+        self._missing = set()
+        self._lock = threading.Lock()
+        self.loads = 0
+        self.hits = 0
+
+    def path_for(self, name: str) -> Path:
+        return self.directory / self.pattern.replace('*', name)
+
+    def get(self, name: Optional[str] = None) -> PromptTemplate:
+        """
+        A template, re-read only if its file changed since it was loaded
+
+        Args:
+            name: Template name (ACTIVE, v17 ...); defaults to the registry default
+
+        Returns:
+            The template, or the fallback if the file is missing and a fallback was given
+
+        Raises:
+            FileNotFoundError: The file is missing and there is no fallback
+        """
+        name = name or self.default
+        path = self.path_for(name)
+        try:
+            stat = path.stat()
+        except FileNotFoundError:
+            if self.fallback is None:
+                raise
+            if name not in self._missing:
+                self._missing.add(name)
+                self._templates.pop(name, None)
+                logger.warning(f"Prompt template {path} not found, using fallback prompt")
+            return self.fallback
+
+        cached = self._templates.get(name)
+        if cached and (cached.mtime, cached.size) == (stat.st_mtime, stat.st_size):
+            self.hits += 1
+            return cached
+
+        with self._lock:
+            cached = self._templates.get(name)
+            if cached and (cached.mtime, cached.size) == (stat.st_mtime, stat.st_size):
+                self.hits += 1
+                return cached
+            with open(path, 'r', encoding='utf-8') as f:
+                text = f.read()
+            template = make_template(name, text, str(path), stat.st_mtime, stat.st_size)
+            self._templates[name] = template
+            self._missing.discard(name)
+            self.loads += 1
+        logger.info(f"{'Reloaded' if cached else 'Loaded'} prompt template {name} "
+                    f"({template.version}, sha256 {template.sha256})")
+        return template
+
+    def names(self) -> List[str]:
+        """Template names available on disk, e.g. ['ACTIVE', 'v17', ..., 'v21']"""
+        return sorted(template_name(path, self.pattern) for path in self.directory.glob(self.pattern))
+
+    def preload(self) -> List[PromptTemplate]:
+        """Load every template on disk (startup)"""
+        return [self.get(name) for name in self.names()]
+
+    def stats(self) -> Dict:
+        active = self.get()
+        return {
+            'default': self.default,
+            'active': active.info(),
+            'loaded': sorted(self._templates),
+            'loads': self.loads,
+            'hits': self.hits
+        }
@@ -0,0 +1,198 @@
+"""
+Publish Guard
+Idempotency layer for WordPress publishing keyed by KCM URL + converted content hash
+The first successful publish is remembered on disk and returned for every duplicate,
+and concurrent duplicates wait for the in-flight publish instead of starting their own
+"""
+
+import os
+import json
+import hashlib
+import sqlite3
+import logging
+import threading
+from datetime import datetime
+from pathlib import Path
+from typing import Callable, Dict, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+# Default database location (next to the shared modules)
+DEFAULT_GUARD_PATH = Path(__file__).parent / '.cache' / 'publish_guard.db'
+
+# How long a duplicate waits for the in-flight publish before giving up (seconds)
+DEFAULT_WAIT_TIMEOUT = 300
+
+# Outcomes returned by PublishGuard.run
+NEW = 'new'
+CACHED = 'cached'
+COALESCED = 'coalesced'
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS publishes (
+    publish_key TEXT PRIMARY KEY,
+    kcm_url TEXT,
+    content_hash TEXT NOT NULL,
+    result TEXT NOT NULL,
+    notion_page_id TEXT,
+    created_at TEXT NOT NULL,
+    tracked_at TEXT
+);
+"""
+
+
+def content_hash(content: str) -> str:
+    """SHA-256 of the converted HTML (whitespace at the ends ignored)"""
+    return hashlib.sha256(content.strip().encode('utf-8')).hexdigest()
+
+
+def make_publish_key(kcm_url: str, content: str) -> str:
+    """
+    Build the idempotency key for a publish
+
+    Args:
+        kcm_url: Original KCM article URL ('' if unknown)
+        content: Converted HTML as sent by the frontend
+
+    Returns:
+        Hex key combining the URL and the content hash
+    """
+    return hashlib.sha256(f"{kcm_url.strip()}\n{content_hash(content)}".encode('utf-8')).hexdigest()
+
+
+class _InFlight:
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+
+
+class PublishGuard:
+    """Disk-backed record of successful publishes with in-process coalescing"""
+
+    def __init__(self, db_path: Optional[Path] = None, wait_timeout: float = DEFAULT_WAIT_TIMEOUT):
+        """
+        Args:
+            db_path: SQLite file holding completed publishes
+            wait_timeout: Seconds a duplicate waits for the in-flight publish
+        """
+        self.db_path = Path(db_path or os.getenv('PUBLISH_GUARD_PATH', DEFAULT_GUARD_PATH))
+        self.db_path.parent.mkdir(parents=True, exist_ok=True)
+        self.wait_timeout = wait_timeout
+
+        self._lock = threading.Lock()
+        self._in_flight: Dict[str, _InFlight] = {}
+        self.counts = {NEW: 0, CACHED: 0, COALESCED: 0}
+
+        with self._connect() as conn:
+            conn.executescript(SCHEMA)
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(self.db_path, timeout=30)
+        conn.row_factory = sqlite3.Row
+        conn.execute("PRAGMA journal_mode=WAL")
+        return conn
+
+    def lookup(self, publish_key: str) -> Optional[Dict]:
+        """Return the stored publish record ({'result', 'notion_page_id', ...}) or None"""
+        with self._connect() as conn:
+            row = conn.execute("SELECT * FROM publishes WHERE publish_key = ?", (publish_key,)).fetchone()
+        if not row:
+            return None
+        record = dict(row)
+        record['result'] = json.loads(record['result'])
+        return record
+
+    def forget(self, publish_key: str):
+        """Drop a stored publish so the next request publishes again"""
+        with self._connect() as conn:
+            conn.execute("DELETE FROM publishes WHERE publish_key = ?", (publish_key,))
+
+    def _store(self, publish_key: str, kcm_url: str, content: str, result: Dict):
+        with self._connect() as conn:
+            conn.execute(
+                """INSERT OR REPLACE INTO publishes (publish_key, kcm_url, content_hash, result, created_at)
+                   VALUES (?, ?, ?, ?, ?)""",
+                (publish_key, kcm_url, content_hash(content), json.dumps(result), datetime.now().isoformat())
+            )
+
+    def run(
+        self,
+        kcm_url: str,
+        content: str,
+        publish: Callable[[], Dict],
+        is_valid: Optional[Callable[[Dict], bool]] = None
+    ) -> Tuple[Dict, str]:
+        """
+        Publish once per (KCM URL, content) pair
+
+        Args:
+            kcm_url: Original KCM article URL
+            content: Converted HTML the publish is for
+            publish: Performs the publish and returns a JSON-able result ({'success': True, ...})
+            is_valid: Optional check that a stored result still counts (e.g. its delivery has not failed)
+
+        Returns:
+            (result, outcome) where outcome is NEW, CACHED or COALESCED
+        """
+        publish_key = make_publish_key(kcm_url, content)
+
+        stored = self.lookup(publish_key)
+        if stored and (is_valid is None or is_valid(stored['result'])):
+            self._count(CACHED)
+            logger.info(f"Duplicate publish {publish_key[:12]}... - returning the first result")
+            return stored['result'], CACHED
+
+        with self._lock:
+            flight = self._in_flight.get(publish_key)
+            owner = flight is None
+            if owner:
+                flight = self._in_flight[publish_key] = _InFlight()
+
+        if not owner:
+            logger.info(f"Publish {publish_key[:12]}... already in progress - waiting for it")
+            if flight.done.wait(self.wait_timeout) and flight.result is not None:
+                self._count(COALESCED)
+                return flight.result, COALESCED
+            # The in-flight publish failed or timed out - run our own
+            return self.run(kcm_url, content, publish, is_valid)
+
+        try:
+            result = publish()
+            if result.get('success'):
+                result = {**result, 'publish_key': publish_key}
+                self._store(publish_key, kcm_url, content, result)
+                flight.result = result
+            self._count(NEW)
+            return result, NEW
+        finally:
+            with self._lock:
+                self._in_flight.pop(publish_key, None)
+            flight.done.set()
+
+    def mark_tracked(self, publish_key: str, notion_page_id: str) -> bool:
+        """
+        Record that the publish was tracked in Notion
+
+        Returns:
+            False if it had already been tracked (the caller should skip the duplicate row)
+        """
+        with self._connect() as conn:
+            cursor = conn.execute(
+                "UPDATE publishes SET notion_page_id = ?, tracked_at = ? WHERE publish_key = ? AND notion_page_id IS NULL",
+                (notion_page_id, datetime.now().isoformat(), publish_key)
+            )
+        return cursor.rowcount > 0
+
+    def is_tracked(self, publish_key: str) -> bool:
+        """True if a Notion conversion record already exists for this publish"""
+        record = self.lookup(publish_key)
+        return bool(record and record.get('notion_page_id'))
+
+    def _count(self, outcome: str):
+        with self._lock:
+            self.counts[outcome] += 1
+
+    def stats(self) -> Dict:
+        """Publish outcomes since startup (new, cached, coalesced)"""
+        with self._lock:
+            return dict(self.counts)
@@ -0,0 +1,360 @@
+"""
+Rate Limiter
+Concurrency limits and adaptive token-bucket rate control for shared API clients
+Excess calls wait in line instead of failing, and 429 responses slow the bucket down
+Sync and async callers share the same limits (async waits never block the event loop)
+Limits are per server: each worker process enforces an equal share of them
+"""
+
+import os
+import time
+import asyncio
+import logging
+import threading
+from contextlib import contextmanager, asynccontextmanager
+from typing import Any, Callable, Dict, Optional
+
+from tracing import span
+
+logger = logging.getLogger(__name__)
+
+# Maximum retries of a single call after rate-limit (429) responses
+DEFAULT_MAX_RATE_LIMIT_RETRIES = 4
+
+# Backoff used when a 429 response carries no retry-after header (seconds)
+DEFAULT_RETRY_AFTER = 2.0
+
+
+def _env_float(name: str, default: float) -> float:
+    try:
+        return float(os.getenv(name, default))
+    except ValueError:
+        logger.warning(f"Invalid {name} - using default {default}")
+        return default
+
+
+def worker_processes() -> int:
+    """Server processes that each hold their own limiters (SERVER_WORKERS env var, default 1)"""
+    try:
+        return max(1, int(os.getenv('SERVER_WORKERS', 1)))
+    except ValueError:
+        logger.warning("Invalid SERVER_WORKERS - assuming 1 process")
+        return 1
+
+
+def get_status_code(error: Exception) -> Optional[int]:
+    """Return the HTTP status of an Anthropic, Notion or requests error (None if not HTTP)"""
+    status = getattr(error, 'status_code', None) or getattr(error, 'status', None)
+    if status is None:
+        response = getattr(error, 'response', None)
+        status = getattr(response, 'status_code', None)
+    return status if isinstance(status, int) else None
+
+
+def get_retry_after(error: Exception) -> Optional[float]:
+    """Return the retry-after delay (seconds) carried by an error response, if any"""
+    headers = getattr(error, 'headers', None)
+    if headers is None:
+        headers = getattr(getattr(error, 'response', None), 'headers', None)
+    if not headers:
+        return None
+    try:
+        value = headers.get('retry-after')
+        return float(value) if value is not None else None
+    except (TypeError, ValueError):
+        return None
+
+
+def is_rate_limited(error: Exception) -> bool:
+    """True for HTTP 429 responses (Anthropic RateLimitError, Notion rate_limited)"""
+    return get_status_code(error) == 429 or getattr(error, 'code', None) == 'rate_limited'
+
+
+class TokenBucket:
+    """Thread-safe token bucket whose rate can shrink and recover at runtime"""
+
+    def __init__(self, rate_per_second: float, burst: Optional[float] = None):
+        """
+        Args:
+            rate_per_second: Sustained request rate
+            burst: Bucket capacity (defaults to one second of requests, minimum 1)
+        """
+        self.max_rate = rate_per_second
+        self.rate = rate_per_second
+        self.capacity = burst or max(1.0, rate_per_second)
+        self.tokens = self.capacity
+        self.paused_until = 0.0
+        self.updated_at = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _refill(self, now: float):
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated_at) * self.rate)
+        self.updated_at = now
+
+    def _try_take(self) -> float:
+        """Take a token if one is available, otherwise return the seconds to wait"""
+        with self._lock:
+            now = time.monotonic()
+            self._refill(now)
+            if now >= self.paused_until and self.tokens >= 1:
+                self.tokens -= 1
+                return 0.0
+            return max(self.paused_until - now, (1 - self.tokens) / self.rate)
+
+    def acquire(self):
+        """Block until a token is available"""
+        while True:
+            wait = self._try_take()
+            if not wait:
+                return
+            time.sleep(min(wait, 1.0))
+
+    async def acquire_async(self):
+        """Wait until a token is available without blocking the event loop"""
+        while True:
+            wait = self._try_take()
+            if not wait:
+                return
+            await asyncio.sleep(min(wait, 1.0))
+
+    def throttle(self, retry_after: float):
+        """Pause the bucket and halve its rate after a rate-limit response"""
+        with self._lock:
+            self.paused_until = max(self.paused_until, time.monotonic() + retry_after)
+            self.rate = max(self.max_rate / 16, self.rate / 2)
+            self.tokens = 0
+
+    def recover(self):
+        """Step the rate back toward its configured maximum after a success"""
+        with self._lock:
+            if self.rate < self.max_rate:
+                self.rate = min(self.max_rate, self.rate * 1.1)
+
+
+class ClientLimiter:
+    """Semaphore + token bucket guarding one upstream API, with queue statistics"""
+
+    def __init__(self, name: str, max_concurrent: int, rate_per_second: float,
+                 max_retries: int = DEFAULT_MAX_RATE_LIMIT_RETRIES, processes: int = 1):
+        """
+        Args:
+            name: Limiter name used in logs and stats (e.g. 'claude', 'notion')
+            max_concurrent: Maximum calls in flight at once (across all processes)
+            rate_per_second: Sustained call rate (across all processes)
+            max_retries: Retries of a call that keeps getting 429 responses
+            processes: Server processes enforcing these limits together (see share())
+        """
+        self.name = name
+        self.limit_concurrent = max_concurrent
+        self.limit_rate = rate_per_second
+        self.max_retries = max_retries
+        self._lock = threading.Lock()
+        self.share(processes)
+        self.queue_depth = 0
+        self.in_flight = 0
+        self.calls = 0
+        self.throttled = 0
+        self.total_wait = 0.0
+        self.max_wait = 0.0
+
+    def share(self, processes: int):
+        """
+        Enforce 1/processes of the limits here, so processes that each hold a copy of this
+        limiter stay within them together (concurrency never drops below 1 per process)
+
+        Call before the limiter is used - calls already waiting keep the old slots.
+        """
+        self.processes = max(1, processes)
+        self.max_concurrent = max(1, self.limit_concurrent // self.processes)
+        self.bucket = TokenBucket(self.limit_rate / self.processes)
+        self._semaphore = threading.BoundedSemaphore(self.max_concurrent)
+
+    def _leave_queue(self):
+        with self._lock:
+            self.queue_depth -= 1
+
+    def _admit(self, started: float):
+        waited = time.monotonic() - started
+        with self._lock:
+            self.queue_depth -= 1
+            self.in_flight += 1
+            self.calls += 1
+            self.total_wait += waited
+            self.max_wait = max(self.max_wait, waited)
+        if waited > 1:
+            logger.info(f"[{self.name}] waited {waited:.1f}s for a request slot")
+
+    def _release(self):
+        with self._lock:
+            self.in_flight -= 1
+        self._semaphore.release()
+
+    @contextmanager
+    def slot(self):
+        """Hold one concurrency slot (waiting in line for it and for a rate token)"""
+        started = time.monotonic()
+        with self._lock:
+            self.queue_depth += 1
+
+        self._semaphore.acquire()
+        try:
+            self.bucket.acquire()
+        except BaseException:
+            self._semaphore.release()
+            self._leave_queue()
+            raise
+
+        self._admit(started)
+        try:
+            yield
+        finally:
+            self._release()
+
+    @asynccontextmanager
+    async def async_slot(self):
+        """slot() for coroutines: same slots and tokens, waiting with asyncio.sleep (cancellable)"""
+        started = time.monotonic()
+        with self._lock:
+            self.queue_depth += 1
+
+        poll = 0.005
+        try:
+            while not self._semaphore.acquire(blocking=False):
+                await asyncio.sleep(poll)
+                poll = min(poll * 2, 0.1)
+        except BaseException:
+            self._leave_queue()
+            raise
+        try:
+            await self.bucket.acquire_async()
+        except BaseException:
+            self._semaphore.release()
+            self._leave_queue()
+            raise
+
+        self._admit(started)
+        try:
+            yield
+        finally:
+            self._release()
+
+    def _requeue_after_rate_limit(self, error: Exception, attempt: int) -> bool:
+        """Throttle the bucket after a 429; False when the error is not a 429 or retries are exhausted"""
+        if not is_rate_limited(error) or attempt > self.max_retries:
+            return False
+        retry_after = get_retry_after(error) or DEFAULT_RETRY_AFTER * attempt
+        with self._lock:
+            self.throttled += 1
+        self.bucket.throttle(retry_after)
+        logger.warning(
+            f"[{self.name}] rate limited - retry {attempt}/{self.max_retries} after {retry_after:.1f}s "
+            f"(rate now {self.bucket.rate:.2f}/s)"
+        )
+        return True
+
+    def call(self, fn: Callable, *args, **kwargs) -> Any:
+        """
+        Run fn inside a slot, re-queueing it after 429 responses
+
+        Raises:
+            The last rate-limit error once max_retries is exhausted, or any other error unchanged
+        """
+        attempt = 0
+        while True:
+            try:
+                with self.slot():
+                    result = fn(*args, **kwargs)
+                self.bucket.recover()
+                return result
+            except Exception as e:
+                attempt += 1
+                if not self._requeue_after_rate_limit(e, attempt):
+                    raise
+
+    async def call_async(self, fn: Callable, *args, **kwargs) -> Any:
+        """call() for coroutine functions (e.g. AsyncAnthropic, notion AsyncClient methods)"""
+        attempt = 0
+        while True:
+            try:
+                async with self.async_slot():
+                    result = await fn(*args, **kwargs)
+                self.bucket.recover()
+                return result
+            except Exception as e:
+                attempt += 1
+                if not self._requeue_after_rate_limit(e, attempt):
+                    raise
+
+    def stats(self) -> Dict:
+        """Current queue depth, in-flight calls, wait times and effective rate"""
+        with self._lock:
+            return {
+                'in_flight': self.in_flight,
+                'queue_depth': self.queue_depth,
+                'max_concurrent': self.max_concurrent,
+                'rate_per_second': round(self.bucket.rate, 3),
+                'max_rate_per_second': self.bucket.max_rate,
+                'processes': self.processes,
+                'calls': self.calls,
+                'throttled': self.throttled,
+                'avg_wait_ms': round(1000 * self.total_wait / self.calls, 1) if self.calls else 0.0,
+                'max_wait_ms': round(1000 * self.max_wait, 1)
+            }
+
+
+class LimitedClient:
+    """
+    Transparent proxy that routes every method call on a client through a ClientLimiter
+    e.g. LimitedClient(Anthropic(), limiter).messages.create(...) waits for a slot first
+    """
+
+    def __init__(self, target: Any, limiter: ClientLimiter, path: str = ''):
+        self._target = target
+        self._limiter = limiter
+        self._path = path
+
+    def __getattr__(self, name: str) -> Any:
+        value = getattr(self._target, name)
+        if isinstance(value, (str, bytes, int, float, bool, dict, list, tuple, type(None))):
+            return value
+        return type(self)(value, self._limiter, f"{self._path}.{name}" if self._path else name)
+
+    def __call__(self, *args, **kwargs) -> Any:
+        # Each outbound call is a span, e.g. 'notion.databases.query' or 'claude.messages.create'
+        with span(f"{self._limiter.name}.{self._path}"):
+            return self._limiter.call(self._target, *args, **kwargs)
+
+    def __bool__(self) -> bool:
+        return bool(self._target)
+
+
+class AsyncLimitedClient(LimitedClient):
+    """
+    LimitedClient for async SDK clients: calls return coroutines that wait for a slot first
+    e.g. await AsyncLimitedClient(AsyncAnthropic(), limiter).messages.create(...)
+    """
+
+    async def __call__(self, *args, **kwargs) -> Any:
+        with span(f"{self._limiter.name}.{self._path}"):
+            return await self._limiter.call_async(self._target, *args, **kwargs)
+
+
+def create_claude_limiter() -> ClientLimiter:
+    """Limiter for the Anthropic API (CLAUDE_MAX_CONCURRENT, CLAUDE_RATE_PER_MINUTE env vars, split over SERVER_WORKERS)"""
+    return ClientLimiter(
+        'claude',
+        max_concurrent=int(_env_float('CLAUDE_MAX_CONCURRENT', 4)),
+        rate_per_second=_env_float('CLAUDE_RATE_PER_MINUTE', 50) / 60,
+        processes=worker_processes()
+    )
+
+
+def create_notion_limiter() -> ClientLimiter:
+    """Limiter for the Notion API (NOTION_MAX_CONCURRENT, NOTION_RATE_PER_SECOND env vars, split over SERVER_WORKERS)"""
+    # Notion allows an average of 3 requests per second per integration - for all processes together
+    return ClientLimiter(
+        'notion',
+        max_concurrent=int(_env_float('NOTION_MAX_CONCURRENT', 3)),
+        rate_per_second=_env_float('NOTION_RATE_PER_SECOND', 3),
+        processes=worker_processes()
+    )
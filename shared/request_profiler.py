@@ -0,0 +1,264 @@
+"""
+Request Profiler
+Opt-in profiling of a single request without attaching a debugger to the server
+Modes: 'top' (cProfile hot functions in the response), 'prof' (also writes a .prof file for
+pstats/snakeviz) and 'speedscope' (sampled call stacks written as a speedscope JSON file).
+"""
+
+import os
+import sys
+import json
+import time
+import cProfile
+import pstats
+import logging
+import secrets
+import threading
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+TOP = 'top'
+PROF = 'prof'
+SPEEDSCOPE = 'speedscope'
+PROFILE_MODES = (TOP, PROF, SPEEDSCOPE)
+
+DEFAULT_PROFILE_DIR = Path(__file__).parent / '.cache' / 'profiles'
+DEFAULT_TOP_N = 25
+SORT_KEYS = ('cumulative', 'tottime')
+
+# One profiled request at a time (a profiler slows its request and Python allows one per thread)
+_profile_lock = threading.Lock()
+
+
+def profiling_enabled() -> bool:
+    """
+    Per-request profiling is off unless REQUEST_PROFILING=true
+    (a profiled request is slow and holds the profiler lock - not something any client should trigger)
+    """
+    return os.getenv('REQUEST_PROFILING', 'false').lower() in ('1', 'true', 'yes')
+
+
+def get_profile_dir() -> Path:
+    """Directory for .prof and speedscope files (PROFILE_DIR env var)"""
+    return Path(os.getenv('PROFILE_DIR', DEFAULT_PROFILE_DIR))
+
+
+def parse_profile_mode(value: Optional[str]) -> Optional[str]:
+    """
+    Profile mode requested by a header or query parameter value
+
+    Returns:
+        'top', 'prof' or 'speedscope', or None when profiling was not requested
+    """
+    if not value:
+        return None
+    value = value.strip().lower()
+    if value in ('0', 'false', 'no', 'off'):
+        return None
+    if value in PROFILE_MODES:
+        return value
+    return TOP
+
+
+def _function_label(filename: str, line: int, name: str) -> str:
+    if filename == '~':
+        return name  # built-in (e.g. <method 'sub' of 're.Pattern' objects>)
+    return f"{name} ({os.path.basename(filename)}:{line})"
+
+
+class StackSampler:
+    """Samples one thread's Python call stack at a fixed interval"""
+
+    def __init__(self, thread_id: int, interval: float = 0.002):
+        self.thread_id = thread_id
+        self.interval = interval
+        self.frames: List[Dict] = []
+        self._frame_index: Dict = {}
+        self.samples: List[List[int]] = []
+        self.weights: List[float] = []
+        self._stop = threading.Event()
+        self._thread = None
+
+    def _stack(self, frame) -> List[int]:
+        stack = []
+        while frame is not None:
+            code = frame.f_code
+            key = (code.co_filename, code.co_firstlineno, code.co_name)
+            index = self._frame_index.get(key)
+            if index is None:
+                index = self._frame_index[key] = len(self.frames)
+                self.frames.append({'name': code.co_name, 'file': code.co_filename, 'line': code.co_firstlineno})
+            stack.append(index)
+            frame = frame.f_back
+        stack.reverse()  # root first
+        return stack
+
+    def _run(self):
+        last = time.perf_counter()
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            now = time.perf_counter()
+            if frame is not None:
+                self.samples.append(self._stack(frame))
+                self.weights.append((now - last) * 1000)
+            last = now
+
+    def start(self):
+        self._thread = threading.Thread(target=self._run, name='request-profiler', daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread:
+            self._thread.join()
+
+    def top(self, n: int) -> List[Dict]:
+        """Functions with the most self and total sampled time"""
+        self_ms: Dict[int, float] = {}
+        total_ms: Dict[int, float] = {}
+        for stack, weight in zip(self.samples, self.weights):
+            if not stack:
+                continue
+            self_ms[stack[-1]] = self_ms.get(stack[-1], 0) + weight
+            for index in set(stack):
+                total_ms[index] = total_ms.get(index, 0) + weight
+        ranked = sorted(total_ms, key=lambda i: (self_ms.get(i, 0), total_ms[i]), reverse=True)[:n]
+        return [
+            {
+                'function': _function_label(self.frames[i]['file'], self.frames[i]['line'], self.frames[i]['name']),
+                'self_ms': round(self_ms.get(i, 0), 2),
+                'cumulative_ms': round(total_ms[i], 2)
+            }
+            for i in ranked
+        ]
+
+    def to_speedscope(self, name: str) -> Dict:
+        """The samples as a speedscope file (https://www.speedscope.app/file-format-schema.json)"""
+        return {
+            '$schema': 'https://www.speedscope.app/file-format-schema.json',
+            'name': name,
+            'exporter': 'kcm-converter',
+            'activeProfileIndex': 0,
+            'shared': {'frames': self.frames},
+            'profiles': [{
+                'type': 'sampled',
+                'name': name,
+                'unit': 'milliseconds',
+                'startValue': 0,
+                'endValue': round(sum(self.weights), 3),
+                'samples': self.samples,
+                'weights': [round(w, 3) for w in self.weights]
+            }]
+        }
+
+
+class RequestProfiler:
+    """
+    Context manager that profiles the current thread and builds a report
+
+    Usage:
+        with RequestProfiler('top', name='POST /convert') as profiler:
+            handle_request()
+        response_data['profile'] = profiler.report()
+    """
+
+    def __init__(self, mode: str = TOP, name: str = 'request', top_n: int = DEFAULT_TOP_N,
+                 sort: str = 'cumulative'):
+        self.mode = mode if mode in PROFILE_MODES else TOP
+        self.name = name
+        self.top_n = max(1, min(top_n, 200))
+        self.sort = sort if sort in SORT_KEYS else 'cumulative'
+        self.active = False
+        self.wall_ms = 0.0
+        self._profile = None
+        self._sampler = None
+        self._started = 0.0
+
+    def __enter__(self) -> 'RequestProfiler':
+        self.active = _profile_lock.acquire(blocking=False)
+        if not self.active:
+            logger.warning(f"Skipping profile of {self.name}: another request is being profiled")
+            return self
+
+        if self.mode == SPEEDSCOPE:
+            self._sampler = StackSampler(threading.get_ident())
+            self._sampler.start()
+        else:
+            self._profile = cProfile.Profile()
+            self._profile.enable()
+        self._started = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if not self.active:
+            return False
+        self.wall_ms = (time.perf_counter() - self._started) * 1000
+        try:
+            if self._sampler:
+                self._sampler.stop()
+            else:
+                self._profile.disable()
+        finally:
+            _profile_lock.release()
+        return False
+
+    def _top_functions(self) -> List[Dict]:
+        stats = pstats.Stats(self._profile)
+        index = 3 if self.sort == 'cumulative' else 2
+        ranked = sorted(stats.stats.items(), key=lambda item: item[1][index], reverse=True)
+        rows = []
+        for (filename, line, name), (primitive_calls, calls, tottime, cumtime, _) in ranked:
+            if name == "<method 'disable' of '_lsprof.Profiler' objects>":
+                continue
+            rows.append({
+                'function': _function_label(filename, line, name),
+                'calls': calls,
+                'self_ms': round(tottime * 1000, 2),
+                'cumulative_ms': round(cumtime * 1000, 2)
+            })
+            if len(rows) >= self.top_n:
+                break
+        return rows
+
+    def _write_file(self, suffix: str, write) -> Optional[str]:
+        directory = get_profile_dir()
+        slug = ''.join(c if c.isalnum() else '-' for c in self.name).strip('-').lower()
+        path = directory / f"{datetime.now().strftime('%Y%m%d_%H%M%S')}_{slug}_{secrets.token_hex(3)}{suffix}"
+        try:
+            directory.mkdir(parents=True, exist_ok=True)
+            write(path)
+            logger.info(f"Request profile written to {path}")
+            return str(path)
+        except OSError as e:
+            logger.warning(f"Could not write profile {path}: {e}")
+            return None
+
+    def report(self) -> Dict:
+        """
+        Profile summary for the response
+
+        Returns:
+            mode, wall_ms and top (hot functions), plus file for 'prof' and 'speedscope';
+            error when the request could not be profiled
+        """
+        if not self.active:
+            return {'mode': self.mode, 'error': 'Another request is being profiled - try again'}
+
+        result = {'mode': self.mode, 'wall_ms': round(self.wall_ms, 1)}
+        if self._sampler:
+            result['samples'] = len(self._sampler.samples)
+            result['top'] = self._sampler.top(self.top_n)
+
+            def write_speedscope(path):
+                with open(path, 'w', encoding='utf-8') as f:
+                    json.dump(self._sampler.to_speedscope(self.name), f)
+            result['file'] = self._write_file('.speedscope.json', write_speedscope)
+        else:
+            result['sort'] = self.sort
+            result['top'] = self._top_functions()
+            if self.mode == PROF:
+                result['file'] = self._write_file('.prof', self._profile.dump_stats)
+        return result
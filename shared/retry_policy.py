@@ -0,0 +1,192 @@
+"""
+Retry Policy
+Classifies transient API errors and retries calls with exponential backoff
+"""
+
+import os
+import time
+import random
+import asyncio
+import logging
+from typing import Any, Callable, Optional
+
+from rate_limiter import LimitedClient, get_status_code, get_retry_after, is_rate_limited
+from async_runner import time_remaining
+
+logger = logging.getLogger(__name__)
+
+# Error classes that are worth retrying
+OVERLOADED = 'overloaded'
+RATE_LIMITED = 'rate_limited'
+TIMEOUT = 'timeout'
+CONNECTION = 'connection'
+SERVER_ERROR = 'server_error'
+
+# Error event types the API sends inside a stream that has already returned 200
+STREAM_ERROR_TYPES = {'overloaded_error': OVERLOADED, 'api_error': SERVER_ERROR}
+
+
+def stream_error_type(error: Exception) -> Optional[str]:
+    """The `error.type` of an Anthropic error body (e.g. 'overloaded_error'), if any"""
+    body = getattr(error, 'body', None)
+    if isinstance(body, dict) and isinstance(body.get('error'), dict):
+        return body['error'].get('type')
+    return None
+
+
+def classify_error(error: Exception) -> Optional[str]:
+    """
+    Classify an exception from the Anthropic, Notion or requests clients
+
+    Returns:
+        One of OVERLOADED, RATE_LIMITED, TIMEOUT, CONNECTION, SERVER_ERROR,
+        or None if the error is not transient (bad request, auth, parse errors...)
+    """
+    status = get_status_code(error)
+    class_names = [cls.__name__.lower() for cls in type(error).__mro__]
+
+    if status == 529 or any('overloaded' in name for name in class_names):
+        return OVERLOADED
+    if is_rate_limited(error):
+        return RATE_LIMITED
+    if stream_error_type(error) in STREAM_ERROR_TYPES:
+        # An SSE error event mid-stream arrives as an APIStatusError with status 200
+        return STREAM_ERROR_TYPES[stream_error_type(error)]
+    if isinstance(error, TimeoutError) or any('timeout' in name for name in class_names):
+        return TIMEOUT
+    # httpx/httpx2 TransportError covers dropped streams (ReadError, RemoteProtocolError "peer closed")
+    if (isinstance(error, ConnectionError) or any('connect' in name for name in class_names)
+            or 'transporterror' in class_names):
+        return CONNECTION
+    if status in (500, 502, 503, 504):
+        return SERVER_ERROR
+    return None
+
+
+def retryable_class(error: Exception, fn: Callable) -> Optional[str]:
+    """
+    classify_error(), except that 429s from a LimitedClient call are final: the limiter
+    has already re-queued the call after each one, and retrying here would multiply them
+    """
+    error_class = classify_error(error)
+    if error_class == RATE_LIMITED and isinstance(fn, LimitedClient):
+        return None
+    return error_class
+
+
+class RetryPolicy:
+    """Retries transient failures with exponential backoff and jitter"""
+
+    def __init__(self, max_attempts: int = 4, base_delay: float = 2.0, max_delay: float = 60.0):
+        """
+        Args:
+            max_attempts: Total attempts including the first call
+            base_delay: Backoff before the first retry (doubles every attempt)
+            max_delay: Upper bound for a single backoff
+        """
+        self.max_attempts = max_attempts
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+
+    @classmethod
+    def from_env(cls) -> 'RetryPolicy':
+        """Build a policy from CLAUDE_RETRY_ATTEMPTS and CLAUDE_RETRY_BASE_DELAY env vars"""
+        try:
+            return cls(
+                max_attempts=int(os.getenv('CLAUDE_RETRY_ATTEMPTS', 4)),
+                base_delay=float(os.getenv('CLAUDE_RETRY_BASE_DELAY', 2.0))
+            )
+        except ValueError:
+            logger.warning("Invalid retry settings - using defaults")
+            return cls()
+
+    def backoff(self, attempt: int, error: Exception) -> float:
+        """Delay before the next attempt (honors retry-after when the server sends one)"""
+        retry_after = get_retry_after(error)
+        if retry_after is not None:
+            return min(retry_after, self.max_delay)
+        delay = min(self.max_delay, self.base_delay * (2 ** (attempt - 1)))
+        return delay * random.uniform(0.75, 1.25)
+
+    def run(self, fn: Callable, *args, label: str = 'call',
+            on_retry: Optional[Callable[[Exception, str], None]] = None, **kwargs) -> Any:
+        """
+        Call fn, retrying transient errors
+
+        Args:
+            fn: Function to call with *args and **kwargs
+            label: Name used in log lines
+            on_retry: Optional hook called with (error, error_class) before each retry
+
+        Returns:
+            fn's return value
+
+        Raises:
+            The last error if it is not transient or attempts are exhausted
+        """
+        total_backoff = 0.0
+        attempt = 1
+
+        while True:
+            try:
+                result = fn(*args, **kwargs)
+                logger.info(f"[{label}] succeeded after {attempt} attempt(s), {total_backoff:.1f}s backoff")
+                return result
+            except Exception as e:
+                error_class = retryable_class(e, fn)
+                if error_class is None or attempt >= self.max_attempts:
+                    logger.error(
+                        f"[{label}] failed after {attempt} attempt(s), {total_backoff:.1f}s backoff "
+                        f"({error_class or 'not retryable'}): {e}"
+                    )
+                    raise
+
+                delay = self.backoff(attempt, e)
+                logger.warning(
+                    f"[{label}] attempt {attempt}/{self.max_attempts} failed ({error_class}) - "
+                    f"retrying in {delay:.1f}s"
+                )
+                if on_retry:
+                    on_retry(e, error_class)
+                time.sleep(delay)
+                total_backoff += delay
+                attempt += 1
+
+    async def run_async(self, fn: Callable, *args, label: str = 'call',
+                        on_retry: Optional[Callable[[Exception, str], None]] = None, **kwargs) -> Any:
+        """
+        run() for coroutine functions
+
+        Backoff waits are cancellable, and a retry that could not finish before the
+        current deadline (see async_runner) is not attempted - the error is raised instead.
+        """
+        total_backoff = 0.0
+        attempt = 1
+
+        while True:
+            try:
+                result = await fn(*args, **kwargs)
+                logger.info(f"[{label}] succeeded after {attempt} attempt(s), {total_backoff:.1f}s backoff")
+                return result
+            except Exception as e:
+                error_class = retryable_class(e, fn)
+                delay = self.backoff(attempt, e) if error_class else 0.0
+                remaining = time_remaining()
+                out_of_time = remaining is not None and delay >= remaining
+                if error_class is None or attempt >= self.max_attempts or out_of_time:
+                    reason = 'deadline' if out_of_time and error_class else (error_class or 'not retryable')
+                    logger.error(
+                        f"[{label}] failed after {attempt} attempt(s), {total_backoff:.1f}s backoff "
+                        f"({reason}): {e}"
+                    )
+                    raise
+
+                logger.warning(
+                    f"[{label}] attempt {attempt}/{self.max_attempts} failed ({error_class}) - "
+                    f"retrying in {delay:.1f}s"
+                )
+                if on_retry:
+                    on_retry(e, error_class)
+                await asyncio.sleep(delay)
+                total_backoff += delay
+                attempt += 1
@@ -0,0 +1,125 @@
+"""
+Server Lifecycle
+Readiness checks, in-flight request tracking and graceful draining for the production server
+A worker reports ready only after its startup checks pass; on shutdown it stops taking new
+conversions and waits for the in-flight ones to finish.
+"""
+
+import time
+import logging
+import threading
+from typing import Callable, Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+
+class Lifecycle:
+    """Readiness state and in-flight request counter for one server process"""
+
+    def __init__(self):
+        self.ready = False
+        self.draining = False
+        self.checks: Dict[str, Dict] = {}
+        self._in_flight = 0
+        self._condition = threading.Condition()
+        self._recheck_thread = None
+
+    @property
+    def in_flight(self) -> int:
+        with self._condition:
+            return self._in_flight
+
+    def begin(self) -> bool:
+        """
+        Count a request as in flight
+
+        Returns:
+            False when the server is draining (the request should be turned away)
+        """
+        with self._condition:
+            if self.draining:
+                return False
+            self._in_flight += 1
+            return True
+
+    def end(self):
+        with self._condition:
+            self._in_flight = max(0, self._in_flight - 1)
+            self._condition.notify_all()
+
+    def start_draining(self):
+        """Stop accepting new work and report not ready (load balancers stop routing here)"""
+        with self._condition:
+            if not self.draining:
+                logger.info(f"Draining: {self._in_flight} request(s) in flight")
+            self.draining = True
+
+    def drain(self, timeout: float) -> bool:
+        """
+        Stop accepting new work and wait for in-flight requests to finish
+
+        Returns:
+            True if everything finished within the timeout
+        """
+        self.start_draining()
+        deadline = time.monotonic() + timeout
+        with self._condition:
+            while self._in_flight:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    logger.warning(f"Drain timed out with {self._in_flight} request(s) still in flight")
+                    return False
+                self._condition.wait(remaining)
+        logger.info("Drained: no requests in flight")
+        return True
+
+    def run_checks(self, checks: Dict[str, Callable[[], Optional[str]]]) -> bool:
+        """
+        Run the startup checks and update readiness
+
+        Args:
+            checks: Name -> callable that raises on failure (may return a short detail string)
+
+        Returns:
+            True if every check passed
+        """
+        results = {}
+        for name, check in checks.items():
+            started = time.perf_counter()
+            try:
+                detail = check()
+                results[name] = {'ok': True}
+                if detail:
+                    results[name]['detail'] = detail
+            except Exception as e:
+                results[name] = {'ok': False, 'error': f"{type(e).__name__}: {e}"}
+                logger.error(f"Readiness check '{name}' failed: {e}")
+            results[name]['ms'] = round((time.perf_counter() - started) * 1000, 1)
+
+        self.checks = results
+        self.ready = all(result['ok'] for result in results.values())
+        if self.ready:
+            logger.info(f"Ready ({', '.join(results)} checks passed)")
+        return self.ready
+
+    def start_rechecking(self, checks: Dict[str, Callable[[], Optional[str]]], interval: float = 30):
+        """Re-run failed startup checks in the background until they pass"""
+        if self.ready or self._recheck_thread:
+            return
+
+        def run():
+            while not self.ready and not self.draining:
+                time.sleep(interval)
+                self.run_checks(checks)
+            self._recheck_thread = None
+
+        self._recheck_thread = threading.Thread(target=run, name='readiness-recheck', daemon=True)
+        self._recheck_thread.start()
+
+    def status(self) -> Dict:
+        return {
+            'ready': self.ready and not self.draining,
+            'draining': self.draining,
+            'in_flight': self.in_flight,
+            'checks': self.checks
+        }
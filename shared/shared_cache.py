@@ -0,0 +1,412 @@
+"""
+Shared Cache
+Cache shared by every server process and kept across restarts
+Each namespace (Claude responses, page text, URL mappings, ...) has its own TTL, eviction
+policy and hit/miss counters. Lookups go through a small in-process LRU first, then the
+shared store: a SQLite file in WAL mode (default) or a local Redis-compatible server
+(SHARED_CACHE_URL=redis://localhost:6379/0). A store that is down or locked only costs
+misses - a cache failure never fails a conversion.
+
+Eviction policies:
+    lru   least recently used entries go first once the namespace holds max_entries
+    fifo  oldest stored entries go first (no write on a hit)
+    ttl   no size limit, entries only expire
+"""
+
+import os
+import copy
+import json
+import time
+import hashlib
+import logging
+import sqlite3
+import threading
+from collections import OrderedDict
+from pathlib import Path
+from typing import Any, Dict, Optional, Tuple
+
+from metrics import record_cache, record_error
+
+logger = logging.getLogger(__name__)
+
+# Default store location (next to the shared modules)
+DEFAULT_CACHE_PATH = Path(__file__).parent / '.cache' / 'shared_cache.db'
+
+LRU = 'lru'
+FIFO = 'fifo'
+TTL = 'ttl'
+POLICIES = (LRU, FIFO, TTL)
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS cache (
+    namespace TEXT NOT NULL,
+    key TEXT NOT NULL,
+    version TEXT,
+    value TEXT NOT NULL,
+    expires_at REAL NOT NULL,
+    stored_at REAL NOT NULL,
+    used_at REAL NOT NULL,
+    PRIMARY KEY (namespace, key)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS idx_cache_used ON cache (namespace, used_at);
+CREATE INDEX IF NOT EXISTS idx_cache_stored ON cache (namespace, stored_at);
+"""
+
+
+def _copy(value: Any) -> Any:
+    """Callers get their own copy of a cached dict or list (strings are immutable)"""
+    return value if isinstance(value, (str, int, float, bool, type(None))) else copy.deepcopy(value)
+
+
+def cache_key(*parts: Any) -> str:
+    """Stable key for a tuple of JSON-serializable parts (e.g. model, max_tokens and prompt)"""
+    return hashlib.sha256(json.dumps(parts, sort_keys=True, default=str).encode('utf-8')).hexdigest()
+
+
+class SQLiteBackend:
+    """Entries in one SQLite table (WAL mode, so readers in other processes never block)"""
+
+    def __init__(self, path: Path):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._local = threading.local()
+
+    def _connect(self) -> sqlite3.Connection:
+        # One connection per thread, reopened after a fork (gunicorn workers)
+        conn = getattr(self._local, 'conn', None)
+        if conn is None or self._local.pid != os.getpid():
+            conn = sqlite3.connect(self.path, timeout=5, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.executescript(SCHEMA)
+            self._local.conn = conn
+            self._local.pid = os.getpid()
+        return conn
+
+    def get(self, namespace: str, key: str, touch: bool) -> Optional[Tuple[Optional[str], Any, float]]:
+        now = time.time()
+        conn = self._connect()
+        row = conn.execute(
+            "SELECT version, value, expires_at FROM cache WHERE namespace = ? AND key = ? AND expires_at > ?",
+            (namespace, key, now)
+        ).fetchone()
+        if row is None:
+            return None
+        if touch:
+            conn.execute("UPDATE cache SET used_at = ? WHERE namespace = ? AND key = ?", (now, namespace, key))
+        return row[0], json.loads(row[1]), row[2]
+
+    def put(self, namespace: str, key: str, version: Optional[str], value: Any, ttl: float,
+            max_entries: Optional[int], policy: str) -> int:
+        now = time.time()
+        conn = self._connect()
+        with conn:
+            conn.execute("BEGIN IMMEDIATE")
+            conn.execute(
+                "INSERT OR REPLACE INTO cache (namespace, key, version, value, expires_at, stored_at, used_at) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (namespace, key, version, json.dumps(value), now + ttl, now, now)
+            )
+            evicted = conn.execute("DELETE FROM cache WHERE namespace = ? AND expires_at <= ?", (namespace, now)).rowcount
+            if max_entries and policy != TTL:
+                order = 'used_at' if policy == LRU else 'stored_at'
+                evicted += conn.execute(
+                    f"DELETE FROM cache WHERE namespace = ? AND key IN ("
+                    f"SELECT key FROM cache WHERE namespace = ? ORDER BY {order} DESC LIMIT -1 OFFSET ?)",
+                    (namespace, namespace, max_entries)
+                ).rowcount
+        return evicted
+
+    def delete(self, namespace: str, key: str):
+        self._connect().execute("DELETE FROM cache WHERE namespace = ? AND key = ?", (namespace, key))
+
+    def clear(self, namespace: str):
+        self._connect().execute("DELETE FROM cache WHERE namespace = ?", (namespace,))
+
+    def count(self, namespace: str) -> int:
+        return self._connect().execute(
+            "SELECT COUNT(*) FROM cache WHERE namespace = ? AND expires_at > ?", (namespace, time.time())
+        ).fetchone()[0]
+
+    def describe(self) -> str:
+        return f"sqlite:///{self.path}"
+
+
+class RedisBackend:
+    """
+    Entries as Redis keys with a native expiry, plus one sorted set per namespace
+    (score: last use or store time) that drives max_entries eviction
+    """
+
+    def __init__(self, url: str, prefix: str = 'kcm'):
+        import redis  # optional dependency, only needed for SHARED_CACHE_URL=redis://...
+
+        self.url = url
+        self.prefix = prefix
+        self.client = redis.Redis.from_url(url, socket_timeout=2, socket_connect_timeout=2)
+
+    def _key(self, namespace: str, key: str) -> str:
+        return f"{self.prefix}:{namespace}:{key}"
+
+    def _order(self, namespace: str) -> str:
+        return f"{self.prefix}:{namespace}:~order"
+
+    def get(self, namespace: str, key: str, touch: bool) -> Optional[Tuple[Optional[str], Any, float]]:
+        pipe = self.client.pipeline()
+        pipe.get(self._key(namespace, key))
+        pipe.pttl(self._key(namespace, key))
+        raw, remaining_ms = pipe.execute()
+        if raw is None:
+            return None
+        entry = json.loads(raw)
+        if touch:
+            self.client.zadd(self._order(namespace), {key: time.time()})
+        return entry['version'], entry['value'], time.time() + max(remaining_ms, 0) / 1000
+
+    def put(self, namespace: str, key: str, version: Optional[str], value: Any, ttl: float,
+            max_entries: Optional[int], policy: str) -> int:
+        now = time.time()
+        order = self._order(namespace)
+        pipe = self.client.pipeline()
+        pipe.set(self._key(namespace, key), json.dumps({'version': version, 'value': value}), px=max(1, int(ttl * 1000)))
+        if policy != TTL:
+            # An entry unused (lru) or stored (fifo) longer than the TTL ago has expired already
+            pipe.zadd(order, {key: now})
+            pipe.zremrangebyscore(order, '-inf', now - ttl)
+            pipe.zcard(order)
+        results = pipe.execute()
+        if policy == TTL or not max_entries or results[-1] <= max_entries:
+            return 0
+
+        overflow = [member.decode('utf-8') for member in self.client.zrange(order, 0, results[-1] - max_entries - 1)]
+        if overflow:
+            pipe = self.client.pipeline()
+            pipe.delete(*(self._key(namespace, member) for member in overflow))
+            pipe.zrem(order, *overflow)
+            pipe.execute()
+        return len(overflow)
+
+    def delete(self, namespace: str, key: str):
+        self.client.delete(self._key(namespace, key))
+        self.client.zrem(self._order(namespace), key)
+
+    def clear(self, namespace: str):
+        keys = list(self.client.scan_iter(match=f"{self.prefix}:{namespace}:*"))
+        if keys:
+            self.client.delete(*keys)
+
+    def count(self, namespace: str) -> int:
+        return sum(1 for key in self.client.scan_iter(match=f"{self.prefix}:{namespace}:*")
+                   if not key.endswith(b':~order'))
+
+    def describe(self) -> str:
+        return self.url.split('@')[-1]  # without credentials
+
+
+class CacheNamespace:
+    """
+    One kind of cached value: an in-process LRU (maxsize entries, 0 to skip it) in front of
+    the shared store (max_entries, None for no limit). Entries expire ttl seconds after they
+    were stored; a version (e.g. a page's last_edited_time) makes an entry stale as soon as
+    its source changes. Values must be JSON-serializable.
+    """
+
+    def __init__(self, name: str, backend, ttl: float, maxsize: int = 256,
+                 max_entries: Optional[int] = None, policy: str = LRU):
+        if policy not in POLICIES:
+            raise ValueError(f"Unknown eviction policy '{policy}' (expected one of {', '.join(POLICIES)})")
+        self.name = name
+        self.backend = backend
+        self.ttl = ttl
+        self.maxsize = maxsize
+        self.max_entries = max_entries
+        self.policy = policy
+        self._entries: 'OrderedDict[str, tuple]' = OrderedDict()
+        self._lock = threading.Lock()
+        self.memory_hits = 0
+        self.shared_hits = 0
+        self.misses = 0
+        self.puts = 0
+        self.evictions = 0
+        self.errors = 0
+
+    @property
+    def enabled(self) -> bool:
+        return self.ttl > 0
+
+    def _remember(self, key: str, version: Optional[str], value: Any, expires_at: float):
+        if not self.maxsize:
+            return
+        with self._lock:
+            self._entries[key] = (version, value, expires_at)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+    def _failed(self, action: str, error: Exception):
+        self.errors += 1
+        record_error('shared_cache')
+        logger.warning(f"Shared cache {action} failed for '{self.name}': {type(error).__name__}: {error}")
+
+    def get(self, key: str, version: Any = None) -> Optional[Any]:
+        """
+        Cached value for a key
+
+        Args:
+            key: Entry key (see cache_key)
+            version: Version the entry must have been stored with (None: any)
+
+        Returns:
+            The value, or None on a miss (absent, expired or another version)
+        """
+        if not self.enabled:
+            return None
+        version = None if version is None else str(version)
+        now = time.time()
+
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[2] > now and (version is None or entry[0] == version):
+                if self.policy == LRU:
+                    self._entries.move_to_end(key)
+                self.memory_hits += 1
+                record_cache(self.name, True)
+                return _copy(entry[1])
+
+        found = None
+        if self.backend is not None:
+            try:
+                found = self.backend.get(self.name, key, touch=self.policy == LRU)
+            except Exception as e:
+                self._failed('read', e)
+
+        if found is not None and (version is None or found[0] == version):
+            self._remember(key, found[0], _copy(found[1]), found[2])
+            self.shared_hits += 1
+            record_cache(self.name, True)
+            return found[1]
+
+        self.misses += 1
+        record_cache(self.name, False)
+        return None
+
+    def put(self, key: str, value: Any, version: Any = None):
+        """Store a value for every process (and this process's LRU)"""
+        if not self.enabled:
+            return
+        version = None if version is None else str(version)
+        self._remember(key, version, _copy(value), time.time() + self.ttl)
+        self.puts += 1
+        if self.backend is None:
+            return
+        try:
+            self.evictions += self.backend.put(self.name, key, version, value, self.ttl, self.max_entries, self.policy)
+        except Exception as e:
+            self._failed('write', e)
+
+    def delete(self, key: str):
+        with self._lock:
+            self._entries.pop(key, None)
+        if self.backend is not None:
+            try:
+                self.backend.delete(self.name, key)
+            except Exception as e:
+                self._failed('delete', e)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+        if self.backend is not None:
+            try:
+                self.backend.clear(self.name)
+            except Exception as e:
+                self._failed('clear', e)
+
+    def stats(self) -> Dict:
+        stored = None
+        if self.backend is not None and self.enabled:
+            try:
+                stored = self.backend.count(self.name)
+            except Exception as e:
+                self._failed('count', e)
+        lookups = self.memory_hits + self.shared_hits + self.misses
+        return {
+            'ttl': self.ttl,
+            'policy': self.policy,
+            'maxsize': self.maxsize,
+            'max_entries': self.max_entries,
+            'in_memory': len(self._entries),
+            'stored': stored,
+            'memory_hits': self.memory_hits,
+            'shared_hits': self.shared_hits,
+            'misses': self.misses,
+            'hit_rate': round((self.memory_hits + self.shared_hits) / lookups, 3) if lookups else None,
+            'puts': self.puts,
+            'evictions': self.evictions,
+            'errors': self.errors
+        }
+
+
+def open_backend(url: str):
+    """
+    Store for a SHARED_CACHE_URL
+
+    Args:
+        url: sqlite:///path/to/file.db (or a plain path), redis://host:port/db,
+             or 'memory' for process-local caching only
+
+    Returns:
+        SQLiteBackend, RedisBackend, or None for 'memory'
+    """
+    if url == 'memory':
+        return None
+    if url.startswith(('redis://', 'rediss://', 'unix://')):
+        try:
+            return RedisBackend(url)
+        except ImportError:
+            logger.warning("SHARED_CACHE_URL points at Redis but the redis package is not installed - "
+                           f"using {DEFAULT_CACHE_PATH}")
+            return SQLiteBackend(DEFAULT_CACHE_PATH)
+    if url.startswith('sqlite:///'):
+        url = url[len('sqlite:///'):]
+    return SQLiteBackend(Path(url))
+
+
+class SharedCache:
+    """The shared store and its namespaces"""
+
+    def __init__(self, url: Optional[str] = None):
+        """
+        Args:
+            url: Store to use (default: SHARED_CACHE_URL, else a SQLite file next to the shared modules)
+        """
+        self.backend = open_backend(url or os.getenv('SHARED_CACHE_URL') or f"sqlite:///{DEFAULT_CACHE_PATH}")
+        self._namespaces: Dict[str, CacheNamespace] = {}
+        self._lock = threading.Lock()
+
+    def namespace(self, name: str, ttl: float, maxsize: int = 256,
+                  max_entries: Optional[int] = None, policy: str = LRU) -> CacheNamespace:
+        """The namespace with this name (created with these settings on first use)"""
+        with self._lock:
+            if name not in self._namespaces:
+                self._namespaces[name] = CacheNamespace(name, self.backend, ttl, maxsize, max_entries, policy)
+            return self._namespaces[name]
+
+    def stats(self) -> Dict:
+        return {
+            'backend': self.backend.describe() if self.backend is not None else 'memory',
+            'namespaces': {name: namespace.stats() for name, namespace in self._namespaces.items()}
+        }
+
+
+_shared_cache: Optional[SharedCache] = None
+_shared_cache_lock = threading.Lock()
+
+
+def get_shared_cache() -> SharedCache:
+    """The process-wide shared cache (created on first use, after .env is loaded)"""
+    global _shared_cache
+    with _shared_cache_lock:
+        if _shared_cache is None:
+            _shared_cache = SharedCache()
+        return _shared_cache
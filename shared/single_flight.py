@@ -0,0 +1,157 @@
+"""
+Single Flight
+Merges identical concurrent lookups into one upstream call
+When several conversions ask for the same thing at once (the context database listing, the
+master doc's blocks, the URL mappings, an image, a taxonomy sync), the first caller makes
+the request and the others wait for its result instead of repeating it. Nothing is cached
+once the call returns. Callers per upstream call (the fan-out ratio) are reported in metrics.
+"""
+
+import asyncio
+import inspect
+import functools
+import threading
+from typing import Any, Callable, Dict, Hashable, Optional
+
+from metrics import record_single_flight
+
+
+class _Call:
+    """One in-flight call in a thread-based group"""
+    __slots__ = ('done', 'result', 'error')
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error: Optional[BaseException] = None
+
+
+class SingleFlight:
+    """A named group of coalesced calls (threads and asyncio tasks are coalesced separately)"""
+
+    def __init__(self, name: str):
+        self.name = name
+        self._lock = threading.Lock()
+        self._calls: Dict[Hashable, _Call] = {}
+        self._tasks: Dict[Hashable, asyncio.Task] = {}
+        self.calls = 0
+        self.shared = 0
+
+    def _count(self, shared: bool):
+        with self._lock:
+            self.calls += 1
+            if shared:
+                self.shared += 1
+        record_single_flight(self.name, shared)
+
+    def do(self, key: Hashable, fn: Callable, *args, **kwargs) -> Any:
+        """
+        Call fn(*args, **kwargs), or wait for the identical call already in flight
+
+        Returns:
+            fn's result (the same object for every caller - treat it as read-only)
+
+        Raises:
+            Whatever fn raised, in every caller that waited for it
+        """
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = _Call()
+        self._count(not leader)
+
+        if not leader:
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result
+
+        try:
+            call.result = fn(*args, **kwargs)
+            return call.result
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.done.set()
+
+    async def do_async(self, key: Hashable, coro_fn: Callable, *args, **kwargs) -> Any:
+        """
+        Await coro_fn(*args, **kwargs), or the identical call already in flight on this event loop
+
+        The call runs as its own task, so a caller cancelled by its deadline does not
+        cancel it for the others.
+        """
+        task = self._tasks.get(key)
+        leader = task is None or task.get_loop() is not asyncio.get_running_loop()
+        if leader:
+            task = asyncio.ensure_future(coro_fn(*args, **kwargs))
+            self._tasks[key] = task
+            task.add_done_callback(functools.partial(self._task_done, key))
+        self._count(not leader)
+        return await asyncio.shield(task)
+
+    def _task_done(self, key: Hashable, task: asyncio.Task):
+        if self._tasks.get(key) is task:
+            del self._tasks[key]
+        # Mark the exception retrieved even if every caller was cancelled
+        if not task.cancelled():
+            task.exception()
+
+    def coalesce(self, key: Optional[Callable[..., Hashable]] = None) -> Callable:
+        """
+        Decorator: coalesce concurrent calls of a function (or coroutine function) with the same arguments
+
+        Args:
+            key: Builds the coalescing key from the call's arguments (default: the arguments themselves)
+        """
+        def decorator(fn: Callable) -> Callable:
+            def make_key(args, kwargs) -> Hashable:
+                if key is not None:
+                    return (fn.__name__, key(*args, **kwargs))
+                return (fn.__name__, args, tuple(sorted(kwargs.items())))
+
+            if inspect.iscoroutinefunction(fn):
+                @functools.wraps(fn)
+                async def async_wrapper(*args, **kwargs):
+                    return await self.do_async(make_key(args, kwargs), fn, *args, **kwargs)
+                return async_wrapper
+
+            @functools.wraps(fn)
+            def wrapper(*args, **kwargs):
+                return self.do(make_key(args, kwargs), fn, *args, **kwargs)
+            return wrapper
+
+        return decorator
+
+    def stats(self) -> Dict:
+        with self._lock:
+            upstream = self.calls - self.shared
+            return {
+                'calls': self.calls,
+                'upstream_calls': upstream,
+                'fan_out': round(self.calls / upstream, 2) if upstream else None,
+                'in_flight': len(self._calls) + len(self._tasks)
+            }
+
+
+_groups: Dict[str, SingleFlight] = {}
+_groups_lock = threading.Lock()
+
+
+def group(name: str) -> SingleFlight:
+    """The shared single-flight group with this name (e.g. 'notion', 'wordpress_media')"""
+    with _groups_lock:
+        if name not in _groups:
+            _groups[name] = SingleFlight(name)
+        return _groups[name]
+
+
+def stats() -> Dict[str, Dict]:
+    """Stats of every group"""
+    with _groups_lock:
+        groups = list(_groups.values())
+    return {flight.name: flight.stats() for flight in groups}
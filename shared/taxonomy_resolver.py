@@ -0,0 +1,188 @@
+"""
+Taxonomy Resolver
+Maps category and tag names from Claude or KCM onto the site's WordPress terms
+Names are normalized (case, punctuation, plurals, Twp/Township) and looked up in a
+precomputed index that also holds the KCM_TO_WP synonyms. Names that still don't match
+fall back to the closest term within a small edit distance, found through a character
+n-gram index instead of a scan of every term. Results are memoized, so repeated names
+resolve with a single dict lookup.
+"""
+
+import re
+from typing import Dict, List, Optional, Set, Tuple
+
+from taxonomy_sync import CATEGORIES, TAGS, TaxonomyIndex, get_taxonomy
+from kcm_to_wordpress_mapping import KCM_TO_WP_CATEGORIES, KCM_TO_WP_TAGS
+
+NGRAM = 3
+
+# Word-level spellings that mean the same term
+WORD_ALIASES = {
+    '&': 'and',
+    'township': 'twp',
+    'mt': 'mount',
+}
+
+# Words that end in "s" but are not plurals
+NOT_PLURAL = {'news', 'series'}
+
+_PUNCTUATION = re.compile(r"[^a-z0-9&]+")
+
+
+def singular(word: str) -> str:
+    """Strip a plural ending: buyers -> buyer, properties -> property, taxes -> tax"""
+    if len(word) <= 3 or word in NOT_PLURAL:
+        return word
+    if word.endswith('ies'):
+        return word[:-3] + 'y'
+    if word.endswith(('sses', 'xes', 'ches', 'shes')):
+        return word[:-2]
+    if word.endswith('s') and not word.endswith(('ss', 'us', 'is')):
+        return word[:-1]
+    return word
+
+
+def normalize(name: str) -> str:
+    """
+    Matching key for a term name
+
+    "Move-up Buyers", "move up buyer" and "MOVE UP BUYERS" all become "move up buyer"
+    """
+    text = name.lower().replace("'", '').replace('&', ' & ')
+    words = []
+    for word in _PUNCTUATION.sub(' ', text).split():
+        words.extend(WORD_ALIASES.get(word, word).split())
+    return ' '.join(singular(word) for word in words)
+
+
+def ngrams(key: str, n: int = NGRAM) -> Set[str]:
+    padded = f" {key} "
+    return {padded[i:i + n] for i in range(max(1, len(padded) - n + 1))}
+
+
+def bounded_distance(a: str, b: str, limit: int) -> int:
+    """Levenshtein distance, or limit + 1 as soon as it must exceed limit"""
+    if abs(len(a) - len(b)) > limit:
+        return limit + 1
+    previous = list(range(len(b) + 1))
+    for i, char_a in enumerate(a, 1):
+        current = [i]
+        for j, char_b in enumerate(b, 1):
+            current.append(min(previous[j] + 1, current[j - 1] + 1, previous[j - 1] + (char_a != char_b)))
+        if min(current) > limit:
+            return limit + 1
+        previous = current
+    return previous[-1]
+
+
+def max_edits(key: str) -> int:
+    """Allowed typos: none for short names (Tax/Tag), one up to 8 characters, two beyond"""
+    if len(key) <= 4:
+        return 0
+    return 1 if len(key) <= 8 else 2
+
+
+class TaxonomyResolver:
+    """Normalized, synonym-aware and typo-tolerant name -> term lookup for one taxonomy"""
+
+    def __init__(self, index: TaxonomyIndex, synonyms: Optional[Dict[str, str]] = None):
+        """
+        Args:
+            index: The taxonomy's terms (from taxonomy_sync)
+            synonyms: Other name -> WordPress term name (KCM_TO_WP_TAGS / KCM_TO_WP_CATEGORIES)
+        """
+        self.index = index
+        self._keys: Dict[str, str] = {}
+        for term in index.terms:
+            self._keys.setdefault(normalize(term['name']), term['name'])
+        for term in index.terms:
+            self._keys.setdefault(normalize(term['slug']), term['name'])
+        for other, target in (synonyms or {}).items():
+            term = self._keys.get(normalize(target))
+            if term:
+                self._keys.setdefault(normalize(other), term)
+
+        self._grams: Dict[str, List[str]] = {}
+        for key in self._keys:
+            for gram in ngrams(key):
+                self._grams.setdefault(gram, []).append(key)
+        self._memo: Dict[str, Optional[str]] = {}
+
+    def _closest(self, key: str) -> Optional[str]:
+        limit = max_edits(key)
+        if not limit:
+            return None
+        # One edit changes at most NGRAM n-grams, so a match shares all but limit * NGRAM of them
+        grams = ngrams(key)
+        shared: Dict[str, int] = {}
+        for gram in grams:
+            for candidate in self._grams.get(gram, ()):
+                shared[candidate] = shared.get(candidate, 0) + 1
+        needed = len(grams) - limit * NGRAM
+        best, best_distance = None, limit + 1
+        for candidate, count in sorted(shared.items(), key=lambda item: -item[1]):
+            if count < needed:
+                break
+            distance = bounded_distance(key, candidate, min(limit, best_distance - 1))
+            if distance < best_distance:
+                best, best_distance = candidate, distance
+        return self._keys[best] if best else None
+
+    def resolve(self, name: str) -> Optional[str]:
+        """
+        The WordPress term name for a name
+
+        Returns:
+            Term name, or None if nothing matched
+        """
+        if name in self._memo:
+            return self._memo[name]
+        if name in self.index.name_to_id:
+            term = name
+        else:
+            key = normalize(name)
+            term = self._keys.get(key) or self._closest(key)
+        if len(self._memo) < 10000:
+            self._memo[name] = term
+        return term
+
+    def resolve_all(self, names: List[str]) -> Tuple[List[str], List[str]]:
+        """
+        Resolve a list of names
+
+        Returns:
+            (term names in first-seen order without duplicates, names that could not be mapped)
+        """
+        resolved = []
+        unmapped = []
+        for name in names:
+            term = self.resolve(name)
+            if term is None:
+                unmapped.append(name)
+            elif term not in resolved:
+                resolved.append(term)
+        return resolved, unmapped
+
+    def ids(self, names: List[str]) -> Tuple[List[int], List[str]]:
+        """
+        WordPress IDs for a list of names
+
+        Returns:
+            (IDs without duplicates, names that could not be mapped)
+        """
+        terms, unmapped = self.resolve_all(names)
+        return [self.index.name_to_id[term] for term in terms], unmapped
+
+
+_resolvers: Dict[str, TaxonomyResolver] = {}
+
+
+def get_resolver(kind: str) -> TaxonomyResolver:
+    """Resolver for 'categories' or 'tags', rebuilt when a taxonomy sync replaced the terms"""
+    index = get_taxonomy().index(kind)
+    resolver = _resolvers.get(kind)
+    if resolver is None or resolver.index is not index:
+        synonyms = {CATEGORIES: KCM_TO_WP_CATEGORIES, TAGS: KCM_TO_WP_TAGS}[kind]
+        resolver = TaxonomyResolver(index, synonyms)
+        _resolvers[kind] = resolver
+    return resolver
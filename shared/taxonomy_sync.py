@@ -0,0 +1,348 @@
+"""
+WordPress Taxonomy Sync
+Keeps the site's categories and tags in memory, synced from the WordPress REST API
+Terms are fetched page by page from /wp-json/wp/v2/categories and /tags and cached on disk
+with their ETag, so a refresh that finds nothing changed costs one conditional request per
+taxonomy. Lookups (name -> id, id -> name, slug -> id) are dict reads and never wait on the
+network; until the first sync they use the disk cache, or the snapshot shipped in the repo.
+With a shared cache namespace, a sync done by one server process is picked up by the others
+instead of each of them asking WordPress again.
+"""
+
+import os
+import json
+import time
+import logging
+import threading
+from datetime import datetime
+from pathlib import Path
+from typing import Callable, Dict, List, Optional
+
+import single_flight
+from shared_cache import CacheNamespace, TTL, cache_key, get_shared_cache
+
+logger = logging.getLogger(__name__)
+
+CATEGORIES = 'categories'
+TAGS = 'tags'
+KINDS = (CATEGORIES, TAGS)
+
+SNAPSHOT_PATH = Path(__file__).parent / 'wordpress_taxonomy_snapshot.json'
+DEFAULT_CACHE_PATH = Path(__file__).parent / '.cache' / 'wordpress_taxonomy.json'
+DEFAULT_REFRESH_INTERVAL = 3600
+PER_PAGE = 100
+
+# Called with the taxonomy kind after a sync changed it (e.g. to rebuild cached prompt strings)
+_change_listeners: List[Callable[[str], None]] = []
+
+
+def on_change(listener: Callable[[str], None]) -> Callable[[str], None]:
+    """Register a listener for taxonomy changes (usable as a decorator)"""
+    _change_listeners.append(listener)
+    return listener
+
+
+class TaxonomyIndex:
+    """One taxonomy's terms with O(1) lookups in each direction"""
+
+    def __init__(self, terms: List[Dict]):
+        self.terms = sorted(terms, key=lambda t: (t['name'].lower(), t['id']))
+        self.name_to_id: Dict[str, int] = {}
+        self.id_to_name: Dict[int, str] = {}
+        self.slug_to_id: Dict[str, int] = {}
+        # Most-used term wins when two share a name
+        for term in sorted(terms, key=lambda t: t.get('count', 0)):
+            self.name_to_id[term['name']] = term['id']
+            self.id_to_name[term['id']] = term['name']
+            self.slug_to_id[term['slug']] = term['id']
+
+    def __len__(self) -> int:
+        return len(self.terms)
+
+    def names(self) -> List[str]:
+        return [term['name'] for term in self.terms]
+
+    def signature(self) -> List[tuple]:
+        """The terms without their post counts (which change with every post)"""
+        return [(term['id'], term['name'], term['slug']) for term in self.terms]
+
+    def id_for(self, name: str) -> Optional[int]:
+        """ID of a term by exact name, or by slug"""
+        term_id = self.name_to_id.get(name)
+        if term_id is None:
+            term_id = self.slug_to_id.get(name)
+        return term_id
+
+    def ids_for(self, names: List[str]) -> List[int]:
+        """IDs for the names that exist (unknown names are skipped)"""
+        ids = []
+        for name in names:
+            term_id = self.id_for(name)
+            if term_id:
+                ids.append(term_id)
+        return ids
+
+
+def parse_term(term: Dict) -> Dict:
+    """Keep the fields the converter uses from a REST API term"""
+    return {'id': int(term['id']), 'name': term['name'], 'slug': term['slug'], 'count': term.get('count', 0)}
+
+
+class TaxonomyService:
+    """Categories and tags for one WordPress site, refreshed from its REST API"""
+
+    def __init__(self, site_url: str, username: Optional[str] = None, password: Optional[str] = None,
+                 cache_path: Optional[Path] = None, snapshot_path: Path = SNAPSHOT_PATH, timeout: float = 20,
+                 shared: Optional[CacheNamespace] = None):
+        """
+        Args:
+            site_url: WordPress site, e.g. https://mikesellsnj.com
+            username / password: Application password credentials (the endpoints are public, so optional)
+            cache_path: JSON file with the last synced terms and ETags (ignored if written for another site)
+            snapshot_path: Terms used when there is no cache yet (offline)
+            timeout: Seconds per HTTP request
+            shared: Cache namespace holding the last sync of any process (checked before WordPress)
+        """
+        self.site_url = site_url.rstrip('/')
+        self.auth = (username, password) if username and password else None
+        self.cache_path = Path(cache_path or os.getenv('WORDPRESS_TAXONOMY_CACHE_PATH', DEFAULT_CACHE_PATH))
+        self.snapshot_path = Path(snapshot_path)
+        self.timeout = timeout
+        self.shared = shared
+        self._lock = threading.Lock()
+        self._refresh_lock = threading.Lock()
+        self._indexes: Dict[str, TaxonomyIndex] = {}
+        self._state: Dict[str, Dict] = {}
+        self._refresher = None
+        self.refreshes = 0
+        self.not_modified = 0
+        self.shared_syncs = 0
+        self.failures = 0
+        self.last_error: Optional[str] = None
+        self._load()
+
+    # --- Lookups ------------------------------------------------------------
+
+    @property
+    def categories(self) -> TaxonomyIndex:
+        return self._indexes[CATEGORIES]
+
+    @property
+    def tags(self) -> TaxonomyIndex:
+        return self._indexes[TAGS]
+
+    def index(self, kind: str) -> TaxonomyIndex:
+        return self._indexes[kind]
+
+    # --- Disk cache -----------------------------------------------------------
+
+    def _load(self):
+        """Terms from the disk cache, else the bundled snapshot"""
+        cached = {}
+        if self.cache_path.exists():
+            try:
+                with open(self.cache_path, 'r', encoding='utf-8') as f:
+                    cached = json.load(f)
+            except (OSError, ValueError) as e:
+                logger.warning(f"Unreadable taxonomy cache {self.cache_path}: {e}")
+            if cached.get('site') != self.site_url:
+                cached = {}
+
+        with open(self.snapshot_path, 'r', encoding='utf-8') as f:
+            snapshot = json.load(f)
+
+        for kind in KINDS:
+            entry = cached.get(kind)
+            if entry and entry.get('terms'):
+                self._state[kind] = {'etag': entry.get('etag'), 'fetched_at': entry.get('fetched_at'), 'source': 'cache'}
+                self._indexes[kind] = TaxonomyIndex(entry['terms'])
+            else:
+                self._state[kind] = {'etag': None, 'fetched_at': None, 'source': 'snapshot'}
+                self._indexes[kind] = TaxonomyIndex(snapshot[kind])
+
+    def _save(self):
+        data = {'site': self.site_url}
+        data.update({
+            kind: {
+                'etag': self._state[kind]['etag'],
+                'fetched_at': self._state[kind]['fetched_at'],
+                'terms': self._indexes[kind].terms
+            }
+            for kind in KINDS if self._state[kind]['source'] != 'snapshot'
+        })
+        self.cache_path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = self.cache_path.with_suffix('.tmp')
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(data, f, indent=1)
+        os.replace(tmp_path, self.cache_path)
+
+    # --- Sync -----------------------------------------------------------------
+
+    def fetch(self, kind: str, etag: Optional[str] = None):
+        """
+        Fetch every term of one taxonomy
+
+        Args:
+            kind: 'categories' or 'tags'
+            etag: ETag of the last sync (sent as If-None-Match for the first page)
+
+        Returns:
+            (terms, etag), or None if the server answered 304 Not Modified
+        """
+        import requests
+
+        url = f"{self.site_url}/wp-json/wp/v2/{kind}"
+        terms = []
+        first_etag = None
+        page = 1
+        total_pages = 1
+        while page <= total_pages:
+            headers = {'If-None-Match': etag} if etag and page == 1 else {}
+            response = requests.get(
+                url,
+                params={'per_page': PER_PAGE, 'page': page, 'orderby': 'id', '_fields': 'id,name,slug,count'},
+                headers=headers,
+                auth=self.auth,
+                timeout=self.timeout
+            )
+            if response.status_code == 304:
+                return None
+            response.raise_for_status()
+            if page == 1:
+                first_etag = response.headers.get('ETag')
+                total_pages = int(response.headers.get('X-WP-TotalPages') or 1)
+            terms.extend(parse_term(term) for term in response.json())
+            page += 1
+        return terms, first_etag
+
+    def refresh(self, kinds=KINDS) -> Dict[str, str]:
+        """
+        Sync the taxonomies from WordPress (callers that overlap a sync in flight share its result)
+
+        Returns:
+            Kind -> 'updated', 'unchanged', 'not_modified' or 'failed'
+        """
+        kinds = tuple(kinds)
+        return single_flight.group('taxonomy').do((self.site_url, kinds), self._refresh, kinds)
+
+    def _refresh(self, kinds) -> Dict[str, str]:
+        results = {}
+        with self._refresh_lock:
+            for kind in kinds:
+                synced = self.shared.get(cache_key(self.site_url, kind)) if self.shared else None
+                if synced:
+                    # Another process synced within the refresh interval
+                    self.shared_syncs += 1
+                    results[kind] = self._apply(kind, synced['terms'], synced['etag'], synced['fetched_at'], 'shared')
+                    continue
+
+                try:
+                    fetched = self.fetch(kind, self._state[kind]['etag'])
+                except Exception as e:
+                    self.failures += 1
+                    self.last_error = f"{kind}: {type(e).__name__}: {e}"
+                    logger.warning(f"Taxonomy sync failed for {kind}, keeping {len(self._indexes[kind])} "
+                                   f"{self._state[kind]['source']} terms: {e}")
+                    results[kind] = 'failed'
+                    continue
+
+                now = datetime.now().isoformat()
+                if fetched is None:
+                    self.not_modified += 1
+                    self._state[kind].update(fetched_at=now, source='live')
+                    self._share(kind)
+                    results[kind] = 'not_modified'
+                    continue
+
+                terms, etag = fetched
+                if not terms:
+                    # WordPress always has at least "Uncategorized" - an empty list is a broken response
+                    logger.warning(f"Taxonomy sync returned no {kind}, keeping the current terms")
+                    results[kind] = 'failed'
+                    continue
+
+                results[kind] = self._apply(kind, terms, etag, now, 'live')
+                self._share(kind)
+
+            self.refreshes += 1
+            if any(result != 'failed' for result in results.values()):
+                try:
+                    self._save()
+                except OSError as e:
+                    logger.warning(f"Could not write taxonomy cache {self.cache_path}: {e}")
+
+        for kind, result in results.items():
+            if result == 'updated':
+                logger.info(f"Taxonomy sync: {len(self._indexes[kind])} {kind}")
+                for listener in _change_listeners:
+                    listener(kind)
+        return results
+
+    def _apply(self, kind: str, terms: List[Dict], etag: Optional[str], fetched_at: str, source: str) -> str:
+        """Swap in a new term list ('updated' if it differs from the current one, else 'unchanged')"""
+        index = TaxonomyIndex(terms)
+        changed = index.signature() != self._indexes[kind].signature()
+        with self._lock:
+            self._indexes[kind] = index
+            self._state[kind] = {'etag': etag, 'fetched_at': fetched_at, 'source': source}
+        return 'updated' if changed else 'unchanged'
+
+    def _share(self, kind: str):
+        """Hand a live sync to the other processes"""
+        if self.shared:
+            state = self._state[kind]
+            self.shared.put(cache_key(self.site_url, kind), {
+                'etag': state['etag'], 'fetched_at': state['fetched_at'], 'terms': self._indexes[kind].terms
+            })
+
+    def start_background_refresh(self, interval: Optional[float] = None):
+        """Sync now and then every interval seconds (TAXONOMY_REFRESH_INTERVAL, default 1 hour) in a daemon thread"""
+        if self._refresher and self._refresher.is_alive():
+            return
+        if interval is None:
+            interval = refresh_interval()
+
+        def run():
+            while True:
+                self.refresh()
+                time.sleep(interval)
+
+        self._refresher = threading.Thread(target=run, name='taxonomy-sync', daemon=True)
+        self._refresher.start()
+
+    def stats(self) -> Dict:
+        return {
+            **{kind: dict(self._state[kind], terms=len(self._indexes[kind])) for kind in KINDS},
+            'refreshes': self.refreshes,
+            'not_modified': self.not_modified,
+            'shared_syncs': self.shared_syncs,
+            'failures': self.failures,
+            'last_error': self.last_error
+        }
+
+
+def refresh_interval() -> float:
+    return float(os.getenv('TAXONOMY_REFRESH_INTERVAL', DEFAULT_REFRESH_INTERVAL))
+
+
+_service: Optional[TaxonomyService] = None
+_service_lock = threading.Lock()
+
+
+def get_taxonomy() -> TaxonomyService:
+    """The shared taxonomy service for WORDPRESS_SITE_URL (created on first use, after .env is loaded)"""
+    global _service
+    if _service is None:
+        with _service_lock:
+            if _service is None:
+                password = os.getenv('WORDPRESS_APP_PASSWORD')
+                if password == 'your_wordpress_app_password_here':
+                    password = None
+                _service = TaxonomyService(
+                    os.getenv('WORDPRESS_SITE_URL', 'https://mikesellsnj.com'),
+                    os.getenv('WORDPRESS_USERNAME'),
+                    password,
+                    # Any process's sync is good for one refresh interval
+                    shared=get_shared_cache().namespace('taxonomy', ttl=refresh_interval(), maxsize=0, policy=TTL)
+                )
+    return _service
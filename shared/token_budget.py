@@ -0,0 +1,268 @@
+"""
+Token Budget Manager
+Counts prompt tokens per section and trims Notion context documents to fit a budget
+"""
+
+import os
+import re
+import math
+import logging
+from typing import Callable, Dict, List, Optional, Tuple
+
+from tracing import traced
+
+logger = logging.getLogger(__name__)
+
+# Rough Claude tokenizer ratio for English prose (used when no counter is supplied)
+CHARS_PER_TOKEN = 4
+
+# Default token budget for all context documents combined
+DEFAULT_CONTEXT_TOKEN_BUDGET = 12000
+
+# Master doc sections that are always kept (matched against section headings)
+DEFAULT_MASTER_KEY_SECTIONS = [
+    'market',
+    'price',
+    'town',
+    'county',
+    'statistic',
+    'data',
+]
+
+HEADING_PATTERN = re.compile(r'^#{2,4}\s+(.*)$')
+WORD_PATTERN = re.compile(r'[a-z0-9$%]+')
+
+
+def count_tokens(text: str) -> int:
+    """
+    Estimate the number of tokens in a string
+
+    Args:
+        text: Text to measure
+
+    Returns:
+        Estimated token count
+    """
+    if not text:
+        return 0
+    return math.ceil(len(text) / CHARS_PER_TOKEN)
+
+
+def get_context_token_budget() -> int:
+    """
+    Returns the configured context token budget (CONTEXT_TOKEN_BUDGET env var)
+    """
+    try:
+        return int(os.getenv('CONTEXT_TOKEN_BUDGET', DEFAULT_CONTEXT_TOKEN_BUDGET))
+    except ValueError:
+        logger.warning("Invalid CONTEXT_TOKEN_BUDGET - using default")
+        return DEFAULT_CONTEXT_TOKEN_BUDGET
+
+
+def get_master_key_sections() -> List[str]:
+    """
+    Returns heading keywords marking master doc sections that must never be trimmed
+    Override with a comma-separated MASTER_KEY_SECTIONS env var
+    """
+    configured = os.getenv('MASTER_KEY_SECTIONS', '')
+    if configured.strip():
+        return [s.strip().lower() for s in configured.split(',') if s.strip()]
+    return DEFAULT_MASTER_KEY_SECTIONS
+
+
+def split_paragraphs(content: str) -> List[Dict]:
+    """
+    Split page content (as built by retrieve_page_content) into paragraphs
+
+    Args:
+        content: Plain text page content with markdown-style headings
+
+    Returns:
+        List of dicts with 'text', 'heading' and 'is_heading' keys, in document order
+    """
+    paragraphs = []
+    current_heading = ''
+
+    for line in content.split('\n'):
+        text = line.strip()
+        if not text:
+            continue
+
+        heading_match = HEADING_PATTERN.match(text)
+        if heading_match:
+            current_heading = heading_match.group(1).strip()
+            paragraphs.append({'text': text, 'heading': current_heading, 'is_heading': True})
+        else:
+            paragraphs.append({'text': text, 'heading': current_heading, 'is_heading': False})
+
+    return paragraphs
+
+
+def score_paragraph(text: str, topics: List[str]) -> float:
+    """
+    Score a paragraph's relevance to the extracted blog topics
+
+    Whole-phrase topic matches count most, individual topic words less,
+    and paragraphs carrying numbers (stats, prices) get a small boost.
+    """
+    text_lower = text.lower()
+    words = set(WORD_PATTERN.findall(text_lower))
+    score = 0.0
+
+    for topic in topics:
+        topic_lower = topic.lower().strip()
+        if not topic_lower:
+            continue
+        if topic_lower in text_lower:
+            score += 3 * text_lower.count(topic_lower)
+        for word in WORD_PATTERN.findall(topic_lower):
+            if len(word) > 3 and word in words:
+                score += 1
+
+    if re.search(r'\d', text):
+        score += 0.5
+
+    return score
+
+
+def _is_key_section(heading: str, key_sections: List[str]) -> bool:
+    heading_lower = heading.lower()
+    return any(key in heading_lower for key in key_sections)
+
+
+@traced()
+def fit_context_to_budget(
+    context_docs: List[Dict],
+    topics: List[str],
+    budget: Optional[int] = None,
+    template: str = '',
+    original_html: str = '',
+    token_counter: Callable[[str], int] = count_tokens
+) -> Tuple[List[Dict], Dict]:
+    """
+    Trim context documents so their combined size fits the token budget
+
+    Paragraphs are ranked by relevance to the topics and packed greedily.
+    Key sections of the master doc are always kept, even past the budget.
+    Kept paragraphs stay in their original order, along with their headings.
+
+    Args:
+        context_docs: List of dicts with 'title', 'content' and 'is_master' keys
+        topics: Topics extracted from the original blog post
+        budget: Token budget for context documents (defaults to CONTEXT_TOKEN_BUDGET)
+        template: Prompt template (counted for the report only)
+        original_html: Original blog HTML (counted for the report only)
+        token_counter: Function returning the token count of a string
+
+    Returns:
+        Tuple of (trimmed_docs, report_dict)
+        report_dict contains:
+            - budget: context token budget used
+            - template_tokens / original_html_tokens: fixed prompt sections
+            - documents: per-document original and kept token counts
+            - context_tokens_before / context_tokens_after
+            - trimmed_tokens / trimmed_paragraphs
+            - total_prompt_tokens: estimated prompt size after trimming
+    """
+    if budget is None:
+        budget = get_context_token_budget()
+
+    key_sections = get_master_key_sections()
+
+    # Flatten all paragraphs into candidates tagged with their document
+    candidates = []
+    for doc_index, doc in enumerate(context_docs):
+        for para_index, para in enumerate(split_paragraphs(doc['content'])):
+            candidates.append({
+                'doc': doc_index,
+                'position': para_index,
+                'text': para['text'],
+                'heading': para['heading'],
+                'is_heading': para['is_heading'],
+                'tokens': token_counter(para['text']),
+                'required': doc.get('is_master', False) and (
+                    para['heading'] == '' or _is_key_section(para['heading'], key_sections)
+                ),
+                'score': 0.0 if para['is_heading'] else score_paragraph(para['text'], topics)
+            })
+
+    context_tokens_before = sum(c['tokens'] for c in candidates)
+    kept = set()
+    used = 0
+
+    # Master doc key sections always go in first
+    for index, candidate in enumerate(candidates):
+        if candidate['required']:
+            kept.add(index)
+            used += candidate['tokens']
+
+    if used > budget:
+        logger.warning(f"Master doc key sections alone use {used} tokens (budget {budget})")
+
+    # Section headings travel with their paragraphs, so index them for packing
+    headings = {
+        (c['doc'], c['heading']): i for i, c in enumerate(candidates) if c['is_heading']
+    }
+
+    # Pack the remaining paragraphs by relevance, then document order
+    ranked = sorted(
+        (i for i, c in enumerate(candidates) if i not in kept and not c['is_heading']),
+        key=lambda i: (-candidates[i]['score'], candidates[i]['doc'], candidates[i]['position'])
+    )
+    for index in ranked:
+        candidate = candidates[index]
+        heading_index = headings.get((candidate['doc'], candidate['heading']))
+        cost = candidate['tokens']
+        if heading_index is not None and heading_index not in kept:
+            cost += candidates[heading_index]['tokens']
+        if used + cost <= budget:
+            kept.add(index)
+            if heading_index is not None:
+                kept.add(heading_index)
+            used += cost
+
+    # Rebuild documents in their original order
+    trimmed_docs = []
+    documents_report = []
+    for doc_index, doc in enumerate(context_docs):
+        doc_candidates = [(i, c) for i, c in enumerate(candidates) if c['doc'] == doc_index]
+        kept_parts = [
+            f"\n{c['text']}\n" if c['is_heading'] else c['text']
+            for i, c in doc_candidates if i in kept
+        ]
+        original_tokens = sum(c['tokens'] for _, c in doc_candidates)
+        kept_tokens = sum(c['tokens'] for i, c in doc_candidates if i in kept)
+
+        documents_report.append({
+            'title': doc['title'],
+            'is_master': doc.get('is_master', False),
+            'original_tokens': original_tokens,
+            'kept_tokens': kept_tokens
+        })
+
+        if kept_parts:
+            trimmed_docs.append({**doc, 'content': '\n'.join(kept_parts)})
+        else:
+            logger.info(f"Dropped context document entirely: {doc['title']}")
+
+    template_tokens = token_counter(template)
+    original_html_tokens = token_counter(original_html)
+
+    report = {
+        'budget': budget,
+        'template_tokens': template_tokens,
+        'original_html_tokens': original_html_tokens,
+        'documents': documents_report,
+        'context_tokens_before': context_tokens_before,
+        'context_tokens_after': used,
+        'trimmed_tokens': context_tokens_before - used,
+        'trimmed_paragraphs': len(candidates) - len(kept),
+        'total_prompt_tokens': template_tokens + original_html_tokens + used
+    }
+
+    logger.info(
+        f"Context budget: {used}/{budget} tokens kept "
+        f"({report['trimmed_tokens']} tokens, {report['trimmed_paragraphs']} paragraphs trimmed)"
+    )
+
+    return trimmed_docs, report
@@ -0,0 +1,230 @@
+"""
+Tracing
+Lightweight per-request span timeline with parent/child spans
+A trace is started per request; span() and @traced record into it only while one is active,
+so untraced calls (CLI, background threads) pay a single context variable lookup.
+Finished traces can be appended to a local file as OpenTelemetry (OTLP/JSON) spans.
+"""
+
+import os
+import json
+import time
+import logging
+import secrets
+import functools
+import inspect
+import threading
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, Callable, Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+_current_trace: ContextVar[Optional['Trace']] = ContextVar('current_trace', default=None)
+_current_span: ContextVar[Optional['Span']] = ContextVar('current_span', default=None)
+
+_export_lock = threading.Lock()
+
+
+class Span:
+    """One timed operation inside a trace"""
+
+    __slots__ = ('span_id', 'parent_id', 'name', 'start_ns', 'end_ns', 'attributes', 'error')
+
+    def __init__(self, name: str, parent_id: Optional[str], attributes: Optional[Dict] = None):
+        self.span_id = secrets.token_hex(8)
+        self.parent_id = parent_id
+        self.name = name
+        self.start_ns = time.time_ns()
+        self.end_ns = None
+        self.attributes = dict(attributes or {})
+        self.error = None
+
+    def set(self, **attributes):
+        """Attach attributes (sizes, counts, IDs) to the span"""
+        self.attributes.update(attributes)
+
+    @property
+    def duration_ms(self) -> float:
+        end_ns = self.end_ns or time.time_ns()
+        return (end_ns - self.start_ns) / 1e6
+
+
+class Trace:
+    """All spans recorded while handling one request"""
+
+    def __init__(self, name: str):
+        self.trace_id = secrets.token_hex(16)
+        self.spans: List[Span] = []
+        self._lock = threading.Lock()
+        self.root = self.add(name, None)
+
+    def add(self, name: str, parent_id: Optional[str], attributes: Optional[Dict] = None) -> Span:
+        span = Span(name, parent_id, attributes)
+        with self._lock:
+            self.spans.append(span)
+        return span
+
+    def timeline(self, min_ms: float = 0.0) -> List[Dict]:
+        """
+        Compact timeline for API responses
+
+        Args:
+            min_ms: Leave out spans shorter than this (the root span is always kept)
+
+        Returns:
+            One dict per span in start order: name, depth, start_ms (offset from the request start),
+            duration_ms, plus 'error' and attributes when present
+        """
+        depths = {self.root.span_id: 0}
+        rows = []
+        for span in sorted(self.spans, key=lambda s: s.start_ns):
+            depth = depths.get(span.parent_id, -1) + 1 if span.parent_id else 0
+            depths[span.span_id] = depth
+            if span is not self.root and span.duration_ms < min_ms:
+                continue
+            row = {
+                'name': span.name,
+                'depth': depth,
+                'start_ms': round((span.start_ns - self.root.start_ns) / 1e6, 1),
+                'duration_ms': round(span.duration_ms, 1)
+            }
+            if span.attributes:
+                row['attributes'] = span.attributes
+            if span.error:
+                row['error'] = span.error
+            rows.append(row)
+        return rows
+
+    def to_otlp(self, service_name: str = 'kcm-converter') -> Dict:
+        """The trace as an OTLP/JSON ExportTraceServiceRequest"""
+        def attribute(key: str, value: Any) -> Dict:
+            if isinstance(value, bool):
+                return {'key': key, 'value': {'boolValue': value}}
+            if isinstance(value, int):
+                return {'key': key, 'value': {'intValue': str(value)}}
+            if isinstance(value, float):
+                return {'key': key, 'value': {'doubleValue': value}}
+            return {'key': key, 'value': {'stringValue': str(value)}}
+
+        spans = []
+        for span in self.spans:
+            otlp_span = {
+                'traceId': self.trace_id,
+                'spanId': span.span_id,
+                'name': span.name,
+                'kind': 2 if span is self.root else 1,  # SERVER for the request, INTERNAL otherwise
+                'startTimeUnixNano': str(span.start_ns),
+                'endTimeUnixNano': str(span.end_ns or time.time_ns()),
+                'attributes': [attribute(k, v) for k, v in span.attributes.items()],
+                'status': {'code': 2, 'message': span.error} if span.error else {'code': 1}
+            }
+            if span.parent_id:
+                otlp_span['parentSpanId'] = span.parent_id
+            spans.append(otlp_span)
+
+        return {
+            'resourceSpans': [{
+                'resource': {'attributes': [attribute('service.name', service_name)]},
+                'scopeSpans': [{'scope': {'name': 'kcm-converter.tracing'}, 'spans': spans}]
+            }]
+        }
+
+
+def current_trace() -> Optional[Trace]:
+    """The trace of the request being handled, or None"""
+    return _current_trace.get()
+
+
+def get_export_path() -> Optional[str]:
+    """File that finished traces are appended to (TRACE_EXPORT_PATH env var), or None"""
+    return os.getenv('TRACE_EXPORT_PATH') or None
+
+
+def export_trace(trace: Trace, path: str):
+    """Append a trace to a JSON Lines file (one OTLP/JSON request per line)"""
+    line = json.dumps(trace.to_otlp())
+    try:
+        with _export_lock:
+            with open(path, 'a', encoding='utf-8') as f:
+                f.write(line + '\n')
+    except OSError as e:
+        logger.warning(f"Could not export trace to {path}: {e}")
+
+
+@contextmanager
+def start_trace(name: str, **attributes):
+    """
+    Start a trace for one request (its root span covers the whole block)
+
+    Yields:
+        The Trace; spans opened inside the block become its children
+    """
+    trace = Trace(name)
+    trace.root.set(**attributes)
+    trace_token = _current_trace.set(trace)
+    span_token = _current_span.set(trace.root)
+    try:
+        yield trace
+    except BaseException as e:
+        trace.root.error = f"{type(e).__name__}: {e}"
+        raise
+    finally:
+        trace.root.end_ns = time.time_ns()
+        _current_span.reset(span_token)
+        _current_trace.reset(trace_token)
+        export_path = get_export_path()
+        if export_path:
+            export_trace(trace, export_path)
+
+
+@contextmanager
+def span(name: str, **attributes):
+    """
+    Record a child span of the current span (does nothing outside a trace)
+
+    Yields:
+        The Span (or None when no trace is active)
+    """
+    trace = _current_trace.get()
+    if trace is None:
+        yield None
+        return
+
+    parent = _current_span.get()
+    current = trace.add(name, parent.span_id if parent else None, attributes)
+    token = _current_span.set(current)
+    try:
+        yield current
+    except BaseException as e:
+        current.error = f"{type(e).__name__}: {e}"
+        raise
+    finally:
+        current.end_ns = time.time_ns()
+        _current_span.reset(token)
+
+
+def traced(name: Optional[str] = None) -> Callable:
+    """Decorator that records every call of a function as a span"""
+    def decorator(fn: Callable) -> Callable:
+        span_name = name or fn.__name__
+
+        if inspect.iscoroutinefunction(fn):
+            @functools.wraps(fn)
+            async def async_wrapper(*args, **kwargs):
+                if _current_trace.get() is None:
+                    return await fn(*args, **kwargs)
+                with span(span_name):
+                    return await fn(*args, **kwargs)
+
+            return async_wrapper
+
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            if _current_trace.get() is None:
+                return fn(*args, **kwargs)
+            with span(span_name):
+                return fn(*args, **kwargs)
+
+        return wrapper
+    return decorator
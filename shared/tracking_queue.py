@@ -0,0 +1,232 @@
+"""
+Tracking Queue
+Write-behind SQLite queue for Notion conversion tracking records
+Records are committed to disk immediately and written to Notion in small batches by a
+background worker (through the rate-limited Notion client), with retries across restarts
+"""
+
+import os
+import json
+import time
+import sqlite3
+import logging
+import threading
+from datetime import datetime
+from pathlib import Path
+from typing import Callable, Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+# Default database location (next to the shared modules)
+DEFAULT_QUEUE_PATH = Path(__file__).parent / '.cache' / 'tracking_queue.db'
+
+# Record statuses
+PENDING = 'pending'
+WRITING = 'writing'
+DONE = 'done'
+FAILED = 'failed'
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS tracking (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    dedupe_key TEXT NOT NULL UNIQUE,
+    kcm_url TEXT,
+    wordpress_url TEXT,
+    record TEXT NOT NULL,
+    status TEXT NOT NULL,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    next_attempt_at REAL NOT NULL DEFAULT 0,
+    last_error TEXT,
+    notion_page_id TEXT,
+    created_at TEXT NOT NULL,
+    updated_at TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_tracking_due ON tracking (status, next_attempt_at);
+"""
+
+
+class TrackingQueue:
+    """Persistent queue of conversion records with a batching background writer"""
+
+    def __init__(
+        self,
+        write_record: Callable[[Dict], str],
+        db_path: Optional[Path] = None,
+        on_written: Optional[Callable[[str, str], None]] = None,
+        batch_size: int = 10,
+        max_attempts: int = 10,
+        base_delay: float = 30.0,
+        max_delay: float = 1800.0
+    ):
+        """
+        Args:
+            write_record: Writes one record to Notion and returns the page ID (raises on failure)
+            db_path: SQLite file holding the queue
+            on_written: Called with (dedupe_key, notion_page_id) after each successful write
+            batch_size: Maximum records written per worker cycle
+            max_attempts: Attempts before a record is marked failed
+            base_delay: Backoff before the first retry (doubles every attempt)
+            max_delay: Upper bound for a single backoff
+        """
+        self.write_record = write_record
+        self.db_path = Path(db_path or os.getenv('TRACKING_QUEUE_PATH', DEFAULT_QUEUE_PATH))
+        self.db_path.parent.mkdir(parents=True, exist_ok=True)
+        self.on_written = on_written
+        self.batch_size = batch_size
+        self.max_attempts = max_attempts
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+
+        self._wake = threading.Event()
+        self._worker = None
+
+        with self._connect() as conn:
+            conn.executescript(SCHEMA)
+
+    def recover(self) -> int:
+        """
+        Requeue records left in 'writing' by a crashed worker
+
+        Only the process that runs the worker may call this - any other process would
+        requeue the live worker's in-flight writes.
+
+        Returns:
+            Number of records requeued
+        """
+        with self._connect() as conn:
+            cursor = conn.execute("UPDATE tracking SET status = ? WHERE status = ?", (PENDING, WRITING))
+        if cursor.rowcount:
+            logger.warning(f"Requeued {cursor.rowcount} conversion record(s) interrupted mid-write")
+        return cursor.rowcount
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(self.db_path, timeout=30)
+        conn.row_factory = sqlite3.Row
+        conn.execute("PRAGMA journal_mode=WAL")
+        return conn
+
+    def enqueue(self, record: Dict, dedupe_key: str) -> bool:
+        """
+        Durably queue a conversion record
+
+        Args:
+            record: add_conversion_record keyword arguments (must include kcm_url and wordpress_url)
+            dedupe_key: Unique key for the conversion (a repeated key is ignored)
+
+        Returns:
+            True if queued, False if the key was already queued
+        """
+        now = datetime.now().isoformat()
+        with self._connect() as conn:
+            cursor = conn.execute(
+                """INSERT OR IGNORE INTO tracking
+                   (dedupe_key, kcm_url, wordpress_url, record, status, created_at, updated_at)
+                   VALUES (?, ?, ?, ?, ?, ?, ?)""",
+                (dedupe_key, record.get('kcm_url'), record.get('wordpress_url'), json.dumps(record), PENDING, now, now)
+            )
+        queued = cursor.rowcount > 0
+        if queued:
+            self._wake.set()
+            logger.info(f"Tracking record queued: {record.get('kcm_url')}")
+        return queued
+
+    def pending_mappings(self) -> Dict[str, str]:
+        """KCM URL -> WordPress URL for records not yet written to Notion"""
+        with self._connect() as conn:
+            rows = conn.execute(
+                "SELECT kcm_url, wordpress_url FROM tracking WHERE status IN (?, ?) ORDER BY id",
+                (PENDING, WRITING)
+            ).fetchall()
+        return {kcm_url: wordpress_url for kcm_url, wordpress_url in rows if kcm_url and wordpress_url}
+
+    def stats(self) -> Dict:
+        """Number of records per status"""
+        with self._connect() as conn:
+            rows = conn.execute("SELECT status, COUNT(*) FROM tracking GROUP BY status").fetchall()
+        return {status: count for status, count in rows}
+
+    def _claim_batch(self) -> List[Dict]:
+        with self._connect() as conn:
+            rows = conn.execute(
+                "SELECT * FROM tracking WHERE status = ? AND next_attempt_at <= ? ORDER BY id LIMIT ?",
+                (PENDING, time.time(), self.batch_size)
+            ).fetchall()
+            conn.executemany(
+                "UPDATE tracking SET status = ?, attempts = attempts + 1, updated_at = ? WHERE id = ?",
+                [(WRITING, datetime.now().isoformat(), row['id']) for row in rows]
+            )
+        batch = []
+        for row in rows:
+            item = dict(row)
+            item['record'] = json.loads(item['record'])
+            item['attempts'] += 1
+            batch.append(item)
+        return batch
+
+    def _seconds_until_due(self, default: float) -> float:
+        with self._connect() as conn:
+            row = conn.execute("SELECT MIN(next_attempt_at) FROM tracking WHERE status = ?", (PENDING,)).fetchone()
+        if not row or row[0] is None:
+            return default
+        return max(0.0, min(default, row[0] - time.time()))
+
+    def _mark(self, item: Dict, status: str, error: Optional[str] = None,
+              notion_page_id: Optional[str] = None, next_attempt_at: float = 0):
+        with self._connect() as conn:
+            conn.execute(
+                """UPDATE tracking SET status = ?, last_error = ?, notion_page_id = ?, next_attempt_at = ?, updated_at = ?
+                   WHERE id = ?""",
+                (status, error, notion_page_id, next_attempt_at, datetime.now().isoformat(), item['id'])
+            )
+
+    def write(self, item: Dict):
+        """Write one claimed record to Notion and record the outcome"""
+        record = item['record']
+        try:
+            notion_page_id = self.write_record(record)
+        except Exception as e:
+            if item['attempts'] >= self.max_attempts:
+                self._mark(item, FAILED, error=str(e))
+                logger.error(f"❌ Notion tracking failed permanently for {record.get('kcm_url')}: {e}")
+            else:
+                delay = min(self.max_delay, self.base_delay * (2 ** (item['attempts'] - 1)))
+                self._mark(item, PENDING, error=str(e), next_attempt_at=time.time() + delay)
+                logger.warning(f"⚠️  Notion tracking attempt {item['attempts']} failed - retrying in {delay:.0f}s: {e}")
+            return
+
+        self._mark(item, DONE, notion_page_id=notion_page_id)
+        if self.on_written:
+            try:
+                self.on_written(item['dedupe_key'], notion_page_id)
+            except Exception as e:
+                logger.error(f"Post-tracking hook failed (non-critical): {e}")
+
+    def start_worker(self, poll_interval: float = 10.0):
+        """Start the daemon thread that writes due records in batches"""
+        if self._worker and self._worker.is_alive():
+            return
+
+        def run():
+            while True:
+                try:
+                    batch = self._claim_batch()
+                except sqlite3.Error as e:
+                    logger.error(f"Tracking queue read failed: {e}")
+                    batch = []
+
+                if batch:
+                    logger.info(f"Writing {len(batch)} conversion record(s) to Notion")
+                    for item in batch:
+                        self.write(item)
+                    continue
+
+                try:
+                    wait = self._seconds_until_due(poll_interval)
+                except sqlite3.Error:
+                    wait = poll_interval
+                self._wake.wait(wait)
+                self._wake.clear()
+
+        self._worker = threading.Thread(target=run, name='notion-tracking-writer', daemon=True)
+        self._worker.start()
+        logger.info(f"Notion tracking writer started ({self.stats()})")
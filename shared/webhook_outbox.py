@@ -0,0 +1,316 @@
+"""
+Webhook Outbox
+Durable SQLite queue for n8n webhook deliveries
+Payloads are committed to disk before the HTTP request returns, then a background
+sender delivers them with exponential backoff, so a server restart never loses a post
+"""
+
+import os
+import json
+import time
+import sqlite3
+import logging
+import threading
+from datetime import datetime
+from pathlib import Path
+from typing import Callable, Dict, List, Optional
+from urllib.parse import urlparse
+
+from metrics import timed
+
+logger = logging.getLogger(__name__)
+
+# Default database location (next to the shared modules)
+DEFAULT_OUTBOX_PATH = Path(__file__).parent / '.cache' / 'webhook_outbox.db'
+
+# Delivery statuses
+PENDING = 'pending'
+SENDING = 'sending'
+DELIVERED = 'delivered'
+FAILED = 'failed'
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS outbox (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    idempotency_key TEXT NOT NULL UNIQUE,
+    post_key TEXT,
+    payload TEXT NOT NULL,
+    context TEXT,
+    status TEXT NOT NULL,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    next_attempt_at REAL NOT NULL DEFAULT 0,
+    last_error TEXT,
+    response TEXT,
+    created_at TEXT NOT NULL,
+    updated_at TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_outbox_due ON outbox (status, next_attempt_at);
+CREATE INDEX IF NOT EXISTS idx_outbox_post ON outbox (post_key);
+"""
+
+
+class WebhookOutbox:
+    """Persistent webhook queue with a background sender thread"""
+
+    def __init__(
+        self,
+        webhook_url: str,
+        db_path: Optional[Path] = None,
+        on_delivered: Optional[Callable[[Dict, Dict], None]] = None,
+        max_attempts: int = 8,
+        base_delay: float = 5.0,
+        max_delay: float = 600.0,
+        timeout: int = 30
+    ):
+        """
+        Args:
+            webhook_url: n8n webhook URL
+            db_path: SQLite file holding the outbox
+            on_delivered: Called with (record, webhook_response) after each successful delivery
+            max_attempts: Attempts before a delivery is marked failed
+            base_delay: Backoff before the first retry (doubles every attempt)
+            max_delay: Upper bound for a single backoff
+            timeout: Webhook request timeout in seconds
+        """
+        self.webhook_url = webhook_url
+        self.db_path = Path(db_path or os.getenv('WEBHOOK_OUTBOX_PATH', DEFAULT_OUTBOX_PATH))
+        self.db_path.parent.mkdir(parents=True, exist_ok=True)
+        self.on_delivered = on_delivered
+        self.max_attempts = max_attempts
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.timeout = timeout
+
+        self._wake = threading.Event()
+        self._sender = None
+        self._session = None
+
+        with self._connect() as conn:
+            conn.executescript(SCHEMA)
+
+    def recover(self) -> int:
+        """
+        Requeue deliveries left in 'sending' by a crashed sender
+
+        Only the process that runs the sender may call this - any other process would
+        requeue the live sender's in-flight deliveries and post them twice.
+
+        Returns:
+            Number of deliveries requeued
+        """
+        with self._connect() as conn:
+            cursor = conn.execute("UPDATE outbox SET status = ? WHERE status = ?", (PENDING, SENDING))
+        if cursor.rowcount:
+            logger.warning(f"Requeued {cursor.rowcount} webhook delivery(ies) interrupted mid-send")
+        return cursor.rowcount
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(self.db_path, timeout=30)
+        conn.row_factory = sqlite3.Row
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=FULL")
+        return conn
+
+    @staticmethod
+    def _to_record(row: sqlite3.Row) -> Dict:
+        record = dict(row)
+        record['payload'] = json.loads(record['payload'])
+        record['context'] = json.loads(record['context']) if record['context'] else {}
+        record['response'] = json.loads(record['response']) if record['response'] else None
+        return record
+
+    def enqueue(self, payload: Dict, idempotency_key: str, post_key: str = '', context: Optional[Dict] = None) -> Dict:
+        """
+        Durably queue a webhook payload (a key that is already queued returns the existing record)
+
+        Args:
+            payload: JSON body to POST to the webhook
+            idempotency_key: Unique key for this delivery
+            post_key: Lookup key for status queries (KCM URL or slug)
+            context: Extra data handed to on_delivered (e.g. Notion tracking fields)
+
+        Returns:
+            Outbox record dict
+        """
+        now = datetime.now().isoformat()
+        with self._connect() as conn:
+            conn.execute(
+                """INSERT OR IGNORE INTO outbox
+                   (idempotency_key, post_key, payload, context, status, created_at, updated_at)
+                   VALUES (?, ?, ?, ?, ?, ?, ?)""",
+                (idempotency_key, post_key, json.dumps(payload), json.dumps(context or {}), PENDING, now, now)
+            )
+            row = conn.execute("SELECT * FROM outbox WHERE idempotency_key = ?", (idempotency_key,)).fetchone()
+
+        self._wake.set()
+        record = self._to_record(row)
+        logger.info(f"Webhook queued: {idempotency_key[:16]}... (status: {record['status']})")
+        return record
+
+    def get(self, idempotency_key: str) -> Optional[Dict]:
+        """Return the outbox record for a delivery, or None"""
+        with self._connect() as conn:
+            row = conn.execute("SELECT * FROM outbox WHERE idempotency_key = ?", (idempotency_key,)).fetchone()
+        return self._to_record(row) if row else None
+
+    def find_by_post(self, post_key: str) -> List[Dict]:
+        """Return every delivery for a post, newest first"""
+        with self._connect() as conn:
+            rows = conn.execute("SELECT * FROM outbox WHERE post_key = ? ORDER BY id DESC", (post_key,)).fetchall()
+        return [self._to_record(row) for row in rows]
+
+    def retry(self, idempotency_key: str) -> Optional[Dict]:
+        """Reset a pending or failed delivery so it is sent again right away"""
+        with self._connect() as conn:
+            conn.execute(
+                """UPDATE outbox SET status = ?, attempts = 0, next_attempt_at = 0, updated_at = ?
+                   WHERE idempotency_key = ? AND status IN (?, ?)""",
+                (PENDING, datetime.now().isoformat(), idempotency_key, PENDING, FAILED)
+            )
+        self._wake.set()
+        return self.get(idempotency_key)
+
+    def stats(self) -> Dict:
+        """Number of deliveries per status"""
+        with self._connect() as conn:
+            rows = conn.execute("SELECT status, COUNT(*) FROM outbox GROUP BY status").fetchall()
+        return {status: count for status, count in rows}
+
+    def _claim_due(self) -> Optional[Dict]:
+        with self._connect() as conn:
+            row = conn.execute(
+                "SELECT * FROM outbox WHERE status = ? AND next_attempt_at <= ? ORDER BY id LIMIT 1",
+                (PENDING, time.time())
+            ).fetchone()
+            if not row:
+                return None
+            conn.execute(
+                "UPDATE outbox SET status = ?, attempts = attempts + 1, updated_at = ? WHERE id = ?",
+                (SENDING, datetime.now().isoformat(), row['id'])
+            )
+        record = self._to_record(row)
+        record['attempts'] += 1
+        return record
+
+    def _seconds_until_due(self, default: float) -> float:
+        with self._connect() as conn:
+            row = conn.execute("SELECT MIN(next_attempt_at) FROM outbox WHERE status = ?", (PENDING,)).fetchone()
+        if not row or row[0] is None:
+            return default
+        return max(0.0, min(default, row[0] - time.time()))
+
+    def _mark(self, record: Dict, status: str, error: Optional[str] = None,
+              response: Optional[Dict] = None, next_attempt_at: float = 0):
+        with self._connect() as conn:
+            conn.execute(
+                """UPDATE outbox SET status = ?, last_error = ?, response = ?, next_attempt_at = ?, updated_at = ?
+                   WHERE id = ?""",
+                (status, error, json.dumps(response) if response is not None else None,
+                 next_attempt_at, datetime.now().isoformat(), record['id'])
+            )
+
+    def _http(self):
+        """HTTP session shared by the deliveries, so the connection to n8n is reused"""
+        if self._session is None:
+            import requests  # imported by the sender thread, not at server startup
+            self._session = requests.Session()
+        return self._session
+
+    def warm_connection(self) -> bool:
+        """
+        Open the connection to the webhook host ahead of the next delivery
+
+        Returns:
+            True if the host answered (always False outside the process running the sender)
+        """
+        if not (self._sender and self._sender.is_alive()):
+            return False
+        parts = urlparse(self.webhook_url)
+        try:
+            # The host root, not the webhook itself, so nothing is triggered
+            self._http().head(f"{parts.scheme}://{parts.netloc}/", timeout=10)
+            return True
+        except Exception as e:
+            logger.debug(f"Could not open a connection to the webhook host: {e}")
+            return False
+
+    @staticmethod
+    def parse_response(response) -> Dict:
+        """
+        Read n8n's reply to an accepted delivery (an object, an array of objects, or anything else)
+
+        Returns:
+            The response object, or {} if the body is empty or not a JSON object
+        """
+        try:
+            webhook_response_raw = response.json() if response.text else {}
+        except ValueError:
+            logger.warning(f"Webhook returned a non-JSON body (delivered anyway): {response.text[:200]}")
+            return {}
+        if isinstance(webhook_response_raw, list) and len(webhook_response_raw) > 0:
+            webhook_response_raw = webhook_response_raw[0]
+        return webhook_response_raw if isinstance(webhook_response_raw, dict) else {}
+
+    def deliver(self, record: Dict):
+        """POST one claimed record to the webhook and record the outcome"""
+        import requests
+
+        key = record['idempotency_key']
+        try:
+            with timed('webhook'):
+                response = self._http().post(
+                    self.webhook_url,
+                    json=record['payload'],
+                    headers={'Content-Type': 'application/json', 'Idempotency-Key': key},
+                    timeout=self.timeout
+                )
+                if not 200 <= response.status_code < 300:
+                    raise requests.exceptions.HTTPError(f"Webhook returned status {response.status_code}: {response.text[:200]}")
+        except Exception as e:
+            if record['attempts'] >= self.max_attempts:
+                self._mark(record, FAILED, error=str(e))
+                logger.error(f"❌ Webhook delivery failed permanently after {record['attempts']} attempts: {e}")
+            else:
+                delay = min(self.max_delay, self.base_delay * (2 ** (record['attempts'] - 1)))
+                self._mark(record, PENDING, error=str(e), next_attempt_at=time.time() + delay)
+                logger.warning(f"⚠️  Webhook attempt {record['attempts']} failed - retrying in {delay:.0f}s: {e}")
+            return
+
+        # n8n accepted the post - from here on nothing may trigger a redelivery (it would post twice)
+        webhook_response = self.parse_response(response)
+        self._mark(record, DELIVERED, response=webhook_response)
+        logger.info(f"✅ Webhook delivered (attempt {record['attempts']}) - WordPress Post ID: {webhook_response.get('id', 'NOT SET')}")
+
+        if self.on_delivered:
+            try:
+                self.on_delivered(record, webhook_response)
+            except Exception as e:
+                logger.error(f"Post-delivery hook failed (non-critical): {e}")
+
+    def start_sender(self, poll_interval: float = 5.0):
+        """Start the daemon thread that delivers due records"""
+        if self._sender and self._sender.is_alive():
+            return
+
+        def run():
+            while True:
+                try:
+                    record = self._claim_due()
+                except sqlite3.Error as e:
+                    logger.error(f"Outbox read failed: {e}")
+                    record = None
+
+                if record:
+                    self.deliver(record)
+                    continue
+
+                try:
+                    wait = self._seconds_until_due(poll_interval)
+                except sqlite3.Error:
+                    wait = poll_interval
+                self._wake.wait(wait)
+                self._wake.clear()
+
+        self._sender = threading.Thread(target=run, name='webhook-outbox-sender', daemon=True)
+        self._sender.start()
+        logger.info(f"Webhook outbox sender started ({self.stats()})")
@@ -20,8 +20,8 @@ if errorlevel 1 (
 )
 
 echo Checking dependencies...
-REM Check if Flask is installed (indicator that dependencies are set up)
-python -c "import flask" >nul 2>&1
+REM Check if Flask and the production server are installed (indicator that dependencies are set up)
+python -c "import flask, waitress" >nul 2>&1
 if errorlevel 1 (
     echo.
     echo Dependencies not found. Installing required packages...
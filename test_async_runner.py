@@ -0,0 +1,126 @@
+#!/usr/bin/env python3
+"""
+Test the async runner: results and errors reach the sync caller, deadlines cancel the coroutine,
+and the caller's context variables are visible inside it
+"""
+import sys
+import time
+import asyncio
+from contextvars import ContextVar
+from pathlib import Path
+
+# Add shared directory to path
+sys.path.insert(0, str(Path(__file__).parent / 'shared'))
+
+from async_runner import AsyncRunner, DeadlineExceeded, time_remaining
+
+request_id: ContextVar[str] = ContextVar('request_id', default='')
+
+
+async def add(a, b, delay=0.0):
+    await asyncio.sleep(delay)
+    return a + b
+
+
+async def fail():
+    raise ValueError("bad response")
+
+
+async def context_seen():
+    return request_id.get(), time_remaining()
+
+
+def not_a_coroutine():
+    raise TypeError("not a coroutine function")
+
+
+def test_async_runner():
+    """Test run() results, errors, deadlines and context propagation"""
+
+    print("=" * 70)
+    print("ASYNC RUNNER TEST")
+    print("=" * 70)
+    print()
+
+    runner = AsyncRunner('test-engine')
+    result = runner.run(add, 2, 3)
+
+    try:
+        runner.run(fail)
+        error = None
+    except ValueError as e:
+        error = e
+
+    slow = {'finished': False}
+
+    async def too_slow():
+        await asyncio.sleep(1)
+        slow['finished'] = True
+
+    started = time.monotonic()
+    try:
+        runner.run(too_slow, timeout=0.05)
+        deadline_raised = False
+    except DeadlineExceeded:
+        deadline_raised = True
+    waited = time.monotonic() - started
+
+    request_id.set('req-42')
+    seen_id, remaining = runner.run(context_seen, timeout=30)
+
+    # A function that fails before a task exists reports its error instead of hanging
+    started = time.monotonic()
+    try:
+        runner.run(not_a_coroutine, timeout=5)
+        sync_error = None
+    except TypeError as e:
+        sync_error = e
+    sync_waited = time.monotonic() - started
+
+    # The deadline passes while the loop is still busy, before the task is created
+    never_started = {'ran': False}
+
+    async def mark_started():
+        never_started['ran'] = True
+
+    runner.loop().call_soon_threadsafe(time.sleep, 0.2)
+    try:
+        runner.run(mark_started, timeout=0.05)
+        early_deadline = False
+    except DeadlineExceeded:
+        early_deadline = True
+    after_busy = runner.run(add, 1, 1)
+
+    time.sleep(0.05)
+    stats = runner.stats()
+
+    checks = [
+        ("Result is returned to the caller", result == 5),
+        ("Coroutine errors are raised to the caller", isinstance(error, ValueError)),
+        ("Deadline raises DeadlineExceeded on time", deadline_raised and waited < 0.5),
+        ("Deadline cancels the coroutine", not slow['finished'] and stats['cancelled'] >= 1),
+        ("Caller's context variables are carried in", seen_id == 'req-42'),
+        ("Deadline is visible as time_remaining()", remaining is not None and 29 < remaining <= 30),
+        ("Errors before the task starts are raised at once", isinstance(sync_error, TypeError)
+         and sync_waited < 1),
+        ("Deadline before the task starts is reported", early_deadline),
+        ("Abandoned coroutine never starts", not never_started['ran'] and after_busy == 2),
+        ("Nothing is left running", stats['running'] == 0),
+    ]
+
+    all_passed = True
+    for name, passed in checks:
+        status = "✅ PASS" if passed else "❌ FAIL"
+        print(f"{status}: {name}")
+        if not passed:
+            all_passed = False
+
+    print()
+    print(f"Stats: {stats}")
+    print("=" * 70)
+
+    assert all_passed, "Some async runner checks FAILED"
+
+if __name__ == '__main__':
+    test_async_runner()
+    print("✅ All tests PASSED!")
@@ -0,0 +1,208 @@
+#!/usr/bin/env python3
+"""
+Test the Message Batches backfill: submitting, resuming from the state file, collecting
+succeeded and errored results, and recovering a submission interrupted before its ID was saved
+"""
+import os
+import sys
+import json
+import tempfile
+from datetime import datetime, timezone
+from pathlib import Path
+from types import SimpleNamespace
+
+# Add shared and converter directories to path
+sys.path.insert(0, str(Path(__file__).parent / 'shared'))
+sys.path.insert(0, str(Path(__file__).parent / 'kcm-converter'))
+
+KCM_URL = 'https://www.keepingcurrentmatters.com/2025/01/07/equity-update/'
+WP_URL = 'https://mikesellsnj.com/equity-update/'
+
+SEO_REPLY = json.dumps({
+    'article_title': 'Is Now a Good Time to Downsize in South Jersey?',
+    'categories': ['For Sellers'],
+    'tags': ['Downsizing'],
+    'focus_keyphrase': 'downsize in South Jersey',
+    'seo_title': 'Downsizing in South Jersey',
+    'meta_description': 'What your equity can do in South Jersey.'
+})
+
+
+class FakeBatches:
+    """
+    messages.batches stand-in: every batch has ended by the time it is polled, and each request
+    is answered from a script by its input file name (a string succeeds, None errors, '' is empty)
+    """
+
+    def __init__(self, rewrites, seo):
+        self.replies = {16000: rewrites, 1000: seo}
+        self.batches = {}
+        self.created = []
+        self.interrupt_after_create = False
+        self.fail_before_create = False
+
+    def create(self, requests):
+        if self.fail_before_create:
+            self.fail_before_create = False
+            raise ConnectionError("connection reset before the request was sent")
+        batch_id = f"msgbatch_{len(self.batches) + 1}"
+        self.batches[batch_id] = SimpleNamespace(
+            id=batch_id, requests=requests, processing_status='ended',
+            created_at=datetime.now(timezone.utc),
+            request_counts=SimpleNamespace(processing=0, succeeded=len(requests), errored=0, canceled=0, expired=0))
+        self.created.append(batch_id)
+        if self.interrupt_after_create:
+            # Ctrl-C between batches.create returning and the state file being written
+            self.interrupt_after_create = False
+            raise KeyboardInterrupt
+        return self.batches[batch_id]
+
+    def retrieve(self, batch_id):
+        return self.batches[batch_id]
+
+    def list(self, limit=20):
+        return sorted(self.batches.values(), key=lambda batch: batch.created_at, reverse=True)[:limit]
+
+    def results(self, batch_id):
+        for request in self.batches[batch_id].requests:
+            custom_id = request['custom_id']
+            text = self.replies[request['params']['max_tokens']].get(custom_id.rsplit('-', 1)[0])
+            if text is None:
+                result = SimpleNamespace(type='errored')
+            else:
+                content = [SimpleNamespace(type='text', text=text)] if text else []
+                result = SimpleNamespace(type='succeeded', message=SimpleNamespace(content=content))
+            yield SimpleNamespace(custom_id=custom_id, result=result)
+
+    def requests_in(self, batch_id):
+        return sorted(request['custom_id'].rsplit('-', 1)[0] for request in self.batches[batch_id].requests)
+
+
+def load_backfill():
+    """Import the backfill with throwaway server state and no real Claude or Notion calls"""
+    state_dir = tempfile.mkdtemp(prefix='kcm-backfill-test-')
+    for name, filename in (('WEBHOOK_OUTBOX_PATH', 'outbox.db'), ('PUBLISH_GUARD_PATH', 'guard.db'),
+                           ('TRACKING_QUEUE_PATH', 'tracking.db'), ('CONTEXT_INDEX_PATH', 'context_index.bin')):
+        os.environ[name] = os.path.join(state_dir, filename)
+    os.environ['SHARED_CACHE_URL'] = 'memory'
+    import batch_backfill
+    batch_backfill.extract_topics_from_blog = lambda html: ['downsizing', 'equity']
+    batch_backfill.search_notion_database = lambda topics: [{'id': 'page-1', 'title': "South Jersey Market Report"}]
+    batch_backfill.build_rewrite_prompt = lambda html, pages, topics: (f"Rewrite for South Jersey:\n{html}", {})
+    batch_backfill.get_url_mappings = lambda client: {KCM_URL: WP_URL}
+    return batch_backfill
+
+
+def write_inputs(directory: Path, names):
+    for name in names:
+        (directory / f"{name}.html").write_text(f"<h1>{name}</h1><p>Equity is up.</p>", encoding='utf-8')
+
+
+def run(backfill, batches, inputs, state_file, output_dir):
+    backfill.claude_client = SimpleNamespace(messages=SimpleNamespace(batches=batches))
+    backfill.run_backfill([str(path) for path in inputs], str(state_file), str(output_dir), poll_seconds=0)
+    with open(state_file, 'r', encoding='utf-8') as f:
+        data = json.load(f)
+    return {article_id.rsplit('-', 1)[0]: article for article_id, article in data['articles'].items()}, data
+
+
+def test_batch_backfill():
+    """Test a backfill run, a resumed run, and interrupted submissions"""
+
+    print("=" * 70)
+    print("BATCH BACKFILL TEST")
+    print("=" * 70)
+    print()
+
+    backfill = load_backfill()
+    work = Path(tempfile.mkdtemp(prefix='kcm-backfill-'))
+    inputs, output_dir, state_file = work / 'inputs', work / 'output', work / 'state.json'
+    inputs.mkdir()
+    write_inputs(inputs, ['alpha', 'bravo', 'charlie'])
+
+    rewrite = f'<h1>Downsizing in South Jersey</h1><p>See <a href="{KCM_URL}">our equity update</a>.</p>'
+    batches = FakeBatches(rewrites={'alpha': rewrite, 'bravo': None, 'charlie': '', 'delta': rewrite},
+                          seo={'alpha': SEO_REPLY, 'delta': '```json\n' + SEO_REPLY + '\n```'})
+    first, first_data = run(backfill, batches, [inputs], state_file, output_dir)
+    first_batches = list(batches.created)
+
+    alpha_html = Path(first['alpha']['output_html']).read_text(encoding='utf-8')
+    with open(first['alpha']['metadata_file'], 'r', encoding='utf-8') as f:
+        alpha_metadata = json.load(f)
+
+    # Same state file, one new article: only the new article is submitted
+    write_inputs(inputs, ['delta'])
+    second, _ = run(backfill, batches, [inputs], state_file, output_dir)
+    second_batches = batches.created[len(first_batches):]
+
+    # Interrupted right after batches.create: the next run adopts the batch instead of paying again
+    crash_state = work / 'crash_state.json'
+    crash_inputs = work / 'crash_inputs'
+    crash_inputs.mkdir()
+    write_inputs(crash_inputs, ['alpha', 'delta'])
+    crashing = FakeBatches(rewrites={'alpha': rewrite, 'delta': rewrite}, seo={'alpha': SEO_REPLY, 'delta': SEO_REPLY})
+    crashing.interrupt_after_create = True
+    try:
+        run(backfill, crashing, [crash_inputs], crash_state, work / 'crash_output')
+        interrupted = False
+    except KeyboardInterrupt:
+        interrupted = True
+    with open(crash_state, 'r', encoding='utf-8') as f:
+        marker = json.load(f)['submitting']
+    recovered, recovered_data = run(backfill, crashing, [crash_inputs], crash_state, work / 'crash_output')
+
+    # Failed before the request reached the API: the next run submits again
+    lost_state = work / 'lost_state.json'
+    lost = FakeBatches(rewrites={'alpha': rewrite, 'delta': rewrite}, seo={'alpha': SEO_REPLY, 'delta': SEO_REPLY})
+    lost.fail_before_create = True
+    try:
+        run(backfill, lost, [crash_inputs], lost_state, work / 'lost_output')
+        lost_raised = False
+    except ConnectionError:
+        lost_raised = True
+    resubmitted, _ = run(backfill, lost, [crash_inputs], lost_state, work / 'lost_output')
+
+    checks = [
+        ("Rewrites and SEO are submitted as one batch each", len(first_batches) == 2
+         and batches.requests_in(first_batches[0]) == ['alpha', 'bravo', 'charlie']
+         and batches.requests_in(first_batches[1]) == ['alpha']),
+        ("Succeeded rewrite is post-processed", first['alpha']['status'] == 'done'
+         and WP_URL in alpha_html and first['alpha']['link_replacement']['replaced'] == 1),
+        ("SEO metadata is written per article", alpha_metadata['seo']['focus_keyphrase'] == 'downsize in South Jersey'
+         and alpha_metadata['topics'] == ['downsizing', 'equity']),
+        ("Errored rewrite fails only its article", first['bravo']['status'] == 'failed'
+         and first['bravo']['error'] == 'Rewrite errored'),
+        ("Empty rewrite fails only its article", first['charlie']['status'] == 'failed'
+         and first['charlie']['error'] == 'Rewrite unusable: Empty response'),
+        ("No submission is left open", first_data['submitting'] is None),
+        ("Resumed run submits only the new article", [batches.requests_in(batch_id) for batch_id in second_batches]
+         == [['delta'], ['delta']]),
+        ("Resumed run finishes the new article", second['delta']['status'] == 'done'
+         and second['alpha']['status'] == 'done' and second['bravo']['status'] == 'failed'),
+        ("Submission marker is saved before batches.create", interrupted
+         and marker['status'] == 'rewrite_submitted' and len(marker['request_ids']) == 2),
+        ("Interrupted submission is adopted, not paid for twice", len(crashing.created) == 2
+         and crashing.requests_in(crashing.created[0]) == ['alpha', 'delta']
+         and all(article['rewrite_batch_id'] == crashing.created[0] for article in recovered.values())),
+        ("Adopted batch is collected", [article['status'] for article in recovered.values()] == ['done', 'done']
+         and recovered_data['submitting'] is None),
+        ("Submission that never reached the API is sent again", lost_raised and len(lost.created) == 2
+         and [article['status'] for article in resubmitted.values()] == ['done', 'done']),
+    ]
+
+    all_passed = True
+    for name, passed in checks:
+        status = "✅ PASS" if passed else "❌ FAIL"
+        print(f"{status}: {name}")
+        if not passed:
+            all_passed = False
+
+    print()
+    print(f"Batches: {batches.created}")
+    print("=" * 70)
+
+    assert all_passed, "Some batch backfill checks FAILED"
+
+if __name__ == '__main__':
+    test_batch_backfill()
+    print("✅ All tests PASSED!")
@@ -0,0 +1,84 @@
+#!/usr/bin/env python3
+"""
+Test startup cache warming and the background refresh scheduler
+"""
+import sys
+import time
+from pathlib import Path
+
+# Add shared directory to path
+sys.path.insert(0, str(Path(__file__).parent / 'shared'))
+
+from cache_warmer import CacheWarmer, TimedValue, VersionedCache
+
+
+def test_cache_warmer():
+    """Test the cache types, warm-up order, failure handling and scheduled refreshes"""
+
+    print("=" * 70)
+    print("CACHE WARMER TEST")
+    print("=" * 70)
+    print()
+
+    listing = TimedValue('test_listing', ttl=0.2)
+    cold = listing.get()
+    listing.put(['page-1', 'page-2'])
+    warm = listing.get()
+    time.sleep(0.25)
+    expired = listing.get()
+
+    pages = VersionedCache('test_pages', maxsize=2)
+    pages.put('master', '2025-01-01', 'old text')
+    same_version = pages.get('master', '2025-01-01')
+    edited = pages.get('master', '2025-02-01')
+    pages.put('a', 1, 'a')
+    pages.put('b', 1, 'b')
+
+    order = []
+    refreshes = []
+
+    def fail():
+        order.append('notion')
+        raise ConnectionError("Notion down")
+
+    warmer = CacheWarmer()
+    warmer.add('prompt', lambda: order.append('prompt') or "v24")
+    warmer.add('listing', lambda: refreshes.append(time.monotonic()) or order.append('listing'), interval=0.1)
+    warmer.add('notion', fail, interval=60)
+    failed = warmer.warm()
+    warmer.start()
+    time.sleep(0.35)
+    warmer.stop()
+    stats = warmer.stats()
+
+    checks = [
+        ("Never loaded value is a miss", cold is None),
+        ("Loaded value is returned", warm == ['page-1', 'page-2']),
+        ("Value expires after its TTL", expired is None),
+        ("Versioned entry is returned for the same version", same_version == 'old text'),
+        ("Edited page is a miss", edited is None),
+        ("Least recently used entry is evicted", len(pages) == 2 and pages.get('master', '2025-01-01') is None),
+        ("Tasks warm up in order", order[:3] == ['prompt', 'listing', 'notion']),
+        ("Failed task is reported, not raised", failed == ['notion'] and 'Notion down' in stats['notion']['error']),
+        ("Warm-up detail is kept", stats['prompt']['detail'] == "v24" and stats['prompt']['runs'] == 1),
+        ("Scheduler refreshes on the interval", 2 <= len(refreshes) - 1 <= 4),
+        ("Task without an interval runs once", order.count('prompt') == 1),
+        ("Failed task waits for its interval", stats['notion']['runs'] == 1),
+    ]
+
+    all_passed = True
+    for name, passed in checks:
+        status = "✅ PASS" if passed else "❌ FAIL"
+        print(f"{status}: {name}")
+        if not passed:
+            all_passed = False
+
+    print()
+    print(f"Stats: {stats}")
+    print("=" * 70)
+
+    assert all_passed, "Some cache warmer checks FAILED"
+
+if __name__ == '__main__':
+    test_cache_warmer()
+    print("✅ All tests PASSED!")
@@ -0,0 +1,128 @@
+#!/usr/bin/env python3
+"""
+Test recording and replaying outbound HTTP traffic (redaction, matching, latency)
+"""
+import os
+import sys
+import json
+import time
+import asyncio
+import tempfile
+import threading
+from pathlib import Path
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# Add shared directory to path
+sys.path.insert(0, str(Path(__file__).parent / 'shared'))
+
+import httpx
+import requests
+
+import cassette
+
+API_KEY = 'secret_test_notion_key_12345'
+
+
+class EchoHandler(BaseHTTPRequestHandler):
+    """Local API stand-in: answers with a call counter so replays can be told apart"""
+    calls = 0
+
+    def do_POST(self):
+        EchoHandler.calls += 1
+        length = int(self.headers.get('Content-Length', 0))
+        body = json.loads(self.rfile.read(length) or b'{}')
+        time.sleep(0.1)
+        payload = json.dumps({'call': EchoHandler.calls, 'echo': body, 'token': API_KEY}).encode()
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def log_message(self, *args):
+        pass
+
+
+def test_cassette():
+    """Test that a recorded session replays offline with secrets redacted"""
+
+    print("=" * 70)
+    print("CASSETTE RECORD / REPLAY TEST")
+    print("=" * 70)
+    print()
+
+    os.environ['NOTION_API_KEY'] = API_KEY
+    server = ThreadingHTTPServer(('127.0.0.1', 0), EchoHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    url = f"http://127.0.0.1:{server.server_port}/v1/pages"
+    path = str(Path(tempfile.mkdtemp()) / 'session.jsonl.gz')
+    headers = {'Authorization': f"Bearer {API_KEY}"}
+
+    async def async_post(title: str) -> dict:
+        async with httpx.AsyncClient() as client:
+            response = await client.post(url, json={'title': title}, headers=headers)
+            return response.json()
+
+    # Record: httpx calls (Notion/Claude clients, sync and async) and two requests calls (WordPress/n8n)
+    cassette.install(path, cassette.RECORD)
+    recorded_httpx = httpx.post(url, json={'title': 'Downsizing'}, headers=headers).json()
+    recorded_async = asyncio.run(async_post('Equity'))
+    recorded_first = requests.post(url, json={'title': 'Buying'}, headers=headers).json()
+    recorded_second = requests.post(url, json={'title': 'Buying'}, headers=headers).json()
+    cassette.uninstall()
+    server.shutdown()
+    server.server_close()
+
+    raw = json.dumps(cassette.read_cassette(path))
+
+    # Replay with the server gone
+    active = cassette.install(path, cassette.REPLAY, latency_scale=0)
+    replay_started = time.perf_counter()
+    replayed_first = requests.post(url, json={'title': 'Buying'}, headers=headers).json()
+    replayed_second = requests.post(url, json={'title': 'Buying'}, headers=headers).json()
+    replayed_httpx = httpx.post(url, json={'title': 'Downsizing'}, headers=headers).json()
+    replayed_async = asyncio.run(async_post('Equity'))
+    replay_seconds = time.perf_counter() - replay_started
+    try:
+        requests.get(url.replace('/pages', '/users'))
+        missed = False
+    except cassette.CassetteMiss:
+        missed = True
+    stats = active.stats()
+    cassette.uninstall()
+
+    # Replay at the recorded latency
+    cassette.install(path, cassette.REPLAY, latency_scale=1.0)
+    timed_started = time.perf_counter()
+    httpx.post(url, json={'title': 'Downsizing'}, headers=headers)
+    timed_seconds = time.perf_counter() - timed_started
+    cassette.uninstall()
+
+    checks = [
+        ("Every call was recorded", len(cassette.read_cassette(path)) == 4),
+        ("API key is not in the cassette", API_KEY not in raw and 'REDACTED' in raw),
+        ("httpx response replays", replayed_httpx['echo'] == recorded_httpx['echo']),
+        ("Async httpx response replays", replayed_async['echo'] == recorded_async['echo']),
+        ("Repeated requests replay in order", [replayed_first['call'], replayed_second['call']]
+         == [recorded_first['call'], recorded_second['call']]),
+        ("Replay with scale 0 skips the latency", replay_seconds < 0.1),
+        ("Replay with scale 1 keeps the latency", timed_seconds >= 0.09),
+        ("Unrecorded request is a miss", missed and stats['misses'] == 1),
+    ]
+
+    all_passed = True
+    for name, passed in checks:
+        status = "✅ PASS" if passed else "❌ FAIL"
+        print(f"{status}: {name}")
+        if not passed:
+            all_passed = False
+
+    print()
+    print(f"Replay stats: {stats}")
+    print("=" * 70)
+
+    assert all_passed, "Some cassette checks FAILED"
+
+if __name__ == '__main__':
+    test_cassette()
+    print("✅ All tests PASSED!")
@@ -0,0 +1,128 @@
+#!/usr/bin/env python3
+"""
+Test the context digest store: digests are rebuilt when a page's last_edited_time changes
+"""
+import sys
+import time
+import tempfile
+from pathlib import Path
+from types import SimpleNamespace
+
+# Add shared directory to path
+sys.path.insert(0, str(Path(__file__).parent / 'shared'))
+
+from context_digest import ContextDigestStore
+
+PAGE_ID = '1a2b3c4d-0000-4000-8000-000000000001'
+MONDAY = '2025-03-03T09:00:00.000Z'
+TUESDAY = '2025-03-04T09:00:00.000Z'
+
+
+class DigestClaude:
+    """Anthropic client stand-in: the digest names the page content it was built from"""
+
+    def __init__(self):
+        self.calls = 0
+        self.down = False
+        self.messages = self
+
+    def create(self, model, max_tokens, messages):
+        self.calls += 1
+        if self.down:
+            raise ConnectionError("Claude is down")
+        content = messages[0]['content'].rsplit('PAGE CONTENT:\n', 1)[1].split('\n\nReturn ONLY')[0]
+        return SimpleNamespace(content=[SimpleNamespace(text=f"  - Digest of: {content}  ")], usage=None)
+
+
+def wait_for(condition, timeout: float = 3.0) -> bool:
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        if condition():
+            return True
+        time.sleep(0.02)
+    return False
+
+
+def test_context_digest():
+    """Test cache hits, invalidation on edits, failed builds and the background builder"""
+
+    print("=" * 70)
+    print("CONTEXT DIGEST TEST")
+    print("=" * 70)
+    print()
+
+    claude = DigestClaude()
+    store = ContextDigestStore(claude, 'test-model', cache_dir=Path(tempfile.mkdtemp()))
+
+    built = store.build_digest(PAGE_ID, "Cherry Hill Market", "Median price $425,000", MONDAY)
+    current = store.get_digest(PAGE_ID, MONDAY)
+    after_edit = store.get_digest(PAGE_ID, TUESDAY)
+    no_edit_time = store.get_digest(PAGE_ID, None)
+    rebuilt = store.build_digest(PAGE_ID, "Cherry Hill Market", "Median price $440,000", TUESDAY)
+    old_version = store.get_digest(PAGE_ID, MONDAY)
+    new_version = store.get_digest(PAGE_ID, TUESDAY)
+
+    calls_before_empty = claude.calls
+    empty = store.build_digest('empty-page', "Empty", "", MONDAY)
+    calls_after_empty = claude.calls
+    claude.down = True
+    failed = store.build_digest('failed-page', "Haddonfield", "Taxes 3.1%", MONDAY)
+    claude.down = False
+
+    store._digest_path('broken-page').write_text('{not json', encoding='utf-8')
+    unreadable = store.get_digest('broken-page', MONDAY)
+
+    store.request_build({'id': 'queued-page', 'title': "Queued", 'last_edited_time': MONDAY})
+    store.request_build({'id': 'queued-page', 'title': "Queued", 'last_edited_time': MONDAY})
+    queued = store._queue.qsize()
+
+    # Background builder: only pages edited since their digest was built go back to Claude
+    builder_claude = DigestClaude()
+    builder = ContextDigestStore(builder_claude, 'test-model', cache_dir=Path(tempfile.mkdtemp()))
+    builder.build_digest('unchanged-page', "Moorestown", "Moorestown schools", MONDAY)
+    builder.build_digest('edited-page', "Voorhees", "Voorhees inventory 1.8 months", MONDAY)
+    builder_claude.calls = 0
+    pages = [
+        {'id': 'unchanged-page', 'title': "Moorestown", 'last_edited_time': MONDAY},
+        {'id': 'edited-page', 'title': "Voorhees", 'last_edited_time': TUESDAY},
+        {'id': 'new-page', 'title': "Marlton", 'last_edited_time': MONDAY},
+    ]
+    contents = {'unchanged-page': "Moorestown schools", 'edited-page': "Voorhees inventory 2.1 months",
+                'new-page': "Marlton new construction"}
+    builder.start_background_builder(lambda: pages, contents.get, refresh_interval=60)
+    caught_up = wait_for(lambda: builder.get_digest('edited-page', TUESDAY) is not None
+                         and builder.get_digest('new-page', MONDAY) is not None)
+
+    checks = [
+        ("Digest is built and trimmed", built == "- Digest of: Median price $425,000"),
+        ("Unchanged page is served from the cache", current == built),
+        ("Edited page misses the cache", after_edit is None),
+        ("Page without last_edited_time misses the cache", no_edit_time is None),
+        ("Rebuilt digest replaces the old one", rebuilt == new_version == "- Digest of: Median price $440,000"
+         and old_version is None),
+        ("Empty page is not sent to Claude", empty is None and calls_after_empty == calls_before_empty),
+        ("Failed build stores nothing", failed is None and store.get_digest('failed-page', MONDAY) is None),
+        ("Unreadable digest file is a miss", unreadable is None),
+        ("A page is queued for building once", queued == 1),
+        ("Builder rebuilds edited and new pages", caught_up
+         and builder.get_digest('edited-page', TUESDAY) == "- Digest of: Voorhees inventory 2.1 months"),
+        ("Builder leaves current digests alone", builder_claude.calls == 2
+         and builder.get_digest('unchanged-page', MONDAY) == "- Digest of: Moorestown schools"),
+    ]
+
+    all_passed = True
+    for name, passed in checks:
+        status = "✅ PASS" if passed else "❌ FAIL"
+        print(f"{status}: {name}")
+        if not passed:
+            all_passed = False
+
+    print()
+    print(f"Claude calls: {claude.calls} (store), {builder_claude.calls} (builder)")
+    print("=" * 70)
+
+    assert all_passed, "Some context digest checks FAILED"
+
+if __name__ == '__main__':
+    test_context_digest()
+    print("✅ All tests PASSED!")
@@ -0,0 +1,97 @@
+#!/usr/bin/env python3
+"""
+Test the memory-mapped context index: ranking, interning and atomic snapshot swaps
+"""
+import os
+import sys
+import tempfile
+from pathlib import Path
+
+# Add shared directory to path
+sys.path.insert(0, str(Path(__file__).parent / 'shared'))
+
+from context_index import ContextIndexStore, ContextIndex, build_index
+
+
+def record(number: int, title: str, keywords: str, is_master: bool = False):
+    return {
+        'id': f"page-{number}",
+        'url': f"https://www.notion.so/page-{number}",
+        'title': title,
+        'last_edited_time': '2025-01-01T00:00:00.000Z',
+        'text': f"{title.lower()} {keywords}",
+        'is_master': is_master
+    }
+
+
+RECORDS = [
+    record(0, "South Jersey Real Estate Context Guide", "equity downsizing", is_master=True),
+    record(1, "Equity in Cherry Hill", "equity home prices"),
+    record(2, "Downsizing in Haddonfield", "downsizing equity"),
+    record(3, "Inventory in Glassboro", "inventory"),
+    record(4, "First-Time Buyers in Cherry Hill", "first-time buyers mortgage rates"),
+]
+
+
+def test_context_index():
+    """Test ranking, page metadata, interning and snapshot swaps between processes"""
+
+    print("=" * 70)
+    print("CONTEXT INDEX TEST")
+    print("=" * 70)
+    print()
+
+    index = ContextIndex(build_index(RECORDS))
+    ranked = index.rank(['Equity', 'cherry hill', 'eq'])
+
+    path = Path(tempfile.mkdtemp()) / 'context_index.bin'
+    writer = ContextIndexStore(path)
+    reader = ContextIndexStore(path)
+    missing = reader.current()
+    writer.publish(RECORDS[:3])
+    first = reader.current()
+    same = reader.current()
+    maps_after_first = reader.maps
+    writer.publish(RECORDS)
+    second = reader.current()
+
+    with writer.rebuild_lock() as first_lock:
+        with reader.rebuild_lock() as second_lock:
+            locks = (first_lock, second_lock)
+
+    path.write_bytes(b'not an index')
+    corrupt = ContextIndexStore(path).current()
+
+    checks = [
+        ("Master document comes first", ranked[0]['id'] == 'page-0' and ranked[0]['is_master']),
+        ("Pages ranked by topic matches", [page['id'] for page in ranked[1:]] == ['page-1', 'page-2', 'page-4']),
+        ("Scores count every occurrence", [page['score'] for page in ranked[1:]] == [5, 2, 1]),
+        ("Unmatched topics return only the master document", len(index.rank(['condos'])) == 1),
+        ("Page metadata is kept", index.page(3)['title'] == "Inventory in Glassboro"
+         and index.page(3)['last_edited_time'] == '2025-01-01T00:00:00.000Z'),
+        ("Repeated strings are stored once", build_index(RECORDS * 2).count(b'Inventory in Glassboro') == 1),
+        ("No snapshot before the first publish", missing is None),
+        ("Readers map a published snapshot once", len(first) == 3 and same is first and maps_after_first == 1),
+        ("Readers pick up a new snapshot", len(second) == 5 and reader.maps == 2),
+        ("Old snapshot stays readable after the swap", first.page(2)['title'] == "Downsizing in Haddonfield"),
+        ("No temporary files left behind", not [name for name in os.listdir(path.parent) if name.endswith('.tmp')]),
+        ("Only one process rebuilds at a time", locks == (True, False) or os.name == 'nt'),
+        ("Corrupt snapshot is ignored", corrupt is None),
+    ]
+
+    all_passed = True
+    for name, passed in checks:
+        status = "✅ PASS" if passed else "❌ FAIL"
+        print(f"{status}: {name}")
+        if not passed:
+            all_passed = False
+
+    print()
+    print(f"Ranked: {[(page['title'], page.get('score')) for page in ranked]}")
+    print("=" * 70)
+
+    assert all_passed, "Some context index checks FAILED"
+
+if __name__ == '__main__':
+    test_context_index()
+    print("✅ All tests PASSED!")
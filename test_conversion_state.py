@@ -0,0 +1,105 @@
+#!/usr/bin/env python3
+"""
+Test that per-conversion state travels with each request instead of living in the server process
+"""
+import os
+import sys
+import tempfile
+from pathlib import Path
+
+# Add shared and converter directories to path
+sys.path.insert(0, str(Path(__file__).parent / 'shared'))
+sys.path.insert(0, str(Path(__file__).parent / 'kcm-converter'))
+
+from retry_policy import RetryPolicy
+from webhook_outbox import FAILED, PENDING
+
+
+def load_server():
+    """Import the converter with throwaway state files"""
+    state_dir = tempfile.mkdtemp(prefix='kcm-state-test-')
+    for name, filename in (('WEBHOOK_OUTBOX_PATH', 'outbox.db'), ('PUBLISH_GUARD_PATH', 'guard.db'),
+                           ('TRACKING_QUEUE_PATH', 'tracking.db'), ('CONTEXT_INDEX_PATH', 'context_index.bin')):
+        os.environ[name] = os.path.join(state_dir, filename)
+    os.environ['SHARED_CACHE_URL'] = 'memory'
+    import kcm_converter_server as server
+    server.claude_retry = RetryPolicy(max_attempts=2, base_delay=0.01)
+    return server
+
+
+def failed_delivery(server, kcm_url: str, title: str) -> str:
+    """Queue a delivery for a post and mark it failed; returns its delivery ID"""
+    payload = {'body': {'title': title, 'slug': title.lower()}}
+    record = server.queue_webhook(payload, {'kcm_url': kcm_url})
+    server.outbox._mark(record, FAILED, error="n8n down")
+    return record['idempotency_key']
+
+
+def test_conversion_state():
+    """Test link stats, uploaded images and webhook retries from two users' conversions"""
+
+    print("=" * 70)
+    print("CONVERSION STATE TEST")
+    print("=" * 70)
+    print()
+
+    server = load_server()
+    client = server.app.test_client()
+
+    first = failed_delivery(server, 'https://kcm.example/first/', 'First')
+    second = failed_delivery(server, 'https://kcm.example/second/', 'Second')
+
+    retried = client.post('/retry-webhook', json={'delivery_id': first})
+    first_status = server.outbox.get(first)['status']
+    second_status = server.outbox.get(second)['status']
+
+    by_post = client.post('/retry-webhook', json={'kcm_url': 'https://kcm.example/second/'})
+    no_conversion = client.post('/retry-webhook', json={})
+    unknown = client.post('/retry-webhook', json={'delivery_id': 'not-a-delivery'})
+
+    seo = {'focus_keyphrase': 'downsizing'}
+    with_stats = server.build_tracking_context(
+        {'kcm_url': 'https://kcm.example/first/',
+         'link_stats': {'replaced': 2, 'not_found': ['https://kcm.example/missing/']}},
+        'First', [], [], seo)
+    without_stats = server.build_tracking_context({'kcm_url': 'https://kcm.example/second/'}, 'Second', [], [], seo)
+
+    uploaded = [{'original_url': 'https://kcm.example/photo.jpg', 'wordpress_url': 'https://wp.example/photo.jpg',
+                 'is_featured': False}]
+    # The first image becomes the featured image and is dropped from the content
+    html = '<img src="https://kcm.example/hero.jpg"><p>Intro</p><img src="https://kcm.example/photo.jpg">'
+    with_images = server.apply_uploaded_images(html, uploaded)
+    without_images = server.apply_uploaded_images(html, [])
+
+    checks = [
+        ("Retry by delivery ID re-queues that delivery", retried.status_code == 202
+         and retried.get_json()['delivery_id'] == first and first_status == PENDING),
+        ("Another user's failed delivery is left alone", second_status == FAILED),
+        ("Retry by KCM URL finds the post's delivery", by_post.status_code == 202
+         and by_post.get_json()['delivery_id'] == second),
+        ("Retry without a conversion is rejected", no_conversion.status_code == 400),
+        ("Retry of an unknown delivery is rejected", unknown.status_code == 400),
+        ("Link stats come from the request", with_stats['internal_links_count'] == 3),
+        ("Missing link stats count no links", without_stats['internal_links_count'] == 0),
+        ("Uploaded images come from the request", 'https://wp.example/photo.jpg' in with_images),
+        ("No uploaded images keeps the KCM URLs", 'https://kcm.example/photo.jpg' in without_images),
+        ("No conversion state is kept on the module", not any(
+            hasattr(server, name) for name in ('last_delivery_key', 'last_link_stats', 'last_context_budget',
+                                               'uploaded_images'))),
+    ]
+
+    all_passed = True
+    for name, passed in checks:
+        status = "✅ PASS" if passed else "❌ FAIL"
+        print(f"{status}: {name}")
+        if not passed:
+            all_passed = False
+
+    print()
+    print("=" * 70)
+
+    assert all_passed, "Some conversion state checks FAILED"
+
+if __name__ == '__main__':
+    test_conversion_state()
+    print("✅ All tests PASSED!")
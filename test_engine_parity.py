@@ -0,0 +1,151 @@
+#!/usr/bin/env python3
+"""
+Test that the sync and async conversion steps share one implementation: same prompts,
+same cache entries, same parsing and fallbacks - and that image substitution is shared too
+Also covers Re-convert (refresh skips the cached Claude responses) and image reuse by alt text
+"""
+import os
+import sys
+import asyncio
+import tempfile
+from pathlib import Path
+from types import SimpleNamespace
+
+# Add shared and converter directories to path
+sys.path.insert(0, str(Path(__file__).parent / 'shared'))
+sys.path.insert(0, str(Path(__file__).parent / 'kcm-converter'))
+
+BLOG = "<h1>Is Now a Good Time to Downsize?</h1><p>Equity is up for homeowners.</p>"
+
+
+class ScriptedClaude:
+    """messages.create stand-in (sync or async) that answers from a script and counts calls"""
+
+    def __init__(self, replies, is_async=False):
+        self.replies = replies
+        self.is_async = is_async
+        self.calls = 0
+        self.messages = self
+
+    def reply(self, label):
+        self.calls += 1
+        text = self.replies[label]
+        if isinstance(text, Exception):
+            raise text
+        return SimpleNamespace(content=[SimpleNamespace(text=text)], usage=None)
+
+    def create(self, model, max_tokens, messages):
+        label = 'seo' if 'SEO' in messages[0]['content'] else 'topics'
+        if self.is_async:
+            async def respond():
+                return self.reply(label)
+            return respond()
+        return self.reply(label)
+
+
+def load_server():
+    """Import the converter with throwaway state files and an in-process cache"""
+    state_dir = tempfile.mkdtemp(prefix='kcm-parity-test-')
+    for name, filename in (('WEBHOOK_OUTBOX_PATH', 'outbox.db'), ('PUBLISH_GUARD_PATH', 'guard.db'),
+                           ('TRACKING_QUEUE_PATH', 'tracking.db'), ('CONTEXT_INDEX_PATH', 'context_index.bin')):
+        os.environ[name] = os.path.join(state_dir, filename)
+    os.environ['SHARED_CACHE_URL'] = 'memory'
+    import kcm_converter_server as server
+    from retry_policy import RetryPolicy
+    server.claude_retry = RetryPolicy(max_attempts=2, base_delay=0.01)
+    return server
+
+
+def test_engine_parity():
+    """Test the sync and async twins against the same scripted Claude"""
+
+    print("=" * 70)
+    print("SYNC / ASYNC PARITY TEST")
+    print("=" * 70)
+    print()
+
+    server = load_server()
+    replies = {'topics': '```json\n["downsizing", "equity"]\n```',
+               'seo': '{"article_title": "Downsizing in South Jersey", "tags": ["Downsize"]}'}
+    sync_claude = ScriptedClaude(replies)
+    async_claude = ScriptedClaude(replies, is_async=True)
+    server.claude_client = sync_claude
+    server.claude_async = async_claude
+
+    sync_topics = server.extract_topics_from_blog(BLOG)
+    server.claude_cache.clear()
+    async_topics = asyncio.run(server.extract_topics_from_blog_async(BLOG))
+    cached_topics = server.extract_topics_from_blog(BLOG)
+
+    sync_seo = server.generate_seo_metadata(BLOG, BLOG)
+    server.claude_cache.clear()
+    async_seo = asyncio.run(server.generate_seo_metadata_async(BLOG, BLOG))
+    calls_before_cache = sync_claude.calls + async_claude.calls
+    cached_seo = asyncio.run(server.generate_seo_metadata_async(BLOG, BLOG))
+    calls_after_cache = sync_claude.calls + async_claude.calls
+
+    calls_before_refresh = sync_claude.calls
+    replies['topics'] = '["downsizing", "equity", "retirement"]'
+    refreshed = server.extract_topics_from_blog(BLOG, refresh=True)
+    after_refresh = asyncio.run(server.extract_topics_from_blog_async(BLOG))
+
+    server.claude_cache.clear()
+    puts_before_failures = server.claude_cache.stats()['puts']
+    broken = {'topics': 'Sure! Here are the topics: downsizing', 'seo': ConnectionError("Claude is down")}
+    server.claude_client = ScriptedClaude(broken)
+    server.claude_async = ScriptedClaude(broken, is_async=True)
+    fallbacks = [
+        server.extract_topics_from_blog(BLOG), asyncio.run(server.extract_topics_from_blog_async(BLOG)),
+        server.generate_seo_metadata(BLOG, BLOG), asyncio.run(server.generate_seo_metadata_async(BLOG, BLOG)),
+    ]
+    nothing_cached = server.claude_cache.stats()['puts'] == puts_before_failures
+
+    featured = '<img src="https://kcm.example/a.png">'
+    html = f'<p>Intro</p><br>{featured}<br><p>Body</p><br>{featured}<br>'
+    applied = server.apply_uploaded_images(html, [{'original_url': 'https://kcm.example/a.png',
+                                                   'wordpress_url': 'https://wp.example/a.png'}])
+
+    server.WORDPRESS_APP_PASSWORD = 'app-password'
+    image = b'\x89PNG same bytes'
+    server.remember_uploaded_image(server.image_media_key(image, 'Downsizing in Cherry Hill'), {
+        'id': 7, 'url': 'https://wp.example/downsizing.png', 'filename': 'downsizing.png',
+        'alt_text': 'Downsizing in Cherry Hill'})
+    same_alt = server.MediaUpload(image, 'downsizing.png', 'Downsizing in Cherry Hill').settled()
+    new_alt = server.MediaUpload(image, 'downsizing.png', 'Equity in Moorestown').settled()
+
+    checks = [
+        ("Both engines parse topics the same way", sync_topics == async_topics == ['downsizing', 'equity']),
+        ("A result stored by one engine is served to the other", cached_topics == sync_topics
+         and cached_seo == async_seo and calls_after_cache == calls_before_cache),
+        ("Both engines parse SEO metadata the same way", sync_seo == async_seo
+         and sync_seo['article_title'] == 'Downsizing in South Jersey'),
+        ("Re-convert asks Claude again", refreshed == ['downsizing', 'equity', 'retirement']
+         and sync_claude.calls == calls_before_refresh + 1),
+        ("Re-convert replaces the cached result", after_refresh == refreshed),
+        ("Malformed topics fall back on both engines", fallbacks[0] == fallbacks[1] == list(server.FALLBACK_TOPICS)),
+        ("Failed SEO calls fall back on both engines", fallbacks[2] == fallbacks[3] == dict(server.FALLBACK_SEO_METADATA)),
+        ("Fallbacks are never cached", nothing_cached),
+        ("Only the featured image is removed", applied.count('https://wp.example/a.png') == 1
+         and applied.startswith('<p>Intro</p><p>Body</p>')),
+        ("Same image with the same alt text is reused", same_alt == (True, {
+            'id': 7, 'url': 'https://wp.example/downsizing.png', 'filename': 'downsizing.png',
+            'alt_text': 'Downsizing in Cherry Hill'})),
+        ("Same image with new alt text is uploaded again", new_alt == (False, None)),
+    ]
+
+    all_passed = True
+    for name, passed in checks:
+        status = "✅ PASS" if passed else "❌ FAIL"
+        print(f"{status}: {name}")
+        if not passed:
+            all_passed = False
+
+    print()
+    print(f"Claude cache: {server.claude_cache.stats()}")
+    print("=" * 70)
+
+    assert all_passed, "Some sync / async parity checks FAILED"
+
+if __name__ == '__main__':
+    test_engine_parity()
+    print("✅ All tests PASSED!")
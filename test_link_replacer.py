@@ -0,0 +1,133 @@
+#!/usr/bin/env python3
+"""
+Test KCM link replacement against the original one-pass-per-variation implementation:
+same HTML and same counts on the benchmark corpus and on attribute order and case variants
+"""
+import re
+import sys
+import logging
+from pathlib import Path
+from urllib.parse import urlparse
+
+# Add shared and benchmarks directories to path
+sys.path.insert(0, str(Path(__file__).parent / 'shared'))
+sys.path.insert(0, str(Path(__file__).parent / 'benchmarks'))
+
+from link_replacer import replace_kcm_links, extract_kcm_links
+from bench_transforms import build_corpus, SIZES, ITEM_COUNTS
+
+KCM_URL = 'https://www.keepingcurrentmatters.com/2024/01/01/x'
+WP_URL = 'https://mikesellsnj.com/x/'
+OTHER_URL = 'https://www.keepingcurrentmatters.com/2024/02/02/not-converted'
+
+
+def baseline_replace_kcm_links(html, url_mapping):
+    """replace_kcm_links as it was before the single-pass rewrite (one re.sub per URL variation)"""
+    if not url_mapping:
+        return html, {"replaced": 0, "not_found": [], "total_kcm_links": 0}
+    kcm_links = extract_kcm_links(html)
+    if not kcm_links:
+        return html, {"replaced": 0, "not_found": [], "total_kcm_links": 0}
+
+    replaced_count = 0
+    not_found = []
+    normalized_mapping = {}
+    for kcm_url, wp_url in url_mapping.items():
+        parsed = urlparse(kcm_url)
+        normalized_mapping[f"{parsed.scheme}://{parsed.netloc}{parsed.path}".rstrip('/')] = wp_url
+
+    updated_html = html
+    for kcm_url in kcm_links:
+        if kcm_url in normalized_mapping:
+            wp_url = normalized_mapping[kcm_url]
+            variations = [
+                kcm_url,
+                kcm_url + '/',
+                kcm_url.replace('https://', 'http://'),
+                kcm_url.replace('http://', 'https://'),
+                kcm_url.replace('https://', 'http://') + '/',
+                kcm_url.replace('http://', 'https://') + '/'
+            ]
+            for variation in variations:
+                pattern = f'(<a[^>]+href=["\']){re.escape(variation)}(["\'][^>]*>)'
+                new_html = re.sub(pattern, f'\\1{wp_url}\\2', updated_html, flags=re.IGNORECASE)
+                if new_html != updated_html:
+                    replaced_count += 1
+                    updated_html = new_html
+        else:
+            not_found.append(kcm_url)
+
+    return updated_html, {"replaced": replaced_count, "not_found": not_found, "total_kcm_links": len(kcm_links)}
+
+
+# (name, html) - every variant maps KCM_URL to WP_URL
+VARIANTS = [
+    ("href first", f'<p><a href="{KCM_URL}">x</a></p>'),
+    ("href after other attributes", f'<p><a target="_blank" rel="noopener" href="{KCM_URL}/">x</a></p>'),
+    ("data-orig-href after href", f'<a href="{KCM_URL}" data-orig-href="z">x</a>'),
+    ("data-orig-href before href", f'<a data-orig-href="https://example.com/z" href="{KCM_URL}">x</a>'),
+    ("upper-case tag and attribute", f'<A HREF="{KCM_URL}">x</A>'),
+    ("upper-case URL", f'<a href="{KCM_URL.upper()}">x</a>'),
+    ("single quotes", f"<a class='more' href='{KCM_URL}'>x</a>"),
+    ("http and https", f'<a href="{KCM_URL.replace("https://", "http://")}">x</a> <a href="{KCM_URL}/">y</a>'),
+    ("repeated link", f'<a href="{KCM_URL}">x</a> and again <a href="{KCM_URL}">x</a>'),
+    ("query string is left alone", f'<a href="{KCM_URL}/?utm_source=kcm">x</a> <a href="{KCM_URL}">y</a>'),
+    ("href on the next line", f'<a\n   href="{KCM_URL}">x</a>'),
+    ("unmapped link", f'<a href="{OTHER_URL}/">x</a> <a href="{KCM_URL}">y</a>'),
+    ("link text mentions the URL", f'<a href="https://example.com/">{KCM_URL}</a> <a href="{KCM_URL}">y</a>'),
+]
+
+
+def test_link_replacer():
+    """Test the single-pass replacement against the baseline output"""
+
+    print("=" * 70)
+    print("LINK REPLACER TEST")
+    print("=" * 70)
+    print()
+
+    logging.getLogger('link_replacer').setLevel(logging.WARNING)
+
+    corpus = build_corpus(SIZES[:2], ITEM_COUNTS[:3])
+    corpus_mismatches = [name for name, case in corpus.items()
+                         if replace_kcm_links(case['html'], case['url_mapping'])
+                         != baseline_replace_kcm_links(case['html'], case['url_mapping'])]
+    corpus_replaced = sum(replace_kcm_links(case['html'], case['url_mapping'])[1]['replaced']
+                          for case in corpus.values())
+
+    mapping = {KCM_URL + '/': WP_URL}
+    variant_mismatches = [name for name, html in VARIANTS
+                          if replace_kcm_links(html, mapping) != baseline_replace_kcm_links(html, mapping)]
+
+    reported_html, reported_stats = replace_kcm_links(VARIANTS[2][1], mapping)
+    kcm_valued_html, _ = replace_kcm_links(f'<a href="https://example.com/" data-orig-href="{KCM_URL}">x</a>',
+                                           mapping)
+    unmapped_html, unmapped_stats = replace_kcm_links(VARIANTS[0][1], {})
+
+    checks = [
+        ("Corpus output matches the baseline", not corpus_mismatches and len(corpus) >= 6),
+        ("Corpus links are replaced", corpus_replaced > 0),
+        ("Attribute order and case variants match the baseline", not variant_mismatches),
+        ("href before data-orig-href is replaced", reported_stats['replaced'] == 1
+         and reported_html == f'<a href="{WP_URL}" data-orig-href="z">x</a>'),
+        ("Other *-href attributes are never rewritten", kcm_valued_html
+         == f'<a href="https://example.com/" data-orig-href="{KCM_URL}">x</a>'),
+        ("No mapping leaves the HTML alone", unmapped_html == VARIANTS[0][1] and unmapped_stats['replaced'] == 0),
+    ]
+
+    all_passed = True
+    for name, passed in checks:
+        status = "✅ PASS" if passed else "❌ FAIL"
+        print(f"{status}: {name}")
+        if not passed:
+            all_passed = False
+
+    print()
+    print(f"Corpus cases: {len(corpus)}, mismatches: {corpus_mismatches + variant_mismatches}")
+    print("=" * 70)
+
+    assert all_passed, "Some link replacer checks FAILED"
+
+if __name__ == '__main__':
+    test_link_replacer()
+    print("✅ All tests PASSED!")
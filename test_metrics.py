@@ -0,0 +1,147 @@
+#!/usr/bin/env python3
+"""
+Test the metrics registry: counters, histogram buckets, gauge callbacks and the Prometheus text
+format served at /metrics
+"""
+import os
+import re
+import sys
+import tempfile
+from pathlib import Path
+from types import SimpleNamespace
+
+# Add shared and converter directories to path
+sys.path.insert(0, str(Path(__file__).parent / 'shared'))
+sys.path.insert(0, str(Path(__file__).parent / 'kcm-converter'))
+
+import metrics
+from metrics import Registry
+from retry_policy import RetryPolicy
+
+# name{label="value",...} value (label values may contain escaped quotes)
+SAMPLE_LINE = re.compile(r'^[a-zA-Z_:][a-zA-Z0-9_:]*(\{([a-zA-Z_][a-zA-Z0-9_]*="(\\.|[^"\\])*",?)*\})? '
+                         r'(-?[0-9.e+-]+|\+Inf|NaN)$')
+
+
+def load_server():
+    """Import the converter with throwaway state files"""
+    state_dir = tempfile.mkdtemp(prefix='kcm-state-test-')
+    for name, filename in (('WEBHOOK_OUTBOX_PATH', 'outbox.db'), ('PUBLISH_GUARD_PATH', 'guard.db'),
+                           ('TRACKING_QUEUE_PATH', 'tracking.db'), ('CONTEXT_INDEX_PATH', 'context_index.bin')):
+        os.environ[name] = os.path.join(state_dir, filename)
+    os.environ['SHARED_CACHE_URL'] = 'memory'
+    import kcm_converter_server as server
+    server.claude_retry = RetryPolicy(max_attempts=2, base_delay=0.01)
+    return server
+
+
+def sample_lines(text: str):
+    return [line for line in text.splitlines() if line and not line.startswith('#')]
+
+
+def test_metrics():
+    """Test recording, rendering and the /metrics endpoint"""
+
+    print("=" * 70)
+    print("METRICS TEST")
+    print("=" * 70)
+    print()
+
+    registry = Registry()
+    requests_total = registry.counter('test_requests_total', 'Requests by route', ('route', 'status'))
+    requests_total.inc(route='/convert', status='200')
+    requests_total.inc(2, route='/convert', status='200')
+    requests_total.inc(route='/upload-all', status='500')
+    requests_total.inc(route='/say "hi"\n', status='200')
+    unlabelled = registry.counter('test_restarts_total', 'Restarts')
+    unlabelled.inc()
+
+    latency = registry.histogram('test_latency_seconds', 'Latency', ('stage',), buckets=(0.1, 0.01, 1.0))
+    for value in (0.005, 0.01, 0.2, 0.5, 7.0):
+        latency.observe(value, stage='rewrite')
+    latency.observe(0.05, stage='seo')
+
+    registry.gauge_callback('test_queue_items', 'Items by status', ('status',),
+                            lambda: {('pending',): 3, ('failed',): 1})
+
+    def broken():
+        raise RuntimeError("queue database is locked")
+    registry.gauge_callback('test_broken', 'Collector that fails', ('status',), broken)
+
+    text = registry.render()
+    lines = text.splitlines()
+    rewrite_buckets = [line for line in lines if line.startswith('test_latency_seconds_bucket{stage="rewrite"')]
+
+    # Module-level helpers feed the shared registry
+    before = metrics.STAGE_SECONDS.render()
+    with metrics.timed('test_stage'):
+        pass
+    try:
+        with metrics.timed('test_stage'):
+            raise ValueError("upstream failed")
+    except ValueError:
+        pass
+    metrics.record_cache('test_cache', hit=True)
+    metrics.record_cache('test_cache', hit=True)
+    metrics.record_cache('test_cache', hit=False)
+    usage = metrics.record_claude_usage(SimpleNamespace(usage=SimpleNamespace(
+        input_tokens=1200, output_tokens=300, cache_read_input_tokens=None)))
+    stage_text = metrics.render()
+
+    server = load_server()
+    client = server.app.test_client()
+    response = client.get('/metrics')
+    body = response.get_data(as_text=True)
+    malformed = [line for line in sample_lines(body) if not SAMPLE_LINE.match(line)]
+
+    checks = [
+        ("Counter adds up per label set", requests_total.values()[('/convert', '200')] == 3
+         and 'test_requests_total{route="/convert",status="200"} 3' in lines),
+        ("Counter without labels has no braces", 'test_restarts_total 1' in lines),
+        ("Label values are escaped", 'test_requests_total{route="/say \\"hi\\"\\n",status="200"} 1' in lines),
+        ("HELP and TYPE precede each metric", lines[:2] == ['# HELP test_requests_total Requests by route',
+                                                            '# TYPE test_requests_total counter']
+         and '# TYPE test_latency_seconds histogram' in lines),
+        ("Histogram buckets are sorted and cumulative", rewrite_buckets == [
+            'test_latency_seconds_bucket{stage="rewrite",le="0.01"} 2',
+            'test_latency_seconds_bucket{stage="rewrite",le="0.1"} 2',
+            'test_latency_seconds_bucket{stage="rewrite",le="1.0"} 4',
+            'test_latency_seconds_bucket{stage="rewrite",le="+Inf"} 5']),
+        ("Histogram has sum and count", 'test_latency_seconds_sum{stage="rewrite"} 7.715' in lines
+         and 'test_latency_seconds_count{stage="rewrite"} 5' in lines
+         and 'test_latency_seconds_count{stage="seo"} 1' in lines),
+        ("Gauge callbacks are read at render time", '# TYPE test_queue_items gauge' in lines
+         and 'test_queue_items{status="failed"} 1' in lines and 'test_queue_items{status="pending"} 3' in lines),
+        ("A failing collector is left out", 'test_broken' not in text),
+        ("Output ends with a newline", text.endswith('\n')),
+        ("timed() observes every run and counts errors", 'test_stage' not in before
+         and 'kcm_stage_duration_seconds_count{stage="test_stage"} 2' in stage_text
+         and 'kcm_stage_errors_total{stage="test_stage"} 1' in stage_text),
+        ("Cache hit ratio is derived at scrape time", 'kcm_cache_hit_ratio{cache="test_cache"} 0.6667' in stage_text),
+        ("Claude usage is counted by kind", usage == {'input': 1200, 'output': 300, 'cache_read': 0,
+                                                     'cache_creation': 0}
+         and 'kcm_claude_tokens_total{kind="input"} 1200' in stage_text
+         and 'kind="cache_read"' not in stage_text),
+        ("/metrics serves the Prometheus text format", response.status_code == 200
+         and response.mimetype == 'text/plain' and 'version=0.0.4' in response.content_type),
+        ("/metrics includes stages and queue gauges", '# TYPE kcm_stage_duration_seconds histogram' in body
+         and '# TYPE kcm_queue_items gauge' in body),
+        ("Every /metrics sample line is well formed", not malformed),
+    ]
+
+    all_passed = True
+    for name, passed in checks:
+        status = "✅ PASS" if passed else "❌ FAIL"
+        print(f"{status}: {name}")
+        if not passed:
+            all_passed = False
+
+    print()
+    print(f"/metrics: {len(sample_lines(body))} samples" + (f", malformed: {malformed[:3]}" if malformed else ''))
+    print("=" * 70)
+
+    assert all_passed, "Some metrics checks FAILED"
+
+if __name__ == '__main__':
+    test_metrics()
+    print("✅ All tests PASSED!")
@@ -0,0 +1,99 @@
+#!/usr/bin/env python3
+"""
+Test the push-down filters for the Notion context database query
+"""
+import sys
+from pathlib import Path
+
+# Add shared directory to path
+sys.path.insert(0, str(Path(__file__).parent / 'shared'))
+
+from notion_query import ContextSchema, context_filter, master_doc_filter, query_pages, MAX_FILTER_CONDITIONS
+
+MASTER = "South Jersey Real Estate Context Guide"
+
+DATABASE = {
+    'properties': {
+        'Title': {'id': 'title', 'type': 'title', 'title': {}},
+        'Keywords / Tags': {'id': 'kw%3At', 'type': 'multi_select', 'multi_select': {'options': [
+            {'name': 'Home Equity'}, {'name': 'equity'}, {'name': 'Downsizing'}, {'name': 'Mortgage Rates'}
+        ]}},
+        'Summary': {'id': 'sm%5Ey', 'type': 'rich_text', 'rich_text': {}}
+    }
+}
+
+
+class PagedDatabase:
+    """Stand-in for notion_client.databases that returns two pages of results"""
+
+    def __init__(self):
+        self.calls = []
+
+    def query(self, **kwargs):
+        self.calls.append(kwargs)
+        if 'start_cursor' not in kwargs:
+            return {'results': [{'id': 'a'}, {'id': 'b'}], 'has_more': True, 'next_cursor': 'page-2'}
+        return {'results': [{'id': 'c'}], 'has_more': False, 'next_cursor': None}
+
+
+class PagedClient:
+    def __init__(self):
+        self.databases = PagedDatabase()
+
+
+def test_notion_query():
+    """Test filter_properties, the compound topic filter and pagination"""
+
+    print("=" * 70)
+    print("NOTION QUERY TEST")
+    print("=" * 70)
+    print()
+
+    schema = ContextSchema(DATABASE)
+    query_filter = context_filter(['Equity', 'downsizing', 'equity', 'Cherry Hill'], schema, MASTER)
+    conditions = query_filter['or']
+    multi_select = [c['multi_select']['contains'] for c in conditions if 'multi_select' in c]
+    titles = [c['title']['contains'] for c in conditions if 'title' in c]
+
+    rich_text_schema = ContextSchema({'properties': {
+        'Title': {'id': 'title', 'type': 'title'},
+        'Keywords / Tags': {'id': 'kw', 'type': 'rich_text'}
+    }})
+    rich_text_filter = context_filter(['equity'], rich_text_schema, MASTER)
+
+    no_title = ContextSchema({'properties': {'Name': {'id': 'title', 'type': 'title'}}})
+    too_many = [f"topic {i}" for i in range(MAX_FILTER_CONDITIONS)]
+
+    client = PagedClient()
+    pages = query_pages(client, 'db', filter=master_doc_filter(MASTER), filter_properties=schema.property_ids)
+
+    checks = [
+        ("Only Title and Keywords / Tags are requested", schema.query_args() == {'filter_properties': ['title', 'kw%3At']}),
+        ("Master document is the first condition", conditions[0] == master_doc_filter(MASTER)),
+        ("Topics match titles case-insensitively", titles == [MASTER, 'equity', 'downsizing', 'cherry hill']),
+        ("Multi-select topics expand to matching options", multi_select == ['Home Equity', 'equity', 'Downsizing']),
+        ("Rich text keywords use contains", {'property': 'Keywords / Tags', 'rich_text': {'contains': 'equity'}}
+         in rich_text_filter['or']),
+        ("No filter without a Title property", context_filter(['equity'], no_title, MASTER) is None),
+        ("No filter beyond Notion's condition limit", context_filter(too_many, schema, MASTER) is None),
+        ("Pagination follows next_cursor", [page['id'] for page in pages] == ['a', 'b', 'c']),
+        ("Every page request carries the filter", all('filter' in call and 'filter_properties' in call
+                                                      for call in client.databases.calls)),
+    ]
+
+    all_passed = True
+    for name, passed in checks:
+        status = "✅ PASS" if passed else "❌ FAIL"
+        print(f"{status}: {name}")
+        if not passed:
+            all_passed = False
+
+    print()
+    print(f"Filter: {query_filter}")
+    print("=" * 70)
+
+    assert all_passed, "Some Notion query checks FAILED"
+
+if __name__ == '__main__':
+    test_notion_query()
+    print("✅ All tests PASSED!")
@@ -0,0 +1,123 @@
+#!/usr/bin/env python3
+"""
+Test the prompt registry: reloads on mtime/size changes, the fallback prompt and header versions
+"""
+import os
+import sys
+import tempfile
+from pathlib import Path
+
+# Add shared and converter directories to path
+sys.path.insert(0, str(Path(__file__).parent / 'shared'))
+sys.path.insert(0, str(Path(__file__).parent / 'kcm-converter'))
+
+from prompt_registry import PromptRegistry, FALLBACK, make_template
+from retry_policy import RetryPolicy
+
+
+def load_server():
+    """Import the converter with throwaway state files"""
+    state_dir = tempfile.mkdtemp(prefix='kcm-prompt-test-')
+    for name, filename in (('WEBHOOK_OUTBOX_PATH', 'outbox.db'), ('PUBLISH_GUARD_PATH', 'guard.db'),
+                           ('TRACKING_QUEUE_PATH', 'tracking.db'), ('CONTEXT_INDEX_PATH', 'context_index.bin')):
+        os.environ[name] = os.path.join(state_dir, filename)
+    os.environ['SHARED_CACHE_URL'] = 'memory'
+    import kcm_converter_server as server
+    server.claude_retry = RetryPolicy(max_attempts=2, base_delay=0.01)
+    return server
+
+
+def write_template(path: Path, text: str, mtime: float):
+    """Write a template and pin its modification time (filesystem clocks can be coarse)"""
+    path.write_text(text, encoding='utf-8')
+    os.utime(path, (mtime, mtime))
+
+
+def test_prompt_registry():
+    """Test caching, reloads, the fallback and prompts built before and after a template edit"""
+
+    print("=" * 70)
+    print("PROMPT REGISTRY TEST")
+    print("=" * 70)
+    print()
+
+    directory = Path(tempfile.mkdtemp(prefix='kcm-prompts-'))
+    active = directory / 'kcm_prompt_ACTIVE.md'
+    write_template(active, "# KCM to South Jersey Blog Conversion Prompt - VERSION 24\nUse short sentences.", 1000)
+    write_template(directory / 'kcm_prompt_v17.md', "# Old prompt\nNo version header here.", 1000)
+
+    registry = PromptRegistry(directory, fallback="Built-in prompt", default='ACTIVE')
+    names = registry.names()
+    first = registry.get()
+    again = registry.get()
+    loads_before_edit = registry.loads
+
+    # Same size, new modification time
+    write_template(active, "# KCM to South Jersey Blog Conversion Prompt - VERSION 25\nUse short sentences.", 2000)
+    touched = registry.get()
+
+    # New size, modification time put back
+    write_template(active, "# KCM to South Jersey Blog Conversion Prompt - VERSION 25\nUse very short sentences.", 2000)
+    resized = registry.get()
+
+    old = registry.get('v17')
+
+    active.unlink()
+    missing = registry.get()
+    write_template(active, "# Prompt - version 26.1\nBack again.", 3000)
+    restored = registry.get()
+
+    strict = PromptRegistry(directory)
+    try:
+        strict.get('v99')
+        strict_raised = False
+    except FileNotFoundError:
+        strict_raised = True
+
+    # The server builds its rewrite prompt from the registry - an edit shows up in the next prompt
+    server = load_server()
+    server.prompt_registry = PromptRegistry(directory, default='ACTIVE')
+    original_html = '<p>Downsizing in 2025</p>'
+    write_template(active, "# KCM Prompt - VERSION 30\nMention Cherry Hill once.", 4000)
+    prompt_before, budget_before = server.assemble_rewrite_prompt(original_html, [])
+    write_template(active, "# KCM Prompt - VERSION 31\nMention Haddonfield once.", 5000)
+    prompt_after, budget_after = server.assemble_rewrite_prompt(original_html, [])
+
+    checks = [
+        ("Template names come from the file names", names == ['ACTIVE', 'v17']),
+        ("Version is read from the template header", first.version == 'v24'),
+        ("Template without a header is versioned by its name", old.version == 'v17'),
+        ("Decimal and lower-case versions are read", restored.version == 'v26.1'),
+        ("Unchanged file is served from memory", again is first and loads_before_edit == 1 and registry.hits == 1),
+        ("New modification time reloads the file", touched.version == 'v25' and touched.sha256 != first.sha256),
+        ("New size reloads the file", 'very short' in resized.text and resized.sha256 != touched.sha256),
+        ("Missing file serves the fallback", missing.name == FALLBACK and missing.text == "Built-in prompt"),
+        ("Restored file replaces the fallback", restored.name == 'ACTIVE' and restored.text.endswith("Back again.")),
+        ("Missing file without a fallback raises", strict_raised),
+        ("Hash depends only on the text", make_template('a', 'same').sha256 == make_template('b', 'same').sha256),
+        ("Prompt before the edit uses the old template", "Cherry Hill" in prompt_before
+         and "Haddonfield" not in prompt_before),
+        ("Prompt after the edit uses the new template", "Haddonfield" in prompt_after
+         and "Cherry Hill" not in prompt_after),
+        ("Both prompts carry the original post", original_html in prompt_before and original_html in prompt_after),
+        ("Budget report names the template version", budget_before['prompt']['version'] == 'v30'
+         and budget_after['prompt']['version'] == 'v31'
+         and budget_before['prompt']['sha256'] != budget_after['prompt']['sha256']),
+    ]
+
+    all_passed = True
+    for name, passed in checks:
+        status = "✅ PASS" if passed else "❌ FAIL"
+        print(f"{status}: {name}")
+        if not passed:
+            all_passed = False
+
+    print()
+    print(f"Stats: {registry.stats()}")
+    print("=" * 70)
+
+    assert all_passed, "Some prompt registry checks FAILED"
+
+if __name__ == '__main__':
+    test_prompt_registry()
+    print("✅ All tests PASSED!")
@@ -0,0 +1,85 @@
+#!/usr/bin/env python3
+"""
+Test idempotent publishing (cached results and coalesced concurrent duplicates)
+"""
+import sys
+import time
+import tempfile
+import threading
+from pathlib import Path
+
+# Add shared directory to path
+sys.path.insert(0, str(Path(__file__).parent / 'shared'))
+
+from publish_guard import PublishGuard, make_publish_key, NEW, CACHED, COALESCED
+
+KCM_URL = 'https://simplifyingthemarket.com/en/2025/09/24/how-to-buy-a-home/'
+HTML = '<p>Buying a home in Mullica Hill</p>'
+
+
+def test_publish_guard():
+    """Test that duplicates return the first successful publish"""
+
+    print("=" * 70)
+    print("PUBLISH GUARD TEST")
+    print("=" * 70)
+    print()
+
+    guard = PublishGuard(db_path=Path(tempfile.mkdtemp()) / 'publish_guard.db')
+    calls = []
+
+    def publish():
+        calls.append(1)
+        time.sleep(0.2)
+        return {'success': True, 'delivery_id': f"delivery-{len(calls)}"}
+
+    # Three concurrent duplicates - only one publish runs
+    outcomes = []
+    threads = [
+        threading.Thread(target=lambda: outcomes.append(guard.run(KCM_URL, HTML, publish)))
+        for _ in range(3)
+    ]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    cached_result, cached_outcome = guard.run(KCM_URL, HTML + '\n', publish)
+    changed_result, changed_outcome = guard.run(KCM_URL, HTML + '<p>Edited</p>', publish)
+    invalid_result, invalid_outcome = guard.run(KCM_URL, HTML, publish, is_valid=lambda result: False)
+
+    key = make_publish_key(KCM_URL, HTML)
+    first_track = guard.mark_tracked(key, 'notion-page-1')
+    second_track = guard.mark_tracked(key, 'notion-page-2')
+
+    # A failed publish is not cached
+    failed_guard = PublishGuard(db_path=Path(tempfile.mkdtemp()) / 'publish_guard.db')
+    failed_guard.run(KCM_URL, HTML, lambda: {'success': False, 'error': 'webhook down'})
+    _, retry_outcome = failed_guard.run(KCM_URL, HTML, lambda: {'success': True, 'delivery_id': 'd'})
+
+    checks = [
+        ("Concurrent duplicates publish once", sorted(o for _, o in outcomes) == [COALESCED, COALESCED, NEW]),
+        ("Coalesced requests share the result", len({r['delivery_id'] for r, _ in outcomes}) == 1),
+        ("Sequential duplicate is cached", cached_outcome == CACHED and cached_result['delivery_id'] == 'delivery-1'),
+        ("Changed content publishes again", changed_outcome == NEW and changed_result['delivery_id'] == 'delivery-2'),
+        ("Invalidated result publishes again", invalid_outcome == NEW and invalid_result['delivery_id'] == 'delivery-3'),
+        ("First Notion record is kept", first_track and not second_track and guard.is_tracked(key)),
+        ("Failed publish is not cached", retry_outcome == NEW),
+    ]
+
+    all_passed = True
+    for name, passed in checks:
+        status = "✅ PASS" if passed else "❌ FAIL"
+        print(f"{status}: {name}")
+        if not passed:
+            all_passed = False
+
+    print()
+    print(f"Outcomes: {guard.stats()}")
+    print("=" * 70)
+
+    assert all_passed, "Some publish guard checks FAILED"
+
+if __name__ == '__main__':
+    test_publish_guard()
+    print("✅ All tests PASSED!")
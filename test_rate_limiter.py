@@ -0,0 +1,195 @@
+#!/usr/bin/env python3
+"""
+Test the API rate limiter: token bucket pacing, 429 re-queueing and the concurrency limit
+"""
+import os
+import sys
+import time
+import asyncio
+import threading
+from pathlib import Path
+from types import SimpleNamespace
+
+# Add shared directory to path
+sys.path.insert(0, str(Path(__file__).parent / 'shared'))
+
+from rate_limiter import (TokenBucket, ClientLimiter, AsyncLimitedClient, create_notion_limiter,
+                          get_retry_after, is_rate_limited)
+
+
+class RateLimited(Exception):
+    """Anthropic-style 429 carrying a retry-after header"""
+    status_code = 429
+
+    def __init__(self, retry_after: str = '0.05'):
+        super().__init__("rate limited")
+        self.headers = {'retry-after': retry_after}
+
+
+class NotionRateLimited(Exception):
+    """notion_client APIResponseError for rate_limited (status on the response)"""
+    code = 'rate_limited'
+
+    def __init__(self):
+        super().__init__("rate limited")
+        self.response = SimpleNamespace(status_code=429, headers={'retry-after': '0.01'})
+
+
+class Upstream:
+    """API call that raises the given errors in turn, then returns 'ok'"""
+
+    def __init__(self, *errors):
+        self.errors = list(errors)
+        self.calls = 0
+
+    def __call__(self):
+        self.calls += 1
+        if self.errors:
+            raise self.errors.pop(0)
+        return 'ok'
+
+
+class AsyncMessages:
+    """AsyncAnthropic().messages stand-in that is rate limited once"""
+
+    def __init__(self):
+        self.calls = 0
+
+    async def create(self, **kwargs):
+        self.calls += 1
+        if self.calls == 1:
+            raise RateLimited('0.01')
+        return 'created'
+
+
+def timed(fn):
+    started = time.monotonic()
+    result = fn()
+    return result, time.monotonic() - started
+
+
+def test_rate_limiter():
+    """Test pacing, throttling after 429s, retry limits and concurrency"""
+
+    print("=" * 70)
+    print("RATE LIMITER TEST")
+    print("=" * 70)
+    print()
+
+    # 20/s with a burst of 2: two calls go at once, the next two wait ~50ms each
+    bucket = TokenBucket(20, burst=2)
+    _, burst_time = timed(lambda: [bucket.acquire() for _ in range(2)])
+    _, paced_time = timed(lambda: [bucket.acquire() for _ in range(2)])
+
+    throttled = TokenBucket(100)
+    throttled.throttle(0.1)
+    halved_rate = throttled.rate
+    _, paused_time = timed(throttled.acquire)
+    for _ in range(10):
+        throttled.throttle(0)
+    floor_rate = throttled.rate
+    for _ in range(100):
+        throttled.recover()
+
+    # Two 429s, then success: the call is re-queued behind the retry-after pause
+    limiter = ClientLimiter('test', max_concurrent=2, rate_per_second=1000, max_retries=3)
+    upstream = Upstream(RateLimited(), RateLimited())
+    result, requeued_time = timed(lambda: limiter.call(upstream))
+    stats = limiter.stats()
+
+    notion = Upstream(NotionRateLimited())
+    notion_result = ClientLimiter('notion', max_concurrent=1, rate_per_second=1000).call(notion)
+
+    exhausted = Upstream(*[RateLimited('0.01')] * 10)
+    exhausted_limiter = ClientLimiter('test', max_concurrent=1, rate_per_second=1000, max_retries=2)
+    try:
+        exhausted_limiter.call(exhausted)
+        exhausted_raised = False
+    except RateLimited:
+        exhausted_raised = True
+
+    other_limiter = ClientLimiter('test', max_concurrent=1, rate_per_second=1000)
+    other = Upstream(ValueError("bad request"))
+    try:
+        other_limiter.call(other)
+        other_raised = False
+    except ValueError:
+        other_raised = True
+
+    # Six threads, two slots: never more than two calls in flight
+    slots = ClientLimiter('test', max_concurrent=2, rate_per_second=1000)
+    in_flight = []
+
+    def slow_call():
+        in_flight.append(slots.in_flight)
+        time.sleep(0.05)
+
+    def run_threads():
+        threads = [threading.Thread(target=slots.call, args=(slow_call,)) for _ in range(6)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+    _, threaded_time = timed(run_threads)
+
+    async_limiter = ClientLimiter('claude', max_concurrent=1, rate_per_second=1000)
+    messages = AsyncMessages()
+    client = AsyncLimitedClient(SimpleNamespace(messages=messages), async_limiter)
+    async_result = asyncio.run(client.messages.create(model='test'))
+
+    # Four worker processes share Notion's 3 requests/second
+    shared = ClientLimiter('notion', max_concurrent=3, rate_per_second=3, processes=4)
+    single = ClientLimiter('notion', max_concurrent=3, rate_per_second=3)
+    single.share(4)
+    os.environ['SERVER_WORKERS'] = '3'
+    try:
+        from_env = create_notion_limiter()
+    finally:
+        del os.environ['SERVER_WORKERS']
+
+    checks = [
+        ("Burst is served at once", burst_time < 0.03),
+        ("Calls past the burst are paced at the rate", paced_time >= 0.08),
+        ("Throttling halves the rate", halved_rate == 50),
+        ("Throttling pauses for retry-after", paused_time >= 0.09),
+        ("Rate never drops below 1/16 of the maximum", floor_rate == 100 / 16),
+        ("Successes bring the rate back to the maximum", throttled.rate == 100),
+        ("429s are re-queued until the call succeeds", result == 'ok' and upstream.calls == 3),
+        ("Re-queued calls wait for retry-after", requeued_time >= 0.09),
+        ("Throttles are counted", stats['throttled'] == 2 and stats['calls'] == 3),
+        ("Notion rate_limited errors are re-queued", notion_result == 'ok' and notion.calls == 2),
+        ("retry-after is read from the error or its response",
+         get_retry_after(RateLimited('3')) == 3.0 and get_retry_after(NotionRateLimited()) == 0.01),
+        ("429s are raised after max_retries", exhausted_raised and exhausted.calls == 3),
+        ("Other errors are raised at once", other_raised and other.calls == 1 and other_limiter.throttled == 0
+         and not is_rate_limited(ValueError())),
+        ("Concurrency is capped at max_concurrent", max(in_flight) == 2 and slots.stats()['calls'] == 6
+         and threaded_time >= 0.14
+         and slots.stats()['in_flight'] == 0),
+        ("Workers split the rate between them", shared.bucket.rate == 0.75 and shared.stats()['processes'] == 4),
+        ("Every worker keeps at least one slot", shared.max_concurrent == 1),
+        ("share() re-splits a limiter before use", single.bucket.rate == 0.75 and single.max_concurrent == 1),
+        ("SERVER_WORKERS splits the configured limits", from_env.processes == 3
+         and from_env.bucket.rate == from_env.limit_rate / 3
+         and from_env.max_concurrent == max(1, from_env.limit_concurrent // 3)),
+        ("Async calls are re-queued too", async_result == 'created' and messages.calls == 2
+         and async_limiter.throttled == 1),
+    ]
+
+    all_passed = True
+    for name, passed in checks:
+        status = "✅ PASS" if passed else "❌ FAIL"
+        print(f"{status}: {name}")
+        if not passed:
+            all_passed = False
+
+    print()
+    print(f"Stats: {stats}")
+    print("=" * 70)
+
+    assert all_passed, "Some rate limiter checks FAILED"
+
+if __name__ == '__main__':
+    test_rate_limiter()
+    print("✅ All tests PASSED!")
@@ -0,0 +1,169 @@
+#!/usr/bin/env python3
+"""
+Test per-request profiling: the top, prof and speedscope modes, the one-request-at-a-time guard
+and the REQUEST_PROFILING switch
+"""
+import os
+import sys
+import json
+import time
+import pstats
+import tempfile
+import threading
+from pathlib import Path
+
+# Add shared and converter directories to path
+sys.path.insert(0, str(Path(__file__).parent / 'shared'))
+sys.path.insert(0, str(Path(__file__).parent / 'kcm-converter'))
+
+from request_profiler import RequestProfiler, parse_profile_mode, profiling_enabled
+from retry_policy import RetryPolicy
+
+
+def load_server():
+    """Import the converter with throwaway state files"""
+    state_dir = tempfile.mkdtemp(prefix='kcm-state-test-')
+    for name, filename in (('WEBHOOK_OUTBOX_PATH', 'outbox.db'), ('PUBLISH_GUARD_PATH', 'guard.db'),
+                           ('TRACKING_QUEUE_PATH', 'tracking.db'), ('CONTEXT_INDEX_PATH', 'context_index.bin')):
+        os.environ[name] = os.path.join(state_dir, filename)
+    os.environ['SHARED_CACHE_URL'] = 'memory'
+    import kcm_converter_server as server
+    server.claude_retry = RetryPolicy(max_attempts=2, base_delay=0.01)
+    return server
+
+
+def slugify_articles(seconds: float = 0.06) -> int:
+    """CPU-bound stand-in for a conversion step"""
+    deadline = time.perf_counter() + seconds
+    slugs = 0
+    while time.perf_counter() < deadline:
+        slugs += len('-'.join(word.lower() for word in "Is Now a Good Time to Downsize".split()))
+    return slugs
+
+
+def profile(mode: str, **kwargs) -> dict:
+    with RequestProfiler(mode, name='POST /convert', **kwargs) as profiler:
+        slugify_articles()
+    return profiler.report()
+
+
+def function_names(report: dict):
+    return [row['function'] for row in report['top']]
+
+
+def test_request_profiler():
+    """Test each profile mode, the profiler guard and the server's opt-in switch"""
+
+    print("=" * 70)
+    print("REQUEST PROFILER TEST")
+    print("=" * 70)
+    print()
+
+    profile_dir = Path(tempfile.mkdtemp(prefix='kcm-profiles-'))
+    os.environ['PROFILE_DIR'] = str(profile_dir)
+
+    top = profile('top', top_n=5)
+    tottime = profile('top', sort='tottime')
+    prof = profile('prof')
+    prof_stats = pstats.Stats(prof['file']) if prof.get('file') else None
+    speedscope = profile('speedscope')
+    with open(speedscope['file'], 'r', encoding='utf-8') as f:
+        speedscope_file = json.load(f)
+    sampled = speedscope_file['profiles'][0]
+    frame_names = {frame['name'] for frame in speedscope_file['shared']['frames']}
+
+    # A second request is not profiled while the first one holds the profiler
+    inside = threading.Event()
+    release = threading.Event()
+    busy = {}
+
+    def profiled_request():
+        with RequestProfiler('top', name='POST /upload-all') as profiler:
+            inside.set()
+            release.wait(5)
+        busy['first'] = profiler.report()
+
+    thread = threading.Thread(target=profiled_request)
+    thread.start()
+    inside.wait(5)
+    with RequestProfiler('top', name='POST /convert') as second:
+        slugify_articles(0.01)
+    busy['second'] = second.report()
+    release.set()
+    thread.join()
+    after_release = profile('top')
+
+    # Profiling must be switched on for the server to honour X-Profile
+    server = load_server()
+
+    @server.with_profile
+    def converted():
+        slugify_articles(0.02)
+        return server.jsonify({'success': True})
+
+    os.environ.pop('REQUEST_PROFILING', None)
+    default_enabled = profiling_enabled()
+    with server.app.test_request_context('/convert', method='POST', headers={'X-Profile': 'top'}):
+        ignored = converted()
+    os.environ['REQUEST_PROFILING'] = 'true'
+    try:
+        with server.app.test_request_context('/convert', method='POST', headers={'X-Profile': 'prof'}):
+            profiled = converted()
+        with server.app.test_request_context('/convert?profile=speedscope', method='POST'):
+            by_query = converted()
+        with server.app.test_request_context('/convert', method='POST'):
+            not_asked = converted()
+    finally:
+        del os.environ['REQUEST_PROFILING']
+        del os.environ['PROFILE_DIR']
+    profiled_report = profiled.get_json()['profile']
+
+    checks = [
+        ("Profile modes are parsed from the switch", [parse_profile_mode(v) for v in (
+            None, '', 'off', 'false', 'top', ' PROF ', 'speedscope', '1', 'yes')]
+         == [None, None, None, None, 'top', 'prof', 'speedscope', 'top', 'top']),
+        ("top lists the hot functions", top['mode'] == 'top' and top['sort'] == 'cumulative'
+         and len(top['top']) == 5 and any('slugify_articles' in name for name in function_names(top))
+         and 'file' not in top),
+        ("top rows carry calls and timings", all({'function', 'calls', 'self_ms', 'cumulative_ms'} <= set(row)
+                                                 for row in top['top'])
+         and top['wall_ms'] >= 50),
+        ("Profiler's own disable call is left out", not any('disable' in name for name in function_names(tottime))),
+        ("tottime sorts by self time", tottime['sort'] == 'tottime'
+         and [row['self_ms'] for row in tottime['top']] == sorted((row['self_ms'] for row in tottime['top']),
+                                                                  reverse=True)),
+        ("prof writes a pstats file", prof['file'].endswith('.prof') and Path(prof['file']).parent == profile_dir
+         and prof_stats is not None and prof_stats.total_calls > 0),
+        ("speedscope writes sampled stacks", speedscope['file'].endswith('.speedscope.json')
+         and speedscope['samples'] > 0 and sampled['type'] == 'sampled'
+         and len(sampled['samples']) == len(sampled['weights']) == speedscope['samples']),
+        ("speedscope frames name the sampled code", 'slugify_articles' in frame_names
+         and any('slugify_articles' in name for name in function_names(speedscope))),
+        ("One request is profiled at a time", 'error' not in busy['first']
+         and busy['second'] == {'mode': 'top', 'error': 'Another request is being profiled - try again'}),
+        ("Profiler is free again afterwards", 'error' not in after_release),
+        ("Profiling is off by default", default_enabled is False),
+        ("X-Profile is ignored while profiling is off", ignored.get_json() == {'success': True}
+         and 'X-Profile-File' not in ignored.headers),
+        ("REQUEST_PROFILING=true adds the report", profiled_report['mode'] == 'prof'
+         and profiled.headers['X-Profile-File'] == profiled_report['file']),
+        ("?profile= works like the header", by_query.get_json()['profile']['mode'] == 'speedscope'),
+        ("Requests that do not ask are not profiled", 'profile' not in not_asked.get_json()),
+    ]
+
+    all_passed = True
+    for name, passed in checks:
+        status = "✅ PASS" if passed else "❌ FAIL"
+        print(f"{status}: {name}")
+        if not passed:
+            all_passed = False
+
+    print()
+    print(f"Hot functions: {function_names(top)}")
+    print("=" * 70)
+
+    assert all_passed, "Some request profiler checks FAILED"
+
+if __name__ == '__main__':
+    test_request_profiler()
+    print("✅ All tests PASSED!")
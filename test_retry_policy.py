@@ -0,0 +1,210 @@
+#!/usr/bin/env python3
+"""
+Test error classification, retries, and resuming a rewrite stream that dropped mid-response
+"""
+import os
+import sys
+import asyncio
+import tempfile
+from pathlib import Path
+from types import SimpleNamespace
+
+# Add shared and converter directories to path
+sys.path.insert(0, str(Path(__file__).parent / 'shared'))
+sys.path.insert(0, str(Path(__file__).parent / 'kcm-converter'))
+
+import httpx
+import anthropic
+
+from retry_policy import RetryPolicy, classify_error, OVERLOADED, SERVER_ERROR, CONNECTION, TIMEOUT
+from rate_limiter import ClientLimiter, LimitedClient
+
+API_URL = 'https://api.anthropic.com/v1/messages'
+
+
+def stream_error(error_type: str) -> anthropic.APIStatusError:
+    """What the SDK raises for an SSE error event (the HTTP status was already 200)"""
+    response = httpx.Response(200, request=httpx.Request('POST', API_URL))
+    return anthropic.APIStatusError(f"{error_type}", response=response,
+                                    body={'type': 'error', 'error': {'type': error_type, 'message': error_type}})
+
+
+class RateLimited(Exception):
+    """A 429 that asks for an (almost) immediate retry"""
+    status_code = 429
+    headers = {'retry-after': '0.01'}
+
+
+class Flaky:
+    """Raises the given errors in turn, then returns 'ok'"""
+
+    def __init__(self, *errors):
+        self.errors = list(errors)
+        self.calls = 0
+
+    def __call__(self):
+        self.calls += 1
+        if self.errors:
+            raise self.errors.pop(0)
+        return 'ok'
+
+
+class DroppingStream:
+    """messages.stream stand-in: the first stream dies after some text, the next finishes it"""
+
+    def __init__(self, chunks, error=None):
+        self.chunks = chunks
+        self.error = error
+
+    def _text(self):
+        yield from self.chunks
+        if self.error:
+            raise self.error
+
+    @property
+    def text_stream(self):
+        return self._text()
+
+    def get_final_message(self):
+        return SimpleNamespace(stop_reason='end_turn', usage=None)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+class AsyncDroppingStream(DroppingStream):
+    async def _atext(self):
+        for chunk in self._text():
+            yield chunk
+
+    @property
+    def text_stream(self):
+        return self._atext()
+
+    async def get_final_message(self):
+        return DroppingStream.get_final_message(self)
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        return False
+
+
+class FakeAnthropic:
+    """Anthropic client whose streams are scripted; records the messages of every request"""
+
+    def __init__(self, stream_type, error):
+        self.requests = []
+        self.error = error
+        self.stream_type = stream_type
+        self.messages = self
+
+    def stream(self, model, max_tokens, messages):
+        self.requests.append(messages)
+        if len(self.requests) == 1:
+            return self.stream_type(['<h1>Downsizing</h1>\n', '<p>Equity in Cherry ', ' '], self.error)
+        return self.stream_type(['Hill</p>'])
+
+
+def load_server():
+    """Import the converter with throwaway state files"""
+    state_dir = tempfile.mkdtemp(prefix='kcm-retry-test-')
+    for name, filename in (('WEBHOOK_OUTBOX_PATH', 'outbox.db'), ('PUBLISH_GUARD_PATH', 'guard.db'),
+                           ('TRACKING_QUEUE_PATH', 'tracking.db'), ('CONTEXT_INDEX_PATH', 'context_index.bin')):
+        os.environ[name] = os.path.join(state_dir, filename)
+    os.environ['SHARED_CACHE_URL'] = 'memory'
+    import kcm_converter_server as server
+    server.claude_retry = RetryPolicy(max_attempts=3, base_delay=0.01)
+    return server
+
+
+def test_retry_policy():
+    """Test classification, retry counts, 429 handling and stream resume"""
+
+    print("=" * 70)
+    print("RETRY POLICY TEST")
+    print("=" * 70)
+    print()
+
+    policy = RetryPolicy(max_attempts=4, base_delay=0.01)
+
+    transient = Flaky(httpx.ReadError("connection reset"), stream_error('overloaded_error'))
+    transient_result = policy.run(transient, label='test')
+
+    permanent = Flaky(stream_error('invalid_request_error'))
+    try:
+        policy.run(permanent, label='test')
+        permanent_raised = False
+    except anthropic.APIStatusError:
+        permanent_raised = True
+
+    exhausted = Flaky(*[httpx.ReadError("down")] * 5)
+    try:
+        policy.run(exhausted, label='test')
+    except httpx.ReadError:
+        pass
+
+    # A LimitedClient re-queues 429s itself - the policy must not retry them on top
+    limiter = ClientLimiter('test', max_concurrent=2, rate_per_second=1000, max_retries=2)
+    upstream = Flaky(*[RateLimited()] * 10)
+    try:
+        policy.run(LimitedClient(upstream, limiter), label='test')
+    except RateLimited:
+        pass
+    plain = Flaky(*[RateLimited()] * 10)
+    try:
+        policy.run(plain, label='test')
+    except RateLimited:
+        pass
+
+    server = load_server()
+    sync_client = FakeAnthropic(DroppingStream, httpx.RemoteProtocolError("peer closed connection"))
+    server.anthropic_client = sync_client
+    sync_text = server.stream_rewrite("Rewrite this")
+
+    async_client = FakeAnthropic(AsyncDroppingStream, stream_error('overloaded_error'))
+    server.anthropic_async = async_client
+    async_text = asyncio.run(server.stream_rewrite_async("Rewrite this"))
+
+    expected = '<h1>Downsizing</h1>\n<p>Equity in CherryHill</p>'
+    prefill = sync_client.requests[1][-1]
+
+    checks = [
+        ("Dropped connection is a connection error", classify_error(httpx.ReadError("reset")) == CONNECTION),
+        ("'peer closed' is a connection error", classify_error(httpx.RemoteProtocolError("peer closed")) == CONNECTION),
+        ("overloaded_error stream event is overloaded", classify_error(stream_error('overloaded_error')) == OVERLOADED),
+        ("api_error stream event is a server error", classify_error(stream_error('api_error')) == SERVER_ERROR),
+        ("Read timeout is a timeout", classify_error(httpx.ReadTimeout("slow")) == TIMEOUT),
+        ("Bad request is not retried", classify_error(stream_error('invalid_request_error')) is None),
+        ("Transient errors are retried", transient_result == 'ok' and transient.calls == 3),
+        ("Permanent errors are raised at once", permanent_raised and permanent.calls == 1),
+        ("Attempts are capped at max_attempts", exhausted.calls == 4),
+        ("429s through a LimitedClient are retried by the limiter only", upstream.calls == 3),
+        ("429s from other calls are retried by the policy", plain.calls == 4),
+        ("Dropped stream resumes from its partial output", sync_text == expected and len(sync_client.requests) == 2),
+        ("Partial output is sent as an assistant prefill without trailing whitespace",
+         prefill == {'role': 'assistant', 'content': '<h1>Downsizing</h1>\n<p>Equity in Cherry'}),
+        ("Async stream resumes after an overloaded_error event", async_text == expected
+         and len(async_client.requests) == 2),
+    ]
+
+    all_passed = True
+    for name, passed in checks:
+        status = "✅ PASS" if passed else "❌ FAIL"
+        print(f"{status}: {name}")
+        if not passed:
+            all_passed = False
+
+    print()
+    print(f"Resumed rewrite: {sync_text!r}")
+    print("=" * 70)
+
+    assert all_passed, "Some retry policy checks FAILED"
+
+if __name__ == '__main__':
+    test_retry_policy()
+    print("✅ All tests PASSED!")
@@ -0,0 +1,152 @@
+#!/usr/bin/env python3
+"""
+Test the shared cache: cross-process SQLite store, per-namespace TTL, eviction and counters
+"""
+import sys
+import time
+import tempfile
+from pathlib import Path
+
+# Add shared directory to path
+sys.path.insert(0, str(Path(__file__).parent / 'shared'))
+
+from shared_cache import SharedCache, CacheNamespace, FIFO, TTL, cache_key
+from taxonomy_sync import TaxonomyService
+
+
+class BrokenBackend:
+    """A store that is down: every call raises"""
+
+    def __getattr__(self, name):
+        def fail(*args, **kwargs):
+            raise ConnectionError("store unavailable")
+        return fail
+
+
+class CountingTaxonomy(TaxonomyService):
+    """TaxonomyService that counts WordPress fetches instead of making them"""
+
+    fetches = 0
+
+    def fetch(self, kind, etag=None):
+        CountingTaxonomy.fetches += 1
+        return [{'id': 1, 'name': 'Uncategorized', 'slug': 'uncategorized', 'count': 0},
+                {'id': 7, 'name': f"Synced {kind}", 'slug': f"synced-{kind}", 'count': 3}], '"v2"'
+
+
+def test_shared_cache():
+    """Test sharing between processes, versions, TTLs, eviction policies and failure handling"""
+
+    print("=" * 70)
+    print("SHARED CACHE TEST")
+    print("=" * 70)
+    print()
+
+    state_dir = Path(tempfile.mkdtemp())
+    url = f"sqlite:///{state_dir / 'shared_cache.db'}"
+    # Two instances on one file behave like two server processes
+    first, second = SharedCache(url), SharedCache(url)
+
+    pages = first.namespace('page_text', ttl=60)
+    other_pages = second.namespace('page_text', ttl=60)
+    pages.put('page-1', "master doc text", version='2025-01-01')
+    shared_hit = other_pages.get('page-1', '2025-01-01')
+    memory_hit = other_pages.get('page-1', '2025-01-01')
+    edited = other_pages.get('page-1', '2025-02-01')
+
+    claude = first.namespace('claude_response', ttl=60)
+    claude.put(cache_key('seo', 'prompt'), {'tags': ['Downsizing']})
+    copy = second.namespace('claude_response', ttl=60).get(cache_key('seo', 'prompt'))
+    copy['tags'].append('Mutated')
+    unchanged = second.namespace('claude_response', ttl=60).get(cache_key('seo', 'prompt'))
+
+    short = first.namespace('short', ttl=0.2, maxsize=0)
+    short.put('k', 'v')
+    before_expiry = short.get('k')
+    time.sleep(0.25)
+    after_expiry = short.get('k')
+
+    lru = first.namespace('lru', ttl=60, maxsize=0, max_entries=2)
+    lru.put('a', 1)
+    time.sleep(0.01)
+    lru.put('b', 2)
+    time.sleep(0.01)
+    lru.get('a')
+    time.sleep(0.01)
+    lru.put('c', 3)
+
+    fifo = first.namespace('fifo', ttl=60, maxsize=0, max_entries=2, policy=FIFO)
+    fifo.put('a', 1)
+    time.sleep(0.01)
+    fifo.put('b', 2)
+    time.sleep(0.01)
+    fifo.get('a')
+    time.sleep(0.01)
+    fifo.put('c', 3)
+
+    unbounded = first.namespace('unbounded', ttl=60, maxsize=0, policy=TTL)
+    for i in range(5):
+        unbounded.put(str(i), i)
+
+    disabled = first.namespace('disabled', ttl=0)
+    disabled.put('k', 'v')
+
+    broken = CacheNamespace('broken', BrokenBackend(), ttl=60, maxsize=0)
+    broken.put('k', 'v')
+    broken_read = broken.get('k')
+    broken_errors = broken.errors
+
+    local_only = SharedCache('memory').namespace('local', ttl=60)
+    local_only.put('k', 'v')
+
+    try:
+        first.namespace('bad', ttl=60, policy='random')
+        bad_policy = False
+    except ValueError:
+        bad_policy = True
+
+    stats = second.stats()['namespaces']['page_text']
+
+    taxonomy = [
+        CountingTaxonomy('https://example.com', cache_path=state_dir / f"taxonomy_{i}.json",
+                         shared=SharedCache(url).namespace('taxonomy', ttl=60, maxsize=0, policy=TTL))
+        for i in range(2)
+    ]
+    taxonomy[0].refresh()
+    adopted = taxonomy[1].refresh()
+
+    checks = [
+        ("Value stored by one process is read by another", shared_hit == "master doc text"),
+        ("Repeat lookup is served from memory", memory_hit == "master doc text" and stats['memory_hits'] == 1),
+        ("Other version is a miss", edited is None and stats['misses'] == 1),
+        ("Hits and misses are counted per namespace", stats['shared_hits'] == 1 and stats['hit_rate'] == 0.667),
+        ("Callers get their own copy", unchanged == {'tags': ['Downsizing']}),
+        ("Entries expire after the namespace TTL", before_expiry == 'v' and after_expiry is None),
+        ("LRU evicts the least recently used entry", lru.get('b') is None and lru.get('a') == 1 and lru.get('c') == 3),
+        ("FIFO evicts the oldest stored entry", fifo.get('a') is None and fifo.get('b') == 2 and fifo.get('c') == 3),
+        ("TTL policy keeps every entry", unbounded.stats()['stored'] == 5),
+        ("Namespace with TTL 0 stores nothing", disabled.get('k') is None and disabled.stats()['puts'] == 0),
+        ("Store failures are misses, not errors", broken_read is None and broken_errors == 2),
+        ("'memory' keeps entries in the process", local_only.get('k') == 'v' and local_only.stats()['stored'] is None),
+        ("Unknown eviction policy is rejected", bad_policy),
+        ("A taxonomy sync serves every process", CountingTaxonomy.fetches == 2 and adopted == {
+            'categories': 'updated', 'tags': 'updated'} and taxonomy[1].stats()['shared_syncs'] == 2
+         and taxonomy[1].categories.id_for('Synced categories') == 7),
+    ]
+
+    all_passed = True
+    for name, passed in checks:
+        status = "✅ PASS" if passed else "❌ FAIL"
+        print(f"{status}: {name}")
+        if not passed:
+            all_passed = False
+
+    print()
+    print(f"Stats: {stats}")
+    print("=" * 70)
+
+    assert all_passed, "Some shared cache checks FAILED"
+
+if __name__ == '__main__':
+    test_shared_cache()
+    print("✅ All tests PASSED!")
@@ -0,0 +1,107 @@
+#!/usr/bin/env python3
+"""
+Test coalescing of identical concurrent lookups (threads and asyncio)
+"""
+import sys
+import time
+import asyncio
+import threading
+from pathlib import Path
+
+# Add shared directory to path
+sys.path.insert(0, str(Path(__file__).parent / 'shared'))
+
+from single_flight import SingleFlight
+
+
+def test_single_flight():
+    """Test that concurrent identical calls share one upstream call"""
+
+    print("=" * 70)
+    print("SINGLE FLIGHT TEST")
+    print("=" * 70)
+    print()
+
+    flight = SingleFlight('test')
+    upstream = []
+
+    @flight.coalesce()
+    def fetch_page(page_id):
+        upstream.append(page_id)
+        time.sleep(0.2)
+        return f"content of {page_id}"
+
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(fetch_page('master'))) for _ in range(5)]
+    threads.append(threading.Thread(target=lambda: results.append(fetch_page('other'))))
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    thread_stats = flight.stats()
+
+    # Errors reach every waiting caller, and the next call goes upstream again
+    def failing():
+        time.sleep(0.1)
+        raise RuntimeError("Notion down")
+
+    errors = []
+
+    def call_failing():
+        try:
+            flight.do('failing', failing)
+        except RuntimeError as e:
+            errors.append(str(e))
+
+    threads = [threading.Thread(target=call_failing) for _ in range(3)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    sequential = [fetch_page('master'), fetch_page('master')]
+
+    # asyncio: a cancelled caller does not cancel the call for the others
+    async_flight = SingleFlight('test_async')
+    async_upstream = []
+
+    @async_flight.coalesce()
+    async def query_database():
+        async_upstream.append(1)
+        await asyncio.sleep(0.2)
+        return ['page-1', 'page-2']
+
+    async def run_async():
+        impatient = asyncio.ensure_future(asyncio.wait_for(query_database(), 0.05))
+        patient = [asyncio.ensure_future(query_database()) for _ in range(3)]
+        results = await asyncio.gather(impatient, *patient, return_exceptions=True)
+        return results
+
+    async_results = asyncio.run(run_async())
+
+    checks = [
+        ("Identical calls made one upstream call per key", sorted(upstream[:2]) == ['master', 'other']),
+        ("Every caller got the result", results.count("content of master") == 5 and "content of other" in results),
+        ("Fan-out ratio reported", thread_stats['fan_out'] == 3.0 and thread_stats['upstream_calls'] == 2),
+        ("Errors reach every waiting caller", errors == ["Notion down"] * 3),
+        ("Nothing is cached after the call returns", len(upstream) == 4 and sequential == ["content of master"] * 2),
+        ("Async calls coalesce", len(async_upstream) == 1 and async_results[1:] == [['page-1', 'page-2']] * 3),
+        ("Cancelled caller does not cancel the others", isinstance(async_results[0], asyncio.TimeoutError)),
+        ("No calls left in flight", flight.stats()['in_flight'] == 0 and async_flight.stats()['in_flight'] == 0),
+    ]
+
+    all_passed = True
+    for name, passed in checks:
+        status = "✅ PASS" if passed else "❌ FAIL"
+        print(f"{status}: {name}")
+        if not passed:
+            all_passed = False
+
+    print()
+    print(f"Stats: {flight.stats()} / {async_flight.stats()}")
+    print("=" * 70)
+
+    assert all_passed, "Some single flight checks FAILED"
+
+if __name__ == '__main__':
+    test_single_flight()
+    print("✅ All tests PASSED!")
@@ -0,0 +1,83 @@
+#!/usr/bin/env python3
+"""
+Test loose matching of Claude/KCM category and tag names onto WordPress terms
+"""
+import os
+import sys
+import tempfile
+from pathlib import Path
+
+# Add shared directory to path
+sys.path.insert(0, str(Path(__file__).parent / 'shared'))
+
+# Use the bundled taxonomy snapshot, not a synced cache
+os.environ['WORDPRESS_TAXONOMY_CACHE_PATH'] = str(Path(tempfile.mkdtemp()) / 'wordpress_taxonomy.json')
+
+from taxonomy_sync import TaxonomyIndex
+from taxonomy_resolver import TaxonomyResolver, normalize
+from kcm_to_wordpress_mapping import merge_taxonomy
+from wordpress_taxonomy_ids import get_tag_ids
+
+TAGS = TaxonomyIndex([
+    {'id': 1134, 'name': 'Affordability', 'slug': 'affordability'},
+    {'id': 1145, 'name': 'First Time Home Buyers', 'slug': 'first-time-home-buyers'},
+    {'id': 1147, 'name': 'Home Prices', 'slug': 'home-prices'},
+    {'id': 1152, 'name': 'Interest Rates', 'slug': 'interest-rates'},
+    {'id': 1156, 'name': 'Move Up Buyers', 'slug': 'move-up-buyers'},
+    {'id': 1052, 'name': 'Washington Twp', 'slug': 'washington-twp'},
+    {'id': 1054, 'name': 'Cherry Hill', 'slug': 'cherry-hill'},
+    {'id': 1060, 'name': 'Mount Laurel', 'slug': 'mount-laurel'},
+])
+
+
+def test_taxonomy_resolver():
+    """Test normalization, synonyms, typo matching and unmapped reporting"""
+
+    print("=" * 70)
+    print("TAXONOMY RESOLVER TEST")
+    print("=" * 70)
+    print()
+
+    resolver = TaxonomyResolver(TAGS, {'Mortgage Rates': 'Interest Rates', 'First-Time Buyers': 'First Time Home Buyers'})
+    ids, unmapped = resolver.ids(['Move-up Buyers', 'move up buyer', 'Crypto', 'home-prices'])
+    merged = merge_taxonomy(['For Buyers'], ['Home Prices', 'Move-up Buyers'],
+                            ['for buyers', 'Homebuyer Tips'], ['home prices', 'Move Up Buyers', 'Blockchain', 'blockchain'])
+
+    checks = [
+        ("Case, punctuation and plurals normalize", normalize('Move-up Buyers') == normalize('MOVE UP BUYER')),
+        ("Exact name", resolver.resolve('Cherry Hill') == 'Cherry Hill'),
+        ("Hyphen and casing", resolver.resolve('move-up buyers') == 'Move Up Buyers'),
+        ("Singular form", resolver.resolve('Interest Rate') == 'Interest Rates'),
+        ("Slug", resolver.resolve('home-prices') == 'Home Prices'),
+        ("KCM synonym", resolver.resolve('Mortgage Rates') == 'Interest Rates'),
+        ("Synonym with different punctuation", resolver.resolve('first time buyers') == 'First Time Home Buyers'),
+        ("Township and Mt abbreviations", resolver.resolve('Washington Township') == 'Washington Twp'
+         and resolver.resolve('Mt. Laurel') == 'Mount Laurel'),
+        ("One typo", resolver.resolve('Cherry Hil') == 'Cherry Hill'),
+        ("Two typos in a long name", resolver.resolve('Afordabilty') == 'Affordability'),
+        ("Short names need an exact match", resolver.resolve('Tax') is None),
+        ("Unrelated name is not matched", resolver.resolve('Crypto') is None),
+        ("IDs are de-duplicated", ids == [1156, 1147]),
+        ("Unmapped names are reported", unmapped == ['Crypto']),
+        ("Payload IDs use the resolver", get_tag_ids(['Move-up Buyers', 'Move Up Buyers', 'Home Price']) == [1156, 1147]),
+        ("Merged categories map synonyms", merged['categories'] == ['For Buyers']),
+        ("Merged tags de-duplicate variants", merged['tags'] == ['Home Prices', 'Move Up Buyers', 'Blockchain']),
+        ("Merge reports unmapped tags once", merged['unmapped']['tags'] == ['Blockchain']),
+    ]
+
+    all_passed = True
+    for name, passed in checks:
+        status = "✅ PASS" if passed else "❌ FAIL"
+        print(f"{status}: {name}")
+        if not passed:
+            all_passed = False
+
+    print()
+    print(f"Merged: {merged}")
+    print("=" * 70)
+
+    assert all_passed, "Some taxonomy resolver checks FAILED"
+
+if __name__ == '__main__':
+    test_taxonomy_resolver()
+    print("✅ All tests PASSED!")
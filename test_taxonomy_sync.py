@@ -0,0 +1,167 @@
+#!/usr/bin/env python3
+"""
+Test the WordPress taxonomy sync: ETag revalidation, paging, the disk cache and the snapshot fallback
+"""
+import sys
+import json
+import tempfile
+from pathlib import Path
+
+# Add shared directory to path
+sys.path.insert(0, str(Path(__file__).parent / 'shared'))
+
+import requests
+
+import taxonomy_sync
+from taxonomy_sync import TaxonomyService, SNAPSHOT_PATH
+
+SITE = 'https://wp.example'
+
+
+class Reply:
+    def __init__(self, status_code, terms=None, headers=None):
+        self.status_code = status_code
+        self.terms = terms or []
+        self.headers = headers or {}
+
+    def json(self):
+        return self.terms
+
+    def raise_for_status(self):
+        if self.status_code >= 400:
+            raise requests.HTTPError(f"{self.status_code} Server Error")
+
+
+class WordPress:
+    """requests.get stand-in for /wp-json/wp/v2/categories and /tags (one term per page)"""
+
+    def __init__(self):
+        self.terms = {
+            'categories': [{'id': 1, 'name': 'Uncategorized', 'slug': 'uncategorized', 'count': 0},
+                           {'id': 1031, 'name': 'Camden County Real Estate', 'slug': 'camden-county-real-estate',
+                            'count': 12}],
+            'tags': [{'id': 1054, 'name': 'Cherry Hill', 'slug': 'cherry-hill', 'count': 40}]
+        }
+        self.version = 1
+        self.down = False
+        self.requests = []
+
+    def etag(self):
+        return f'"v{self.version}"'
+
+    def __call__(self, url, params=None, headers=None, auth=None, timeout=None):
+        kind = url.rsplit('/', 1)[-1]
+        self.requests.append((kind, params['page'], dict(headers or {})))
+        if self.down:
+            return Reply(503)
+        if (headers or {}).get('If-None-Match') == self.etag():
+            return Reply(304)
+        terms = self.terms[kind]
+        page = params['page']
+        return Reply(200, terms[page - 1:page], {'ETag': self.etag(), 'X-WP-TotalPages': str(len(terms))})
+
+
+def test_taxonomy_sync():
+    """Test conditional refreshes, term changes, failures and where terms come from before a sync"""
+
+    print("=" * 70)
+    print("TAXONOMY SYNC TEST")
+    print("=" * 70)
+    print()
+
+    state_dir = Path(tempfile.mkdtemp())
+    cache_path = state_dir / 'wordpress_taxonomy.json'
+    with open(SNAPSHOT_PATH, 'r', encoding='utf-8') as f:
+        snapshot = json.load(f)
+
+    changes = []
+    listener = taxonomy_sync.on_change(changes.append)
+    wordpress = WordPress()
+    real_get = requests.get
+    requests.get = wordpress
+    try:
+        service = TaxonomyService(SITE, cache_path=cache_path)
+        before_sync = service.stats()['categories']['source']
+        snapshot_lookup = service.categories.id_for('Camden County Real Estate')
+
+        first = service.refresh()
+        pages_fetched = len(wordpress.requests)
+        cached = json.loads(cache_path.read_text(encoding='utf-8'))
+
+        wordpress.requests.clear()
+        revalidated = service.refresh()
+        conditional_headers = [headers for _, _, headers in wordpress.requests]
+
+        # A new process starts from the disk cache and revalidates it with the saved ETag
+        restarted = TaxonomyService(SITE, cache_path=cache_path)
+        restarted_source = restarted.stats()['tags']['source']
+        restarted_result = restarted.refresh()
+
+        # Only post counts changed: a new ETag, but the same terms
+        wordpress.version = 2
+        wordpress.terms['tags'][0]['count'] = 41
+        recounted = service.refresh()
+
+        wordpress.version = 3
+        wordpress.terms['tags'].append({'id': 1060, 'name': 'Mount Laurel', 'slug': 'mount-laurel', 'count': 2})
+        changes.clear()
+        added = service.refresh()
+
+        wordpress.down = True
+        failed = service.refresh()
+        kept_after_failure = service.tags.id_for('Mount Laurel')
+        cache_after_failure = json.loads(cache_path.read_text(encoding='utf-8'))['tags']['etag']
+
+        offline = TaxonomyService(SITE, cache_path=state_dir / 'never_synced.json')
+        offline_result = offline.refresh()
+
+        other_site = TaxonomyService('https://other.example', cache_path=cache_path)
+        broken_path = state_dir / 'broken.json'
+        broken_path.write_text('{not json', encoding='utf-8')
+        broken = TaxonomyService(SITE, cache_path=broken_path)
+    finally:
+        requests.get = real_get
+        taxonomy_sync._change_listeners.remove(listener)
+
+    checks = [
+        ("Before the first sync, terms come from the snapshot", before_sync == 'snapshot'
+         and snapshot_lookup == 1031),
+        ("First sync fetches every page", first == {'categories': 'updated', 'tags': 'updated'}
+         and pages_fetched == 3),
+        ("Sync is saved with its ETag", cached['site'] == SITE and cached['categories']['etag'] == '"v1"'
+         and len(cached['categories']['terms']) == 2),
+        ("Refresh sends If-None-Match", conditional_headers == [{'If-None-Match': '"v1"'}] * 2),
+        ("304 keeps the terms", revalidated == {'categories': 'not_modified', 'tags': 'not_modified'}
+         and service.stats()['not_modified'] == 2 and service.categories.id_for('Uncategorized') == 1),
+        ("Restart loads the disk cache", restarted_source == 'cache'),
+        ("Restart revalidates with the cached ETag", restarted_result == {
+            'categories': 'not_modified', 'tags': 'not_modified'}),
+        ("New post counts are not a change", recounted['tags'] == 'unchanged'),
+        ("New term is an update and notifies listeners", added['tags'] == 'updated'
+         and service.tags.id_for('mount-laurel') == 1060 and changes == ['tags']),
+        ("Failed sync keeps the synced terms", failed == {'categories': 'failed', 'tags': 'failed'}
+         and kept_after_failure == 1060 and service.stats()['failures'] == 2),
+        ("Failed sync leaves the disk cache alone", cache_after_failure == '"v3"'),
+        ("Failed first sync keeps the snapshot", offline_result['tags'] == 'failed'
+         and len(offline.tags) == len(snapshot['tags']) and offline.stats()['tags']['source'] == 'snapshot'),
+        ("Cache written for another site is ignored", other_site.stats()['tags']['source'] == 'snapshot'),
+        ("Unreadable cache falls back to the snapshot", broken.stats()['categories']['source'] == 'snapshot'
+         and len(broken.categories) == len(snapshot['categories'])),
+    ]
+
+    all_passed = True
+    for name, passed in checks:
+        status = "✅ PASS" if passed else "❌ FAIL"
+        print(f"{status}: {name}")
+        if not passed:
+            all_passed = False
+
+    print()
+    print(f"Stats: {service.stats()}")
+    print("=" * 70)
+
+    assert all_passed, "Some taxonomy sync checks FAILED"
+
+if __name__ == '__main__':
+    test_taxonomy_sync()
+    print("✅ All tests PASSED!")
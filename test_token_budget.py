@@ -0,0 +1,83 @@
+#!/usr/bin/env python3
+"""
+Test context trimming against the token budget
+"""
+import sys
+from pathlib import Path
+
+# Add shared directory to path
+sys.path.insert(0, str(Path(__file__).parent / 'shared'))
+
+from token_budget import fit_context_to_budget, count_tokens
+
+MASTER_CONTENT = """Intro to South Jersey for every article.
+
+## Market Statistics
+
+Median price in Gloucester County is $385,000.
+
+## Local History
+
+The region was settled in the 1600s and has many historic districts."""
+
+DOWNSIZING_CONTENT = """
+## Downsizing
+
+Downsizing seniors in Mullica Hill often move to 55+ communities.
+
+## Schools
+
+School ratings vary widely across Camden County districts and townships."""
+
+
+def test_token_budget():
+    """Test that trimming keeps master key sections and the most relevant paragraphs"""
+
+    docs = [
+        {'title': 'South Jersey Real Estate Context Guide', 'content': MASTER_CONTENT, 'is_master': True},
+        {'title': 'Downsizing Notes', 'content': DOWNSIZING_CONTENT, 'is_master': False},
+    ]
+
+    print("=" * 70)
+    print("TOKEN BUDGET TEST")
+    print("=" * 70)
+    print()
+
+    # Tight budget: master key sections + the downsizing paragraph only
+    budget = 60
+    trimmed, report = fit_context_to_budget(docs, ['downsizing', 'seniors'], budget=budget)
+    combined = '\n'.join(doc['content'] for doc in trimmed)
+
+    checks = [
+        ("Master intro kept", 'Intro to South Jersey' in combined),
+        ("Master key section kept", '$385,000' in combined),
+        ("Non-key master section trimmed", 'settled in the 1600s' not in combined),
+        ("Relevant paragraph kept", 'Downsizing seniors' in combined),
+        ("Irrelevant paragraph trimmed", 'School ratings' not in combined),
+        ("Heading kept with its paragraph", '## Downsizing' in combined),
+        ("Report counts trimmed tokens", report['trimmed_tokens'] == report['context_tokens_before'] - report['context_tokens_after']),
+        ("Within budget", report['context_tokens_after'] <= budget),
+    ]
+
+    # Generous budget: nothing trimmed
+    _, full_report = fit_context_to_budget(docs, ['downsizing'], budget=10000)
+    checks.append(("Nothing trimmed under a large budget", full_report['trimmed_tokens'] == 0))
+    checks.append(("Token estimate is non-zero", count_tokens('Median price') > 0))
+
+    all_passed = True
+    for name, passed in checks:
+        status = "✅ PASS" if passed else "❌ FAIL"
+        print(f"{status}: {name}")
+        if not passed:
+            all_passed = False
+
+    print()
+    print(f"Report: {report['context_tokens_after']}/{report['budget']} tokens kept, "
+          f"{report['trimmed_paragraphs']} paragraphs trimmed")
+    print("=" * 70)
+
+    assert all_passed, "Some token budget checks FAILED"
+
+if __name__ == '__main__':
+    test_token_budget()
+    print("✅ All tests PASSED!")
@@ -0,0 +1,194 @@
+#!/usr/bin/env python3
+"""
+Test request tracing: span nesting through the context variable, the timeline added to JSON
+responses and the OTLP/JSON lines written to TRACE_EXPORT_PATH
+"""
+import os
+import sys
+import json
+import time
+import asyncio
+import tempfile
+from pathlib import Path
+
+# Add shared and converter directories to path
+sys.path.insert(0, str(Path(__file__).parent / 'shared'))
+sys.path.insert(0, str(Path(__file__).parent / 'kcm-converter'))
+
+import tracing
+from tracing import start_trace, span, traced, current_trace
+from retry_policy import RetryPolicy
+
+
+def load_server():
+    """Import the converter with throwaway state files"""
+    state_dir = tempfile.mkdtemp(prefix='kcm-state-test-')
+    for name, filename in (('WEBHOOK_OUTBOX_PATH', 'outbox.db'), ('PUBLISH_GUARD_PATH', 'guard.db'),
+                           ('TRACKING_QUEUE_PATH', 'tracking.db'), ('CONTEXT_INDEX_PATH', 'context_index.bin')):
+        os.environ[name] = os.path.join(state_dir, filename)
+    os.environ['SHARED_CACHE_URL'] = 'memory'
+    import kcm_converter_server as server
+    server.claude_retry = RetryPolicy(max_attempts=2, base_delay=0.01)
+    return server
+
+
+@traced()
+def fetch_page(page_id):
+    with span('parse_blocks', page_id=page_id):
+        time.sleep(0.002)
+    return page_id
+
+
+@traced('rewrite')
+async def rewrite_async():
+    await asyncio.sleep(0.002)
+    return current_trace() is not None
+
+
+def test_tracing():
+    """Test span parents, timelines, error capture, response timelines and OTLP export"""
+
+    print("=" * 70)
+    print("TRACING TEST")
+    print("=" * 70)
+    print()
+
+    export_path = Path(tempfile.mkdtemp()) / 'traces.jsonl'
+    os.environ.pop('TRACE_EXPORT_PATH', None)
+
+    with span('outside') as untraced:
+        pass
+    untraced_call = fetch_page('untraced')
+
+    with start_trace('POST /convert', route='/convert') as trace:
+        with span('notion_query', topics=3) as query:
+            fetch_page('page-1')
+            fetch_page('page-2')
+        with span('rewrite_step'):
+            traced_async = asyncio.run(rewrite_async())
+        try:
+            with span('seo'):
+                raise ValueError("bad JSON from Claude")
+        except ValueError:
+            pass
+    after_trace = current_trace()
+
+    by_name = {}
+    for recorded in trace.spans:
+        by_name.setdefault(recorded.name, []).append(recorded)
+    fetches = by_name['fetch_page']
+    timeline = trace.timeline()
+    depths = [(row['name'], row['depth']) for row in timeline]
+    short_left_out = [row['name'] for row in trace.timeline(min_ms=1000)]
+
+    # Concurrent requests keep their own traces
+    seen = {}
+
+    async def request(name):
+        with start_trace(name) as own:
+            await asyncio.sleep(0.005)
+            with span('work'):
+                seen[name] = current_trace() is own
+
+    async def both():
+        await asyncio.gather(request('first'), request('second'))
+    asyncio.run(both())
+
+    # Finished traces are appended as OTLP/JSON when TRACE_EXPORT_PATH is set
+    os.environ['TRACE_EXPORT_PATH'] = str(export_path)
+    try:
+        with start_trace('POST /upload-all', images=2, dry_run=True, ratio=0.5):
+            with span('image_upload'):
+                pass
+        try:
+            with start_trace('POST /convert'):
+                raise RuntimeError("Notion is down")
+        except RuntimeError:
+            pass
+    finally:
+        del os.environ['TRACE_EXPORT_PATH']
+    exported = [json.loads(line) for line in export_path.read_text(encoding='utf-8').splitlines()]
+    upload_spans = exported[0]['resourceSpans'][0]['scopeSpans'][0]['spans']
+    upload_root, upload_child = upload_spans
+    failed_root = exported[1]['resourceSpans'][0]['scopeSpans'][0]['spans'][0]
+
+    # with_timeline adds the trace to successful JSON responses only
+    server = load_server()
+    server.TRACE_TIMELINE_MIN_MS = 0
+
+    @server.with_timeline
+    def converted():
+        with span('rewrite'):
+            pass
+        return server.jsonify({'success': True})
+
+    @server.with_timeline
+    def rejected():
+        return server.jsonify({'error': 'No HTML provided'}), 400
+
+    @server.with_timeline
+    def listed():
+        return server.jsonify(['not', 'a', 'dict'])
+
+    with server.app.test_request_context('/convert', method='POST'):
+        converted_data = converted().get_json()
+        rejected_data = rejected()[0].get_json()
+        listed_data = listed().get_json()
+
+    checks = [
+        ("Spans outside a trace record nothing", untraced is None and untraced_call == 'untraced'),
+        ("Root span carries the request attributes", trace.root.name == 'POST /convert'
+         and trace.root.attributes == {'route': '/convert'} and trace.root.end_ns is not None),
+        ("Child spans point at the span that was current", query.parent_id == trace.root.span_id
+         and [f.parent_id for f in fetches] == [query.span_id] * 2
+         and by_name['parse_blocks'][0].parent_id == fetches[0].span_id),
+        ("@traced records each call", len(fetches) == 2
+         and by_name['parse_blocks'][1].attributes == {'page_id': 'page-2'}),
+        ("Async @traced joins the caller's trace", traced_async
+         and by_name['rewrite'][0].parent_id == by_name['rewrite_step'][0].span_id),
+        ("Errors are recorded on their span", by_name['seo'][0].error == 'ValueError: bad JSON from Claude'
+         and trace.root.error is None),
+        ("Context is restored after the trace", after_trace is None),
+        ("Timeline is in start order with depths", depths == [
+            ('POST /convert', 0), ('notion_query', 1), ('fetch_page', 2), ('parse_blocks', 3),
+            ('fetch_page', 2), ('parse_blocks', 3), ('rewrite_step', 1), ('rewrite', 2), ('seo', 1)]),
+        ("Timeline offsets start at the request", timeline[0]['start_ms'] == 0
+         and all(row['start_ms'] >= 0 and row['duration_ms'] >= 0 for row in timeline)
+         and timeline[-1]['error'] == 'ValueError: bad JSON from Claude'),
+        ("Short spans are left out, the root never", short_left_out == ['POST /convert']),
+        ("Concurrent requests keep their own traces", seen == {'first': True, 'second': True}),
+        ("Untraced runs export nothing", len(exported) == 2),
+        ("Export is one OTLP request per trace", exported[0]['resourceSpans'][0]['resource']['attributes'] == [
+            {'key': 'service.name', 'value': {'stringValue': 'kcm-converter'}}]
+         and upload_root['traceId'] == upload_child['traceId'] and len(upload_root['traceId']) == 32),
+        ("Exported spans keep parents and kinds", upload_child['parentSpanId'] == upload_root['spanId']
+         and 'parentSpanId' not in upload_root and upload_root['kind'] == 2 and upload_child['kind'] == 1
+         and int(upload_root['endTimeUnixNano']) >= int(upload_root['startTimeUnixNano'])),
+        ("Exported attributes are typed", upload_root['attributes'] == [
+            {'key': 'images', 'value': {'intValue': '2'}}, {'key': 'dry_run', 'value': {'boolValue': True}},
+            {'key': 'ratio', 'value': {'doubleValue': 0.5}}]),
+        ("Failed requests are exported with an error status", failed_root['status'] == {
+            'code': 2, 'message': 'RuntimeError: Notion is down'} and upload_root['status'] == {'code': 1}),
+        ("Successful JSON responses get the timeline", len(converted_data['trace_id']) == 32
+         and [row['name'] for row in converted_data['timeline']] == ['POST /convert', 'rewrite']
+         and converted_data['success'] is True),
+        ("Error responses are left alone", rejected_data == {'error': 'No HTML provided'}),
+        ("Non-object JSON is left alone", listed_data == ['not', 'a', 'dict']),
+    ]
+
+    all_passed = True
+    for name, passed in checks:
+        status = "✅ PASS" if passed else "❌ FAIL"
+        print(f"{status}: {name}")
+        if not passed:
+            all_passed = False
+
+    print()
+    print(f"Timeline: {depths}")
+    print("=" * 70)
+
+    assert all_passed, "Some tracing checks FAILED"
+
+if __name__ == '__main__':
+    test_tracing()
+    print("✅ All tests PASSED!")
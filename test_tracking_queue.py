@@ -0,0 +1,123 @@
+#!/usr/bin/env python3
+"""
+Test the Notion tracking queue: backoff, giving up, batching, and crash recovery in the worker process
+"""
+import sys
+import tempfile
+from pathlib import Path
+
+# Add shared directory to path
+sys.path.insert(0, str(Path(__file__).parent / 'shared'))
+
+from tracking_queue import TrackingQueue, PENDING, WRITING, DONE, FAILED
+
+
+def record(slug: str):
+    return {'kcm_url': f"https://kcm.example/{slug}/", 'wordpress_url': f"https://wp.example/{slug}/"}
+
+
+class FlakyNotion:
+    """write_record stand-in that fails a given number of times, then returns a page ID"""
+
+    def __init__(self, failures: int):
+        self.failures = failures
+        self.calls = 0
+
+    def __call__(self, record):
+        self.calls += 1
+        if self.calls <= self.failures:
+            raise ConnectionError("Notion is down")
+        return f"page-{self.calls}"
+
+
+def due(queue: TrackingQueue, item):
+    """Make a backed-off record due now and claim it again"""
+    with queue._connect() as conn:
+        conn.execute("UPDATE tracking SET next_attempt_at = 0 WHERE id = ?", (item['id'],))
+    return queue._claim_batch()[0]
+
+
+def test_tracking_queue():
+    """Test retries, failed records, batching, and that only recover() requeues in-flight writes"""
+
+    print("=" * 70)
+    print("TRACKING QUEUE TEST")
+    print("=" * 70)
+    print()
+
+    db_path = Path(tempfile.mkdtemp()) / 'tracking.db'
+    worker = TrackingQueue(lambda r: 'page-id', db_path=db_path)
+    worker.enqueue(record('downsizing'), 'key-1')
+    claimed = worker._claim_batch()
+
+    # Another process (batch backfill, a second worker) opening the same queue
+    TrackingQueue(lambda r: 'page-id', db_path=db_path)
+    after_open = worker.stats()
+
+    requeued = worker.recover()
+    after_recover = worker.stats()
+
+    # Notion down twice, then back: retries back off (base_delay doubling) until the write succeeds
+    written = []
+    notion = FlakyNotion(failures=2)
+    flaky = TrackingQueue(notion, db_path=Path(tempfile.mkdtemp()) / 'tracking.db',
+                          on_written=lambda key, page_id: written.append((key, page_id)),
+                          max_attempts=3, base_delay=10, max_delay=15)
+    flaky.enqueue(record('flaky'), 'flaky')
+    duplicate_queued = flaky.enqueue(record('flaky'), 'flaky')
+    item = flaky._claim_batch()[0]
+    flaky.write(item)
+    first_delay = flaky._seconds_until_due(60)
+    not_due = flaky._claim_batch()
+    item = due(flaky, item)
+    flaky.write(item)
+    second_delay = flaky._seconds_until_due(60)
+    flaky.write(due(flaky, item))
+
+    # Notion down for good: the record is marked failed after max_attempts and leaves the mappings
+    broken = TrackingQueue(FlakyNotion(failures=10), db_path=Path(tempfile.mkdtemp()) / 'tracking.db',
+                           max_attempts=2, base_delay=0.01)
+    broken.enqueue(record('broken'), 'broken')
+    item = broken._claim_batch()[0]
+    broken.write(item)
+    broken.write(due(broken, item))
+
+    batched = TrackingQueue(lambda r: 'page-id', db_path=Path(tempfile.mkdtemp()) / 'tracking.db', batch_size=2)
+    for i in range(3):
+        batched.enqueue(record(f"post-{i}"), f"key-{i}")
+    batch_sizes = [len(batched._claim_batch()), len(batched._claim_batch())]
+
+    checks = [
+        ("Worker claimed the record", len(claimed) == 1),
+        ("Opening the queue elsewhere leaves in-flight writes alone", after_open == {WRITING: 1}),
+        ("recover() requeues interrupted writes", requeued == 1 and after_recover == {PENDING: 1}),
+        ("In-flight records still count as pending mappings",
+         worker.pending_mappings() == {'https://kcm.example/downsizing/': 'https://wp.example/downsizing/'}),
+        ("Nothing left to recover afterwards", worker.recover() == 0),
+        ("A repeated dedupe key is not queued twice", duplicate_queued is False),
+        ("First retry waits base_delay", 9 <= first_delay <= 10),
+        ("Backed-off record is not claimed early", not_due == []),
+        ("Backoff doubles up to max_delay", 14 <= second_delay <= 15),
+        ("Record is written once Notion recovers", notion.calls == 3 and flaky.stats() == {DONE: 1}
+         and written == [('flaky', 'page-3')]),
+        ("Record is failed after max_attempts", broken.stats() == {FAILED: 1}),
+        ("Failed records are not pending mappings", broken.pending_mappings() == {}),
+        ("Claims are limited to batch_size", batch_sizes == [2, 1]),
+    ]
+
+    all_passed = True
+    for name, passed in checks:
+        status = "✅ PASS" if passed else "❌ FAIL"
+        print(f"{status}: {name}")
+        if not passed:
+            all_passed = False
+
+    print()
+    print(f"Queue: {worker.stats()}")
+    print("=" * 70)
+
+    assert all_passed, "Some tracking queue checks FAILED"
+
+if __name__ == '__main__':
+    test_tracking_queue()
+    print("✅ All tests PASSED!")
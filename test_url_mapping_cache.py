@@ -0,0 +1,146 @@
+#!/usr/bin/env python3
+"""
+Test the KCM -> WordPress URL mapping cache: reloads, Notion failures and the retry delay
+"""
+import os
+import sys
+import time
+from pathlib import Path
+
+# Add shared directory to path
+sys.path.insert(0, str(Path(__file__).parent / 'shared'))
+
+os.environ['NOTION_CONVERSION_DB_ID'] = 'conversions'
+
+import tempfile
+
+import notion_conversion_tracker
+from notion_conversion_tracker import UrlMappingCache, get_url_mappings
+from shared_cache import SharedCache, TTL
+
+
+def conversion_page(kcm_url: str, wordpress_url: str):
+    return {'properties': {'KCM URL': {'url': kcm_url}, 'WordPress URL': {'url': wordpress_url}}}
+
+
+class ConversionDatabase:
+    """Stand-in for notion_client.databases that can be switched to failing"""
+
+    def __init__(self):
+        self.pages = [conversion_page('https://kcm.example/a/', 'https://wp.example/a/')]
+        self.down = False
+        self.queries = 0
+
+    def query(self, **kwargs):
+        self.queries += 1
+        if self.down:
+            raise ConnectionError("Notion is down")
+        return {'results': list(self.pages)}
+
+
+class NotionStub:
+    def __init__(self):
+        self.databases = ConversionDatabase()
+
+
+def test_url_mapping_cache():
+    """Test that a failed reload keeps the last mapping and is retried soon"""
+
+    print("=" * 70)
+    print("URL MAPPING CACHE TEST")
+    print("=" * 70)
+    print()
+
+    notion_conversion_tracker.RELOAD_RETRY_DELAY = 0.2
+    notion = NotionStub()
+    cache = UrlMappingCache(notion, ttl=60, pending=lambda: {'https://kcm.example/queued/': 'https://wp.example/queued/'})
+
+    loaded = cache.get()
+
+    notion.databases.down = True
+    try:
+        cache.refresh()
+        refresh_raised = False
+    except ConnectionError:
+        refresh_raised = True
+    after_failure = cache.get()
+    queries_during_retry_delay = notion.databases.queries
+
+    notion.databases.down = False
+    notion.databases.pages.append(conversion_page('https://kcm.example/b/', 'https://wp.example/b/'))
+    time.sleep(0.25)
+    recovered = cache.get()
+
+    cold_notion = NotionStub()
+    cold_notion.databases.down = True
+    cold = UrlMappingCache(cold_notion, ttl=60, pending=lambda: {'https://kcm.example/queued/': 'https://wp.example/queued/'})
+    cold_mapping = cold.get()
+
+    # Workers sharing one cache: a failed reload must never reach the other workers
+    url = f"sqlite:///{Path(tempfile.mkdtemp()) / 'shared_cache.db'}"
+
+    def worker(notion_stub):
+        shared = SharedCache(url).namespace('url_mappings', ttl=60, maxsize=0, policy=TTL)
+        return UrlMappingCache(notion_stub, ttl=60, shared=shared), shared
+
+    failing_notion = NotionStub()
+    failing_notion.databases.down = True
+    failing_worker, shared = worker(failing_notion)
+    try:
+        failing_worker.refresh()
+    except ConnectionError:
+        pass
+    nothing_published = shared.get(failing_worker._shared_key) is None
+
+    healthy_worker, _ = worker(NotionStub())
+    healthy_worker.refresh()
+    published = shared.get(failing_worker._shared_key)['mapping']
+    try:
+        failing_worker.refresh()
+    except ConnectionError:
+        pass
+    kept_shared = shared.get(failing_worker._shared_key)['mapping']
+    restarted_worker, _ = worker(failing_notion)
+    restarted_mapping = restarted_worker.get()
+
+    swallowed = get_url_mappings(cold_notion)
+    try:
+        get_url_mappings(cold_notion, raise_errors=True)
+        loader_raised = False
+    except ConnectionError:
+        loader_raised = True
+
+    checks = [
+        ("Mapping and pending conversions are loaded", loaded == {
+            'https://kcm.example/a/': 'https://wp.example/a/',
+            'https://kcm.example/queued/': 'https://wp.example/queued/'}),
+        ("Failed reload raises for the cache warmer", refresh_raised),
+        ("Failed reload keeps the previous mapping", after_failure == loaded),
+        ("No Notion query during the retry delay", queries_during_retry_delay == 2),
+        ("Reload is retried after the delay", 'https://kcm.example/b/' in recovered),
+        ("First load failing serves the pending mappings", cold_mapping == {
+            'https://kcm.example/queued/': 'https://wp.example/queued/'}),
+        ("Failed reload is not published to other workers", nothing_published),
+        ("Failed reload leaves the shared mapping alone", kept_shared == published
+         == {'https://kcm.example/a/': 'https://wp.example/a/'}),
+        ("New worker uses the last good shared mapping while Notion is down", restarted_mapping == published),
+        ("Loader still returns {} by default", swallowed == {}),
+        ("Loader raises when asked to", loader_raised),
+    ]
+
+    all_passed = True
+    for name, passed in checks:
+        status = "✅ PASS" if passed else "❌ FAIL"
+        print(f"{status}: {name}")
+        if not passed:
+            all_passed = False
+
+    print()
+    print(f"Mapping after recovery: {recovered}")
+    print("=" * 70)
+
+    assert all_passed, "Some URL mapping cache checks FAILED"
+
+if __name__ == '__main__':
+    test_url_mapping_cache()
+    print("✅ All tests PASSED!")
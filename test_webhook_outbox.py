@@ -0,0 +1,136 @@
+#!/usr/bin/env python3
+"""
+Test the webhook outbox: delivery outcomes, backoff, giving up, and crash recovery
+"""
+import sys
+import time
+import json
+import tempfile
+from pathlib import Path
+
+# Add shared directory to path
+sys.path.insert(0, str(Path(__file__).parent / 'shared'))
+
+import requests
+
+from webhook_outbox import WebhookOutbox, PENDING, SENDING, DELIVERED, FAILED
+
+
+class Reply:
+    """requests.Response stand-in"""
+
+    def __init__(self, status_code: int, text: str = ''):
+        self.status_code = status_code
+        self.text = text
+
+    def json(self):
+        return json.loads(self.text)
+
+
+class Webhook:
+    """HTTP session stand-in that answers with the scripted replies (or raises them) in turn"""
+
+    def __init__(self, *replies):
+        self.replies = list(replies)
+        self.posts = 0
+
+    def post(self, url, **kwargs):
+        self.posts += 1
+        reply = self.replies.pop(0)
+        if isinstance(reply, Exception):
+            raise reply
+        return reply
+
+
+def send(outbox: WebhookOutbox, key: str, webhook: Webhook, tries: int = 1) -> dict:
+    """Queue a delivery and run the sender for it up to `tries` times (ignoring the backoff)"""
+    outbox._session = webhook
+    outbox.enqueue({'title': key}, key)
+    for _ in range(tries):
+        with outbox._connect() as conn:
+            conn.execute("UPDATE outbox SET next_attempt_at = 0 WHERE idempotency_key = ?", (key,))
+        record = outbox._claim_due()
+        if record:
+            outbox.deliver(record)
+    return outbox.get(key)
+
+
+def test_webhook_outbox():
+    """Test crash recovery, which replies count as delivered, backoff and max_attempts"""
+
+    print("=" * 70)
+    print("WEBHOOK OUTBOX TEST")
+    print("=" * 70)
+    print()
+
+    db_path = Path(tempfile.mkdtemp()) / 'outbox.db'
+    sender = WebhookOutbox('https://n8n.example/webhook', db_path=db_path)
+    sender.enqueue({'title': 'Downsizing'}, 'key-1', post_key='downsizing')
+    claimed = sender._claim_due()
+
+    # Another process (batch backfill, a second worker) opening the same outbox
+    WebhookOutbox('https://n8n.example/webhook', db_path=db_path)
+    after_open = sender.get('key-1')['status']
+
+    requeued = sender.recover()
+    after_recover = sender.get('key-1')
+
+    delivered = []
+    outbox = WebhookOutbox('https://n8n.example/webhook', db_path=db_path.with_name('deliveries.db'),
+                           on_delivered=lambda record, response: delivered.append(response),
+                           max_attempts=3, base_delay=10, max_delay=15)
+
+    json_reply = send(outbox, 'json', Webhook(Reply(200, '[{"id": 42, "link": "https://wp.example/p/"}]')))
+    text_webhook = Webhook(Reply(200, 'Workflow was started'), Reply(200, 'Workflow was started'))
+    text_reply = send(outbox, 'text', text_webhook, tries=2)
+    created = send(outbox, 'created', Webhook(Reply(201)))
+
+    started = time.time()
+    server_error = send(outbox, 'server-error', Webhook(Reply(500, 'n8n is restarting')))
+    first_delay = server_error['next_attempt_at'] - started
+    flaky = send(outbox, 'flaky', Webhook(requests.exceptions.ConnectionError("refused"), Reply(200, '{"id": 7}')), tries=2)
+
+    down = Webhook(*[Reply(502, 'Bad gateway')] * 5)
+    with outbox._connect() as conn:
+        conn.execute("UPDATE outbox SET attempts = 2, next_attempt_at = 0 WHERE idempotency_key = 'server-error'")
+    outbox._session = down
+    outbox.deliver(outbox._claim_due())
+    gave_up = outbox.get('server-error')
+    exhausted = send(outbox, 'exhausted', down, tries=5)
+    retried = outbox.retry('exhausted')
+
+    checks = [
+        ("Sender claimed the delivery", claimed['idempotency_key'] == 'key-1'),
+        ("Opening the outbox elsewhere leaves in-flight deliveries alone", after_open == SENDING),
+        ("recover() requeues interrupted deliveries", requeued == 1 and after_recover['status'] == PENDING),
+        ("Recovered delivery keeps its attempt count", after_recover['attempts'] == 1),
+        ("Nothing left to recover afterwards", sender.recover() == 0),
+        ("JSON array reply is unwrapped", json_reply['status'] == DELIVERED and json_reply['response']['id'] == 42),
+        ("200 with a non-JSON body is delivered once", text_reply['status'] == DELIVERED and text_webhook.posts == 1
+         and text_reply['response'] == {}),
+        ("Any 2xx counts as delivered", created['status'] == DELIVERED),
+        ("on_delivered runs once per delivery", len(delivered) == 4),
+        ("Non-2xx reply is retried after the base delay", server_error['status'] == PENDING
+         and 9 <= first_delay <= 11 and 'status 500' in server_error['last_error']),
+        ("Transport error is retried", flaky['status'] == DELIVERED and flaky['attempts'] == 2),
+        ("Delivery fails after max_attempts", gave_up['status'] == FAILED and 'status 502' in gave_up['last_error']),
+        ("Failed delivery is not retried by the sender", exhausted['status'] == FAILED and exhausted['attempts'] == 3),
+        ("retry() re-queues a failed delivery", retried['status'] == PENDING and retried['attempts'] == 0),
+    ]
+
+    all_passed = True
+    for name, passed in checks:
+        status = "✅ PASS" if passed else "❌ FAIL"
+        print(f"{status}: {name}")
+        if not passed:
+            all_passed = False
+
+    print()
+    print(f"Outbox: {sender.stats()}")
+    print("=" * 70)
+
+    assert all_passed, "Some webhook outbox checks FAILED"
+
+if __name__ == '__main__':
+    test_webhook_outbox()
+    print("✅ All tests PASSED!")